@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步并发 RAG 引擎：多个问题的检索和生成相互重叠执行
+
+- embedding（CPU 密集）和 Milvus 检索（阻塞调用）放到线程池中执行，不阻塞事件循环
+- DeepSeek 调用使用异步客户端，并用信号量限制同时在途的请求数
+- 每个请求有独立的截止时间，超时的请求返回错误而不会拖慢其他请求
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+from index_config import DEFAULT_INDEX_CONFIG, IndexConfig
+from llm_client import DEEPSEEK_MODEL, build_rag_messages, create_async_deepseek_client
+
+
+class RagResult(NamedTuple):
+    """单个问题的处理结果"""
+
+    question: str
+    contexts: List[Tuple[str, str, float]]
+    answer: Optional[str]
+    seconds: float
+    error: Optional[str] = None
+
+
+class AsyncRagEngine:
+    """
+    asyncio RAG 引擎
+
+    用法:
+        engine = AsyncRagEngine(milvus_client, embedding_model, collection_name)
+        results = await engine.answer_many(questions)
+        await engine.aclose()
+    """
+
+    def __init__(
+        self,
+        milvus_client,
+        embedding_model,
+        collection_name: str,
+        llm_client: Optional[AsyncOpenAI] = None,
+        top_k: int = 3,
+        max_concurrent_llm_calls: int = 8,
+        embedding_workers: int = 4,
+        deadline: Optional[float] = 30.0,
+        index_config: IndexConfig = DEFAULT_INDEX_CONFIG
+    ):
+        """
+        Args:
+            milvus_client: Milvus 客户端
+            embedding_model: 提供 encode_queries 的 embedding 模型，会被多个线程同时调用，需要线程安全
+                （wrap_with_cache 返回的缓存包装是线程安全的）
+            collection_name: collection 名称
+            llm_client: 异步 OpenAI 兼容客户端，默认使用 create_async_deepseek_client()
+            top_k: 每个问题检索的条文数
+            max_concurrent_llm_calls: 同时在途的 LLM 请求数上限
+            embedding_workers: 执行 embedding 和 Milvus 检索的线程数
+            deadline: 每个请求的默认截止时间（秒），None 表示不限制
+            index_config: 构建 collection 时使用的索引配置，提供度量方式和检索参数
+        """
+
+        self.milvus_client = milvus_client
+        self.embedding_model = embedding_model
+        self.collection_name = collection_name
+        self.llm_client = llm_client or create_async_deepseek_client()
+        self.top_k = top_k
+        self.deadline = deadline
+        self.index_config = index_config
+
+        self._llm_semaphore = asyncio.Semaphore(max_concurrent_llm_calls)
+        self._executor = ThreadPoolExecutor(max_workers=embedding_workers, thread_name_prefix="rag-retrieval")
+
+    def _retrieve(self, question: str) -> List[Tuple[str, str, float]]:
+        """在线程池中执行：生成查询向量并检索"""
+
+        query_embedding = self.embedding_model.encode_queries([question])
+        search_results = self.milvus_client.search(
+            collection_name=self.collection_name,
+            data=query_embedding,
+            limit=self.top_k,
+            search_params=self.index_config.search_request(),
+            output_fields=["title", "text"]
+        )
+
+        return [
+            (result["entity"]["title"], result["entity"]["text"], result["distance"])
+            for result in search_results[0]
+        ]
+
+    async def retrieve(self, question: str) -> List[Tuple[str, str, float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._retrieve, question)
+
+    async def generate(self, question: str, contexts: List[Tuple[str, str, float]]) -> str:
+        async with self._llm_semaphore:
+            response = await self.llm_client.chat.completions.create(
+                model=DEEPSEEK_MODEL,
+                messages=build_rag_messages(question, contexts),
+                temperature=0.1
+            )
+        return response.choices[0].message.content
+
+    async def _answer(self, question: str, contexts_holder: list) -> str:
+        contexts = await self.retrieve(question)
+        contexts_holder.extend(contexts)
+        return await self.generate(question, contexts)
+
+    async def answer(self, question: str, deadline: Optional[float] = None) -> RagResult:
+        """
+        处理单个问题；超时或出错时 RagResult.error 不为空
+
+        Args:
+            question: 问题
+            deadline: 本请求的截止时间（秒），默认使用引擎的 deadline
+        """
+
+        deadline = self.deadline if deadline is None else deadline
+        contexts: List[Tuple[str, str, float]] = []
+        start = time.perf_counter()
+
+        try:
+            answer = await asyncio.wait_for(self._answer(question, contexts), timeout=deadline)
+            return RagResult(question, contexts, answer, time.perf_counter() - start)
+        except asyncio.TimeoutError:
+            return RagResult(question, contexts, None, time.perf_counter() - start,
+                             error=f"超过截止时间 {deadline:.1f}s")
+        except Exception as e:
+            return RagResult(question, contexts, None, time.perf_counter() - start, error=str(e))
+
+    async def answer_many(self, questions: List[str], deadline: Optional[float] = None) -> List[RagResult]:
+        """并发处理多个问题，结果与输入顺序一致"""
+
+        return await asyncio.gather(*(self.answer(question, deadline) for question in questions))
+
+    async def aclose(self):
+        self._executor.shutdown(wait=False)
+        await self.llm_client.close()
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量索引参数扫描：HNSW / IVF 等索引在参数网格上的 recall@k、QPS、构建时间和内存
+
+- 真值为 NumPy 暴力检索（精确 top-k），同时给出暴力检索的 QPS 作为参照
+- 构建参数相同的配置只建一次索引，再依次扫描 ef / nprobe 等检索参数
+- 构建和检索分别在独立的子进程中执行（Milvus Lite 的数据库文件在进程退出前一直被占用），
+  峰值内存为子进程的最大常驻内存；另外给出按索引结构估算的内存（index_config.estimate_index_bytes）
+- 结果写成 JSON 报告；安装了 matplotlib 时画出 recall@k–QPS 和 构建时间–内存 两张图
+
+默认数据为聚类分布的随机向量（比纯随机向量更接近真实 embedding），也可以用 --vectors
+传入真实 embedding（.npy），此时随机取出 --queries 行作为查询，不参与建库。
+
+注意：Milvus Lite 支持 FLAT / IVF_FLAT / IVF_SQ8 / HNSW，不支持 IVF_PQ（报告中记为错误），
+且每次检索的调用开销较大，QPS 差异会被掩盖。百万级 collection 的调参请用 --uri 指向
+Milvus standalone / 集群（此时峰值内存只包含客户端进程，以估算值为准）。
+
+用法:
+    python bench_ann_index.py --rows 20000 --output ann_sweep.json --plot ann_sweep
+    python bench_ann_index.py --grid "hnsw:M=16|32,efConstruction=200,ef=16|64|256" --uri http://localhost:19530
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from index_config import IndexConfig, create_indexed_collection, estimate_index_bytes, expand_index_grid
+
+COLLECTION_NAME = "ann_sweep"
+
+DEFAULT_GRID = [
+    "flat",
+    "ivf_flat:nlist=64|256|1024,nprobe=1|4|16|64",
+    "ivf_sq8:nlist=256,nprobe=4|16|64",
+    "ivf_pq:nlist=256,m=16,nbits=8,nprobe=4|16|64",
+    "hnsw:M=8|16|32,efConstruction=200,ef=16|32|64|128|256"
+]
+
+
+def make_dataset(rows: int, dim: int, num_queries: int, clusters: int = 100, seed: int = 42):
+    """聚类分布的归一化随机向量，查询来自同一分布但不在库中"""
+
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+
+    def sample(n):
+        points = centers[rng.integers(0, clusters, n)] + rng.normal(size=(n, dim)).astype(np.float32) * 0.6
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+    return sample(rows), sample(num_queries)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, block_rows: int = 65536) -> np.ndarray:
+    """分块暴力计算余弦相似度的精确 top-k（向量已归一化），作为真值"""
+
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(vectors), block_rows):
+        scores = queries @ vectors[start:start + block_rows].T
+        best_scores = np.concatenate([best_scores, scores], axis=1)
+        best_ids = np.concatenate([best_ids, np.broadcast_to(
+            np.arange(start, start + scores.shape[1]), scores.shape)], axis=1)
+        keep = np.argpartition(-best_scores, min(k, best_scores.shape[1] - 1), axis=1)[:, :k]
+        best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        best_ids = np.take_along_axis(best_ids, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_ids, order, axis=1)
+
+
+def brute_force_qps(vectors: np.ndarray, queries: np.ndarray, k: int) -> float:
+    """逐个查询的 NumPy 暴力检索 QPS（矩阵乘法 + argpartition）"""
+
+    start = time.perf_counter()
+    for query in queries:
+        scores = vectors @ query
+        top = np.argpartition(-scores, k)[:k]
+        top = top[np.argsort(-scores[top])]
+    return len(queries) / (time.perf_counter() - start)
+
+
+def _peak_rss() -> int:
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _open_client(uri: str):
+    from pymilvus import MilvusClient
+    return MilvusClient(uri=uri)
+
+
+def build_child(uri: str, config_path: str, vectors_path: str):
+    """子进程入口：按索引配置建库并写入全部向量"""
+
+    with open(config_path, "r", encoding="utf-8") as file:
+        index_config = IndexConfig(**json.load(file))
+    vectors = np.load(vectors_path, mmap_mode="r")
+
+    build_start = time.perf_counter()
+    client = _open_client(uri)
+    if client.has_collection(COLLECTION_NAME):
+        client.drop_collection(COLLECTION_NAME)
+    create_indexed_collection(client, COLLECTION_NAME, vectors.shape[1], index_config)
+
+    for start in range(0, len(vectors), 1000):
+        client.insert(
+            collection_name=COLLECTION_NAME,
+            data=[
+                {"id": start + i, "vector": vector.tolist()}
+                for i, vector in enumerate(vectors[start:start + 1000])
+            ]
+        )
+    # 落盘后才会为数据段建索引，计入构建时间
+    client.flush(COLLECTION_NAME)
+    build_seconds = time.perf_counter() - build_start
+    client.close()
+
+    print(json.dumps({"build_seconds": build_seconds, "peak_rss": _peak_rss()}))
+
+
+def measure_child(uri: str, config_path: str, queries_path: str, top_k: int):
+    """子进程入口：依次使用每组检索参数逐个查询，输出 QPS 和结果 ID"""
+
+    with open(config_path, "r", encoding="utf-8") as file:
+        configs = [IndexConfig(**config) for config in json.load(file)]
+    queries = np.load(queries_path)
+
+    client = _open_client(uri)
+    client.load_collection(COLLECTION_NAME)
+
+    results = []
+    for index_config in configs:
+        search_params = index_config.search_request()
+        # 预热一次，排除首次检索的加载开销
+        client.search(collection_name=COLLECTION_NAME, data=[queries[0].tolist()], limit=top_k,
+                      search_params=search_params)
+
+        ids = []
+        start = time.perf_counter()
+        for query in queries:
+            hits = client.search(collection_name=COLLECTION_NAME, data=[query.tolist()], limit=top_k,
+                                 search_params=search_params)
+            ids.append([hit["id"] for hit in hits[0]])
+        results.append({"qps": len(queries) / (time.perf_counter() - start), "ids": ids})
+
+    client.close()
+    print(json.dumps({"peak_rss": _peak_rss(), "searches": results}))
+
+
+def run_child(*args) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", *map(str, args)],
+        check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def group_by_build(configs: List[IndexConfig]) -> Dict[str, List[IndexConfig]]:
+    """构建参数相同的配置归为一组，组内只有检索参数不同"""
+
+    groups = {}
+    for config in configs:
+        build = config._replace(search_params={})
+        groups.setdefault(build.spec, []).append(config)
+    return groups
+
+
+def run_sweep(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    configs: List[IndexConfig],
+    top_k: int,
+    uri: str = None,
+    work_dir: str = None
+) -> dict:
+    """
+    对每组构建参数建一次索引并扫描检索参数，返回 JSON 报告
+
+    Args:
+        vectors: 已归一化的库向量
+        queries: 已归一化的查询向量
+        configs: expand_index_grid 展开后的配置
+        top_k: 计算 recall@k 的 k
+        uri: Milvus 服务地址，默认在临时目录中使用 Milvus Lite
+        work_dir: 临时文件目录
+    """
+
+    from retrieval_benchmark import directory_size
+
+    ground_truth = exact_top_k(vectors, queries, top_k)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "rows": len(vectors),
+        "dimension": vectors.shape[1],
+        "num_queries": len(queries),
+        "top_k": top_k,
+        "uri": uri or "milvus-lite",
+        "brute_force_qps": brute_force_qps(vectors, queries, top_k),
+        "builds": []
+    }
+    print(f"🧮 NumPy 暴力检索: {report['brute_force_qps']:.0f} QPS（recall 1.000）")
+
+    run_dir = tempfile.mkdtemp(prefix="ann_sweep_", dir=work_dir)
+    try:
+        vectors_path = os.path.join(run_dir, "vectors.npy")
+        queries_path = os.path.join(run_dir, "queries.npy")
+        np.save(vectors_path, vectors)
+        np.save(queries_path, queries)
+
+        for build_spec, group in group_by_build(configs).items():
+            db_dir = os.path.join(run_dir, "db")
+            os.makedirs(db_dir, exist_ok=True)
+            build_uri = uri or os.path.join(db_dir, "ann_sweep.db")
+
+            config_path = os.path.join(run_dir, "config.json")
+            with open(config_path, "w", encoding="utf-8") as file:
+                json.dump(group[0]._replace(search_params={}).to_dict(), file)
+            searches_path = os.path.join(run_dir, "searches.json")
+            with open(searches_path, "w", encoding="utf-8") as file:
+                json.dump([config.to_dict() for config in group], file)
+
+            build = {
+                "build": build_spec,
+                "index_config": group[0]._replace(search_params={}).to_dict(),
+                "estimated_bytes": estimate_index_bytes(group[0], len(vectors), vectors.shape[1])
+            }
+            try:
+                build.update(run_child("build", build_uri, config_path, vectors_path))
+                measured = run_child("measure", build_uri, searches_path, queries_path, top_k)
+            except subprocess.CalledProcessError as e:
+                # 当前 Milvus 版本不支持的索引类型或参数，记录错误后继续
+                build["error"] = (e.stderr or str(e)).strip().splitlines()[-1]
+                print(f"   ❌ {build_spec}: {build['error']}")
+                report["builds"].append(build)
+                continue
+
+            build["disk_bytes"] = None if uri else directory_size(db_dir)
+            build["loaded_rss"] = measured["peak_rss"]
+            build["searches"] = [
+                {
+                    "spec": config.spec,
+                    "search_params": dict(config.search_params),
+                    "qps": result["qps"],
+                    "recall": float(np.mean([
+                        len(set(ids) & set(truth)) / top_k
+                        for ids, truth in zip(result["ids"], ground_truth.tolist())
+                    ]))
+                }
+                for config, result in zip(group, measured["searches"])
+            ]
+            report["builds"].append(build)
+            print(format_build(build, top_k))
+
+            if not uri:
+                shutil.rmtree(db_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    return report
+
+
+def format_build(build: dict, top_k: int) -> str:
+    lines = [
+        f"\n📦 {build['build']}: 构建 {build['build_seconds']:.2f}s  "
+        f"峰值内存 {build['loaded_rss'] / 1024 / 1024:.0f}MB  "
+        f"估算索引 {build['estimated_bytes'] / 1024 / 1024:.1f}MB"
+        + (f"  磁盘 {build['disk_bytes'] / 1024 / 1024:.1f}MB" if build.get("disk_bytes") is not None else "")
+    ]
+    for search in build["searches"]:
+        params = ",".join(f"{key}={value}" for key, value in search["search_params"].items()) or "-"
+        lines.append(f"   {params:<12} recall@{top_k} {search['recall']:.3f}  {search['qps']:>8.0f} QPS")
+    return "\n".join(lines)
+
+
+def plot_report(report: dict, prefix: str) -> List[str]:
+    """画 recall@k–QPS 和 构建时间–内存 两张图，返回写出的文件；未安装 matplotlib 时返回空列表"""
+
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("⚠️  未安装 matplotlib，跳过绘图（pip install matplotlib）")
+        return []
+
+    builds = [build for build in report["builds"] if "error" not in build]
+    # matplotlib 默认字体不含中文，图中标签使用英文
+    paths = [f"{prefix}_recall_qps.png", f"{prefix}_build_memory.png"]
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    for build in builds:
+        ax.plot([s["recall"] for s in build["searches"]], [s["qps"] for s in build["searches"]],
+                marker="o", label=build["build"])
+    ax.scatter([1.0], [report["brute_force_qps"]], marker="*", s=150, color="black", label="brute force (NumPy)")
+    ax.set_xlabel(f"recall@{report['top_k']}")
+    ax.set_ylabel("QPS")
+    ax.set_yscale("log")
+    ax.set_title(f"{report['rows']} × {report['dimension']}  {report['uri']}")
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=8)
+    fig.tight_layout()
+    fig.savefig(paths[0], dpi=120)
+    plt.close(fig)
+
+    # 峰值常驻内存包含解释器和 Milvus Lite 本身，与估算的索引大小分两栏画，免得后者被压扁
+    fig, (ax_rss, ax_index) = plt.subplots(1, 2, figsize=(12, 5))
+    for build in builds:
+        ax_rss.scatter(build["build_seconds"], build["loaded_rss"] / 1024 / 1024, label=build["build"])
+        ax_index.scatter(build["build_seconds"], build["estimated_bytes"] / 1024 / 1024)
+    ax_rss.set_ylabel("peak RSS (MB)")
+    ax_index.set_ylabel("estimated index size (MB)")
+    for ax in (ax_rss, ax_index):
+        ax.set_xlabel("build time (s)")
+        ax.grid(True, alpha=0.3)
+    ax_rss.legend(fontsize=8)
+    fig.tight_layout()
+    fig.savefig(paths[1], dpi=120)
+    plt.close(fig)
+
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量索引参数扫描")
+    parser.add_argument("--rows", type=int, default=20000, help="随机向量条数")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--vectors", help="真实 embedding 的 .npy 文件，替代随机向量")
+    parser.add_argument("--grid", nargs="+", default=DEFAULT_GRID,
+                        help="配置字符串，| 分隔的取值会展开为网格（见 index_config.py）")
+    parser.add_argument("--uri", help="Milvus 服务地址，默认使用临时的 Milvus Lite 数据库")
+    parser.add_argument("--output", default="ann_sweep.json", help="JSON 报告路径")
+    parser.add_argument("--plot", default="ann_sweep", help="图片文件名前缀")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, uri, config_path, data_path, *rest = args.child
+        if mode == "build":
+            build_child(uri, config_path, data_path)
+        else:
+            measure_child(uri, config_path, data_path, int(rest[0]))
+        return
+
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        held_out = np.random.default_rng(42).permutation(len(vectors))
+        queries, vectors = vectors[held_out[:args.queries]], vectors[np.sort(held_out[args.queries:])]
+    else:
+        vectors, queries = make_dataset(args.rows, args.dim, args.queries)
+
+    configs = [
+        config for spec in args.grid for config in expand_index_grid(spec)
+        # Milvus 要求 HNSW 的 ef 不小于 top_k
+        if config.search_params.get("ef", args.top_k) >= args.top_k
+    ]
+    print(f"📏 {len(vectors)} 条 × {vectors.shape[1]} 维，{len(queries)} 个查询，"
+          f"{len(group_by_build(configs))} 种索引，{len(configs)} 个配置")
+
+    report = run_sweep(vectors, queries, configs, args.top_k, uri=args.uri)
+
+    from retrieval_benchmark import save_report
+    save_report(report, args.output)
+    print(f"\n💾 报告已写入 {args.output}")
+    for path in plot_report(report, args.plot):
+        print(f"📊 {path}")
+
+
+if __name__ == "__main__":
+    main()
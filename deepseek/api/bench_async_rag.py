@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+负载测试：AsyncRagEngine 在不同并发度下的延迟分布和吞吐
+
+问题以 optimized_rag_demo.TEST_QUESTIONS 为种子循环生成，检索使用真实的 Milvus，
+LLM 使用本地模拟的 OpenAI 兼容服务（可配置首 token 延迟和生成速度）。
+
+用法:
+    python bench_async_rag.py --requests 200 --concurrency 1 4 16 64
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from async_rag_engine import AsyncRagEngine
+from llm_client import create_async_deepseek_client
+from mock_openai_server import MockOpenAIServer
+from optimized_rag_demo import TEST_QUESTIONS, build_optimized_rag_system
+
+
+def make_questions(requests: int):
+    """以测试问题为种子生成负载，加编号避免完全相同的请求"""
+
+    return [f"{TEST_QUESTIONS[i % len(TEST_QUESTIONS)]}（{i}）" for i in range(requests)]
+
+
+async def run_level(engine: AsyncRagEngine, questions, concurrency: int):
+    """闭环负载：concurrency 个虚拟用户轮流从队列中取问题"""
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for question in questions:
+        queue.put_nowait(question)
+
+    results = []
+
+    async def user():
+        while True:
+            try:
+                question = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            results.append(await engine.answer(question))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def percentile(quantiles, p: int) -> float:
+    return quantiles[p - 1] * 1000
+
+
+async def main_async(args):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    milvus_client, embedding_model, collection_name = build_optimized_rag_system(
+        os.path.join(script_dir, "mfd.md"), incremental=True
+    )
+
+    with MockOpenAIServer(first_token_delay=args.first_token_delay,
+                          token_delay=args.token_delay) as server:
+        print(f"\n{'并发':>4} | {'p50':>8} | {'p95':>8} | {'p99':>8} | {'吞吐':>10} | LLM峰值 | 超时/错误")
+        print("-" * 74)
+
+        for concurrency in args.concurrency:
+            server.reset_stats()
+            engine = AsyncRagEngine(
+                milvus_client, embedding_model, collection_name,
+                llm_client=create_async_deepseek_client(
+                    api_key="test", base_url=server.base_url, max_connections=args.max_llm_calls
+                ),
+                max_concurrent_llm_calls=args.max_llm_calls,
+                deadline=args.deadline
+            )
+
+            results, seconds = await run_level(engine, make_questions(args.requests), concurrency)
+            await engine.aclose()
+
+            latencies = sorted(result.seconds for result in results if result.error is None)
+            errors = sum(1 for result in results if result.error is not None)
+            if len(latencies) >= 2:
+                q = statistics.quantiles(latencies, n=100, method="inclusive")
+                p50, p95, p99 = percentile(q, 50), percentile(q, 95), percentile(q, 99)
+            else:
+                p50 = p95 = p99 = float("nan")
+
+            print(f"{concurrency:>4} | {p50:>6.0f}ms | {p95:>6.0f}ms | {p99:>6.0f}ms | "
+                  f"{len(results) / seconds:>6.1f} q/s | {server.max_in_flight:>7} | {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AsyncRagEngine 负载测试")
+    parser.add_argument("--requests", type=int, default=120, help="每个并发度下的请求数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--max-llm-calls", type=int, default=16, help="LLM 并发上限")
+    parser.add_argument("--deadline", type=float, default=30.0, help="单个请求截止时间（秒）")
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试：多进程语料入库从 1 个进程扩展到 N 个进程的吞吐
+
+为了只测量解析 + embedding 的扩展性，默认把结果写入一个只计数的 sink；
+传入 --uri 时写入真实的 Milvus。
+
+用法:
+    python bench_corpus_ingest.py --files 200 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import re
+import tempfile
+
+from corpus_ingest import discover_files, ingest_corpus
+
+
+class CountingSink:
+    """只统计写入行数的 Milvus 替身，排除单写入者对扩展性测量的影响"""
+
+    def __init__(self):
+        self.rows = 0
+
+    def upsert(self, collection_name, data):
+        self.rows += len(data)
+        return {"upsert_count": len(data)}
+
+
+def write_synthetic_files(target_dir: str, file_count: int, seed_file: str):
+    """把 mfd.md 按章节拆开，轮流写成 file_count 个独立的法规文件"""
+
+    with open(seed_file, "r", encoding="utf-8") as file:
+        content = file.read()
+
+    chapters = re.split(r"(?m)^(?=#### )", content)[1:]
+    for i in range(file_count):
+        chapter = chapters[i % len(chapters)]
+        path = os.path.join(target_dir, f"doc_{i:05d}.md")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(f"## 合成法规{i}\n\n### （一）总则\n\n{chapter}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程语料入库扩展性基准测试")
+    parser.add_argument("--files", type=int, default=200, help="合成文件数量")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help="要测试的进程数")
+    parser.add_argument("--uri", default=None, help="写入真实 Milvus 的 URI（默认只计数）")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    seed_file = os.path.join(script_dir, "mfd.md")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_synthetic_files(tmp_dir, args.files, seed_file)
+        files = discover_files([os.path.join(tmp_dir, "*.md")])
+
+        baseline = None
+        for workers in args.workers:
+            if args.uri:
+                from pymilvus import MilvusClient
+                from corpus_ingest import default_model_factory
+
+                client = MilvusClient(uri=args.uri)
+                collection_name = f"bench_corpus_{workers}"
+                if client.has_collection(collection_name):
+                    client.drop_collection(collection_name)
+                client.create_collection(
+                    collection_name=collection_name,
+                    dimension=len(default_model_factory().encode_queries(["测试"])[0]),
+                    metric_type="COSINE"
+                )
+            else:
+                client, collection_name = CountingSink(), "bench"
+
+            report = ingest_corpus(files, client, collection_name, tmp_dir, workers=workers)
+            baseline = baseline or report.chunks_per_second
+            print(f"{report}  (加速比 {report.chunks_per_second / baseline:.2f}x)")
+            print(f"    工作进程线程数 (onnxruntime intra_op, OS 线程峰值): {sorted(report.worker_threads.values())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试：单遍流式层级解析器 vs 原先逐章节回扫前缀的分块实现
+
+用法:
+    python bench_hierarchical_parser.py                      # 默认 1MB / 100MB / 1GB
+    python bench_hierarchical_parser.py --sizes 1 10 --legacy-max-mb 10
+"""
+
+import argparse
+import os
+import re
+import tempfile
+import time
+from typing import List, Tuple
+
+from hierarchical_parser import iter_hierarchical_chunks
+
+MB = 1024 * 1024
+
+
+def legacy_parse_articles(content: str) -> List[Tuple[str, str]]:
+    """原 parse_articles_with_chapter_context 的实现（O(章节数 × 文档大小)），仅作对照"""
+
+    chapter_matches = list(re.finditer(r"^####\s+(.+)$", content, re.MULTILINE))
+    articles = []
+
+    for i, match in enumerate(chapter_matches):
+        chapter_title = match.group(1).strip()
+        start_pos = match.start()
+
+        if i + 1 < len(chapter_matches):
+            chapter_content = content[start_pos:chapter_matches[i + 1].start()].strip()
+        else:
+            chapter_content = content[start_pos:].strip()
+
+        # 每个章节都重新扫描之前的全部内容
+        content_before = content[:start_pos]
+        part_matches = list(re.finditer(r"^###\s+(.+)$", content_before, re.MULTILINE))
+        current_part = part_matches[-1].group(1).strip() if part_matches else ""
+        book_matches = list(re.finditer(r"^##\s+(.+)$", content_before, re.MULTILINE))
+        current_book = book_matches[-1].group(1).strip() if book_matches else ""
+
+        full_title_parts = [p for p in (current_book, current_part) if p]
+        full_title_parts.append(f"第{chapter_title}")
+        chapter_context = " / ".join(full_title_parts)
+
+        article_matches = list(re.finditer(r"\*\*第[零一二三四五六七八九十百千万\d]+条\*\*", chapter_content))
+        for j, article_match in enumerate(article_matches):
+            if j + 1 < len(article_matches):
+                article_content = chapter_content[article_match.start():article_matches[j + 1].start()].strip()
+            else:
+                article_content = chapter_content[article_match.start():].strip()
+
+            full_article_title = f"{chapter_context} / {article_match.group(0)}"
+            articles.append((full_article_title, f"【{full_article_title}】\n\n{article_content}"))
+
+    return articles
+
+
+def write_synthetic_corpus(path: str, size_mb: int, seed_file: str) -> int:
+    """重复拼接 mfd.md 生成指定大小的语料，每份副本使用不同的 ## 标题以区分层级路径"""
+
+    with open(seed_file, "r", encoding="utf-8") as file:
+        seed_lines = file.read().split("\n")
+
+    # 去掉种子文件自带的 ## 标题，每份副本单独生成
+    body = "\n".join(line for line in seed_lines if not re.match(r"^##\s+", line))
+    target = size_mb * MB
+    written = 0
+    copy_index = 0
+
+    with open(path, "w", encoding="utf-8") as file:
+        while written < target:
+            copy_index += 1
+            block = f"## 合成法典（第{copy_index}卷）\n\n{body}\n\n"
+            file.write(block)
+            written += len(block.encode("utf-8"))
+
+    return written
+
+
+def bench_streaming(path: str) -> Tuple[float, int]:
+    start = time.perf_counter()
+    count = sum(1 for _ in iter_hierarchical_chunks(path, emit_chapters=False))
+    return time.perf_counter() - start, count
+
+
+def bench_legacy(path: str) -> Tuple[float, List[Tuple[str, str]]]:
+    start = time.perf_counter()
+    with open(path, "r", encoding="utf-8") as file:
+        articles = legacy_parse_articles(file.read())
+    return time.perf_counter() - start, articles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="层级解析器基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 1024],
+                        help="合成语料大小（MB）")
+    parser.add_argument("--legacy-max-mb", type=int, default=1,
+                        help="原实现只在不超过该大小的语料上运行（二次复杂度，大语料会跑几个小时）")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    seed_file = os.path.join(script_dir, "mfd.md")
+
+    print(f"{'语料':>8} | {'流式解析':>10} | {'吞吐':>10} | {'原实现':>10} | {'加速比':>8} | 结果一致")
+    print("-" * 72)
+
+    for size_mb in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, f"corpus_{size_mb}mb.md")
+            actual_bytes = write_synthetic_corpus(path, size_mb, seed_file)
+
+            stream_seconds, stream_count = bench_streaming(path)
+            throughput = actual_bytes / MB / stream_seconds
+
+            if size_mb <= args.legacy_max_mb:
+                legacy_seconds, legacy_articles = bench_legacy(path)
+                same = legacy_articles == [
+                    (chunk.title, chunk.text)
+                    for chunk in iter_hierarchical_chunks(path, emit_chapters=False)
+                ]
+                legacy_text = f"{legacy_seconds:>9.2f}s"
+                speedup_text = f"{legacy_seconds / stream_seconds:>7.1f}x"
+                same_text = "✅" if same else "❌"
+            else:
+                legacy_text = f"{'跳过':>8}"
+                speedup_text = f"{'-':>8}"
+                same_text = "-"
+
+        print(f"{size_mb:>6}MB | {stream_seconds:>9.2f}s | {throughput:>6.1f}MB/s | "
+              f"{legacy_text} | {speedup_text} | {same_text}  ({stream_count} 条文块)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试：每次新建客户端 vs 共享连接池客户端 vs 流式输出
+
+在本地模拟的 OpenAI 兼容服务上运行，报告首 token 时间（TTFT）、总延迟和 TCP 连接数。
+
+用法:
+    python bench_llm_client.py --requests 50 --first-token-delay 0.2 --token-delay 0.01
+"""
+
+import argparse
+import statistics
+import time
+
+from openai import OpenAI
+
+from llm_client import create_deepseek_client, generate_answer_with_deepseek, stream_answer_with_deepseek
+from mock_openai_server import MockOpenAIServer
+
+CONTEXTS = [("第二百二十条", "权利人、利害关系人认为不动产登记簿记载的事项错误的，可以申请更正登记。", 0.9)]
+QUESTION = "权利人、利害关系人认为不动产登记簿记载的事项错误时怎么办？"
+REPLY = "根据《民法典》第二百二十条，权利人、利害关系人可以申请更正登记；权利人不同意更正的，可以申请异议登记。"
+
+
+def run_case(name: str, server: MockOpenAIServer, requests: int, call):
+    """call() 返回 (首 token 时间, 总时间)"""
+
+    server.reset_stats()
+    ttfts, totals = [], []
+    for _ in range(requests):
+        ttft, total = call()
+        ttfts.append(ttft)
+        totals.append(total)
+
+    print(f"{name:<14} TTFT {statistics.mean(ttfts) * 1000:>8.1f}ms  "
+          f"总延迟 {statistics.mean(totals) * 1000:>8.1f}ms  "
+          f"新建TCP连接 {server.connections:>3} / 请求 {server.requests}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DeepSeek 客户端连接复用与流式输出基准测试")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="模拟首 token 延迟（秒）")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="模拟 token 间隔（秒）")
+    args = parser.parse_args()
+
+    with MockOpenAIServer(reply=REPLY, first_token_delay=args.first_token_delay,
+                          token_delay=args.token_delay) as server:
+
+        def per_call_client():
+            # 原实现：每次调用都新建客户端
+            start = time.perf_counter()
+            client = OpenAI(api_key="test", base_url=server.base_url)
+            generate_answer_with_deepseek(QUESTION, CONTEXTS, client=client)
+            client.close()
+            elapsed = time.perf_counter() - start
+            return elapsed, elapsed
+
+        pooled_client = create_deepseek_client(api_key="test", base_url=server.base_url)
+
+        def pooled():
+            start = time.perf_counter()
+            generate_answer_with_deepseek(QUESTION, CONTEXTS, client=pooled_client)
+            elapsed = time.perf_counter() - start
+            return elapsed, elapsed
+
+        def pooled_stream():
+            start = time.perf_counter()
+            ttft = None
+            for _ in stream_answer_with_deepseek(QUESTION, CONTEXTS, client=pooled_client):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+            return ttft, time.perf_counter() - start
+
+        print(f"模拟服务: 首token {args.first_token_delay * 1000:.0f}ms，"
+              f"token间隔 {args.token_delay * 1000:.0f}ms，回答 {len(REPLY)} 个token")
+        run_case("每次新建客户端", server, args.requests, per_call_client)
+        run_case("共享连接池", server, args.requests, pooled)
+        run_case("共享连接池+流式", server, args.requests, pooled_stream)
+
+        pooled_client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试：逐个问题调用 search_with_optimized_rag vs 批量调用 search_many 的 QPS
+
+模拟线上流量：问题从一组常见问题中按长尾分布抽取（大量重复），每批同时到达 batch_size 个问题。
+
+用法:
+    python bench_search_many.py --requests 600 --batch-size 32
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+
+from embedding_cache import QueryVectorLRU
+from optimized_rag_demo import build_optimized_rag_system, search_many, search_with_optimized_rag
+
+QUESTION_POOL = [
+    "权利人、利害关系人认为不动产登记簿记载的事项错误时怎么办？",
+    "什么是异议登记？",
+    "不动产登记簿和不动产权属证书记载不一致时以哪个为准？",
+    "预告登记后多久不申请登记会失效？",
+    "共有人对共有物的管理费用如何负担？",
+    "相邻关系中通行权如何处理？",
+    "建设用地使用权的期限届满后如何续期？",
+    "抵押权人在什么情况下可以实现抵押权？",
+    "留置权人可以留置哪些财产？",
+    "占有人因使用占有的不动产致使其受到损害的，应当承担什么责任？",
+    "合同中的格式条款在什么情况下无效？",
+    "债务人不履行债务时债权人能否行使代位权？",
+]
+
+
+def make_workload(requests: int, seed: int = 42):
+    """按 Zipf 分布从问题池中抽样，排名越靠前的问题出现越频繁"""
+
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(QUESTION_POOL))]
+    return rng.choices(QUESTION_POOL, weights=weights, k=requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="search_many 批量检索基准测试")
+    parser.add_argument("--requests", type=int, default=600, help="问题总数")
+    parser.add_argument("--batch-size", type=int, default=32, help="每批同时到达的问题数")
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    milvus_client, embedding_model, collection_name = build_optimized_rag_system(
+        os.path.join(script_dir, "mfd.md"), incremental=True
+    )
+
+    workload = make_workload(args.requests)
+
+    # 逐个问题检索（屏蔽 search_with_optimized_rag 的打印输出）
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sequential_results = [
+            search_with_optimized_rag(question, milvus_client, embedding_model, collection_name, args.top_k)
+            for question in workload
+        ]
+    sequential_seconds = time.perf_counter() - start
+
+    # 批量检索
+    query_cache = QueryVectorLRU()
+    start = time.perf_counter()
+    batched_results = []
+    for i in range(0, len(workload), args.batch_size):
+        batched_results.extend(search_many(
+            workload[i:i + args.batch_size], milvus_client, embedding_model,
+            collection_name, args.top_k, query_cache=query_cache
+        ))
+    batched_seconds = time.perf_counter() - start
+
+    same = all(
+        [title for title, _, _ in a] == [title for title, _, _ in b]
+        for a, b in zip(sequential_results, batched_results)
+    )
+    sequential_qps = len(workload) / sequential_seconds
+    batched_qps = len(workload) / batched_seconds
+    cache_stats = query_cache.stats()
+
+    print("\n" + "=" * 60)
+    print(f"问题数: {len(workload)}，不同问题: {len(set(workload))}，批大小: {args.batch_size}")
+    print(f"逐个检索: {sequential_seconds:.2f}s, {sequential_qps:.1f} QPS")
+    print(f"批量检索: {batched_seconds:.2f}s, {batched_qps:.1f} QPS（{batched_qps / sequential_qps:.1f}x）")
+    print(f"查询向量缓存命中率: {cache_stats['hit_rate']:.1%}")
+    print(f"检索结果一致: {'✅' if same else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试：进程内 NumPy 向量存储（float32 / float16 / int8）vs Milvus Lite
+
+每个后端在独立的子进程中测量，避免互相影响：
+- 冷启动：导入依赖 + 打开已有数据库 + 完成第一次检索的时间
+- 峰值内存：子进程的最大常驻内存
+- QPS：逐个查询检索，以及一次传入全部查询的批量检索
+- recall@k：与 float32 暴力检索的结果对比（量化存储会有少量误差）
+
+向量为随机生成的归一化向量（默认 390 条 × 768 维，与 mfd.md 使用默认 embedding 模型时相当）。
+
+用法:
+    python bench_vector_store.py --rows 390 10000 --queries 200
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+COLLECTION_NAME = "bench_collection"
+BACKENDS = ["milvus", "numpy-float32", "numpy-float16", "numpy-int8"]
+
+
+def open_store(backend: str, path: str):
+    from vector_store import open_vector_store
+
+    if backend == "milvus":
+        return open_vector_store("milvus", os.path.join(path, "milvus.db"))
+    return open_vector_store("numpy", os.path.join(path, backend), dtype=backend.split("-")[1])
+
+
+def build_child(backend: str, path: str, vectors_path: str):
+    """子进程入口：建库并写入全部向量（Milvus Lite 的数据库文件在进程退出前一直被占用）"""
+
+    build_start = time.perf_counter()
+    vectors = np.load(vectors_path)
+    store = open_store(backend, path)
+    if store.has_collection(COLLECTION_NAME):
+        store.drop_collection(COLLECTION_NAME)
+    store.create_collection(
+        collection_name=COLLECTION_NAME,
+        dimension=vectors.shape[1],
+        metric_type="COSINE",
+        consistency_level="Strong"
+    )
+
+    for start in range(0, len(vectors), 1000):
+        store.insert(
+            collection_name=COLLECTION_NAME,
+            data=[
+                {"id": start + i, "vector": vector.tolist(), "title": f"第{start + i}条"}
+                for i, vector in enumerate(vectors[start:start + 1000])
+            ]
+        )
+    store.close()
+
+    print(json.dumps({"build_seconds": time.perf_counter() - build_start}))
+
+
+def measure_child(backend: str, path: str, queries_path: str, top_k: int):
+    """子进程入口：测量冷启动、QPS 和峰值内存，结果以 JSON 输出到 stdout"""
+
+    start = time.perf_counter()
+    store = open_store(backend, path)
+    store.load_collection(COLLECTION_NAME)
+    queries = np.load(queries_path)
+    search_params = {"metric_type": "COSINE", "params": {}}
+    store.search(collection_name=COLLECTION_NAME, data=[queries[0].tolist()], limit=top_k,
+                 search_params=search_params, output_fields=["title"])
+    cold_start = time.perf_counter() - start
+
+    ids = []
+    start = time.perf_counter()
+    for query in queries:
+        results = store.search(collection_name=COLLECTION_NAME, data=[query.tolist()], limit=top_k,
+                               search_params=search_params, output_fields=["title"])
+        ids.append([hit["id"] for hit in results[0]])
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store.search(collection_name=COLLECTION_NAME, data=queries.tolist(), limit=top_k,
+                 search_params=search_params, output_fields=["title"])
+    batch_seconds = time.perf_counter() - start
+
+    import resource
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    print(json.dumps({
+        "cold_start": cold_start,
+        "qps": len(queries) / single_seconds,
+        "batch_qps": len(queries) / batch_seconds,
+        "peak_rss": peak_rss,
+        "ids": ids
+    }))
+
+
+def run_child(*args) -> dict:
+    """在新的解释器中运行，冷启动包含导入依赖的时间"""
+
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", *map(str, args)],
+        check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy 向量存储 vs Milvus Lite 基准测试")
+    parser.add_argument("--rows", type=int, nargs="+", default=[390, 10000], help="向量条数")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, backend, path, data_path, *rest = args.child
+        if mode == "build":
+            build_child(backend, path, data_path)
+        else:
+            measure_child(backend, path, data_path, int(rest[0]))
+        return
+
+    rng = np.random.default_rng(42)
+    for rows in args.rows:
+        vectors = rng.normal(size=(rows, args.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        # 查询取库中向量加噪声，让 top-k 有明确的近邻
+        queries = vectors[rng.integers(0, rows, args.queries)] + rng.normal(size=(args.queries, args.dim)) * 0.05
+        queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+        ground_truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.top_k]
+
+        work_dir = tempfile.mkdtemp(prefix="bench_vector_store_")
+        try:
+            vectors_path = os.path.join(work_dir, "vectors.npy")
+            queries_path = os.path.join(work_dir, "queries.npy")
+            np.save(vectors_path, vectors)
+            np.save(queries_path, queries)
+
+            print(f"\n📦 {rows} 条 × {args.dim} 维，{args.queries} 个查询，top_k={args.top_k}")
+            print(f"{'后端':<14} | {'构建':>7} | {'冷启动':>7} | {'峰值内存':>9} | {'QPS':>8} | {'批量QPS':>9} | recall@k")
+            print("-" * 82)
+
+            for backend in args.backends:
+                build_seconds = run_child("build", backend, work_dir, vectors_path)["build_seconds"]
+                result = run_child("measure", backend, work_dir, queries_path, args.top_k)
+                recall = np.mean([
+                    len(set(ids) & set(truth)) / args.top_k
+                    for ids, truth in zip(result["ids"], ground_truth.tolist())
+                ])
+                print(f"{backend:<14} | {build_seconds:>6.2f}s | {result['cold_start']:>6.2f}s | "
+                      f"{result['peak_rss'] / 1024 / 1024:>7.1f}MB | {result['qps']:>8.0f} | "
+                      f"{result['batch_qps']:>9.0f} | {recall:.3f}")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中文法律文本的 BM25 稀疏检索：字符二元组 + 英文/数字词的倒排索引
+
+稠密向量检索容易漏掉"不动产登记簿"这类必须精确命中的法律术语，
+这里用 BM25 补充精确匹配，再通过倒数排名融合（RRF）与 Milvus 的结果合并。
+
+倒排表以数组形式存储（所有词项的文档号和词频拼接成两个连续数组，另有偏移数组），
+保存为 .npy 文件，加载时可以直接内存映射，不需要反序列化。
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]+|[A-Za-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """汉字连续片段切成字符二元组（单字片段保留单字），英文和数字按词切分并转小写"""
+
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        span = match.group(0)
+        if span[0].isascii():
+            tokens.append(span.lower())
+        elif len(span) == 1:
+            tokens.append(span)
+        else:
+            tokens.extend(span[i:i + 2] for i in range(len(span) - 1))
+    return tokens
+
+
+class BM25Index:
+    """基于数组倒排表的 BM25 索引"""
+
+    def __init__(self, vocab: Dict[str, int], offsets: np.ndarray, postings_docs: np.ndarray,
+                 postings_tf: np.ndarray, doc_lengths: np.ndarray, doc_ids: np.ndarray,
+                 k1: float = 1.5, b: float = 0.75):
+        self.vocab = vocab
+        self.offsets = offsets  # int64[词项数 + 1]，词项 t 的倒排表为 [offsets[t], offsets[t + 1])
+        self.postings_docs = postings_docs  # int32，文档下标
+        self.postings_tf = postings_tf  # float32，词频
+        self.doc_lengths = doc_lengths  # float32，文档长度（词元数）
+        self.doc_ids = doc_ids  # int64，文档下标 -> 外部主键（与 Milvus 主键一致）
+        self.k1 = k1
+        self.b = b
+        # 空索引或全是空文档时避免除零
+        self.avg_doc_length = float(doc_lengths.mean() or 1.0) if len(doc_lengths) else 1.0
+        self._length_norm = k1 * (1 - b + b * np.asarray(doc_lengths) / self.avg_doc_length)
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, texts: Sequence[str], doc_ids: Sequence[int],
+              k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """
+        构建索引
+
+        Args:
+            texts: 文档文本
+            doc_ids: 与 texts 一一对应的外部主键
+        """
+
+        vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_indexes: List[int] = []
+        term_freqs: List[int] = []
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+
+        for doc_index, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc_index] = len(tokens)
+            for token, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(token, len(vocab)))
+                doc_indexes.append(doc_index)
+                term_freqs.append(tf)
+
+        # 按词项号稳定排序，使同一词项的倒排表连续且文档号递增
+        term_array = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_array, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_array, minlength=len(vocab)), out=offsets[1:])
+
+        return cls(
+            vocab=vocab,
+            offsets=offsets,
+            postings_docs=np.asarray(doc_indexes, dtype=np.int32)[order],
+            postings_tf=np.asarray(term_freqs, dtype=np.float32)[order],
+            doc_lengths=doc_lengths,
+            doc_ids=np.asarray(doc_ids, dtype=np.int64),
+            k1=k1,
+            b=b
+        )
+
+    def save(self, index_dir: str):
+        os.makedirs(index_dir, exist_ok=True)
+        for name in ("offsets", "postings_docs", "postings_tf", "doc_lengths", "doc_ids"):
+            np.save(os.path.join(index_dir, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as file:
+            json.dump({"k1": self.k1, "b": self.b, "vocab": self.vocab}, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, index_dir: str, mmap: bool = True) -> "BM25Index":
+        """加载索引，mmap=True 时倒排数组以只读内存映射方式打开"""
+
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as file:
+            meta = json.load(file)
+
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in ("offsets", "postings_docs", "postings_tf", "doc_lengths", "doc_ids")
+        }
+        return cls(vocab=meta["vocab"], k1=meta["k1"], b=meta["b"], **arrays)
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """
+        BM25 检索
+
+        Returns:
+            List[Tuple[int, float]]: [(外部主键, BM25 得分), ...]，按得分降序
+        """
+
+        if not self.num_docs:
+            return []
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+
+        for token in set(tokenize(query)):
+            term_id = self.vocab.get(token)
+            if term_id is None:
+                continue
+
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            tf = self.postings_tf[start:end]
+
+            doc_freq = end - start
+            idf = np.log(1 + (self.num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+            # 同一词项的倒排表中文档号不重复，可以直接按下标累加
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self._length_norm[docs])
+
+        matched = np.count_nonzero(scores)
+        if not matched:
+            return []
+
+        top_k = min(top_k, matched)
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        return [(int(self.doc_ids[i]), float(scores[i])) for i in candidates]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    倒数排名融合：score(d) = Σ 1 / (k + rank)，rank 从 1 开始
+
+    Args:
+        rankings: 多路检索结果，每路为按相关度降序的主键列表
+        k: 平滑常数，越大越弱化头部排名的优势
+
+    Returns:
+        List[Tuple[int, float]]: [(主键, 融合得分), ...]，按得分降序
+    """
+
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上下文组装：在固定 token 预算内按得分打包检索到的条文
+
+原来的做法是把所有条文直接用 "\n\n" 拼接，存在几个浪费：
+- 同一章的每个条文都重复一遍 【民法典 / 物权编 / 第X章 / 第Y条】 层级前缀
+- 内容几乎相同的条文（如混合检索的两路都召回的相似条文）重复出现
+- 上下文长度不受控制，条文越长 prompt 越贵、越慢
+
+这里的做法：
+1. 按得分从高到低依次考虑每个条文，与已选条文近似重复的直接丢弃
+2. 同一章的条文合并到一个共享的章节标题下，每个条文只保留自己的条文编号和正文
+3. 加入某个条文会超出预算时跳过它，继续尝试得分更低但更短的条文；
+   得分最高的条文总会保留，单独超出预算时（如按章节分块的大分块）截断到预算以内
+
+token 数用本地分词器计算：设置 DEEPSEEK_TOKENIZER_PATH 指向 DeepSeek 的 tokenizer.json
+并安装 tokenizers 时使用真实分词器，否则按 DeepSeek 文档给出的换算比例估算
+（1 个中文字符约 0.6 个 token，1 个英文字符约 0.3 个 token）。
+"""
+
+import math
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from bm25_index import tokenize
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("DEEPSEEK_CONTEXT_TOKENS", "2000"))
+DEFAULT_DUPLICATE_THRESHOLD = 0.85
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+_PREFIX_PATTERN = re.compile(r"^【(.+?)】\s*", re.S)
+_PATH_SEPARATOR = " / "
+_CHUNK_SEPARATOR = "\n\n"
+_TRUNCATION_MARK = "……"
+
+
+class TokenCounter:
+    """本地 token 计数：优先使用 tokenizer.json，否则按字符比例估算"""
+
+    def __init__(self, tokenizer_path: Optional[str] = None):
+        tokenizer_path = tokenizer_path or os.getenv("DEEPSEEK_TOKENIZER_PATH")
+        self._tokenizer = None
+
+        if tokenizer_path and os.path.exists(tokenizer_path):
+            try:
+                from tokenizers import Tokenizer
+            except ImportError:
+                print("⚠️  未安装 tokenizers，token 数改为按字符比例估算")
+            else:
+                self._tokenizer = Tokenizer.from_file(tokenizer_path)
+
+    @property
+    def exact(self) -> bool:
+        return self._tokenizer is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+        cjk_chars = len(_CJK_PATTERN.findall(text))
+        other_chars = len(text) - cjk_chars - text.count(" ")
+        return math.ceil(cjk_chars * 0.6 + other_chars * 0.3)
+
+
+class PackedContext(NamedTuple):
+    """打包结果"""
+
+    text: str
+    tokens: int
+    baseline_tokens: int  # 原来直接拼接全部条文的 token 数
+    included: List[str]  # 被选中的条文标题，按得分排序
+    dropped_duplicates: List[str]
+    dropped_over_budget: List[str]
+    truncated: List[str]  # 为放进预算而被截断的条文标题
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.baseline_tokens - self.tokens
+
+    def format_stats(self) -> str:
+        return (f"{self.tokens} tokens（直接拼接 {self.baseline_tokens}，节省 {self.tokens_saved}），"
+                f"使用 {len(self.included)} 个条文，去重 {len(self.dropped_duplicates)} 个，"
+                f"超出预算 {len(self.dropped_over_budget)} 个，截断 {len(self.truncated)} 个")
+
+
+def split_hierarchy(title: str, content: str) -> Tuple[str, str]:
+    """
+    把条文拆成 (章节路径, 正文)
+
+    正文去掉 【…】 层级前缀；章节路径为层级路径去掉最后一级（条文编号），
+    没有层级前缀的内容章节路径为空。
+    """
+
+    match = _PREFIX_PATTERN.match(content)
+    if not match:
+        return "", content.strip()
+
+    path = match.group(1)
+    body = content[match.end():].strip()
+    chapter = path.rsplit(_PATH_SEPARATOR, 1)[0] if _PATH_SEPARATOR in path else ""
+    return chapter, body
+
+
+def truncate_to_tokens(text: str, max_tokens: int, counter: "TokenCounter") -> str:
+    """
+    截取 text 的最长前缀（加上省略号）使其不超过 max_tokens 个 token，放不下时返回空字符串
+
+    token 数随前缀长度单调不减，按字符数二分查找，真实分词器和估算都适用。
+    """
+
+    if counter.count(text) <= max_tokens:
+        return text
+
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if counter.count(text[:middle] + _TRUNCATION_MARK) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + _TRUNCATION_MARK if low else ""
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    return len(a & b) / len(a | b)
+
+
+def pack_contexts(
+    contexts: Sequence[Tuple[str, str, float]],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    counter: Optional[TokenCounter] = None,
+    duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD
+) -> PackedContext:
+    """
+    在 token 预算内按得分打包上下文
+
+    Args:
+        contexts: 检索结果 [(标题, 内容, 得分), ...]
+        token_budget: 上下文 token 上限
+        counter: token 计数器，默认使用模块级的 TokenCounter
+        duplicate_threshold: 与已选条文的字符二元组 Jaccard 相似度达到该值时视为重复
+    """
+
+    counter = counter or _default_counter
+    separator_tokens = counter.count(_CHUNK_SEPARATOR)
+
+    baseline_tokens = counter.count(_CHUNK_SEPARATOR.join(content for _, content, _ in contexts))
+
+    ranked = sorted(contexts, key=lambda context: context[2], reverse=True)
+
+    # 章节路径 -> 该章已选的正文（按首次出现的顺序，即得分顺序）
+    groups: Dict[str, List[str]] = {}
+    selected_shingles: List[set] = []
+    included, dropped_duplicates, dropped_over_budget, truncated = [], [], [], []
+    used_tokens = 0
+
+    for title, content, _ in ranked:
+        chapter, body = split_hierarchy(title, content)
+
+        shingles = set(tokenize(body))
+        if any(_similarity(shingles, other) >= duplicate_threshold for other in selected_shingles):
+            dropped_duplicates.append(title)
+            continue
+
+        header_cost = counter.count(f"【{chapter}】") + separator_tokens if chapter not in groups and chapter else 0
+        cost = counter.count(body) + (separator_tokens if used_tokens else 0) + header_cost
+
+        if used_tokens + cost > token_budget:
+            if included:
+                dropped_over_budget.append(title)
+                continue
+
+            # 得分最高的条文单独就超出预算：截断它而不是返回空的上下文，章节标题放不下时省略
+            if header_cost >= token_budget:
+                chapter, header_cost = "", 0
+            body = truncate_to_tokens(body, token_budget - header_cost, counter)
+            if not body:
+                dropped_over_budget.append(title)
+                continue
+            truncated.append(title)
+            cost = counter.count(body) + header_cost
+
+        groups.setdefault(chapter, []).append(body)
+        selected_shingles.append(shingles)
+        included.append(title)
+        used_tokens += cost
+
+    sections = []
+    for chapter, bodies in groups.items():
+        header = [f"【{chapter}】"] if chapter else []
+        sections.append(_CHUNK_SEPARATOR.join(header + bodies))
+    text = _CHUNK_SEPARATOR.join(sections)
+
+    return PackedContext(
+        text=text,
+        tokens=counter.count(text),
+        baseline_tokens=baseline_tokens,
+        included=included,
+        dropped_duplicates=dropped_duplicates,
+        dropped_over_budget=dropped_over_budget,
+        truncated=truncated
+    )
+
+
+_default_counter = TokenCounter()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程语料入库：把大量 markdown 文件分片到进程池中解析和 embedding，再合并写入同一个 collection
+
+- 每个 CPU 核心一个工作进程，进程启动时加载一次 embedding 模型（一个模型副本），
+  每个进程的计算线程数限制为 1（onnxruntime 会话用 SessionOptions 重建，torch 用 set_num_threads）
+- 每个任务负责一个文件：解析 → embedding，返回带向量的行；主进程是唯一的写入者
+- 主键由 (文件相对于 --root 的路径, 条文层级路径) 哈希得到，与处理顺序、进程数和本次入库的文件集合无关
+- 同时在途的任务数有上限，避免结果堆积导致内存膨胀
+
+用法:
+    python corpus_ingest.py "milvus_docs/en/faq/*.md" --workers 8 --root milvus_docs
+"""
+
+import argparse
+import contextlib
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from glob import glob
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hierarchical_parser import iter_hierarchical_chunks
+from incremental_index import iter_chunk_ids, stable_chunk_id
+
+# 工作进程内的 embedding 模型（每个进程一个副本）
+_worker_model = None
+
+# OpenMP / MKL / OpenBLAS 只在库加载时读取这些环境变量
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def default_model_factory():
+    """默认的 embedding 模型，与 optimized_rag_demo 保持一致"""
+
+    from pymilvus import model as milvus_model
+    return milvus_model.DefaultEmbeddingFunction()
+
+
+@contextlib.contextmanager
+def _thread_env(threads: int):
+    """
+    在创建进程池期间设置线程数环境变量，工作进程启动时即继承，
+    在工作进程加载 OpenMP / BLAS 之前生效；退出时恢复原值
+    """
+
+    saved = {name: os.environ.get(name) for name in _THREAD_ENV_VARS}
+    os.environ.update({name: str(threads) for name in _THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def onnx_model_path(model) -> Optional[str]:
+    """
+    找到模型的 .onnx 文件路径，用于以新的 SessionOptions 重建会话
+
+    自定义模型可以提供 onnx_model_path 属性；pymilvus 的 OnnxEmbeddingFunction（DefaultEmbeddingFunction）
+    在构造时用 hf_hub_download(model_name, "model.onnx") 下载模型，这里以同样的参数从本地缓存中取出路径。
+    """
+
+    model_path = getattr(model, "onnx_model_path", None)
+    if model_path is None and getattr(model, "model_name", None):
+        from huggingface_hub import hf_hub_download
+        model_path = hf_hub_download(repo_id=model.model_name, filename="model.onnx", local_files_only=True)
+    return model_path
+
+
+def limit_onnx_threads(model, threads: int) -> bool:
+    """
+    用 SessionOptions 重建模型的 onnxruntime 会话，限制算子内/算子间的线程数，成功时返回 True
+
+    pymilvus 的 DefaultEmbeddingFunction 用默认参数创建会话，线程池大小等于物理核心数，
+    且不受 OMP_NUM_THREADS 等环境变量影响。没有 ort_session 属性的模型保持不变；
+    找不到模型文件或重建失败时打印警告并继续使用原来的会话。
+    """
+
+    session = getattr(model, "ort_session", None)
+    if session is None:
+        return False
+
+    try:
+        import onnxruntime
+
+        model_path = onnx_model_path(model)
+        if model_path is None:
+            raise ValueError("找不到 onnx 模型文件")
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        model.ort_session = onnxruntime.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=session.get_providers()
+        )
+    except Exception as e:
+        print(f"⚠️  无法限制 onnxruntime 线程数，继续使用默认会话: {e}")
+        return False
+    return True
+
+
+def _init_worker(model_factory: Callable, threads_per_worker: int):
+    """进程初始化：限制每个进程的计算线程数，避免多进程之间相互抢占 CPU"""
+
+    global _worker_model
+
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+    _worker_model = model_factory()
+    limit_onnx_threads(_worker_model, threads_per_worker)
+
+
+def _worker_threads() -> Tuple[Optional[int], int]:
+    """工作进程内：返回 (onnxruntime 会话的 intra_op 线程数, 进程当前的 OS 线程数)，用于确认线程限制生效"""
+
+    session = getattr(_worker_model, "ort_session", None)
+    intra_op = session.get_session_options().intra_op_num_threads if session is not None else None
+    return intra_op, len(os.listdir("/proc/self/task")) if os.path.isdir("/proc/self/task") else 0
+
+
+def discover_files(patterns: Sequence[str]) -> List[str]:
+    """展开 glob 模式，去重并排序，保证分片结果是确定的"""
+
+    files = set()
+    for pattern in patterns:
+        files.update(glob(pattern, recursive=True))
+    return sorted(path for path in files if os.path.isfile(path))
+
+
+def iter_file_chunks(file_path: str) -> Iterator[Tuple[str, str]]:
+    """
+    解析单个文件
+
+    有 编/章/条 结构的法规文档按条文切分；其他 markdown（如 Milvus FAQ）
+    按 notebook 中的做法用 "# " 切分。
+    """
+
+    has_articles = False
+    for chunk in iter_hierarchical_chunks(file_path, emit_chapters=False):
+        has_articles = True
+        yield chunk.title, chunk.text
+
+    if has_articles:
+        return
+
+    with open(file_path, "r", encoding="utf-8") as file:
+        sections = file.read().split("# ")
+
+    file_name = os.path.basename(file_path)
+    for i, section in enumerate(sections):
+        section = section.strip()
+        if not section:
+            continue
+        first_line = section.split("\n", 1)[0].strip()
+        yield f"{file_name} / {first_line or i}", section
+
+
+def _process_file(args: Tuple[str, str]) -> Tuple[str, List[dict], int, Tuple[Optional[int], int]]:
+    """工作进程任务：解析一个文件并生成 embedding，同时返回进程号和线程数"""
+
+    file_path, relative_path = args
+    rows = []
+
+    chunks = list(iter_chunk_ids(iter_file_chunks(file_path)))
+    if chunks:
+        embeddings = _worker_model.encode_documents([text for _, _, text in chunks])
+        for (chunk_id, title, text), embedding in zip(chunks, embeddings):
+            rows.append({
+                # 文件内主键再与相对路径组合，不同文件中的同名条文不会冲突
+                "id": stable_chunk_id(f"{relative_path}#{chunk_id}"),
+                "vector": np.asarray(embedding, dtype=np.float32),
+                "title": title,
+                "text": text,
+                "source": relative_path
+            })
+
+    return relative_path, rows, os.getpid(), _worker_threads()
+
+
+class CorpusIngestReport:
+    """入库结果统计"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.files = 0
+        self.chunks = 0
+        self.seconds = 0.0
+        # 进程号 -> (onnxruntime intra_op 线程数, OS 线程数峰值)
+        self.worker_threads: Dict[int, Tuple[Optional[int], int]] = {}
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.workers} 进程: {self.files} 个文件, {self.chunks} 个分块, "
+                f"{self.seconds:.2f}s, {self.chunks_per_second:.1f} chunks/s")
+
+
+def ingest_corpus(
+    files: Sequence[str],
+    milvus_client,
+    collection_name: str,
+    root_dir: str,
+    model_factory: Callable = default_model_factory,
+    workers: Optional[int] = None,
+    insert_batch_size: int = 256,
+    max_in_flight: Optional[int] = None
+) -> CorpusIngestReport:
+    """
+    多进程解析并 embedding 多个文件，合并写入同一个 collection
+
+    Args:
+        files: 文件路径列表（通常来自 discover_files）
+        milvus_client: Milvus 客户端，collection 需已创建
+        collection_name: collection 名称
+        root_dir: 计算相对路径（参与主键）的根目录；同一语料每次入库必须使用同一个根目录，
+            否则主键会变化。所有文件都必须位于该目录下
+        model_factory: 在每个工作进程中创建 embedding 模型的函数（必须可被 pickle，即模块级函数）
+        workers: 工作进程数，默认等于 CPU 核心数
+        insert_batch_size: 每批写入 Milvus 的行数
+        max_in_flight: 同时在途的文件任务数上限，默认为 workers 的 2 倍
+    """
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    report = CorpusIngestReport(workers)
+
+    if not files:
+        return report
+
+    root_dir = os.path.abspath(root_dir)
+    task_list = []
+    for path in files:
+        relative_path = os.path.relpath(os.path.abspath(path), root_dir).replace(os.sep, "/")
+        if relative_path.startswith("../"):
+            raise ValueError(f"文件 {path} 不在根目录 {root_dir} 下")
+        task_list.append((path, relative_path))
+    tasks = iter(task_list)
+
+    start = time.perf_counter()
+    buffer: List[dict] = []
+
+    def flush(rows: List[dict]):
+        # 主键是确定的，使用 upsert 保证重复运行幂等
+        milvus_client.upsert(collection_name=collection_name, data=rows)
+        report.chunks += len(rows)
+
+    with _thread_env(1), ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(model_factory, 1)
+    ) as pool:
+        in_flight = set()
+
+        def submit_next() -> bool:
+            task = next(tasks, None)
+            if task is None:
+                return False
+            in_flight.add(pool.submit(_process_file, task))
+            return True
+
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                _, rows, pid, (intra_op, os_threads) = future.result()
+                report.files += 1
+                report.worker_threads[pid] = (intra_op, max(os_threads, report.worker_threads.get(pid, (0, 0))[1]))
+                buffer.extend(rows)
+                submit_next()
+
+            while len(buffer) >= insert_batch_size:
+                flush(buffer[:insert_batch_size])
+                del buffer[:insert_batch_size]
+
+    if buffer:
+        flush(buffer)
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程语料入库")
+    parser.add_argument("patterns", nargs="+", help="文件 glob 模式，如 'milvus_docs/en/faq/*.md'")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数（默认 CPU 核心数）")
+    parser.add_argument("--root", default=".",
+                        help="主键中文件相对路径的根目录（默认当前目录），同一语料每次入库必须相同")
+    parser.add_argument("--uri", default="./corpus_milvus.db", help="Milvus URI")
+    parser.add_argument("--collection", default="corpus_collection", help="collection 名称")
+    parser.add_argument("--index", default=None,
+                        help="向量索引配置，如 hnsw:M=16,efConstruction=200,ef=64（见 index_config.py）")
+    args = parser.parse_args()
+
+    from pymilvus import MilvusClient
+
+    from index_config import DEFAULT_INDEX_CONFIG, create_indexed_collection, parse_index_config
+
+    files = discover_files(args.patterns)
+    print(f"📂 共找到 {len(files)} 个文件")
+
+    embedding_dim = len(default_model_factory().encode_queries(["测试"])[0])
+
+    milvus_client = MilvusClient(uri=args.uri)
+    if milvus_client.has_collection(args.collection):
+        milvus_client.drop_collection(args.collection)
+    index_config = parse_index_config(args.index) if args.index else DEFAULT_INDEX_CONFIG
+    create_indexed_collection(milvus_client, args.collection, embedding_dim, index_config)
+    print(f"🗄️  索引配置: {index_config.spec}")
+
+    report = ingest_corpus(files, milvus_client, args.collection, args.root, workers=args.workers)
+    print(f"✅ {report}")
+    print(f"🧵 工作进程线程数 (onnxruntime intra_op, OS 线程峰值): {sorted(report.worker_threads.values())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,34 @@
 # -*- coding: utf-8 -*-
 """
 RAG调试工具：诊断检索问题
+
+用法:
+    python debug_rag.py                                   # 单个问题的交互式诊断
+    python debug_rag.py --index hnsw:M=16,ef=64           # 指定向量索引进行诊断
+    python debug_rag.py benchmark --output report.json    # 标注问题集上的检索基准测试
+    python debug_rag.py rank                              # 全部问题 × 全部条文的相似度排名表
 """
 
+import argparse
+import json
 import os
 import re
+import time
 from typing import List, Tuple
+import numpy as np
 from pymilvus import MilvusClient, model as milvus_model
-from sentence_transformers import SentenceTransformer
+
+from bm25_index import BM25Index
+from embedding_cache import wrap_with_cache
+from index_config import (
+    DEFAULT_INDEX_CONFIG,
+    IndexConfig,
+    create_indexed_collection,
+    expand_index_grid,
+    parse_index_config
+)
+
+BGE_MODEL_NAME = 'BAAI/bge-large-zh-v1.5'
 
 
 def load_and_parse_articles(file_path: str) -> List[Tuple[str, str]]:
@@ -40,8 +61,8 @@ def load_and_parse_articles(file_path: str) -> List[Tuple[str, str]]:
     return articles
 
 
-def debug_search():
-    """调试搜索功能"""
+def debug_search(index_config: IndexConfig = DEFAULT_INDEX_CONFIG):
+    """调试搜索功能，index_config 为 Milvus collection 使用的向量索引配置"""
 
     print("🔍 RAG系统调试")
     print("=" * 50)
@@ -53,23 +74,19 @@ def debug_search():
 
     print(f"📊 总共解析出 {len(articles)} 个条文")
 
-    # 手动查找目标条文
-    target_keywords = ["不动产登记簿", "错误", "更正", "异议"]
-
-    print("\n🎯 手动搜索相关条文:")
-    relevant_articles = []
-
-    for i, (title, content) in enumerate(articles):
-        score = sum(1 for keyword in target_keywords if keyword in content)
-        if score > 0:
-            relevant_articles.append((score, i, title, content))
+    # 用 BM25 关键词检索查找目标条文
+    target_query = "不动产登记簿 错误 更正 异议"
 
-    # 按相关度排序
-    relevant_articles.sort(key=lambda x: x[0], reverse=True)
+    print("\n🎯 BM25 搜索相关条文:")
+    sparse_index = BM25Index.build([content for _, content in articles], list(range(len(articles))))
+    relevant_articles = [
+        (score, idx, articles[idx][0], articles[idx][1])
+        for idx, score in sparse_index.search(target_query, top_k=5)
+    ]
 
     print(f"找到 {len(relevant_articles)} 个相关条文:")
-    for j, (score, idx, title, content) in enumerate(relevant_articles[:5]):
-        print(f"\n{j + 1}. 相关度: {score}, 索引: {idx}")
+    for j, (score, idx, title, content) in enumerate(relevant_articles):
+        print(f"\n{j + 1}. BM25得分: {score:.2f}, 索引: {idx}")
         print(f"   标题: {title}")
         print(f"   内容: {content[:200]}...")
 
@@ -80,7 +97,11 @@ def debug_search():
     # 使用embedding模型测试
     print("\n🧠 测试Embedding模型:")
     print("正在加载 BAII/bge-large-zh-v1.5 Embedding 模型，这可能需要一些时间...")
-    embedding_model = SentenceTransformer('BAAI/bge-large-zh-v1.5')
+    from sentence_transformers import SentenceTransformer
+    embedding_model = wrap_with_cache(
+        SentenceTransformer(BGE_MODEL_NAME),
+        model_name=BGE_MODEL_NAME
+    )
     print("模型加载完成。")
 
     # 测试目标条文的embedding
@@ -96,8 +117,6 @@ def debug_search():
     target_embedding = embedding_model.encode([target_content])[0]
 
     # 计算相似度
-    import numpy as np
-
     # 余弦相似度
     def cosine_similarity(a, b):
         return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
@@ -129,12 +148,8 @@ def debug_search():
         milvus_client.drop_collection(collection_name)
 
     # 创建collection
-    milvus_client.create_collection(
-        collection_name=collection_name,
-        dimension=1024,
-        metric_type="COSINE",
-        consistency_level="Strong"
-    )
+    create_indexed_collection(milvus_client, collection_name, 1024, index_config)
+    print(f"索引配置: {index_config.spec}")
 
     # 插入少量数据进行测试
     test_articles = articles[:20]  # 使用前20个条文进行测试
@@ -161,7 +176,7 @@ def debug_search():
         collection_name=collection_name,
         data=[query_embedding],
         limit=5,
-        search_params={"metric_type": "COSINE", "params": {}},
+        search_params=index_config.search_request(),
         output_fields=["title", "text"]
     )
 
@@ -174,6 +189,194 @@ def debug_search():
         print(f"   标题: {title}")
         print(f"   内容: {result['entity']['text'][:100]}...")
 
+    print(f"\n💾 Embedding缓存: {embedding_model.cache.format_stats()}")
+
+
+class SentenceTransformerEmbedding:
+    """把 SentenceTransformer 适配成 encode_documents / encode_queries 接口（向量已归一化）"""
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model_name)
+
+    def encode_documents(self, documents):
+        return list(self._model.encode(list(documents), batch_size=self.batch_size, normalize_embeddings=True))
+
+    def encode_queries(self, queries):
+        return list(self._model.encode(list(queries), batch_size=self.batch_size, normalize_embeddings=True))
+
+
+def load_embedding_model(model_name: str):
+    """default 为 pymilvus 默认模型（与 optimized_rag_demo 一致），其他名称按 SentenceTransformer 模型加载"""
+
+    if model_name == "default":
+        return wrap_with_cache(milvus_model.DefaultEmbeddingFunction())
+    return wrap_with_cache(SentenceTransformerEmbedding(model_name), model_name=model_name)
+
+
+def benchmark(args):
+    """标注问题集上的 分块策略 × 索引配置 基准测试"""
+
+    from retrieval_benchmark import (
+        CHUNKING_STRATEGIES,
+        compare_reports,
+        load_eval_set,
+        run_benchmark,
+        save_report
+    )
+
+    print("📏 检索基准测试")
+    print("=" * 50)
+
+    eval_set = load_eval_set(args.eval_set)
+    index_configs = None
+    if args.index_configs and args.index_configs[0].endswith(".json"):
+        with open(args.index_configs[0], "r", encoding="utf-8") as file:
+            index_configs = json.load(file)
+    elif args.index_configs:
+        index_configs = [config for spec in args.index_configs for config in expand_index_grid(spec)]
+
+    print(f"🧠 加载Embedding模型: {args.model}")
+    embedding_model = load_embedding_model(args.model)
+
+    report = run_benchmark(
+        args.corpus,
+        eval_set,
+        embedding_model,
+        model_name=args.model,
+        strategies=args.strategies or list(CHUNKING_STRATEGIES),
+        index_configs=index_configs,
+        k_values=args.k,
+        repeat=args.repeat
+    )
+
+    save_report(report, args.output)
+    print(f"\n💾 报告已写入 {args.output}")
+    print(f"💾 Embedding缓存: {embedding_model.cache.format_stats()}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        print(f"\n📊 与 {args.baseline} 对比:")
+        for line in compare_reports(report, baseline):
+            print(f"   {line}")
+
+
+def rank_diagnosis(args):
+    """
+    批量诊断：全部条文分批编码一次，用一次矩阵乘法算出每个问题对全部条文的相似度，
+    输出标注条文在完整排名中的位置
+    """
+
+    from retrieval_benchmark import (
+        CHUNKING_STRATEGIES,
+        covered_articles,
+        encode_normalized_matrix,
+        load_eval_set,
+        rank_all
+    )
+
+    print("🔍 RAG系统批量相似度诊断")
+    print("=" * 50)
+
+    eval_set = load_eval_set(args.eval_set)
+    chunks = CHUNKING_STRATEGIES[args.strategy](args.corpus)
+    print(f"📊 分块策略 {args.strategy}: {len(chunks)} 个分块，{len(eval_set)} 个问题")
+
+    print(f"🧠 加载Embedding模型: {args.model}")
+    embedding_model = load_embedding_model(args.model)
+
+    start = time.perf_counter()
+    doc_matrix = encode_normalized_matrix(
+        [content for _, content in chunks],
+        embedding_model.encode_documents,
+        batch_size=args.batch_size,
+        memmap_path=args.matrix_path
+    )
+    query_matrix = encode_normalized_matrix([item["question"] for item in eval_set], embedding_model.encode_queries)
+    encode_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores, order = rank_all(query_matrix, doc_matrix)
+    rank_ms = (time.perf_counter() - start) * 1000
+    print(f"⏱️  编码 {encode_seconds:.2f}s（矩阵 {doc_matrix.shape[0]}×{doc_matrix.shape[1]}"
+          f"{'，内存映射' if isinstance(doc_matrix, np.memmap) else ''}），相似度与排序 {rank_ms:.1f}ms")
+
+    coverage = [covered_articles(content) for _, content in chunks]
+    table = []
+    for i, item in enumerate(eval_set):
+        relevant = set(item["articles"])
+        ranking = [
+            {"rank": rank, "title": chunks[j][0], "score": float(scores[i, j]), "relevant": bool(coverage[j] & relevant)}
+            for rank, j in enumerate(order[i], start=1)
+        ]
+        expected_ranks = [entry["rank"] for entry in ranking if entry["relevant"]]
+        table.append({"question": item["question"], "articles": item["articles"],
+                      "expected_ranks": expected_ranks, "ranking": ranking})
+
+        best = expected_ranks[0] if expected_ranks else None
+        marker = "✅" if best is not None and best <= args.top else "❌"
+        print(f"\n{marker} {item['question']}")
+        print(f"   标注条文 {'、'.join(item['articles'])} 排名: "
+              f"{', '.join(map(str, expected_ranks)) if expected_ranks else '未找到'} / {len(chunks)}")
+        for entry in ranking[:args.top]:
+            print(f"   {entry['rank']:>3}. {entry['score']:.4f} {'★' if entry['relevant'] else ' '} {entry['title']}")
+
+    best_ranks = [entry["expected_ranks"][0] for entry in table if entry["expected_ranks"]]
+    if best_ranks:
+        print(f"\n📊 标注条文最好排名: 中位数 {np.median(best_ranks):.0f}，"
+              f"前{args.top}命中 {sum(rank <= args.top for rank in best_ranks)}/{len(table)}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"strategy": args.strategy, "model": args.model, "questions": table},
+                      file, ensure_ascii=False, indent=2)
+        print(f"💾 完整排名表已写入 {args.output}")
+
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="RAG调试工具")
+    parser.add_argument("--index", type=parse_index_config, default=DEFAULT_INDEX_CONFIG,
+                        help="交互式诊断使用的向量索引配置（见 index_config.py）")
+    subparsers = parser.add_subparsers(dest="command")
+
+    bench_parser = subparsers.add_parser("benchmark", help="标注问题集上的检索基准测试")
+    bench_parser.add_argument("--corpus", default=os.path.join(script_dir, "mfd.md"))
+    bench_parser.add_argument("--eval-set", default=os.path.join(script_dir, "retrieval_eval_set.json"),
+                              help="标注问题集 JSON")
+    bench_parser.add_argument("--model", default="default", help="default 或 SentenceTransformer 模型名")
+    bench_parser.add_argument("--strategies", nargs="+", choices=["article", "chapter", "chapter_article"])
+    bench_parser.add_argument("--index-configs", nargs="+",
+                              help="索引配置 JSON 文件（列表），或一个或多个配置字符串（如 hnsw:M=16,ef=32|64），"
+                                   "默认见 retrieval_benchmark")
+    bench_parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    bench_parser.add_argument("--repeat", type=int, default=5, help="每个问题重复检索次数（统计延迟）")
+    bench_parser.add_argument("--output", default="retrieval_report.json")
+    bench_parser.add_argument("--baseline", help="之前的报告，用于对比")
+
+    rank_parser = subparsers.add_parser("rank", help="全部问题 × 全部条文的相似度排名表")
+    rank_parser.add_argument("--corpus", default=os.path.join(script_dir, "mfd.md"))
+    rank_parser.add_argument("--eval-set", default=os.path.join(script_dir, "retrieval_eval_set.json"))
+    rank_parser.add_argument("--model", default="default", help="default 或 SentenceTransformer 模型名")
+    rank_parser.add_argument("--strategy", default="article", choices=["article", "chapter", "chapter_article"])
+    rank_parser.add_argument("--batch-size", type=int, default=64)
+    rank_parser.add_argument("--matrix-path", help="大矩阵的内存映射文件路径，默认使用临时文件")
+    rank_parser.add_argument("--top", type=int, default=5, help="每个问题打印的前几名")
+    rank_parser.add_argument("--output", help="完整排名表 JSON 输出路径")
+
+    args = parser.parse_args()
+    if args.command == "benchmark":
+        benchmark(args)
+    elif args.command == "rank":
+        rank_diagnosis(args)
+    else:
+        debug_search(args.index)
+
 
 if __name__ == "__main__":
-    debug_search()
+    main()
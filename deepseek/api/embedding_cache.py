@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化 Embedding 缓存：demo、调试工具和 notebook 共用，避免每次运行都重新计算文档向量
+
+- 缓存键为 (模型名, 模型版本, 规范化文本哈希)，不同模型/版本存放在不同的子目录
+- 向量保存在内存映射的 float32 矩阵（vectors.f32）中，索引保存在 index.json 中
+- 按字节预算做 LRU 淘汰，并统计命中/未命中次数
+- 线程安全：索引、矩阵扩容和索引文件写入由同一把锁保护，可在线程池中并发使用
+- 进程安全：打开缓存时对命名空间目录加独占的 flock 并持有到 close()；各进程的空闲行列表
+  和索引都在内存中，不能同时写同一个矩阵文件，同时运行的其他进程改用自己的临时命名空间
+- 索引文件在新增条目累计到 flush_every 条、淘汰时和 close() 时写入，而不是每次未命中都重写
+- CachedEmbeddingFunction 透明包装 pymilvus model 的 embedding 函数或 SentenceTransformer
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，不做跨进程保护
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.getenv("RAG_EMBEDDING_CACHE_DIR", "./.embedding_cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_FLUSH_EVERY = 1024
+
+# SentenceTransformer.encode 中不影响向量结果的参数，不参与缓存键
+_NON_SEMANTIC_ENCODE_KWARGS = {"batch_size", "show_progress_bar", "device"}
+
+
+def text_key(text: str, kind: str = "") -> str:
+    """规范化文本（NFC + 统一换行符）后计算哈希，kind 区分文档/查询等不同编码方式"""
+
+    normalized = unicodedata.normalize("NFC", text).replace("\r\n", "\n")
+    return hashlib.sha256(f"{kind}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    基于内存映射矩阵的向量缓存
+
+    每个 (模型名, 模型版本) 对应一个子目录，矩阵的每一行存放一个向量，
+    index.json 按 LRU 顺序（最久未使用在前）记录 文本哈希 -> 行号。
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        model_revision: str = "",
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        flush_every: int = DEFAULT_FLUSH_EVERY
+    ):
+        """
+        Args:
+            model_name: 模型名
+            model_revision: 模型版本
+            cache_dir: 缓存根目录
+            max_bytes: 字节预算
+            flush_every: 新增多少条目后写一次索引文件；进程退出或 close() 时也会写入
+        """
+
+        self.model_name = model_name
+        self.model_revision = model_revision
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+
+        namespace = re.sub(r"[^\w.-]+", "_", f"{model_name}@{model_revision}")
+        self.namespace_dir = os.path.join(cache_dir, namespace)
+        self._lock_fd: Optional[int] = None
+        self._private_dir: Optional[str] = None
+        if not self._lock_namespace():
+            self._private_dir = tempfile.mkdtemp(prefix=f"{namespace}.")
+            print(f"⚠️  Embedding缓存 {self.namespace_dir} 正被其他进程使用，"
+                  f"本进程改用临时缓存 {self._private_dir}（关闭时删除）")
+            self.namespace_dir = self._private_dir
+        self.vectors_path = os.path.join(self.namespace_dir, "vectors.f32")
+        self.index_path = os.path.join(self.namespace_dir, "index.json")
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._dim: Optional[int] = None
+        self._capacity = 0
+        self._matrix: Optional[np.memmap] = None
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._free_rows: List[int] = []
+        self._dirty = 0
+        self._lock = threading.Lock()
+
+        self._load()
+        atexit.register(self.close)
+
+    # --- 持久化 ---
+
+    def _lock_namespace(self) -> bool:
+        """对命名空间目录加独占的 flock（不等待），成功时持有到 close() 为止"""
+
+        if fcntl is None:
+            return True
+
+        os.makedirs(self.namespace_dir, exist_ok=True)
+        fd = os.open(self.namespace_dir, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _load(self):
+        if not (os.path.exists(self.index_path) and os.path.exists(self.vectors_path)):
+            return
+
+        with open(self.index_path, "r", encoding="utf-8") as file:
+            index = json.load(file)
+
+        self._dim = index["dim"]
+        self._capacity = index["capacity"]
+        self._entries = OrderedDict((key, row) for key, row in index["entries"])
+
+        used_rows = set(self._entries.values())
+        self._free_rows = [row for row in range(self._capacity) if row not in used_rows]
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(self._capacity, self._dim))
+
+    def flush(self):
+        """把矩阵刷回磁盘，并原子地写入索引文件"""
+
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """写入尚未落盘的条目并释放命名空间的锁（临时命名空间直接删除）；可重复调用，关闭后不应再写入"""
+
+        atexit.unregister(self.close)
+        with self._lock:
+            if self._private_dir is not None:
+                self._matrix = None
+                self._entries.clear()
+                self._free_rows = []
+                self._capacity = 0
+                self._dirty = 0
+                shutil.rmtree(self._private_dir, ignore_errors=True)
+                self._private_dir = None
+            elif self._dirty:
+                self._flush_locked()
+
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    def _flush_locked(self):
+        if self._matrix is None:
+            return
+
+        self._matrix.flush()
+
+        index = {
+            "model_name": self.model_name,
+            "model_revision": self.model_revision,
+            "dim": self._dim,
+            "capacity": self._capacity,
+            "entries": list(self._entries.items())
+        }
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = 0
+
+    # --- 容量管理 ---
+
+    @property
+    def max_rows(self) -> int:
+        return max(1, self.max_bytes // (self._dim * 4))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._entries) * (self._dim or 0) * 4
+
+    def _grow(self, required_rows: int):
+        """按倍增方式扩大矩阵文件，最多不超过字节预算对应的行数"""
+
+        new_capacity = min(self.max_rows, max(required_rows, self._capacity * 2, 64))
+        if new_capacity <= self._capacity:
+            return
+
+        os.makedirs(self.namespace_dir, exist_ok=True)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+
+        with open(self.vectors_path, "ab") as file:
+            file.truncate(new_capacity * self._dim * 4)
+
+        self._free_rows.extend(range(self._capacity, new_capacity))
+        self._capacity = new_capacity
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(self._capacity, self._dim))
+
+    def _allocate_row(self) -> int:
+        if not self._free_rows:
+            self._grow(self._capacity + 1)
+        if not self._free_rows:
+            # 已达到字节预算，淘汰最久未使用的一批向量
+            self._evict(max(1, self._capacity // 16))
+        return self._free_rows.pop()
+
+    def _evict(self, count: int):
+        """
+        淘汰最久未使用的 count 个向量，并立即写入索引文件：
+        被淘汰的行随后会写入新向量，磁盘上的旧索引不能再指向它们
+        """
+
+        for _ in range(min(count, len(self._entries))):
+            _, row = self._entries.popitem(last=False)
+            self._free_rows.append(row)
+            self.evictions += 1
+        self._flush_locked()
+
+    # --- 读写 ---
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """批量查询，命中的条目会被移到 LRU 队尾"""
+
+        results = []
+        with self._lock:
+            for key in keys:
+                row = self._entries.get(key)
+                if row is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    results.append(np.array(self._matrix[row]))
+        return results
+
+    def put_many(self, keys: Sequence[str], vectors: Sequence[np.ndarray]):
+        """批量写入；单批数量超过预算时只保留最后写入的部分"""
+
+        if not keys:
+            return
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = len(vectors[0])
+            for key, vector in zip(keys, vectors):
+                row = self._entries.pop(key, None)
+                if row is None:
+                    row = self._allocate_row()
+                self._matrix[row] = np.asarray(vector, dtype=np.float32)
+                self._entries[key] = row
+            self._dirty += len(keys)
+            if self._dirty >= self.flush_every:
+                self._flush_locked()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.nbytes
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (f"命中 {stats['hits']} / 未命中 {stats['misses']} "
+                f"(命中率 {stats['hit_rate']:.1%})，缓存 {stats['entries']} 条，"
+                f"{stats['bytes'] / 1024 / 1024:.1f}MB，淘汰 {stats['evictions']} 条")
+
+
+class CachedEmbeddingFunction:
+    """
+    透明的缓存包装：支持 pymilvus model 的 encode_documents / encode_queries
+    以及 SentenceTransformer 的 encode，其余属性（如 dim）直接转发给原模型
+    """
+
+    def __init__(self, model, cache: EmbeddingCache):
+        self._model = model
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def _encode(self, texts: Sequence[str], kind: str, encoder) -> List[np.ndarray]:
+        keys = [text_key(text, kind) for text in texts]
+        results = self.cache.get_many(keys)
+
+        # 同一批次中重复的文本只编码一次
+        miss_texts: Dict[str, str] = {}
+        for key, text, result in zip(keys, texts, results):
+            if result is None:
+                miss_texts.setdefault(key, text)
+
+        if miss_texts:
+            miss_keys = list(miss_texts)
+            miss_vectors = [np.asarray(v, dtype=np.float32) for v in encoder(list(miss_texts.values()))]
+            self.cache.put_many(miss_keys, miss_vectors)
+
+            encoded = dict(zip(miss_keys, miss_vectors))
+            results = [encoded[key] if result is None else result for key, result in zip(keys, results)]
+
+        return results
+
+    def close(self):
+        self.cache.close()
+
+    def encode_documents(self, documents: Sequence[str]) -> List[np.ndarray]:
+        return self._encode(documents, "document", self._model.encode_documents)
+
+    def encode_queries(self, queries: Sequence[str]) -> List[np.ndarray]:
+        return self._encode(queries, "query", self._model.encode_queries)
+
+    def encode(self, sentences, **kwargs):
+        """SentenceTransformer 风格的接口，返回 numpy 数组"""
+
+        if kwargs.get("convert_to_tensor") or kwargs.get("convert_to_numpy") is False:
+            # 需要 torch 张量等非 numpy 输出时不走缓存
+            return self._model.encode(sentences, **kwargs)
+
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        # 影响结果的参数（如 normalize_embeddings、prompt）参与缓存键
+        semantic_kwargs = {k: v for k, v in kwargs.items() if k not in _NON_SEMANTIC_ENCODE_KWARGS}
+        kind = "encode:" + json.dumps(semantic_kwargs, sort_keys=True, default=str)
+
+        vectors = self._encode(texts, kind, lambda batch: self._model.encode(batch, **kwargs))
+        if not vectors:
+            return np.empty((0, self.cache._dim or 0), dtype=np.float32)
+
+        matrix = np.stack(vectors)
+        return matrix[0] if single else matrix
+
+
+class QueryVectorLRU:
+    """
+    进程内的查询向量 LRU 缓存
+
+    线上问题重复率很高，重复的问题直接复用向量；未命中的问题去重后一次性批量编码。
+    缓存键包含模型名，多个模型可以共用同一个实例。
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+
+    def encode_queries(self, embedding_model, queries: Sequence[str]) -> List[np.ndarray]:
+        model_name = getattr(embedding_model, "model_name", None) or type(embedding_model).__name__
+        keys = [(model_name, unicodedata.normalize("NFC", query)) for query in queries]
+
+        vectors: Dict[tuple, np.ndarray] = {}
+        miss_queries: Dict[tuple, str] = {}
+        for key, query in zip(keys, queries):
+            vector = self._entries.get(key)
+            if vector is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                vectors[key] = vector
+            elif key in miss_queries:
+                # 同一批次中重复的问题只编码一次
+                self.hits += 1
+            else:
+                self.misses += 1
+                miss_queries[key] = query
+
+        if miss_queries:
+            encoded = embedding_model.encode_queries(list(miss_queries.values()))
+            for key, vector in zip(miss_queries, encoded):
+                vectors[key] = self._entries[key] = np.asarray(vector, dtype=np.float32)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries)
+        }
+
+
+def wrap_with_cache(
+    model,
+    model_name: Optional[str] = None,
+    model_revision: str = "",
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    flush_every: int = DEFAULT_FLUSH_EVERY
+) -> CachedEmbeddingFunction:
+    """
+    用持久化缓存包装 embedding 模型
+
+    Args:
+        model: pymilvus model 的 embedding 函数或 SentenceTransformer
+        model_name: 缓存命名空间中的模型名，默认取 model.model_name，没有时取类名
+        model_revision: 模型版本，模型权重更新时修改它即可让旧缓存失效
+        cache_dir: 缓存根目录
+        max_bytes: 单个模型缓存的字节预算
+        flush_every: 新增多少条目后写一次索引文件
+    """
+
+    model_name = model_name or getattr(model, "model_name", None) or type(model).__name__
+    cache = EmbeddingCache(model_name, model_revision, cache_dir=cache_dir, max_bytes=max_bytes,
+                           flush_every=flush_every)
+    return CachedEmbeddingFunction(model, cache)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单遍流式层级解析器：逐行读取 markdown，维护标题栈，输出带完整 编/章/条 路径的分块
+
+原先的分块函数对每个 #### 章节都会截取 content[:start_pos] 并重新扫描 ##/### 标题，
+复杂度为 O(章节数 × 文档大小)。这里只读一遍文档，内存占用只与单个章节的大小有关。
+"""
+
+import re
+from typing import Iterable, Iterator, NamedTuple, Tuple, Union
+
+# 各级标题（与原分块函数使用的正则保持一致，只是按行匹配）
+BOOK_PATTERN = re.compile(r"^##\s+(.+)$")
+PART_PATTERN = re.compile(r"^###\s+(.+)$")
+CHAPTER_PATTERN = re.compile(r"^####\s+(.+)$")
+
+# 条文标题（**第XXX条** 格式）
+ARTICLE_PATTERN = re.compile(r"\*\*第[零一二三四五六七八九十百千万\d]+条\*\*")
+
+CHUNK_CHAPTER = "chapter"
+CHUNK_ARTICLE = "article"
+
+
+class HierarchicalChunk(NamedTuple):
+    """解析得到的分块"""
+
+    kind: str  # CHUNK_CHAPTER 或 CHUNK_ARTICLE
+    path: Tuple[str, ...]  # 完整层级路径，如 (法典, 编, 章) 或 (法典, 编, 章, 条)
+    title: str  # " / ".join(path)
+    text: str  # 带【层级标题】前缀的分块内容
+
+
+def _iter_lines(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    """把文件路径、已打开的文件或任意字符串可迭代对象统一成去掉换行符的行"""
+
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8") as file:
+            for line in file:
+                yield line.rstrip("\n")
+    else:
+        for line in source:
+            yield line.rstrip("\n")
+
+
+def _split_articles(chapter_title: str, chapter_path: Tuple[str, ...],
+                    chapter_content: str) -> Iterator[HierarchicalChunk]:
+    """在单个章节内按条文切分，复杂度与章节长度成线性关系"""
+
+    article_matches = list(ARTICLE_PATTERN.finditer(chapter_content))
+
+    for i, match in enumerate(article_matches):
+        article_title = match.group(0)
+        start_pos = match.start()
+
+        # 确定条文内容的结束位置
+        if i + 1 < len(article_matches):
+            article_content = chapter_content[start_pos:article_matches[i + 1].start()].strip()
+        else:
+            article_content = chapter_content[start_pos:].strip()
+
+        full_article_title = f"{chapter_title} / {article_title}"
+
+        yield HierarchicalChunk(
+            kind=CHUNK_ARTICLE,
+            path=chapter_path + (article_title,),
+            title=full_article_title,
+            text=f"【{full_article_title}】\n\n{article_content}"
+        )
+
+
+def iter_hierarchical_chunks(
+    source: Union[str, Iterable[str]],
+    emit_chapters: bool = True,
+    emit_articles: bool = True
+) -> Iterator[HierarchicalChunk]:
+    """
+    单遍解析 markdown，按文档顺序输出章节块以及其后的条文块
+
+    Args:
+        source: markdown 文件路径，或者逐行产出文本的可迭代对象（如已打开的文件）
+        emit_chapters: 是否输出章节块
+        emit_articles: 是否输出条文块
+
+    Yields:
+        HierarchicalChunk: 每个章节块之后紧跟该章节内的条文块
+    """
+
+    current_book = ""  # 最近的 ## 标题（如"中华人民共和国民法典"）
+    current_part = ""  # 最近的 ### 标题（如"（二）物权编"）
+
+    chapter_path: Tuple[str, ...] = ()
+    chapter_lines = []
+
+    def flush() -> Iterator[HierarchicalChunk]:
+        chapter_title = " / ".join(chapter_path)
+        chapter_content = "\n".join(chapter_lines).strip()
+
+        if emit_chapters:
+            yield HierarchicalChunk(
+                kind=CHUNK_CHAPTER,
+                path=chapter_path,
+                title=chapter_title,
+                text=f"【{chapter_title}】\n\n{chapter_content}"
+            )
+        if emit_articles:
+            yield from _split_articles(chapter_title, chapter_path, chapter_content)
+
+    for line in _iter_lines(source):
+        chapter_match = CHAPTER_PATTERN.match(line)
+        if chapter_match:
+            if chapter_path:
+                yield from flush()
+
+            # 构建完整的层级路径
+            path_parts = []
+            if current_book:
+                path_parts.append(current_book)
+            if current_part:
+                path_parts.append(current_part)
+            path_parts.append(f"第{chapter_match.group(1).strip()}")
+
+            chapter_path = tuple(path_parts)
+            chapter_lines = [line]
+            continue
+
+        # 章节之间出现的上级标题只影响后续章节的层级路径，
+        # 其文本仍归入当前章节（与原分块函数的行为一致）
+        part_match = PART_PATTERN.match(line)
+        if part_match:
+            current_part = part_match.group(1).strip()
+        else:
+            book_match = BOOK_PATTERN.match(line)
+            if book_match:
+                current_book = book_match.group(1).strip()
+
+        if chapter_path:
+            chapter_lines.append(line)
+
+    if chapter_path:
+        yield from flush()
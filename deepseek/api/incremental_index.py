@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量索引：用内容哈希清单（manifest）判断哪些分块需要重新 embedding
+
+- 主键由条文的层级路径（标题）哈希得到，文档中间插入或修改条文不会导致后续条文重新编号
+- 清单记录每个分块 title+text 的哈希，只有新增或内容变化的分块需要重新 embedding 并 upsert
+- 清单中存在但本次解析结果中不存在的分块需要从 collection 中删除
+- 清单记录 embedding 模型的名称和版本，模型变化时已有向量全部失效，需要全量重建
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+MANIFEST_VERSION = 1
+_PATH_SEPARATOR = " / "
+
+
+def stable_chunk_id(title: str) -> int:
+    """由分块的层级路径生成稳定的 INT64 主键（取 blake2b 前 8 字节并保证非负）"""
+
+    digest = hashlib.blake2b(title.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def content_hash(title: str, text: str) -> str:
+    """分块内容哈希，title 或 text 任一变化都会改变哈希"""
+
+    hasher = hashlib.sha256()
+    hasher.update(title.encode("utf-8"))
+    hasher.update(b"\x00")
+    hasher.update(text.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def iter_chunk_ids(articles: Iterable[Tuple[str, str]]) -> Iterator[Tuple[int, str, str]]:
+    """
+    为 (标题, 内容) 流分配稳定主键
+
+    标题是 " / " 分隔的层级路径，主键由标题哈希得到。同一上级路径下标题重复时
+    （如同一章中重复的条文编号），第 n 次出现的标题追加 #n 再哈希；上级路径在流中
+    不连续地再次出现时（如两份同名文档），第 r 段中的标题追加 #r.n。主键由分块在
+    上级路径中的位置决定，不依赖其他上级路径中的条文。
+
+    只记住当前上级路径下已出现的标题，以及每个上级路径的哈希（用于识别再次出现），
+    内存随章节/文档数增长，而不是随分块总数增长。
+
+    Yields:
+        Tuple[int, str, str]: (主键, 标题, 内容)
+    """
+
+    # 上级路径哈希 -> 在流中出现的段数
+    parent_runs: Dict[int, int] = {}
+    current_parent: Optional[str] = None
+    run = 1
+    # 当前上级路径下：标题哈希 -> 出现次数
+    occurrences: Dict[int, int] = {}
+
+    for title, text in articles:
+        parent = title.rsplit(_PATH_SEPARATOR, 1)[0] if _PATH_SEPARATOR in title else ""
+        if parent != current_parent:
+            current_parent = parent
+            parent_key = stable_chunk_id(parent)
+            run = parent_runs.get(parent_key, 0) + 1
+            parent_runs[parent_key] = run
+            occurrences = {}
+
+        chunk_id = stable_chunk_id(title)
+        occurrence = occurrences.get(chunk_id, 0) + 1
+        occurrences[chunk_id] = occurrence
+        if run > 1:
+            chunk_id = stable_chunk_id(f"{title}#{run}.{occurrence}")
+        elif occurrence > 1:
+            chunk_id = stable_chunk_id(f"{title}#{occurrence}")
+        yield chunk_id, title, text
+
+
+def assign_chunk_ids(articles: List[Tuple[str, str]]) -> List[Tuple[int, str, str]]:
+    """
+    为 (标题, 内容) 列表分配稳定主键，规则见 iter_chunk_ids
+
+    Returns:
+        List[Tuple[int, str, str]]: [(主键, 标题, 内容), ...]
+    """
+
+    return list(iter_chunk_ids(articles))
+
+
+def embedding_model_key(embedding_model) -> Dict[str, str]:
+    """
+    embedding 模型的标识（名称 + 版本），写入清单用于判断已有向量是否仍然可用
+
+    缓存包装（CachedEmbeddingFunction）使用缓存命名空间中的模型名和版本；
+    其他模型取 model_name 属性，没有时取类名
+    """
+
+    cache = getattr(embedding_model, "cache", None)
+    if cache is not None and hasattr(cache, "model_name"):
+        return {"name": cache.model_name, "revision": cache.model_revision}
+    name = getattr(embedding_model, "model_name", None) or type(embedding_model).__name__
+    return {"name": name, "revision": getattr(embedding_model, "model_revision", "")}
+
+
+def load_manifest(manifest_path: str) -> Optional[dict]:
+    """读取清单文件，不存在或版本不匹配时返回 None"""
+
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+
+    return manifest
+
+
+def save_manifest(manifest_path: str, collection_name: str, dimension: int,
+                  chunk_hashes: Dict[int, str], index: Optional[dict] = None,
+                  model: Optional[Dict[str, str]] = None):
+    """
+    原子地写入清单文件（先写临时文件再替换），避免中途崩溃留下半个清单
+
+    index 为 collection 的索引结构（IndexConfig.build_key()），model 为 embedding 模型标识
+    （embedding_model_key()），任一变化时增量模式会退化为全量构建
+    """
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "collection": collection_name,
+        "dimension": dimension,
+        "index": index,
+        "model": model,
+        # JSON 的键只能是字符串
+        "chunks": {str(chunk_id): digest for chunk_id, digest in chunk_hashes.items()}
+    }
+
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def manifest_matches(manifest: Optional[dict], collection_name: str, dimension: int,
+                     index: Optional[dict], model: Dict[str, str]) -> bool:
+    """清单是否描述同一个 collection、索引结构和 embedding 模型，只有这样才能增量更新"""
+
+    return (
+        manifest is not None
+        and manifest["collection"] == collection_name
+        and manifest.get("model") == model
+        and manifest["dimension"] == dimension
+        and manifest.get("index") == index
+    )
+
+
+def diff_chunks(
+    manifest: dict,
+    chunks: List[Tuple[int, str, str]]
+) -> Tuple[List[Tuple[int, str, str]], List[int], Dict[int, str]]:
+    """
+    对比清单与本次解析结果
+
+    Returns:
+        (需要 embedding 并 upsert 的分块, 需要删除的主键, 本次的完整哈希表)
+    """
+
+    old_hashes = {int(chunk_id): digest for chunk_id, digest in manifest["chunks"].items()}
+    new_hashes = {}
+    changed = []
+
+    for chunk_id, title, text in chunks:
+        digest = content_hash(title, text)
+        new_hashes[chunk_id] = digest
+        if old_hashes.get(chunk_id) != digest:
+            changed.append((chunk_id, title, text))
+
+    removed = [chunk_id for chunk_id in old_hashes if chunk_id not in new_hashes]
+
+    return changed, removed, new_hashes
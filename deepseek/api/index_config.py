@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量索引配置：索引类型、构建参数和检索参数作为一个整体在构建和检索之间传递
+
+建表时的 index_params 和检索时的 search_params 来自同一个 IndexConfig，避免两处不一致。
+配置可以写成简短的字符串，方便在命令行和环境变量（RAG_INDEX_CONFIG）中指定：
+
+    autoindex                                  Milvus 自动选择（默认，与之前的行为一致）
+    flat:metric=IP                             暴力检索，内积
+    ivf_flat:nlist=1024,nprobe=16
+    ivf_pq:nlist=1024,m=16,nbits=8,nprobe=32
+    hnsw:M=16,efConstruction=200,ef=64
+
+ef / nprobe 等检索参数只影响查询，不需要重建索引（见 IndexConfig.with_search_params）。
+参数值用 | 分隔时表示参数网格，例如 hnsw:M=8|16,ef=32|64|128，用 expand_index_grid 展开。
+
+NumPy 后端（vector_store.NumpyVectorStore）始终精确检索，忽略索引类型和参数。
+
+用法:
+    config = parse_index_config("hnsw:M=16,efConstruction=200,ef=64")
+    create_indexed_collection(milvus_client, collection_name, embedding_dim, config)
+    milvus_client.search(..., search_params=config.search_request())
+"""
+
+import itertools
+import os
+from typing import Any, Dict, List, NamedTuple, Union
+
+from pymilvus import DataType, MilvusClient
+
+# 索引类型 -> (构建参数, 检索参数)；未列出的参数视为拼写错误
+INDEX_TYPES = {
+    "AUTOINDEX": ((), ()),
+    "FLAT": ((), ()),
+    "IVF_FLAT": (("nlist",), ("nprobe",)),
+    "IVF_SQ8": (("nlist",), ("nprobe",)),
+    "IVF_PQ": (("nlist", "m", "nbits"), ("nprobe",)),
+    "HNSW": (("M", "efConstruction"), ("ef",)),
+}
+
+METRIC_TYPES = ("COSINE", "IP", "L2")
+
+
+class IndexConfig(NamedTuple):
+    """一种向量索引配置"""
+
+    name: str
+    index_type: str = "AUTOINDEX"
+    metric_type: str = "COSINE"
+    params: Dict[str, Any] = {}
+    search_params: Dict[str, Any] = {}
+
+    @property
+    def spec(self) -> str:
+        """与 parse_index_config 互逆的字符串形式"""
+
+        items = [f"{key}={value}" for key, value in {**self.params, **self.search_params}.items()]
+        if self.metric_type != "COSINE":
+            items.append(f"metric={self.metric_type}")
+        return self.index_type.lower() + (":" + ",".join(items) if items else "")
+
+    def build_key(self) -> dict:
+        """决定索引结构的部分；变化时已有的 collection 需要重建"""
+
+        return {"index_type": self.index_type, "metric_type": self.metric_type, "params": dict(self.params)}
+
+    def search_request(self) -> dict:
+        """传给 MilvusClient.search 的 search_params"""
+
+        return {"metric_type": self.metric_type, "params": dict(self.search_params)}
+
+    def with_search_params(self, **search_params) -> "IndexConfig":
+        """只替换检索参数，用于在同一个索引上扫描 ef / nprobe"""
+
+        config = self._replace(search_params={**self.search_params, **search_params})
+        return config._replace(name=config.spec)
+
+    def to_dict(self) -> dict:
+        return {**self._asdict(), "params": dict(self.params), "search_params": dict(self.search_params)}
+
+
+def _parse_value(text: str) -> Union[int, str]:
+    return int(text) if text.lstrip("-").isdigit() else text
+
+
+def _validate(config: IndexConfig) -> IndexConfig:
+    if config.index_type not in INDEX_TYPES:
+        raise ValueError(f"不支持的索引类型: {config.index_type}，可选: {', '.join(INDEX_TYPES)}")
+    if config.metric_type not in METRIC_TYPES:
+        raise ValueError(f"不支持的度量方式: {config.metric_type}，可选: {', '.join(METRIC_TYPES)}")
+
+    build_keys, search_keys = INDEX_TYPES[config.index_type]
+    unknown = [key for key in config.params if key not in build_keys]
+    unknown += [key for key in config.search_params if key not in search_keys]
+    if unknown:
+        raise ValueError(f"{config.index_type} 不支持参数 {', '.join(unknown)}；"
+                         f"构建参数: {', '.join(build_keys) or '无'}，检索参数: {', '.join(search_keys) or '无'}")
+    return config
+
+
+def _split_spec(spec: str):
+    """拆分配置字符串，返回 (索引类型, 度量方式, [(参数名, [取值, ...]), ...])"""
+
+    index_type, _, body = spec.strip().partition(":")
+    metric_type = "COSINE"
+    items = []
+    for item in filter(None, (part.strip() for part in body.split(","))):
+        key, sep, value = item.partition("=")
+        if not sep or not value:
+            raise ValueError(f"索引参数格式应为 key=value: {item}")
+        if key == "metric":
+            metric_type = value.upper()
+        else:
+            items.append((key, [_parse_value(v) for v in value.split("|")]))
+    return index_type.upper(), metric_type, items
+
+
+def parse_index_config(spec: Union[str, dict, IndexConfig]) -> IndexConfig:
+    """
+    解析索引配置
+
+    Args:
+        spec: 配置字符串（如 "hnsw:M=16,ef=64"）、字典（retrieval_benchmark 的 JSON 配置格式）
+            或已有的 IndexConfig
+
+    Returns:
+        IndexConfig: 校验过参数名的配置；参数不属于该索引类型时抛出 ValueError
+    """
+
+    if isinstance(spec, IndexConfig):
+        return _validate(spec)
+
+    if isinstance(spec, dict):
+        config = IndexConfig(
+            name=spec.get("name", ""),
+            index_type=spec.get("index_type", "AUTOINDEX").upper(),
+            metric_type=spec.get("metric_type", "COSINE").upper(),
+            params=dict(spec.get("params", {})),
+            search_params=dict(spec.get("search_params", {}))
+        )
+        return _validate(config._replace(name=config.name or config.spec))
+
+    configs = expand_index_grid(spec)
+    if len(configs) != 1:
+        raise ValueError(f"配置中包含参数网格（|），请使用 expand_index_grid: {spec}")
+    return configs[0]
+
+
+def expand_index_grid(spec: str) -> List[IndexConfig]:
+    """
+    把带 | 的配置字符串展开为全部组合，例如 hnsw:M=8|16,ef=32|64 展开为 4 个配置
+
+    构建参数相同的配置排在一起，调用方可以只建一次索引、依次扫描检索参数。
+    """
+
+    index_type, metric_type, items = _split_spec(spec)
+    search_keys = INDEX_TYPES.get(index_type, ((), ()))[1]
+    build_items = [(key, values) for key, values in items if key not in search_keys]
+    search_items = [(key, values) for key, values in items if key in search_keys]
+
+    configs = []
+    for build_values in itertools.product(*(values for _, values in build_items)):
+        for search_values in itertools.product(*(values for _, values in search_items)):
+            config = IndexConfig(
+                name="",
+                index_type=index_type,
+                metric_type=metric_type,
+                params=dict(zip([key for key, _ in build_items], build_values)),
+                search_params=dict(zip([key for key, _ in search_items], search_values))
+            )
+            configs.append(_validate(config._replace(name=config.spec)))
+    return configs
+
+
+DEFAULT_INDEX_CONFIG = parse_index_config(os.getenv("RAG_INDEX_CONFIG", "autoindex"))
+
+
+def create_indexed_collection(
+    client,
+    collection_name: str,
+    dimension: int,
+    index_config: IndexConfig = DEFAULT_INDEX_CONFIG,
+    consistency_level: str = "Strong"
+):
+    """
+    按索引配置创建 collection（主键 id、向量字段 vector，其余字段为动态字段）
+
+    MilvusClient 的快速建表方式会忽略 index_params，所以这里显式定义 schema；
+    没有 prepare_index_params 的后端（NumPy 存储）只使用度量方式。
+    """
+
+    if not hasattr(client, "prepare_index_params"):
+        client.create_collection(
+            collection_name=collection_name,
+            dimension=dimension,
+            metric_type=index_config.metric_type,
+            consistency_level=consistency_level
+        )
+        return
+
+    schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=True)
+    schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True)
+    schema.add_field(field_name="vector", datatype=DataType.FLOAT_VECTOR, dim=dimension)
+
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name="vector",
+        index_type=index_config.index_type,
+        metric_type=index_config.metric_type,
+        params=dict(index_config.params)
+    )
+
+    client.create_collection(
+        collection_name=collection_name,
+        schema=schema,
+        index_params=index_params,
+        consistency_level=consistency_level
+    )
+
+
+def estimate_index_bytes(index_config: IndexConfig, rows: int, dimension: int) -> int:
+    """
+    粗略估算索引常驻内存（字节），用于在不同配置之间比较，不含 Milvus 自身开销
+
+    - FLAT：原始 float32 向量
+    - IVF_*：聚类中心 + 每行一个 8 字节 ID + 压缩后的向量（SQ8 每维 1 字节，PQ 每行 m × nbits 位）
+    - HNSW：原始向量 + 底层每个节点约 2M 条 4 字节的邻接边
+    """
+
+    params = index_config.params
+    raw_bytes = rows * dimension * 4
+
+    if index_config.index_type.startswith("IVF_"):
+        nlist = params.get("nlist", 128)
+        if index_config.index_type == "IVF_SQ8":
+            codes = rows * dimension
+        elif index_config.index_type == "IVF_PQ":
+            m, nbits = params.get("m", 8), params.get("nbits", 8)
+            codes = rows * m * nbits // 8 + (2 ** nbits) * dimension * 4
+        else:
+            codes = raw_bytes
+        return nlist * dimension * 4 + rows * 8 + codes
+
+    if index_config.index_type == "HNSW":
+        return raw_bytes + rows * 2 * params.get("M", 16) * 4
+
+    return raw_bytes
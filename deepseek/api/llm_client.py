@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DeepSeek 调用：复用带连接池的客户端，并支持流式输出答案
+
+每次调用都新建 OpenAI 客户端会丢掉 HTTP 连接池和 TLS 会话，这里在模块级别
+维护一个客户端（keep-alive + 可配置的连接池上限），所有调用共用。
+
+连接池参数可以通过环境变量配置：
+    DEEPSEEK_BASE_URL          API 地址（默认 https://api.deepseek.com/v1）
+    DEEPSEEK_MAX_CONNECTIONS   最大连接数（默认 20）
+    DEEPSEEK_MAX_KEEPALIVE     最大空闲 keep-alive 连接数（默认 10）
+    DEEPSEEK_KEEPALIVE_EXPIRY  空闲连接保留时间，秒（默认 60）
+"""
+
+import json
+import os
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from context_packer import DEFAULT_TOKEN_BUDGET, pack_contexts
+
+DEEPSEEK_MODEL = "deepseek-chat"
+
+SYSTEM_PROMPT = """
+你是一个专业的法律AI助手。请基于提供的法律条文上下文，准确回答用户的问题。
+注意：
+1. 只基于提供的上下文信息回答问题
+2. 如果上下文中没有足够信息，请明确说明
+3. 引用具体的法条时请标明条文编号
+4. 回答要准确、简洁、易懂
+"""
+
+MISSING_API_KEY_MESSAGE = "❌ 错误：未设置DEEPSEEK_API_KEY环境变量"
+
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+
+
+def build_rag_messages(
+    question: str,
+    contexts: List[Tuple[str, str, float]],
+    token_budget: int = DEFAULT_TOKEN_BUDGET
+) -> List[dict]:
+    """根据检索到的上下文构建对话消息，上下文在 token_budget 内按得分打包"""
+
+    # 构建上下文：同章条文共用章节标题，去掉近似重复的条文
+    context_text = pack_contexts(contexts, token_budget=token_budget).text
+
+    user_prompt = f"""
+请基于以下法律条文回答问题：
+
+<上下文>
+{context_text}
+</上下文>
+
+<问题>
+{question}
+</问题>
+
+请提供准确的法律解答：
+"""
+
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def _pool_limits(
+    max_connections: Optional[int],
+    max_keepalive_connections: Optional[int],
+    keepalive_expiry: Optional[float]
+) -> httpx.Limits:
+    """连接池上限，未指定的参数从环境变量读取"""
+
+    return httpx.Limits(
+        max_connections=max_connections or int(os.getenv("DEEPSEEK_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=max_keepalive_connections or int(os.getenv("DEEPSEEK_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=keepalive_expiry or float(os.getenv("DEEPSEEK_KEEPALIVE_EXPIRY", "60"))
+    )
+
+
+def create_deepseek_client(
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    max_connections: Optional[int] = None,
+    max_keepalive_connections: Optional[int] = None,
+    keepalive_expiry: Optional[float] = None,
+    timeout: float = 60.0
+) -> OpenAI:
+    """创建带 keep-alive 连接池的 OpenAI 兼容客户端，未指定的参数从环境变量读取"""
+
+    limits = _pool_limits(max_connections, max_keepalive_connections, keepalive_expiry)
+
+    return OpenAI(
+        api_key=api_key or os.getenv("DEEPSEEK_API_KEY"),
+        base_url=base_url or os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1"),
+        http_client=httpx.Client(limits=limits, timeout=timeout)
+    )
+
+
+def create_async_deepseek_client(
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    max_connections: Optional[int] = None,
+    max_keepalive_connections: Optional[int] = None,
+    keepalive_expiry: Optional[float] = None,
+    timeout: float = 60.0
+) -> AsyncOpenAI:
+    """create_deepseek_client 的异步版本，供 asyncio 引擎使用"""
+
+    limits = _pool_limits(max_connections, max_keepalive_connections, keepalive_expiry)
+
+    return AsyncOpenAI(
+        api_key=api_key or os.getenv("DEEPSEEK_API_KEY"),
+        base_url=base_url or os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1"),
+        http_client=httpx.AsyncClient(limits=limits, timeout=timeout)
+    )
+
+
+def get_deepseek_client() -> Optional[OpenAI]:
+    """获取模块级共享客户端；未设置 DEEPSEEK_API_KEY 时返回 None"""
+
+    global _client
+
+    if _client is None:
+        if not os.getenv("DEEPSEEK_API_KEY"):
+            return None
+        with _client_lock:
+            if _client is None:
+                _client = create_deepseek_client()
+
+    return _client
+
+
+def configure_deepseek_client(**kwargs) -> OpenAI:
+    """用指定参数（同 create_deepseek_client）替换共享客户端，旧客户端的连接会被关闭"""
+
+    global _client
+
+    with _client_lock:
+        old_client, _client = _client, create_deepseek_client(**kwargs)
+
+    if old_client is not None:
+        old_client.close()
+
+    return _client
+
+
+def generate_answer_with_deepseek(
+    question: str,
+    contexts: List[Tuple[str, str, float]],
+    client: Optional[OpenAI] = None
+) -> str:
+    """
+    使用DeepSeek生成答案
+    """
+
+    client = client or get_deepseek_client()
+    if client is None:
+        return MISSING_API_KEY_MESSAGE
+
+    try:
+        response = client.chat.completions.create(
+            model=DEEPSEEK_MODEL,
+            messages=build_rag_messages(question, contexts),
+            temperature=0.1  # 较低的temperature确保回答的一致性
+        )
+
+        return response.choices[0].message.content
+
+    except Exception as e:
+        return f"❌ 调用DeepSeek API时出错: {str(e)}"
+
+
+class AnswerStream:
+    """
+    流式答案：迭代时每收到一段 token 就立即产出，出错或答案不完整时产出一条 ❌ 提示后结束
+
+    迭代结束后 completed 表示答案是否完整生成（收到 finish_reason=stop 且没有出错）。
+    中途失败时已经产出的 token 只是半截答案，调用方据此决定能否缓存拼接出的结果。
+    """
+
+    def __init__(
+        self,
+        question: str,
+        contexts: List[Tuple[str, str, float]],
+        client: Optional[OpenAI] = None
+    ):
+        self.question = question
+        self.contexts = contexts
+        self.client = client
+        self.completed = False
+        self.error: Optional[str] = None
+
+    def __iter__(self) -> Iterator[str]:
+        self.completed = False
+        self.error = None
+
+        client = self.client or get_deepseek_client()
+        if client is None:
+            self.error = MISSING_API_KEY_MESSAGE
+            yield MISSING_API_KEY_MESSAGE
+            return
+
+        finish_reason = None
+        try:
+            # 自己解析 SSE 并把响应读到结尾：新版 SDK 在读到 [DONE] 后直接关闭响应，
+            # 剩余的结束块没有被读取，连接会被丢弃而不是放回连接池
+            with client.chat.completions.with_streaming_response.create(
+                model=DEEPSEEK_MODEL,
+                messages=build_rag_messages(self.question, self.contexts),
+                temperature=0.1,
+                stream=True
+            ) as response:
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        continue
+
+                    choices = json.loads(data).get("choices") or []
+                    if not choices:
+                        continue
+                    finish_reason = choices[0].get("finish_reason") or finish_reason
+                    if choices[0].get("delta", {}).get("content"):
+                        yield choices[0]["delta"]["content"]
+
+        except Exception as e:
+            self.error = f"❌ 调用DeepSeek API时出错: {str(e)}"
+            yield self.error
+            return
+
+        if finish_reason == "stop":
+            self.completed = True
+        else:
+            # 被截断（length）、被过滤（content_filter）或没有结束块：提示调用方上面的答案不完整
+            self.error = f"❌ 答案生成未完成（finish_reason={finish_reason}），以上内容不完整"
+            yield self.error
+
+
+def stream_answer_with_deepseek(
+    question: str,
+    contexts: List[Tuple[str, str, float]],
+    client: Optional[OpenAI] = None
+) -> AnswerStream:
+    """
+    流式生成答案：返回 AnswerStream，每收到一段 token 就立即产出，调用方可以边收边显示；
+    迭代结束后通过 AnswerStream.completed 判断答案是否完整
+    """
+
+    return AnswerStream(question, contexts, client)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 OpenAI 兼容的模拟服务：用于测试和基准测试，不消耗真实的 DeepSeek 额度
+
+- 支持 POST /v1/chat/completions，包括 stream=true 的 SSE 流式输出（HTTP/1.1 chunked + keep-alive）
+- 可配置首 token 延迟和每个 token 的间隔，模拟真实模型的生成速度
+- 可在流式输出中途断开连接，模拟生成到一半失败
+- 统计 TCP 连接数、请求数和并发请求峰值，用于验证连接复用和并发限制
+
+用法:
+    with MockOpenAIServer(reply="你好") as server:
+        client = OpenAI(api_key="test", base_url=server.base_url)
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional, Union
+
+
+class _ChatCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # 每个 TCP 连接对应一个 handler 实例
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.stats_lock:
+            self.server.requests += 1
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+
+        try:
+            self._handle_chat_completions(body)
+        finally:
+            with self.server.stats_lock:
+                self.server.in_flight -= 1
+
+    def _handle_chat_completions(self, body: bytes):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        request = json.loads(body or b"{}")
+        mock = self.server.mock
+        reply = mock.reply(request["messages"]) if callable(mock.reply) else mock.reply
+        model = request.get("model", "mock-model")
+
+        if request.get("stream"):
+            self._stream_reply(reply, model)
+        else:
+            time.sleep(mock.first_token_delay + mock.token_delay * max(len(reply) - 1, 0))
+            self._send_json(200, {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(reply), "total_tokens": len(reply)}
+            })
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_reply(self, reply: str, model: str):
+        mock = self.server.mock
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(delta: dict, finish_reason: Optional[str]) -> bytes:
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        time.sleep(mock.first_token_delay)
+        for i, token in enumerate(reply):
+            if i == mock.disconnect_after:
+                # 不发送结束块就断开连接
+                self.close_connection = True
+                return
+            if i:
+                time.sleep(mock.token_delay)
+            delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+            self._write_chunk(event(delta, None))
+
+        if mock.finish_reason is not None:
+            self._write_chunk(event({}, mock.finish_reason))
+        done = b"data: [DONE]\n\n"
+        self.wfile.write(f"{len(done):x}\r\n".encode("ascii") + done + b"\r\n0\r\n\r\n")
+        self.wfile.flush()
+
+
+class MockOpenAIServer:
+    """在后台线程中运行的模拟 chat completions 服务"""
+
+    def __init__(
+        self,
+        reply: Union[str, Callable[[List[dict]], str]] = "这是模拟的回答。",
+        first_token_delay: float = 0.05,
+        token_delay: float = 0.002,
+        disconnect_after: Optional[int] = None,
+        finish_reason: Optional[str] = "stop",
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        """
+        Args:
+            reply: 固定回答，或根据 messages 生成回答的函数；流式输出时每个字符作为一个 token
+            first_token_delay: 首 token 延迟（秒）
+            token_delay: 相邻 token 之间的间隔（秒）
+            disconnect_after: 流式输出这么多个 token 后断开连接，None 表示正常结束
+            finish_reason: 流式输出最后一块的 finish_reason（如 "length"），None 表示不发送结束块
+            host: 监听地址
+            port: 监听端口，0 表示随机分配
+        """
+
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.disconnect_after = disconnect_after
+        self.finish_reason = finish_reason
+
+        self._server = ThreadingHTTPServer((host, port), _ChatCompletionsHandler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._server.stats_lock = threading.Lock()
+        self._server.connections = 0
+        self._server.requests = 0
+        self._server.in_flight = 0
+        self._server.max_in_flight = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def connections(self) -> int:
+        return self._server.connections
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    @property
+    def in_flight(self) -> int:
+        """当前处理中的请求数"""
+        return self._server.in_flight
+
+    @property
+    def max_in_flight(self) -> int:
+        """同时处理中的请求数峰值"""
+        return self._server.max_in_flight
+
+    def reset_stats(self):
+        with self._server.stats_lock:
+            self._server.connections = 0
+            self._server.requests = 0
+            self._server.max_in_flight = 0
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    server = MockOpenAIServer().start()
+    print(f"🧪 模拟 OpenAI 服务已启动: {server.base_url}（Ctrl+C 退出）")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -7,6 +7,9 @@
 import re
 from typing import List, Tuple
 
+from bm25_index import BM25Index
+from hierarchical_parser import iter_hierarchical_chunks
+
 
 def parse_civil_code_by_chapters(file_path: str) -> List[Tuple[str, str]]:
     """
@@ -19,61 +22,11 @@ def parse_civil_code_by_chapters(file_path: str) -> List[Tuple[str, str]]:
         List[Tuple[str, str]]: [(章节标题, 章节内容), ...]
     """
 
-    with open(file_path, "r", encoding="utf-8") as file:
-        content = file.read()
-
-    # 按章节分割（#### 开头的标题）
-    chapter_pattern = r"^####\s+(.+)$"
-    chapters = []
-
-    # 找到所有章节标题及其位置
-    chapter_matches = list(re.finditer(chapter_pattern, content, re.MULTILINE))
-
-    # 确定当前所在的编、部分等上级标题
-    lines = content.split('\n')
-    current_part = ""  # 当前编（如"物权编"）
-    current_book = ""  # 当前部分（如果有的话）
-
-    for i, match in enumerate(chapter_matches):
-        chapter_title = match.group(1).strip()
-        start_pos = match.start()
-
-        # 确定章节内容的结束位置
-        if i + 1 < len(chapter_matches):
-            end_pos = chapter_matches[i + 1].start()
-            chapter_content = content[start_pos:end_pos].strip()
-        else:
-            chapter_content = content[start_pos:].strip()
-
-        # 查找该章节之前的编、部分信息
-        content_before = content[:start_pos]
-
-        # 查找最近的编标题（### 开头，如"### （二）物权编"）
-        part_matches = list(re.finditer(r"^###\s+(.+)$", content_before, re.MULTILINE))
-        if part_matches:
-            current_part = part_matches[-1].group(1).strip()
-
-        # 查找最近的更高级标题（## 开头）
-        book_matches = list(re.finditer(r"^##\s+(.+)$", content_before, re.MULTILINE))
-        if book_matches:
-            current_book = book_matches[-1].group(1).strip()
-
-        # 构建完整的层级标题
-        full_title_parts = []
-        if current_book:
-            full_title_parts.append(current_book)
-        if current_part:
-            full_title_parts.append(current_part)
-        full_title_parts.append(f"第{chapter_title}")
-
-        full_title = " / ".join(full_title_parts)
-
-        # 在章节内容前加上完整的层级信息
-        enhanced_content = f"【{full_title}】\n\n{chapter_content}"
-
-        chapters.append((full_title, enhanced_content))
-
-    return chapters
+    # 单遍流式解析，避免对每个章节重复扫描其之前的全部内容
+    return [
+        (chunk.title, chunk.text)
+        for chunk in iter_hierarchical_chunks(file_path, emit_articles=False)
+    ]
 
 
 def parse_articles_within_chapters(chapters: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
@@ -155,23 +108,17 @@ def main():
         print(f"内容预览:\n{content[:300]}...")
         print("-" * 50)
 
-    # 特别查找包含"不动产登记簿记载的事项错误"相关的条文
+    # 特别查找包含"不动产登记簿记载的事项错误"相关的条文（BM25 打分代替关键词计数）
     print("\n=== 查找相关条文 ===")
-    target_keywords = ["不动产登记簿", "错误", "更正", "异议"]
-
-    relevant_articles = []
-    for title, content in articles:
-        if any(keyword in content for keyword in target_keywords):
-            # 计算相关度得分
-            score = sum(1 for keyword in target_keywords if keyword in content)
-            relevant_articles.append((score, title, content))
+    query = "不动产登记簿 错误 更正 异议"
 
-    # 按相关度排序
-    relevant_articles.sort(key=lambda x: x[0], reverse=True)
+    sparse_index = BM25Index.build([content for _, content in articles], list(range(len(articles))))
+    relevant_articles = sparse_index.search(query, top_k=5)
 
     print(f"找到 {len(relevant_articles)} 个相关条文:")
-    for i, (score, title, content) in enumerate(relevant_articles[:5]):
-        print(f"\n{i + 1}. 相关度得分: {score}")
+    for i, (article_index, score) in enumerate(relevant_articles):
+        title, content = articles[article_index]
+        print(f"\n{i + 1}. BM25得分: {score:.2f}")
         print(f"   标题: {title}")
         print(f"   内容预览: {content[:200]}...")
 
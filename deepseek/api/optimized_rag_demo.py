@@ -5,12 +5,42 @@
 """
 
 import os
-import re
+import sys
 import json
-from typing import List, Tuple
+import time
+from typing import List, Optional, Tuple
 from tqdm import tqdm
 from pymilvus import MilvusClient, model as milvus_model
-from openai import OpenAI
+
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from context_packer import pack_contexts
+from embedding_cache import QueryVectorLRU, wrap_with_cache
+from hierarchical_parser import iter_hierarchical_chunks
+from index_config import DEFAULT_INDEX_CONFIG, IndexConfig, create_indexed_collection, parse_index_config
+from incremental_index import (
+    assign_chunk_ids,
+    content_hash,
+    diff_chunks,
+    embedding_model_key,
+    iter_chunk_ids,
+    load_manifest,
+    manifest_matches,
+    save_manifest
+)
+from llm_client import generate_answer_with_deepseek, stream_answer_with_deepseek  # noqa: F401
+from semantic_cache import SemanticAnswerCache
+from streaming_ingest import file_fingerprint, ingest_streaming, load_checkpoint, save_checkpoint
+from vector_store import DEFAULT_BACKEND, open_vector_store
+
+# 测试问题（也作为基准测试负载的种子）
+TEST_QUESTIONS = [
+    "权利人、利害关系人认为不动产登记簿记载的事项错误时怎么办？",
+    "什么是异议登记？",
+    "不动产登记簿和不动产权属证书记载不一致时以哪个为准？"
+]
+
+# search_many 默认使用的查询向量缓存
+_default_query_cache = QueryVectorLRU()
 
 
 def parse_articles_with_chapter_context(file_path: str) -> List[Tuple[str, str]]:
@@ -18,132 +48,239 @@ def parse_articles_with_chapter_context(file_path: str) -> List[Tuple[str, str]]
     按条文分割，但保留章节上下文信息
     """
 
-    with open(file_path, "r", encoding="utf-8") as file:
-        content = file.read()
-
-    # 按章节分割（#### 开头的标题）
-    chapter_pattern = r"^####\s+(.+)$"
-    chapter_matches = list(re.finditer(chapter_pattern, content, re.MULTILINE))
-
-    articles = []
-
-    for i, match in enumerate(chapter_matches):
-        chapter_title = match.group(1).strip()
-        start_pos = match.start()
-
-        # 确定章节内容的结束位置
-        if i + 1 < len(chapter_matches):
-            end_pos = chapter_matches[i + 1].start()
-            chapter_content = content[start_pos:end_pos].strip()
-        else:
-            chapter_content = content[start_pos:].strip()
+    # 单遍流式解析，避免对每个章节重复扫描其之前的全部内容
+    return [
+        (chunk.title, chunk.text)
+        for chunk in iter_hierarchical_chunks(file_path, emit_chapters=False)
+    ]
 
-        # 查找该章节之前的编、部分信息
-        content_before = content[:start_pos]
 
-        # 查找最近的编标题（### 开头）
-        part_matches = list(re.finditer(r"^###\s+(.+)$", content_before, re.MULTILINE))
-        current_part = part_matches[-1].group(1).strip() if part_matches else ""
+def build_optimized_rag_system(
+    file_path: str,
+    collection_name: str = "optimized_rag_collection",
+    incremental: bool = False,
+    manifest_path: Optional[str] = None,
+    answer_cache: Optional[SemanticAnswerCache] = None,
+    backend: str = DEFAULT_BACKEND,
+    index_config: IndexConfig = DEFAULT_INDEX_CONFIG
+):
+    """
+    构建优化的RAG系统
 
-        # 查找最近的更高级标题（## 开头）
-        book_matches = list(re.finditer(r"^##\s+(.+)$", content_before, re.MULTILINE))
-        current_book = book_matches[-1].group(1).strip() if book_matches else ""
+    Args:
+        file_path: 民法典md文件路径
+        collection_name: Milvus collection 名称
+        incremental: 增量模式，只对新增或内容变化的条文生成embedding并upsert，
+            删除已不存在的条文；collection或清单不可用、embedding 模型（名称或版本）变化时自动退化为全量构建
+        manifest_path: 内容哈希清单路径，默认为 ./{collection_name}.manifest.json
+        answer_cache: 语义答案缓存，基于新增、变化或删除条文的答案会被失效
+        backend: 向量存储后端，"milvus"（Milvus Lite）或 "numpy"（进程内精确检索，适合小语料）
+        index_config: 向量索引配置（索引类型、构建参数、检索参数），检索时需传入同一个配置；
+            与清单中记录的索引结构不同时增量模式退化为全量构建
+    """
 
-        # 构建完整的层级标题
-        full_title_parts = []
-        if current_book:
-            full_title_parts.append(current_book)
-        if current_part:
-            full_title_parts.append(current_part)
-        full_title_parts.append(f"第{chapter_title}")
+    print("📖 解析文档并生成优化分块...")
+    articles = parse_articles_with_chapter_context(file_path)
+    print(f"✅ 共生成 {len(articles)} 个条文块")
 
-        chapter_context = " / ".join(full_title_parts)
+    # 主键由条文层级路径生成，文档中间的修改不会导致后续条文重新编号
+    chunks = assign_chunk_ids(articles)
+    manifest_path = manifest_path or f"./{collection_name}.manifest.json"
 
-        # 按条文分割（**第XXX条** 格式）
-        article_pattern = r"\*\*第[零一二三四五六七八九十百千万\d]+条\*\*"
-        article_matches = list(re.finditer(article_pattern, chapter_content))
+    # 使用默认embedding模型（在实际项目中建议使用更强的中文模型如BGE）
+    print("🔧 初始化Embedding模型...")
+    # 包装持久化缓存，重复构建时未变化的文本直接命中缓存
+    embedding_model = wrap_with_cache(milvus_model.DefaultEmbeddingFunction())
 
-        for j, article_match in enumerate(article_matches):
-            article_title_match = article_match.group(0)
-            article_start = article_match.start()
+    # 测试embedding维度
+    test_embedding = embedding_model.encode_queries(["测试"])[0]
+    embedding_dim = len(test_embedding)
+    print(f"✅ Embedding维度: {embedding_dim}")
 
-            # 确定条文内容的结束位置
-            if j + 1 < len(article_matches):
-                article_end = article_matches[j + 1].start()
-                article_content = chapter_content[article_start:article_end].strip()
-            else:
-                article_content = chapter_content[article_start:].strip()
+    # 初始化向量存储（Milvus Lite 或进程内 NumPy 后端，接口相同）
+    print(f"🗄️  初始化向量存储（{backend}）...")
+    milvus_client = open_vector_store(backend)
 
-            # 构建包含章节上下文的标题和内容
-            full_article_title = f"{chapter_context} / {article_title_match}"
+    model_key = embedding_model_key(embedding_model)
+    previous_manifest = load_manifest(manifest_path)
+    manifest = previous_manifest if incremental else None
+    use_incremental = (
+        manifest_matches(manifest, collection_name, embedding_dim, index_config.build_key(), model_key)
+        and milvus_client.has_collection(collection_name)
+    )
 
-            # 在条文内容前加上上下文信息，使embedding能理解更丰富的语义
-            enhanced_content = f"【{full_article_title}】\n\n{article_content}"
+    if use_incremental:
+        # 新进程中打开已有的 collection 时，Milvus 需要先加载才能检索
+        milvus_client.load_collection(collection_name)
+        changed_chunks, removed_ids, chunk_hashes = diff_chunks(manifest, chunks)
+        print(f"♻️  增量模式: {len(changed_chunks)} 个条文新增或变化，"
+              f"{len(removed_ids)} 个条文已删除，"
+              f"{len(chunks) - len(changed_chunks)} 个条文未变化")
+
+        if removed_ids:
+            milvus_client.delete(collection_name=collection_name, ids=removed_ids)
+            print(f"🗑️  删除 {len(removed_ids)} 条过期记录")
+    else:
+        if incremental:
+            print("⚠️  未找到可用的清单或collection（或索引配置、embedding 模型已变化），执行全量构建")
+
+        # 如果collection已存在则删除
+        if milvus_client.has_collection(collection_name):
+            milvus_client.drop_collection(collection_name)
+            print("🗑️  删除已存在的collection")
+
+        # 创建新collection（默认使用余弦相似度，对长度归一化更友好）
+        create_indexed_collection(milvus_client, collection_name, embedding_dim, index_config)
+        print(f"✅ 创建新collection成功（索引 {index_config.spec}）")
+
+        changed_chunks = chunks
+        removed_ids = []
+        chunk_hashes = {chunk_id: content_hash(title, content) for chunk_id, title, content in chunks}
+
+    if answer_cache is not None:
+        if use_incremental:
+            stale_ids = [chunk_id for chunk_id, _, _ in changed_chunks] + list(removed_ids)
+        elif (previous_manifest is not None and previous_manifest["collection"] == collection_name
+              and previous_manifest.get("model") == model_key):
+            # 全量构建时与上次的清单比较，只失效内容有变化的条文；
+            # 模型变化时缓存的查询向量无法与新模型的向量比较，整体清空
+            stale_chunks, stale_removed, _ = diff_chunks(previous_manifest, chunks)
+            stale_ids = [chunk_id for chunk_id, _, _ in stale_chunks] + list(stale_removed)
+        else:
+            stale_ids = None
+
+        if stale_ids is None:
+            answer_cache.clear()
+            print("🧹 没有可比较的清单，清空语义答案缓存")
+        elif stale_ids:
+            print(f"🧹 语义答案缓存: 失效 {answer_cache.invalidate_chunks(stale_ids)} 个答案")
+
+    if changed_chunks:
+        # 生成embeddings并插入数据
+        print("🚀 生成embeddings并插入数据...")
+
+        # 只对文本内容生成embedding，不包括标题前缀
+        text_content_only = [content for _, _, content in changed_chunks]
+        doc_embeddings = embedding_model.encode_documents(text_content_only)
+        print(f"💾 Embedding缓存: {embedding_model.cache.format_stats()}")
+
+        data = []
+        for (chunk_id, title, content), embedding in tqdm(
+            zip(changed_chunks, doc_embeddings),
+            desc="准备数据",
+            total=len(changed_chunks)
+        ):
+            data.append({
+                "id": chunk_id,
+                "vector": embedding,
+                "title": title,
+                "text": content
+            })
+
+        if use_incremental:
+            # 主键已存在的记录会被覆盖
+            upsert_result = milvus_client.upsert(collection_name=collection_name, data=data)
+            print(f"✅ 成功upsert {upsert_result['upsert_count']} 条记录")
+        else:
+            # 批量插入
+            insert_result = milvus_client.insert(collection_name=collection_name, data=data)
+            print(f"✅ 成功插入 {insert_result['insert_count']} 条记录")
 
-            articles.append((full_article_title, enhanced_content))
+    # 数据写入完成后再更新清单，中途失败时下次运行会重新处理这些条文
+    save_manifest(manifest_path, collection_name, embedding_dim, chunk_hashes, index=index_config.build_key(),
+                  model=model_key)
 
-    return articles
+    return milvus_client, embedding_model, collection_name
 
 
-def build_optimized_rag_system(file_path: str, collection_name: str = "optimized_rag_collection"):
+def build_streaming_rag_system(
+    file_path: str,
+    collection_name: str = "optimized_rag_collection",
+    embed_batch_size: int = 64,
+    insert_batch_size: int = 256,
+    max_pending_batches: int = 4,
+    checkpoint_path: Optional[str] = None,
+    backend: str = DEFAULT_BACKEND,
+    index_config: IndexConfig = DEFAULT_INDEX_CONFIG,
+    answer_cache: Optional[SemanticAnswerCache] = None
+):
     """
-    构建优化的RAG系统
+    流式构建RAG系统：解析、embedding、写入都按批进行，峰值内存不随语料增大
+
+    崩溃后使用相同参数重新运行，会从检查点继续写入而不是重建collection；
+    入库完成后保留检查点，语料没有变化时再次运行直接跳过全部分块。
+
+    Args:
+        file_path: markdown 文件路径
+        collection_name: Milvus collection 名称
+        embed_batch_size: 每批 embedding 的条文数
+        insert_batch_size: 每批写入 Milvus 的条文数
+        max_pending_batches: 等待写入的 embedding 批次上限（反压）
+        checkpoint_path: 检查点路径，默认为 ./{collection_name}.checkpoint.json
+        backend: 向量存储后端，"milvus" 或 "numpy"
+        index_config: 向量索引配置，续传时沿用已有 collection 的索引
+        answer_cache: 语义答案缓存；流式构建没有内容哈希清单，重建或续传写入了分块时整体清空
     """
 
-    print("📖 解析文档并生成优化分块...")
-    articles = parse_articles_with_chapter_context(file_path)
-    print(f"✅ 共生成 {len(articles)} 个条文块")
+    checkpoint_path = checkpoint_path or f"./{collection_name}.checkpoint.json"
+    fingerprint = file_fingerprint(file_path, collection_name)
 
-    # 使用默认embedding模型（在实际项目中建议使用更强的中文模型如BGE）
     print("🔧 初始化Embedding模型...")
-    embedding_model = milvus_model.DefaultEmbeddingFunction()
-
-    # 测试embedding维度
-    test_embedding = embedding_model.encode_queries(["测试"])[0]
-    embedding_dim = len(test_embedding)
+    embedding_model = wrap_with_cache(milvus_model.DefaultEmbeddingFunction())
+    embedding_dim = len(embedding_model.encode_queries(["测试"])[0])
     print(f"✅ Embedding维度: {embedding_dim}")
 
-    # 初始化Milvus客户端
-    print("🗄️  初始化Milvus数据库...")
-    milvus_client = MilvusClient(uri="./optimized_milvus.db")
+    print(f"🗄️  初始化向量存储（{backend}）...")
+    milvus_client = open_vector_store(backend)
 
-    # 如果collection已存在则删除
-    if milvus_client.has_collection(collection_name):
-        milvus_client.drop_collection(collection_name)
-        print("🗑️  删除已存在的collection")
+    skipped = load_checkpoint(checkpoint_path, fingerprint)
+    resuming = skipped > 0 and milvus_client.has_collection(collection_name)
+    if not resuming:
+        skipped = 0
+        if milvus_client.has_collection(collection_name):
+            milvus_client.drop_collection(collection_name)
+            print("🗑️  删除已存在的collection")
 
-    # 创建新collection
-    milvus_client.create_collection(
-        collection_name=collection_name,
-        dimension=embedding_dim,
-        metric_type="COSINE",  # 使用余弦相似度，对长度归一化更友好
-        consistency_level="Strong"
+        create_indexed_collection(milvus_client, collection_name, embedding_dim, index_config)
+        print(f"✅ 创建新collection成功（索引 {index_config.spec}）")
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        # 入库开始前就清空：即使这次入库中途崩溃，旧答案也不会在续传后保留下来
+        if answer_cache is not None:
+            answer_cache.clear()
+            print("🧹 重新构建collection，清空语义答案缓存")
+
+    print("🚀 流式生成embeddings并写入数据...")
+    articles = (
+        (chunk.title, chunk.text)
+        for chunk in iter_hierarchical_chunks(file_path, emit_chapters=False)
     )
-    print("✅ 创建新collection成功")
-
-    # 生成embeddings并插入数据
-    print("🚀 生成embeddings并插入数据...")
-
-    # 只对文本内容生成embedding，不包括标题前缀
-    text_content_only = [content for _, content in articles]
-    doc_embeddings = embedding_model.encode_documents(text_content_only)
-
-    data = []
-    for i, ((title, content), embedding) in enumerate(tqdm(
-        zip(articles, doc_embeddings),
-        desc="准备数据",
-        total=len(articles)
-    )):
-        data.append({
-            "id": i,
-            "vector": embedding,
-            "title": title,
-            "text": content
-        })
-
-    # 批量插入
-    insert_result = milvus_client.insert(collection_name=collection_name, data=data)
-    print(f"✅ 成功插入 {insert_result['insert_count']} 条记录")
+    with tqdm(desc="写入数据", unit="块") as progress:
+        stats = ingest_streaming(
+            iter_chunk_ids(articles),
+            milvus_client,
+            embedding_model,
+            collection_name,
+            embed_batch_size=embed_batch_size,
+            insert_batch_size=insert_batch_size,
+            max_pending_batches=max_pending_batches,
+            checkpoint_path=checkpoint_path,
+            fingerprint=fingerprint,
+            on_progress=lambda committed: progress.update(committed - progress.n)
+        )
+    # ingest_streaming 完成后会删除检查点，这里记录已全部写入，语料不变时下次运行无需重新入库
+    save_checkpoint(checkpoint_path, fingerprint, skipped + stats["insert"].items)
+
+    if answer_cache is not None and resuming and stats["insert"].items:
+        answer_cache.clear()
+        print("🧹 续传写入了分块，清空语义答案缓存")
+
+    print("📊 各阶段统计:")
+    for stage in stats.values():
+        print(f"   {stage}")
+    print(f"💾 Embedding缓存: {embedding_model.cache.format_stats()}")
 
     return milvus_client, embedding_model, collection_name
 
@@ -153,14 +290,26 @@ def search_with_optimized_rag(
     milvus_client: MilvusClient,
     embedding_model,
     collection_name: str,
-    top_k: int = 5
+    top_k: int = 5,
+    sparse_index: Optional[BM25Index] = None,
+    rrf_k: int = 60,
+    return_ids: bool = False,
+    index_config: IndexConfig = DEFAULT_INDEX_CONFIG
 ):
     """
     使用优化的RAG系统进行搜索
+
+    传入 sparse_index 时进行混合检索：向量检索与 BM25 各取若干候选，
+    用倒数排名融合（RRF）合并后取前 top_k 个，此时得分为 RRF 融合得分。
+    return_ids 为 True 时返回 (上下文列表, 条文 ID 列表)，供语义答案缓存使用。
+    index_config 提供度量方式和 ef / nprobe 等检索参数，应与构建时的配置一致。
     """
 
     print(f"\n🔍 搜索问题: {question}")
 
+    # 混合检索时两路各多取一些候选再融合
+    candidate_k = max(top_k * 4, 20) if sparse_index is not None else top_k
+
     # 生成查询embedding
     query_embedding = embedding_model.encode_queries([question])
 
@@ -168,84 +317,125 @@ def search_with_optimized_rag(
     search_results = milvus_client.search(
         collection_name=collection_name,
         data=query_embedding,
-        limit=top_k,
-        search_params={"metric_type": "COSINE", "params": {}},
+        limit=candidate_k,
+        search_params=index_config.search_request(),
         output_fields=["title", "text"]
     )
 
-    print(f"📋 检索到 {len(search_results[0])} 个相关结果:")
+    hits = [
+        (result["id"], result["entity"]["title"], result["entity"]["text"], result["distance"])
+        for result in search_results[0]
+    ]
 
-    retrieved_contexts = []
-    for i, result in enumerate(search_results[0]):
-        score = result["distance"]
-        title = result["entity"]["title"]
-        content = result["entity"]["text"]
+    if sparse_index is not None:
+        start = time.perf_counter()
+        sparse_hits = sparse_index.search(question, top_k=candidate_k)
+        sparse_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        fused = reciprocal_rank_fusion(
+            [[hit[0] for hit in hits], [doc_id for doc_id, _ in sparse_hits]],
+            k=rrf_k
+        )[:top_k]
+
+        # 只被 BM25 召回的条文需要从 Milvus 取回标题和内容
+        entities = {hit[0]: (hit[1], hit[2]) for hit in hits}
+        missing_ids = [doc_id for doc_id, _ in fused if doc_id not in entities]
+        if missing_ids:
+            for entity in milvus_client.get(
+                collection_name=collection_name,
+                ids=missing_ids,
+                output_fields=["title", "text"]
+            ):
+                entities[entity["id"]] = (entity["title"], entity["text"])
+
+        hits = [
+            (doc_id, entities[doc_id][0], entities[doc_id][1], score)
+            for doc_id, score in fused
+            if doc_id in entities
+        ]
+        fusion_ms = (time.perf_counter() - start) * 1000
+        print(f"⏱️  BM25检索 {sparse_ms:.2f}ms，RRF融合 {fusion_ms:.2f}ms")
+
+    print(f"📋 检索到 {len(hits)} 个相关结果:")
 
-        print(f"\n{i + 1}. 相似度得分: {score:.4f}")
+    retrieved_contexts = []
+    for i, (_, title, content, score) in enumerate(hits):
+        print(f"\n{i + 1}. {'融合得分' if sparse_index is not None else '相似度得分'}: {score:.4f}")
         print(f"   标题: {title}")
         print(f"   内容预览: {content[:150]}...")
 
         retrieved_contexts.append((title, content, score))
 
+    if return_ids:
+        return retrieved_contexts, [hit[0] for hit in hits]
     return retrieved_contexts
 
 
-def generate_answer_with_deepseek(question: str, contexts: List[Tuple[str, str, float]]):
+def build_sparse_index(file_path: str, collection_name: str = "optimized_rag_collection") -> BM25Index:
     """
-    使用DeepSeek生成答案
+    构建与 Milvus collection 主键一致的 BM25 索引，并保存到 ./{collection_name}.bm25/
     """
 
-    # 构建上下文
-    context_text = "\n\n".join([content for _, content, _ in contexts])
-
-    # 构建prompt
-    SYSTEM_PROMPT = """
-你是一个专业的法律AI助手。请基于提供的法律条文上下文，准确回答用户的问题。
-注意：
-1. 只基于提供的上下文信息回答问题
-2. 如果上下文中没有足够信息，请明确说明
-3. 引用具体的法条时请标明条文编号
-4. 回答要准确、简洁、易懂
-"""
+    print("🔤 构建BM25稀疏索引...")
+    start = time.perf_counter()
 
-    USER_PROMPT = f"""
-请基于以下法律条文回答问题：
+    chunks = assign_chunk_ids(parse_articles_with_chapter_context(file_path))
+    sparse_index = BM25Index.build(
+        [content for _, _, content in chunks],
+        [chunk_id for chunk_id, _, _ in chunks]
+    )
+    sparse_index.save(f"./{collection_name}.bm25")
 
-<上下文>
-{context_text}
-</上下文>
+    print(f"✅ BM25索引: {sparse_index.num_docs} 个条文，{len(sparse_index.vocab)} 个词项，"
+          f"耗时 {time.perf_counter() - start:.2f}s")
+    return sparse_index
 
-<问题>
-{question}
-</问题>
 
-请提供准确的法律解答：
-"""
+def search_many(
+    questions: List[str],
+    milvus_client: MilvusClient,
+    embedding_model,
+    collection_name: str,
+    top_k: int = 5,
+    query_cache: Optional[QueryVectorLRU] = None,
+    index_config: IndexConfig = DEFAULT_INDEX_CONFIG
+) -> List[List[Tuple[str, str, float]]]:
+    """
+    批量搜索多个问题
 
-    # 调用DeepSeek API
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    if not api_key:
-        return "❌ 错误：未设置DEEPSEEK_API_KEY环境变量"
+    问题先去重，重复的问题从查询向量 LRU 缓存中取向量，未命中的问题一次性批量编码，
+    然后用一次多向量 Milvus 搜索完成所有问题的检索。
 
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://api.deepseek.com/v1"
-    )
+    Returns:
+        List[List[Tuple[str, str, float]]]: 与输入顺序一致，每个问题的 [(标题, 内容, 相似度), ...]
+    """
 
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": USER_PROMPT}
-            ],
-            temperature=0.1  # 较低的temperature确保回答的一致性
-        )
+    if not questions:
+        return []
+
+    query_cache = query_cache if query_cache is not None else _default_query_cache
+
+    unique_questions = list(dict.fromkeys(questions))
+    query_embeddings = query_cache.encode_queries(embedding_model, unique_questions)
+
+    search_results = milvus_client.search(
+        collection_name=collection_name,
+        data=query_embeddings,
+        limit=top_k,
+        search_params=index_config.search_request(),
+        output_fields=["title", "text"]
+    )
 
-        return response.choices[0].message.content
+    contexts_by_question = {
+        question: [
+            (result["entity"]["title"], result["entity"]["text"], result["distance"])
+            for result in results
+        ]
+        for question, results in zip(unique_questions, search_results)
+    }
 
-    except Exception as e:
-        return f"❌ 调用DeepSeek API时出错: {str(e)}"
+    return [list(contexts_by_question[question]) for question in questions]
 
 
 def main():
@@ -261,34 +451,75 @@ def main():
     import os
     script_dir = os.path.dirname(os.path.abspath(__file__))
     file_path = os.path.join(script_dir, "mfd.md")
-    milvus_client, embedding_model, collection_name = build_optimized_rag_system(file_path)
+    # 同义改写的问题直接复用已生成的答案，跨进程持久化
+    answer_cache = SemanticAnswerCache()
+
+    # 传入 --backend numpy 时使用进程内的向量存储，省去 Milvus Lite 的启动开销
+    backend = sys.argv[sys.argv.index("--backend") + 1] if "--backend" in sys.argv else DEFAULT_BACKEND
+    # 传入 --index hnsw:M=16,efConstruction=200,ef=64 等指定向量索引（见 index_config.py）
+    index_config = (
+        parse_index_config(sys.argv[sys.argv.index("--index") + 1]) if "--index" in sys.argv else DEFAULT_INDEX_CONFIG
+    )
 
-    # 测试问题
-    test_questions = [
-        "权利人、利害关系人认为不动产登记簿记载的事项错误时怎么办？",
-        "什么是异议登记？",
-        "不动产登记簿和不动产权属证书记载不一致时以哪个为准？"
-    ]
+    # 传入 --streaming 时按批流式入库（适合大语料，支持断点续传）
+    if "--streaming" in sys.argv:
+        milvus_client, embedding_model, collection_name = build_streaming_rag_system(
+            file_path, backend=backend, index_config=index_config, answer_cache=answer_cache
+        )
+    else:
+        # 传入 --incremental 时只重新索引有变化的条文
+        incremental = "--incremental" in sys.argv
+        milvus_client, embedding_model, collection_name = build_optimized_rag_system(
+            file_path, incremental=incremental, answer_cache=answer_cache, backend=backend,
+            index_config=index_config
+        )
+
+    # BM25 稀疏索引，与向量检索结果做混合检索
+    sparse_index = build_sparse_index(file_path, collection_name)
 
-    for question in test_questions:
+    for question in TEST_QUESTIONS:
         print("\n" + "=" * 60)
 
         # 检索相关上下文
-        contexts = search_with_optimized_rag(
+        contexts, chunk_ids = search_with_optimized_rag(
             question,
             milvus_client,
             embedding_model,
             collection_name,
-            top_k=3
+            top_k=3,
+            sparse_index=sparse_index,
+            return_ids=True,
+            index_config=index_config
         )
 
-        # 生成答案
-        print("\n🤖 生成答案:")
-        answer = generate_answer_with_deepseek(question, contexts)
-        print(answer)
+        # 与直接拼接全部条文相比，打包后的上下文节省的 prompt token
+        print(f"\n🧮 上下文: {pack_contexts(contexts).format_stats()}")
+
+        # 查询向量在检索时已经算过，这里命中 embedding 缓存
+        query_vector = embedding_model.encode_queries([question])[0]
+        cached_answer = answer_cache.lookup(query_vector, chunk_ids)
+        if cached_answer is not None:
+            print("\n⚡ 语义缓存命中:")
+            print(cached_answer)
+        else:
+            # 生成答案
+            print("\n🤖 生成答案:")
+            # 流式输出，首个 token 到达即开始显示
+            start = time.perf_counter()
+            tokens = []
+            stream = stream_answer_with_deepseek(question, contexts)
+            for token in stream:
+                tokens.append(token)
+                print(token, end="", flush=True)
+            print()
+            # 中途失败时拼出的是半截答案加错误提示，不能缓存
+            if stream.completed:
+                answer_cache.store(question, query_vector, chunk_ids, "".join(tokens), time.perf_counter() - start)
 
         print("\n" + "-" * 60)
 
+    print(f"\n💾 语义答案缓存: {answer_cache.format_stats()}")
+    answer_cache.close()
     print("\n✅ 演示完成！")
 
 
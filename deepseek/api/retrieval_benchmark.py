@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检索基准测试：分块策略 × 索引配置，在带标注的问题集上评估召回效果和性能
+
+- 标注集为 JSON：{"questions": [{"question": "...", "articles": ["第二百二十条", ...]}, ...]}，
+  以条文编号标注，与分块方式无关；某个分块包含标注条文即视为命中
+- 分块策略：纯条文分割（article）、按章分割（chapter）、章节上下文 + 条文（chapter_article）
+- 每种组合报告 recall@k、MRR、索引构建时间、索引磁盘占用、p50/p99 检索延迟
+- 结果写成 JSON 报告，可以用 --baseline 与之前的报告对比
+
+用法:
+    python debug_rag.py benchmark --output report.json
+    python debug_rag.py benchmark --output new.json --baseline report.json
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+from pymilvus import MilvusClient
+
+from hierarchical_parser import iter_hierarchical_chunks
+from index_config import IndexConfig, create_indexed_collection, parse_index_config
+
+# 条文编号，如 **第二百二十条** 中的 第二百二十条
+ARTICLE_NUMBER_PATTERN = re.compile(r"\*\*(第[零一二三四五六七八九十百千万\d]+条)\*\*")
+
+DEFAULT_K_VALUES = [1, 3, 5, 10]
+
+# 向量矩阵超过该大小时改用磁盘上的内存映射文件
+DEFAULT_MEMMAP_THRESHOLD = 256 * 1024 * 1024
+
+# Milvus Lite 的索引配置（格式见 index_config.py）
+DEFAULT_INDEX_CONFIGS = [
+    IndexConfig("flat_cosine", "FLAT", "COSINE"),
+    IndexConfig("flat_ip", "FLAT", "IP"),
+    IndexConfig("ivf_flat_cosine", "IVF_FLAT", "COSINE", {"nlist": 32}, {"nprobe": 8}),
+    IndexConfig("hnsw_cosine", "HNSW", "COSINE", {"M": 16, "efConstruction": 200}, {"ef": 64})
+]
+
+
+# --- 分块策略 ---
+
+def split_plain_articles(file_path: str) -> List[Tuple[str, str]]:
+    """纯条文分割：只按 **第X条** 切分，不带章节上下文"""
+
+    with open(file_path, "r", encoding="utf-8") as file:
+        content = file.read()
+
+    matches = list(ARTICLE_NUMBER_PATTERN.finditer(content))
+    articles = []
+    for i, match in enumerate(matches):
+        end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        articles.append((match.group(0), content[match.start():end_pos].strip()))
+    return articles
+
+
+def split_chapters(file_path: str) -> List[Tuple[str, str]]:
+    """按章分割，每章一个分块"""
+
+    return [(chunk.title, chunk.text) for chunk in iter_hierarchical_chunks(file_path, emit_articles=False)]
+
+
+def split_chapter_articles(file_path: str) -> List[Tuple[str, str]]:
+    """条文分割，每个条文带 【法典 / 编 / 章 / 条】 层级前缀（optimized_rag_demo 使用的方式）"""
+
+    return [(chunk.title, chunk.text) for chunk in iter_hierarchical_chunks(file_path, emit_chapters=False)]
+
+
+CHUNKING_STRATEGIES: Dict[str, Callable[[str], List[Tuple[str, str]]]] = {
+    "article": split_plain_articles,
+    "chapter": split_chapters,
+    "chapter_article": split_chapter_articles
+}
+
+
+def covered_articles(text: str) -> Set[str]:
+    """分块中包含的条文编号"""
+
+    return set(ARTICLE_NUMBER_PATTERN.findall(text))
+
+
+# --- 评估指标 ---
+
+def recall_at_k(ranked_coverage: Sequence[Set[str]], relevant: Set[str], k: int) -> float:
+    """前 k 个分块覆盖的标注条文比例"""
+
+    if not relevant:
+        return 0.0
+    found = set().union(*ranked_coverage[:k]) if ranked_coverage[:k] else set()
+    return len(found & relevant) / len(relevant)
+
+
+def first_relevant_rank(ranked_coverage: Sequence[Set[str]], relevant: Set[str]) -> Optional[int]:
+    """第一个包含标注条文的分块的名次（从 1 开始），没有时返回 None"""
+
+    for rank, coverage in enumerate(ranked_coverage, start=1):
+        if coverage & relevant:
+            return rank
+    return None
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def load_eval_set(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)["questions"]
+
+
+# --- 批量相似度 ---
+
+def encode_normalized_matrix(
+    texts: Sequence[str],
+    encode: Callable[[List[str]], Sequence],
+    batch_size: int = 64,
+    memmap_path: Optional[str] = None,
+    memmap_threshold: int = DEFAULT_MEMMAP_THRESHOLD
+) -> np.ndarray:
+    """
+    分批编码并逐行 L2 归一化，结果写入一个连续的 float32 矩阵
+
+    矩阵大小超过 memmap_threshold 时写入 memmap_path 的内存映射文件，不会在内存中同时保留全部向量。
+    未指定 memmap_path 时使用匿名临时文件，矩阵被释放后文件自动删除，不会残留在临时目录中。
+    """
+
+    matrix = None
+    for start in range(0, len(texts), batch_size):
+        batch = np.asarray(encode(list(texts[start:start + batch_size])), dtype=np.float32)
+        norms = np.linalg.norm(batch, axis=1, keepdims=True)
+        batch /= np.where(norms > 0, norms, 1.0)
+
+        if matrix is None:
+            shape = (len(texts), batch.shape[1])
+            if len(texts) * batch.shape[1] * 4 > memmap_threshold:
+                if memmap_path is None:
+                    # 内存映射持有自己的文件句柄，关闭临时文件后映射仍然有效
+                    with tempfile.TemporaryFile(prefix="rag_matrix_") as file:
+                        matrix = np.memmap(file, dtype=np.float32, mode="w+", shape=shape)
+                else:
+                    matrix = np.memmap(memmap_path, dtype=np.float32, mode="w+", shape=shape)
+            else:
+                matrix = np.empty(shape, dtype=np.float32)
+
+        matrix[start:start + len(batch)] = batch
+
+    if matrix is None:
+        return np.empty((0, 0), dtype=np.float32)
+    if isinstance(matrix, np.memmap):
+        matrix.flush()
+    return matrix
+
+
+def rank_all(query_matrix: np.ndarray, doc_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    一次矩阵乘法计算全部问题与全部分块的余弦相似度（输入均已归一化）
+
+    Returns:
+        (scores, order): scores[i, j] 为问题 i 与分块 j 的相似度，
+        order[i] 为问题 i 下按相似度从高到低排列的分块下标
+    """
+
+    scores = query_matrix @ doc_matrix.T
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return scores, order
+
+
+# --- 索引构建与检索 ---
+
+def build_index(
+    run_dir: str,
+    index_config: IndexConfig,
+    vectors: Sequence,
+    titles: Sequence[str]
+) -> Tuple[MilvusClient, str]:
+    """在 run_dir 中新建 Milvus Lite 数据库，按索引配置建表并写入全部向量"""
+
+    milvus_client = MilvusClient(uri=os.path.join(run_dir, "benchmark.db"))
+    collection_name = "benchmark"
+
+    create_indexed_collection(milvus_client, collection_name, len(vectors[0]), index_config)
+    milvus_client.insert(
+        collection_name=collection_name,
+        data=[
+            {"id": i, "vector": list(map(float, vector)), "title": title}
+            for i, (vector, title) in enumerate(zip(vectors, titles))
+        ]
+    )
+    return milvus_client, collection_name
+
+
+def evaluate_index(
+    chunks: List[Tuple[str, str]],
+    doc_vectors: Sequence,
+    query_vectors: Sequence,
+    eval_set: List[dict],
+    index_config: IndexConfig,
+    k_values: Sequence[int],
+    repeat: int = 5,
+    work_dir: Optional[str] = None
+) -> dict:
+    """对一种分块结果和一种索引配置执行构建、检索和评估"""
+
+    run_dir = tempfile.mkdtemp(prefix="rag_benchmark_", dir=work_dir)
+    try:
+        start = time.perf_counter()
+        milvus_client, collection_name = build_index(
+            run_dir, index_config, doc_vectors, [title for title, _ in chunks]
+        )
+        build_seconds = time.perf_counter() - start
+
+        coverage = [covered_articles(content) for _, content in chunks]
+        search_params = index_config.search_request()
+        limit = max(k_values)
+
+        latencies = []
+        recalls = {k: [] for k in k_values}
+        reciprocal_ranks = []
+        per_question = []
+
+        for item, query_vector in zip(eval_set, query_vectors):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results = milvus_client.search(
+                    collection_name=collection_name,
+                    data=[list(map(float, query_vector))],
+                    limit=limit,
+                    search_params=search_params,
+                    output_fields=["title"]
+                )
+                latencies.append(time.perf_counter() - start)
+
+            ranked_coverage = [coverage[result["id"]] for result in results[0]]
+            relevant = set(item["articles"])
+
+            for k in k_values:
+                recalls[k].append(recall_at_k(ranked_coverage, relevant, k))
+            rank = first_relevant_rank(ranked_coverage, relevant)
+            reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+            per_question.append({
+                "question": item["question"],
+                "first_relevant_rank": rank,
+                "top_titles": [chunks[result["id"]][0] for result in results[0][:3]]
+            })
+
+        milvus_client.close()
+        index_bytes = directory_size(run_dir)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "recall": {f"@{k}": float(np.mean(values)) for k, values in recalls.items()},
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "build_seconds": build_seconds,
+        "index_bytes": index_bytes,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p99": float(np.percentile(latencies_ms, 99))
+        },
+        "per_question": per_question
+    }
+
+
+def run_benchmark(
+    file_path: str,
+    eval_set: List[dict],
+    embedding_model,
+    model_name: str,
+    strategies: Optional[Sequence[str]] = None,
+    index_configs: Optional[Sequence[Union[IndexConfig, dict, str]]] = None,
+    k_values: Sequence[int] = DEFAULT_K_VALUES,
+    repeat: int = 5,
+    work_dir: Optional[str] = None
+) -> dict:
+    """
+    运行全部 分块策略 × 索引配置 组合，返回 JSON 报告
+
+    Args:
+        file_path: 语料 markdown 文件
+        eval_set: 标注问题集
+        embedding_model: 提供 encode_documents / encode_queries 的 embedding 模型
+        model_name: 写入报告的模型名
+        strategies: 要测试的分块策略，默认全部
+        index_configs: 索引配置列表（IndexConfig、JSON 字典或配置字符串），默认 DEFAULT_INDEX_CONFIGS
+        k_values: 计算 recall@k 的 k
+        repeat: 每个问题重复检索的次数（用于统计延迟）
+        work_dir: 临时数据库所在目录
+    """
+
+    strategies = list(strategies or CHUNKING_STRATEGIES)
+    index_configs = [parse_index_config(config) for config in index_configs or DEFAULT_INDEX_CONFIGS]
+
+    with open(file_path, "rb") as file:
+        corpus_sha256 = hashlib.sha256(file.read()).hexdigest()
+
+    questions = [item["question"] for item in eval_set]
+    query_vectors = embedding_model.encode_queries(questions)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "corpus": os.path.basename(file_path),
+        "corpus_sha256": corpus_sha256,
+        "model": model_name,
+        "num_questions": len(eval_set),
+        "k_values": list(k_values),
+        "repeat": repeat,
+        "runs": []
+    }
+
+    for strategy in strategies:
+        chunks = CHUNKING_STRATEGIES[strategy](file_path)
+        print(f"\n📦 分块策略 {strategy}: {len(chunks)} 个分块")
+
+        start = time.perf_counter()
+        doc_vectors = embedding_model.encode_documents([content for _, content in chunks])
+        embed_seconds = time.perf_counter() - start
+
+        for index_config in index_configs:
+            run = {
+                "strategy": strategy,
+                "index": index_config.name,
+                "index_config": index_config.to_dict(),
+                "num_chunks": len(chunks),
+                "avg_chunk_chars": float(np.mean([len(content) for _, content in chunks])),
+                "embed_seconds": embed_seconds
+            }
+            try:
+                run.update(evaluate_index(
+                    chunks, doc_vectors, query_vectors, eval_set, index_config,
+                    k_values, repeat=repeat, work_dir=work_dir
+                ))
+            except Exception as e:
+                # 某些索引类型在当前 Milvus 版本不可用时记录错误，继续其他组合
+                run["error"] = str(e)
+                print(f"   ❌ {index_config.name}: {e}")
+            else:
+                print(f"   {index_config.name:<18} " + format_run(run))
+
+            report["runs"].append(run)
+
+    return report
+
+
+# --- 报告 ---
+
+def format_run(run: dict) -> str:
+    recall = "  ".join(f"R{k} {value:.2f}" for k, value in run["recall"].items())
+    return (f"{recall}  MRR {run['mrr']:.3f}  构建 {run['build_seconds']:.2f}s  "
+            f"索引 {run['index_bytes'] / 1024:.0f}KB  "
+            f"p50 {run['latency_ms']['p50']:.2f}ms  p99 {run['latency_ms']['p99']:.2f}ms")
+
+
+def save_report(report: dict, path: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def compare_reports(report: dict, baseline: dict) -> List[str]:
+    """逐个组合对比 MRR、recall 和 p50 延迟的变化"""
+
+    baseline_runs = {
+        (run["strategy"], run["index"]): run
+        for run in baseline.get("runs", [])
+        if "error" not in run
+    }
+
+    lines = []
+    for run in report["runs"]:
+        old = baseline_runs.get((run["strategy"], run["index"]))
+        if old is None or "error" in run:
+            continue
+
+        recall_deltas = "  ".join(
+            f"R{k} {run['recall'][k] - old['recall'][k]:+.2f}"
+            for k in run["recall"] if k in old["recall"]
+        )
+        lines.append(
+            f"{run['strategy']:<16} {run['index']:<18} {recall_deltas}  "
+            f"MRR {run['mrr'] - old['mrr']:+.3f}  "
+            f"p50 {run['latency_ms']['p50'] - old['latency_ms']['p50']:+.2f}ms"
+        )
+    return lines
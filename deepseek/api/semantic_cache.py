@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语义答案缓存：放在 generate_answer_with_deepseek 之前，同义改写的问题直接返回已有答案
+
+- 缓存键为 (查询向量, 检索到的条文 ID 集合)：条文集合完全相同且余弦相似度不低于阈值才算命中，
+  检索结果不同的问题即使措辞接近也不会复用答案
+- 按 TTL 过期，按条目数做 LRU 淘汰
+- 持久化到 JSON 文件（原子写入），重启后继续使用：新增答案累计到 flush_every 条、
+  失效答案时和 close()（进程退出）时写入，而不是每写一条答案都重写整个文件；
+  文件损坏或无法读取时按空缓存启动
+- 某个条文被重新索引时，失效所有基于该条文生成的答案
+- 统计命中率和节省的生成耗时
+"""
+
+import atexit
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from llm_client import generate_answer_with_deepseek
+
+DEFAULT_CACHE_PATH = os.getenv("RAG_ANSWER_CACHE_PATH", "./.answer_cache.json")
+DEFAULT_THRESHOLD = 0.92
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_FLUSH_EVERY = 32
+
+# generate_answer_with_deepseek 出错时返回以此开头的提示，不能缓存
+_ERROR_PREFIX = "❌"
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _chunk_key(chunk_ids: Iterable[int]) -> Tuple[int, ...]:
+    return tuple(sorted({int(chunk_id) for chunk_id in chunk_ids}))
+
+
+class SemanticAnswerCache:
+    """
+    语义答案缓存
+
+    用法:
+        cache = SemanticAnswerCache()
+        answer = cache.lookup(query_vector, chunk_ids)
+        if answer is None:
+            answer = generate_answer_with_deepseek(question, contexts)
+            cache.store(question, query_vector, chunk_ids, answer, generation_seconds)
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        threshold: float = DEFAULT_THRESHOLD,
+        ttl: Optional[float] = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        clock: Callable[[], float] = time.time,
+        flush_every: int = DEFAULT_FLUSH_EVERY
+    ):
+        """
+        Args:
+            path: 持久化文件路径，None 表示只在内存中缓存
+            threshold: 命中所需的最低余弦相似度
+            ttl: 答案有效期（秒），None 表示不过期
+            max_entries: 最多缓存的答案数，超出时淘汰最久未使用的
+            clock: 时间函数，测试中可以替换
+            flush_every: 新增多少条答案后写一次持久化文件；失效答案、close() 和进程退出时也会写入
+        """
+
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self._clock = clock
+        self._lock = threading.Lock()
+        # 保证先取快照的写入不会覆盖后取快照的写入
+        self._flush_lock = threading.Lock()
+        self._dirty = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.seconds_saved = 0.0
+
+        # 条目 ID -> 条目，按 LRU 顺序（最久未使用在前）
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        # 条文 ID 集合 -> 条目 ID 列表；条文 ID -> 引用它的条目 ID
+        self._by_chunks: Dict[Tuple[int, ...], List[int]] = {}
+        self._by_chunk_id: Dict[int, set] = {}
+        self._next_id = 0
+
+        self._load()
+        atexit.register(self.close)
+
+    # --- 内部索引 ---
+
+    def _add(self, entry: dict) -> int:
+        entry_id = self._next_id
+        self._next_id += 1
+
+        self._entries[entry_id] = entry
+        self._by_chunks.setdefault(entry["chunk_ids"], []).append(entry_id)
+        for chunk_id in entry["chunk_ids"]:
+            self._by_chunk_id.setdefault(chunk_id, set()).add(entry_id)
+        return entry_id
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+
+        siblings = self._by_chunks[entry["chunk_ids"]]
+        siblings.remove(entry_id)
+        if not siblings:
+            del self._by_chunks[entry["chunk_ids"]]
+
+        for chunk_id in entry["chunk_ids"]:
+            referrers = self._by_chunk_id[chunk_id]
+            referrers.discard(entry_id)
+            if not referrers:
+                del self._by_chunk_id[chunk_id]
+
+    def _is_expired(self, entry: dict, now: float) -> bool:
+        return self.ttl is not None and now - entry["created_at"] > self.ttl
+
+    # --- 查询与写入 ---
+
+    def lookup(self, query_vector, chunk_ids: Iterable[int]) -> Optional[str]:
+        """返回相似问题的已缓存答案，未命中时返回 None"""
+
+        start = time.perf_counter()
+        query = _normalize(query_vector)
+        key = _chunk_key(chunk_ids)
+        now = self._clock()
+
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._by_chunks.get(key, [])):
+                entry = self._entries[entry_id]
+                if self._is_expired(entry, now):
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+
+                score = float(np.dot(entry["vector"], query))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            entry = self._entries[best_id]
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            self.seconds_saved += max(entry["generation_seconds"] - (time.perf_counter() - start), 0.0)
+            return entry["answer"]
+
+    def store(
+        self,
+        question: str,
+        query_vector,
+        chunk_ids: Iterable[int],
+        answer: str,
+        generation_seconds: float = 0.0
+    ):
+        """写入一条答案；出错提示不会被缓存"""
+
+        if not answer or answer.startswith(_ERROR_PREFIX):
+            return
+
+        entry = {
+            "question": question,
+            "vector": _normalize(query_vector),
+            "chunk_ids": _chunk_key(chunk_ids),
+            "answer": answer,
+            "created_at": self._clock(),
+            "generation_seconds": generation_seconds
+        }
+
+        with self._lock:
+            self._add(entry)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self._dirty += 1
+            should_flush = self._dirty >= self.flush_every
+
+        if should_flush:
+            self.flush()
+
+    def invalidate_chunks(self, chunk_ids: Iterable[int]) -> int:
+        """失效所有引用了这些条文的答案，返回失效的条目数"""
+
+        with self._lock:
+            stale = set()
+            for chunk_id in chunk_ids:
+                stale |= self._by_chunk_id.get(int(chunk_id), set())
+            for entry_id in stale:
+                self._remove(entry_id)
+            self.invalidations += len(stale)
+
+        # 失效的答案不能在重启后复活，立即写入
+        if stale:
+            self.flush()
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_chunks.clear()
+            self._by_chunk_id.clear()
+
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # --- 持久化 ---
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+
+            entries = [
+                {
+                    "question": item["question"],
+                    "vector": np.frombuffer(base64.b64decode(item["vector"]), dtype=np.float32).copy(),
+                    "chunk_ids": tuple(item["chunk_ids"]),
+                    "answer": item["answer"],
+                    "created_at": item["created_at"],
+                    "generation_seconds": item["generation_seconds"]
+                }
+                for item in data.get("entries", [])
+            ]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            # 缓存文件损坏（如写到一半的旧版本文件）时按空缓存启动，下次写入时覆盖
+            print(f"⚠️  语义答案缓存文件无法读取，按空缓存启动: {e}")
+            return
+
+        now = self._clock()
+        for entry in entries:
+            if not self._is_expired(entry, now):
+                self._add(entry)
+
+    def flush(self):
+        """原子地写入持久化文件"""
+
+        if not self.path:
+            return
+
+        with self._flush_lock:
+            with self._lock:
+                entries = [
+                    {
+                        "question": entry["question"],
+                        "vector": base64.b64encode(entry["vector"].tobytes()).decode("ascii"),
+                        "chunk_ids": list(entry["chunk_ids"]),
+                        "answer": entry["answer"],
+                        "created_at": entry["created_at"],
+                        "generation_seconds": entry["generation_seconds"]
+                    }
+                    for entry in self._entries.values()
+                ]
+                self._dirty = 0
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # 每次写入使用独立的临时文件，多个进程同时写入时不会写进同一个文件
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(self.path)}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as file:
+                    json.dump({"version": 1, "entries": entries}, file, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    def close(self):
+        """写入尚未落盘的答案；可重复调用"""
+
+        atexit.unregister(self.close)
+        if self._dirty:
+            self.flush()
+
+    # --- 统计 ---
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "seconds_saved": self.seconds_saved,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries)
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (f"命中 {stats['hits']} / 未命中 {stats['misses']} "
+                f"(命中率 {stats['hit_rate']:.1%})，节省生成耗时 {stats['seconds_saved']:.2f}s，"
+                f"缓存 {stats['entries']} 条，过期 {stats['expirations']} / 淘汰 {stats['evictions']} / "
+                f"失效 {stats['invalidations']} 条")
+
+
+def generate_answer_cached(
+    cache: SemanticAnswerCache,
+    question: str,
+    query_vector,
+    chunk_ids: Sequence[int],
+    contexts: List[Tuple[str, str, float]],
+    generate: Callable[[str, List[Tuple[str, str, float]]], str] = generate_answer_with_deepseek
+) -> Tuple[str, bool]:
+    """
+    先查语义缓存，未命中时调用 generate 生成答案并写入缓存
+
+    Returns:
+        Tuple[str, bool]: (答案, 是否命中缓存)
+    """
+
+    answer = cache.lookup(query_vector, chunk_ids)
+    if answer is not None:
+        return answer, True
+
+    start = time.perf_counter()
+    answer = generate(question, contexts)
+    cache.store(question, query_vector, chunk_ids, answer, time.perf_counter() - start)
+    return answer, False
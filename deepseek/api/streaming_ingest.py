@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式批量入库：解析 → 分批 embedding → 分批写入 Milvus，峰值内存与语料大小无关
+
+- 解析阶段直接消费单遍流式解析器的生成器，不会把全部条文读入内存；主键由
+  incremental_index.iter_chunk_ids 按分块在所属章节中的位置分配，不保存每个分块的状态
+- embedding 在后台线程中按固定批次进行，通过有界队列向写入阶段传递结果（反压）
+- 每写入一批就更新检查点，崩溃后重新运行会跳过已写入的分块继续处理
+- 统计每个阶段的吞吐（chunks/s）和进程峰值内存
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 后台线程结束的标记
+_DONE = object()
+
+
+class StageStats:
+    """单个阶段的统计信息"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+        self.peak_rss = 0
+
+    def record(self, items: int, seconds: float):
+        self.items += items
+        self.seconds += seconds
+        self.peak_rss = max(self.peak_rss, current_rss_bytes())
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.name:<6} {self.items:>8} 块  {self.seconds:>8.2f}s  "
+                f"{self.throughput:>9.1f} chunks/s  峰值内存 {self.peak_rss / 1024 / 1024:>7.1f}MB")
+
+
+def current_rss_bytes() -> int:
+    """当前进程常驻内存；没有 /proc 时退化为历史峰值"""
+
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        # macOS 上单位为字节，Linux 上为 KB
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    """把任意可迭代对象切成固定大小的批次"""
+
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def load_checkpoint(checkpoint_path: str, fingerprint: str) -> int:
+    """返回已写入的分块数；检查点不存在或对应的是另一份语料时返回 0"""
+
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return 0
+
+    with open(checkpoint_path, "r", encoding="utf-8") as file:
+        checkpoint = json.load(file)
+
+    if checkpoint.get("fingerprint") != fingerprint:
+        return 0
+
+    return checkpoint.get("committed", 0)
+
+
+def save_checkpoint(checkpoint_path: str, fingerprint: str, committed: int):
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"fingerprint": fingerprint, "committed": committed}, file)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def file_fingerprint(file_path: str, collection_name: str) -> str:
+    """用文件路径、大小、修改时间和 collection 名标识一次入库任务"""
+
+    stat = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}:{collection_name}"
+
+
+def ingest_streaming(
+    chunks: Iterable[Tuple[int, str, str]],
+    milvus_client,
+    embedding_model,
+    collection_name: str,
+    embed_batch_size: int = 64,
+    insert_batch_size: int = 256,
+    max_pending_batches: int = 4,
+    checkpoint_path: Optional[str] = None,
+    fingerprint: str = "",
+    on_progress: Optional[Callable[[int], None]] = None
+) -> Dict[str, StageStats]:
+    """
+    流式地把 (主键, 标题, 内容) 分块写入 Milvus
+
+    Args:
+        chunks: 分块生成器，顺序必须是确定的（断点续传依赖顺序跳过已写入的分块）
+        milvus_client: Milvus 客户端，collection 需已创建
+        embedding_model: 提供 encode_documents 的 embedding 模型
+        collection_name: collection 名称
+        embed_batch_size: 每次 embedding 的分块数
+        insert_batch_size: 每次写入 Milvus 的分块数
+        max_pending_batches: embedding 结果队列的最大长度，超过时 embedding 线程阻塞等待写入
+        checkpoint_path: 检查点文件路径，为 None 时不支持断点续传
+        fingerprint: 语料标识，只有标识一致时才从检查点恢复
+        on_progress: 每写入一批后回调，参数为累计写入的分块数
+
+    Returns:
+        Dict[str, StageStats]: parse / embed / insert 三个阶段的统计
+    """
+
+    stats = {name: StageStats(name) for name in ("parse", "embed", "insert")}
+
+    committed = load_checkpoint(checkpoint_path, fingerprint)
+    if committed:
+        print(f"⏩ 从检查点恢复，跳过已写入的 {committed} 个分块")
+
+    pending: "queue.Queue" = queue.Queue(maxsize=max_pending_batches)
+    stop_event = threading.Event()
+
+    def embed_worker():
+        try:
+            batches = iter_batches(islice(chunks, committed, None), embed_batch_size)
+            while not stop_event.is_set():
+                start = time.perf_counter()
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                stats["parse"].record(len(batch), time.perf_counter() - start)
+
+                start = time.perf_counter()
+                embeddings = embedding_model.encode_documents([text for _, _, text in batch])
+                stats["embed"].record(len(batch), time.perf_counter() - start)
+
+                rows = [
+                    {"id": chunk_id, "vector": embedding, "title": title, "text": text}
+                    for (chunk_id, title, text), embedding in zip(batch, embeddings)
+                ]
+                # 队列已满时阻塞，实现反压
+                pending.put(rows)
+            pending.put(_DONE)
+        except BaseException as e:
+            pending.put(e)
+
+    worker = threading.Thread(target=embed_worker, name="embed-worker", daemon=True)
+    worker.start()
+
+    def flush(rows: List[dict]):
+        nonlocal committed
+        start = time.perf_counter()
+        # 使用 upsert 保证幂等：崩溃发生在写入之后、检查点更新之前时重跑不会产生重复数据
+        milvus_client.upsert(collection_name=collection_name, data=rows)
+        stats["insert"].record(len(rows), time.perf_counter() - start)
+
+        committed += len(rows)
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, fingerprint, committed)
+        if on_progress:
+            on_progress(committed)
+
+    buffer: List[dict] = []
+    try:
+        while True:
+            item = pending.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+
+            buffer.extend(item)
+            while len(buffer) >= insert_batch_size:
+                flush(buffer[:insert_batch_size])
+                del buffer[:insert_batch_size]
+
+        if buffer:
+            flush(buffer)
+    finally:
+        stop_event.set()
+        # 取出队列中的剩余结果，避免 embedding 线程阻塞在 put 上
+        while worker.is_alive():
+            try:
+                pending.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    # 全部完成后删除检查点，下次运行重新开始
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    return stats
@@ -0,0 +1,105 @@
+import asyncio
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from async_rag_engine import AsyncRagEngine
+from embedding_cache import wrap_with_cache
+from llm_client import create_async_deepseek_client
+from mock_openai_server import MockOpenAIServer
+
+
+class FakeEmbeddingModel:
+    def encode_queries(self, queries):
+        return [[float(len(query))] for query in queries]
+
+
+class VectorEmbeddingModel:
+    model_name = "fake-vectors"
+
+    def encode_queries(self, queries):
+        time.sleep(0.001)
+        return [np.full(8, len(query), dtype=np.float32) for query in queries]
+
+
+class FakeMilvusClient:
+    def search(self, collection_name, data, limit, search_params, output_fields):
+        return [[{"distance": 0.9, "entity": {"title": "第二百二十条", "text": "可以申请更正登记。"}}]]
+
+
+def echo_question(messages):
+    """模拟回答：原样返回 prompt 中的问题，便于核对结果顺序"""
+    return messages[-1]["content"].split("<问题>")[1].split("</问题>")[0].strip()
+
+
+class TestAsyncRagEngine(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockOpenAIServer(reply=echo_question, first_token_delay=0.1).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        # 等待上一个用例中超时放弃的请求在服务端处理完，避免计入并发峰值
+        while self.server.in_flight:
+            time.sleep(0.01)
+        self.server.reset_stats()
+
+    def run_engine(self, questions, embedding_model=None, **kwargs):
+        async def run():
+            engine = AsyncRagEngine(
+                FakeMilvusClient(), embedding_model or FakeEmbeddingModel(), "test",
+                llm_client=create_async_deepseek_client(api_key="test", base_url=self.server.base_url),
+                **kwargs
+            )
+            try:
+                return await engine.answer_many(questions)
+            finally:
+                await engine.aclose()
+
+        return asyncio.run(run())
+
+    def test_results_in_input_order(self):
+        """并发执行，结果按输入顺序返回"""
+        questions = [f"问题{i:02d}" for i in range(10)]
+        results = self.run_engine(questions)
+
+        self.assertEqual([result.answer for result in results], questions)
+        self.assertTrue(all(result.error is None for result in results))
+        self.assertEqual(results[0].contexts[0][0], "第二百二十条")
+
+    def test_llm_concurrency_bounded(self):
+        """同时在途的 LLM 请求数不超过信号量上限"""
+        self.run_engine([f"问题{i}" for i in range(12)], max_concurrent_llm_calls=3)
+
+        self.assertEqual(self.server.requests, 12)
+        self.assertLessEqual(self.server.max_in_flight, 3)
+        self.assertGreater(self.server.max_in_flight, 1)
+
+    def test_concurrent_misses_through_embedding_cache(self):
+        """多个检索线程同时未命中持久化 embedding 缓存（含矩阵扩容和淘汰）时全部成功"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cached_model = wrap_with_cache(VectorEmbeddingModel(), cache_dir=cache_dir, max_bytes=100 * 8 * 4)
+            questions = [f"问题{i}" + "？" * (i % 7) for i in range(300)]
+            results = self.run_engine(questions, embedding_model=cached_model, embedding_workers=8,
+                                      max_concurrent_llm_calls=32)
+            cached_model.close()
+
+        self.assertEqual([result.error for result in results], [None] * len(questions))
+        self.assertEqual([result.answer for result in results], questions)
+        self.assertEqual(cached_model.cache.stats()["misses"], len(questions))
+
+    def test_deadline(self):
+        """超过截止时间的请求返回错误"""
+        results = self.run_engine(["问题"], deadline=0.02)
+
+        self.assertIsNone(results[0].answer)
+        self.assertIn("截止时间", results[0].error)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
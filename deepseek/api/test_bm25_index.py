@@ -0,0 +1,90 @@
+import contextlib
+import io
+import math
+import tempfile
+import unittest
+
+from bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+from optimized_rag_demo import search_with_optimized_rag
+
+DOCS = {
+    11: "不动产登记簿记载的事项错误的，可以申请更正登记。",
+    22: "不动产登记簿是物权归属和内容的根据。",
+    33: "动产物权的设立和转让，自交付时发生效力。",
+}
+
+
+class FakeMilvusClient:
+    """向量检索按固定顺序返回 33、22；get 返回指定主键的条文"""
+
+    def search(self, collection_name, data, limit, search_params, output_fields):
+        return [[{"id": doc_id, "distance": 0.5, "entity": {"title": f"第{doc_id}条", "text": DOCS[doc_id]}}
+                 for doc_id in (33, 22)][:limit]]
+
+    def get(self, collection_name, ids, output_fields):
+        return [{"id": doc_id, "title": f"第{doc_id}条", "text": DOCS[doc_id]} for doc_id in ids]
+
+
+class FakeModel:
+    def encode_queries(self, queries):
+        return [[0.0] for _ in queries]
+
+
+class TestBM25Index(unittest.TestCase):
+    def setUp(self):
+        self.index = BM25Index.build(list(DOCS.values()), list(DOCS))
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("不动产 HNSW 索引v2"), ["不动", "动产", "hnsw", "索引", "v2"])
+        self.assertEqual(tokenize("法"), ["法"])
+
+    def test_scores_match_formula(self):
+        """得分与 BM25 公式一致，结果按得分降序，不含未命中的文档"""
+        results = self.index.search("更正", top_k=10)
+        self.assertEqual([doc_id for doc_id, _ in results], [11])
+
+        tokens = tokenize(DOCS[11])
+        avg_length = sum(len(tokenize(text)) for text in DOCS.values()) / len(DOCS)
+        expected = 0.0
+        for token in set(tokenize("更正")):
+            tf = tokens.count(token)
+            doc_freq = sum(token in tokenize(text) for text in DOCS.values())
+            idf = math.log(1 + (len(DOCS) - doc_freq + 0.5) / (doc_freq + 0.5))
+            expected += idf * tf * 2.5 / (tf + 1.5 * (0.25 + 0.75 * len(tokens) / avg_length))
+        self.assertAlmostEqual(results[0][1], expected, places=4)
+
+        ranked = self.index.search("不动产登记簿 错误", top_k=2)
+        self.assertEqual([doc_id for doc_id, _ in ranked], [11, 22])
+        self.assertGreater(ranked[0][1], ranked[1][1])
+        self.assertEqual(self.index.search("合同", top_k=5), [])
+
+    def test_save_and_mmap_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.index.save(tmp_dir)
+            loaded = BM25Index.load(tmp_dir)
+            self.assertEqual(loaded.search("不动产登记簿", top_k=3), self.index.search("不动产登记簿", top_k=3))
+            del loaded
+
+    def test_reciprocal_rank_fusion(self):
+        fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+        self.assertEqual([doc_id for doc_id, _ in fused], [1, 3, 2])
+        self.assertAlmostEqual(fused[0][1], 1 / 61 + 1 / 62)
+        self.assertAlmostEqual(fused[2][1], 1 / 62)
+
+    def test_hybrid_search_ordering(self):
+        """混合检索：只被 BM25 召回的条文从 Milvus 取回内容，按 RRF 得分排序"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            contexts = search_with_optimized_rag(
+                "不动产登记簿记载错误怎么更正", FakeMilvusClient(), FakeModel(), "test",
+                top_k=3, sparse_index=self.index
+            )
+
+        # 向量检索 [33, 22]，BM25 [11, 22, 33]
+        self.assertEqual([title for title, _, _ in contexts], ["第33条", "第22条", "第11条"])
+        self.assertEqual([score for _, _, score in contexts], [1 / 61 + 1 / 63, 1 / 62 + 1 / 62, 1 / 61])
+        # 11 只被 BM25 召回，内容从 Milvus 取回
+        self.assertEqual(contexts[2][:2], ("第11条", DOCS[11]))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
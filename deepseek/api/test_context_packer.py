@@ -0,0 +1,85 @@
+import unittest
+
+from context_packer import DEFAULT_TOKEN_BUDGET, TokenCounter, pack_contexts, split_hierarchy
+
+CHAPTER = "中华人民共和国民法典 / （二）物权编 / 第一章 一般规定"
+
+
+def article(number: str, text: str, score: float, chapter: str = CHAPTER):
+    title = f"{chapter} / **{number}**"
+    return title, f"【{title}】\n\n**{number}** {text}", score
+
+
+class TestContextPacker(unittest.TestCase):
+    def test_split_hierarchy(self):
+        title, content, _ = article("第二百二十条", "可以申请更正登记。", 0.9)
+
+        self.assertEqual(split_hierarchy(title, content), (CHAPTER, "**第二百二十条** 可以申请更正登记。"))
+        self.assertEqual(split_hierarchy("无层级", "正文"), ("", "正文"))
+
+    def test_siblings_share_chapter_header(self):
+        """同章条文共用一个章节标题，不同章的条文按得分先后分组"""
+        contexts = [
+            article("第二百一十七条", "不动产权属证书是权利人享有该不动产物权的证明。", 0.7),
+            article("第二百二十条", "权利人、利害关系人认为不动产登记簿记载的事项错误的，可以申请更正登记。", 0.9),
+            article("第三百条", "其他章节的条文内容。", 0.8, chapter="中华人民共和国民法典 / （二）物权编 / 第二章 所有权")
+        ]
+        packed = pack_contexts(contexts)
+
+        self.assertEqual(packed.text.count(f"【{CHAPTER}】"), 1)
+        self.assertLess(packed.text.index("第二百二十条"), packed.text.index("第三百条"))
+        self.assertLess(packed.text.index("第二百二十条"), packed.text.index("第二百一十七条"))
+        self.assertGreater(packed.tokens_saved, 0)
+
+    def test_duplicates_and_budget(self):
+        """近似重复的条文被丢弃，超出预算时跳过低分条文"""
+        long_text = "当事人之间订立有关设立、变更、转让和消灭不动产物权的合同，除法律另有规定或者当事人另有约定外，自合同成立时生效。" * 3
+        contexts = [
+            article("第二百一十五条", long_text, 0.9),
+            article("第二百一十五条（重复）", long_text.replace("生效", "起生效"), 0.8),
+            article("第二百一十六条", long_text.replace("合同", "登记簿"), 0.7),
+            article("第二百二十一条", "可以申请预告登记。", 0.6)
+        ]
+        counter = TokenCounter()
+        budget = counter.count(f"【{CHAPTER}】") + counter.count(contexts[0][1]) + 20
+        packed = pack_contexts(contexts, token_budget=budget, counter=counter)
+
+        self.assertEqual(packed.dropped_duplicates, [contexts[1][0]])
+        self.assertEqual(packed.dropped_over_budget, [contexts[2][0]])
+        self.assertEqual(packed.included, [contexts[0][0], contexts[3][0]])
+        self.assertLessEqual(packed.tokens, budget)
+
+    def test_oversized_top_chunk_is_truncated(self):
+        """得分最高的分块单独超出预算时截断保留，而不是得到空的上下文"""
+        packed = pack_contexts([("第一章", "长" * 6000, 0.9)])
+
+        self.assertEqual(packed.included, ["第一章"])
+        self.assertEqual(packed.truncated, ["第一章"])
+        self.assertTrue(packed.text.startswith("长") and packed.text.endswith("……"))
+        self.assertLessEqual(packed.tokens, DEFAULT_TOKEN_BUDGET)
+        self.assertGreater(packed.tokens, DEFAULT_TOKEN_BUDGET - 5)
+
+        # 截断的分块保留章节标题，其余放不下的分块仍然跳过
+        long_text = "不动产物权的设立、变更、转让和消灭，经依法登记，发生效力。" * 20
+        contexts = [
+            article("第二百零九条", long_text, 0.9),
+            article("第二百一十条", "不动产登记，由不动产所在地的登记机构办理。", 0.8)
+        ]
+        counter = TokenCounter()
+        packed = pack_contexts(contexts, token_budget=100, counter=counter)
+
+        self.assertEqual(packed.included, [contexts[0][0]])
+        self.assertEqual(packed.dropped_over_budget, [contexts[1][0]])
+        self.assertTrue(packed.text.startswith(f"【{CHAPTER}】\n\n**第二百零九条**"))
+        self.assertLessEqual(packed.tokens, 100)
+
+    def test_estimated_token_count(self):
+        counter = TokenCounter(tokenizer_path="")
+
+        self.assertFalse(counter.exact)
+        self.assertEqual(counter.count("民法典"), 2)
+        self.assertEqual(counter.count("abcdefghij"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
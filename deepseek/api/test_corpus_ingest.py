@@ -0,0 +1,106 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import onnxruntime
+from onnxruntime.datasets import get_example
+
+from corpus_ingest import discover_files, ingest_corpus, limit_onnx_threads
+
+
+class FakeOnnxModel:
+    """按文本长度生成向量；和 DefaultEmbeddingFunction 一样带一个默认参数创建的 onnxruntime 会话"""
+
+    onnx_model_path = get_example("sigmoid.onnx")
+
+    def __init__(self):
+        self.ort_session = onnxruntime.InferenceSession(self.onnx_model_path)
+
+    def encode_documents(self, documents):
+        return [np.full(4, len(text), dtype=np.float32) for text in documents]
+
+
+def fake_model_factory():
+    return FakeOnnxModel()
+
+
+class RecordingSink:
+    def __init__(self):
+        self.rows = {}
+
+    def upsert(self, collection_name, data):
+        for row in data:
+            self.rows[row["id"]] = (row["source"], row["title"])
+
+
+class TestCorpusIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        for sub_dir, count in (("a", 3), ("b", 3)):
+            os.makedirs(os.path.join(self.root, sub_dir))
+            for i in range(count):
+                with open(os.path.join(self.root, sub_dir, f"doc{i}.md"), "w", encoding="utf-8") as file:
+                    # 不同文件中有同名条文
+                    file.write(f"## 法规{i}\n\n### （一）总则\n\n#### 第一章 一般规定\n\n"
+                               f"**第一条** 内容{sub_dir}{i}。\n\n**第二条** 内容。\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def ingest(self, pattern, workers):
+        sink = RecordingSink()
+        report = ingest_corpus(discover_files([os.path.join(self.root, pattern)]), sink, "test", self.root,
+                               model_factory=fake_model_factory, workers=workers, insert_batch_size=4)
+        return sink.rows, report
+
+    def test_ids_stable_across_worker_counts(self):
+        single, report = self.ingest("*/*.md", workers=1)
+        multi, _ = self.ingest("*/*.md", workers=3)
+
+        self.assertEqual(single, multi)
+        self.assertEqual((report.files, report.chunks, len(single)), (6, 12, 12))
+        self.assertIn(("a/doc0.md", "**第一条**"), [(source, title.split(" / ")[-1]) for source, title in single.values()])
+
+    def test_ids_independent_of_file_subset(self):
+        """只入库部分文件时主键不变（相对路径以固定的根目录计算，而不是本次文件的公共父目录）"""
+        everything, _ = self.ingest("*/*.md", workers=2)
+        subset, _ = self.ingest("a/*.md", workers=2)
+
+        self.assertEqual(len(subset), 6)
+        self.assertEqual({key: everything[key] for key in subset}, subset)
+
+    def test_files_outside_root_are_rejected(self):
+        with tempfile.NamedTemporaryFile(suffix=".md") as outside:
+            with self.assertRaises(ValueError):
+                ingest_corpus([outside.name], RecordingSink(), "test", self.root,
+                              model_factory=fake_model_factory, workers=1)
+
+    def test_worker_threads_limited(self):
+        """工作进程中的 onnxruntime 会话被重建为单线程"""
+        _, report = self.ingest("*/*.md", workers=2)
+
+        self.assertTrue(report.worker_threads)
+        self.assertEqual({intra_op for intra_op, _ in report.worker_threads.values()}, {1})
+        self.assertNotIn("OMP_NUM_THREADS", os.environ)
+
+    def test_unknown_model_file_keeps_session(self):
+        """找不到模型文件时打印警告并保留原来的会话，而不是让工作进程初始化失败"""
+        model = FakeOnnxModel()
+        model.onnx_model_path = None
+        session = model.ort_session
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertFalse(limit_onnx_threads(model, 1))
+        self.assertIs(model.ort_session, session)
+        self.assertIn("⚠️", output.getvalue())
+
+        self.assertTrue(limit_onnx_threads(FakeOnnxModel(), 1))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,165 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache, fcntl, wrap_with_cache
+
+
+class CountingModel:
+    """按文本长度生成向量的模型，记录每次编码的文本"""
+
+    model_name = "counting"
+
+    def __init__(self, dim=4):
+        self.dim = dim
+        self.encoded = []
+        self.lock = threading.Lock()
+
+    def _vectors(self, texts):
+        with self.lock:
+            self.encoded.extend(texts)
+        return [np.full(self.dim, len(text), dtype=np.float32) for text in texts]
+
+    def encode_documents(self, documents):
+        return self._vectors(documents)
+
+    def encode_queries(self, queries):
+        return self._vectors(queries)
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def wrap(self, model, **kwargs):
+        return wrap_with_cache(model, cache_dir=self.tmp_dir.name, **kwargs)
+
+    def test_hits_and_misses(self):
+        """重复文本只编码一次；文档和查询分开缓存"""
+        model = CountingModel()
+        cached = self.wrap(model)
+
+        first = cached.encode_documents(["甲", "乙乙", "甲"])
+        second = cached.encode_documents(["乙乙"])
+        cached.encode_queries(["甲"])
+
+        self.assertEqual(model.encoded, ["甲", "乙乙", "甲"])
+        np.testing.assert_array_equal(first[1], second[0])
+        stats = cached.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 4, 3))
+        cached.close()
+
+    def test_persistence(self):
+        """close() 后重新打开命中磁盘缓存；模型版本不同则使用独立的命名空间"""
+        cached = self.wrap(CountingModel(), flush_every=1000)
+        cached.encode_documents(["第一条", "第二条"])
+        self.assertFalse(os.path.exists(cached.cache.index_path))
+        cached.close()
+
+        model = CountingModel()
+        reopened = self.wrap(model)
+        vectors = reopened.encode_documents(["第一条", "第二条"])
+        self.assertEqual(model.encoded, [])
+        np.testing.assert_array_equal(vectors[0], np.full(4, 3, dtype=np.float32))
+
+        other = self.wrap(model, model_revision="v2")
+        other.encode_documents(["第一条"])
+        self.assertEqual(model.encoded, ["第一条"])
+        reopened.close()
+        other.close()
+
+    def test_flush_every(self):
+        cache = EmbeddingCache("m", cache_dir=self.tmp_dir.name, flush_every=2)
+        cache.put_many(["a"], [np.zeros(4)])
+        self.assertFalse(os.path.exists(cache.index_path))
+        cache.put_many(["b"], [np.zeros(4)])
+        self.assertTrue(os.path.exists(cache.index_path))
+        cache.close()
+
+    def test_lru_eviction_within_budget(self):
+        """超出字节预算时淘汰最久未使用的向量，淘汰后的索引文件不再引用被复用的行"""
+        cache = EmbeddingCache("m", cache_dir=self.tmp_dir.name, max_bytes=4 * 4 * 4)
+        cache.put_many(["a", "b", "c", "d"], [np.full(4, i) for i in range(4)])
+        cache.get_many(["a"])
+        cache.put_many(["e"], [np.full(4, 9)])
+
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual([v is None for v in cache.get_many(["a", "b", "e"])], [False, True, False])
+        cache.close()
+
+        reopened = EmbeddingCache("m", cache_dir=self.tmp_dir.name, max_bytes=4 * 4 * 4)
+        np.testing.assert_array_equal(reopened.get_many(["e"])[0], np.full(4, 9))
+        self.assertIsNone(reopened.get_many(["b"])[0])
+        reopened.close()
+
+    @unittest.skipIf(fcntl is None, "没有 fcntl，不做跨进程保护")
+    def test_second_process_uses_private_namespace(self):
+        """命名空间被其他进程占用时改用临时命名空间，不写共享的矩阵和索引文件"""
+        owner = EmbeddingCache("m", cache_dir=self.tmp_dir.name, flush_every=1)
+        owner.put_many(["a"], [np.full(4, 1.0)])
+
+        script = (
+            "import os, sys, numpy as np\n"
+            "from embedding_cache import EmbeddingCache\n"
+            "cache = EmbeddingCache('m', cache_dir=sys.argv[1], flush_every=1)\n"
+            "print(cache.get_many(['a'])[0] is None)\n"
+            "cache.put_many(['a', 'b'], [np.full(4, 7.0), np.full(4, 8.0)])\n"
+            "print(cache.namespace_dir)\n"
+            "cache.close()\n"
+            "print(os.path.exists(cache.namespace_dir))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script, self.tmp_dir.name], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.splitlines()
+
+        self.assertEqual(output[-3], "True")
+        self.assertNotEqual(output[-2], owner.namespace_dir)
+        self.assertEqual(output[-1], "False")
+        # 共享的缓存不受另一个进程写入的影响
+        np.testing.assert_array_equal(owner.get_many(["a"])[0], np.full(4, 1.0))
+        owner.close()
+
+        # 释放后其他实例可以使用共享的命名空间
+        reopened = EmbeddingCache("m", cache_dir=self.tmp_dir.name)
+        self.assertEqual(reopened.namespace_dir, owner.namespace_dir)
+        self.assertIsNone(reopened.get_many(["b"])[0])
+        np.testing.assert_array_equal(reopened.get_many(["a"])[0], np.full(4, 1.0))
+        reopened.close()
+
+    def test_concurrent_misses(self):
+        """多个线程同时未命中、触发矩阵扩容和淘汰时结果仍然正确"""
+        cached = self.wrap(CountingModel(), max_bytes=200 * 4 * 4, flush_every=50)
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(250):
+                    text = "x" * ((offset * 7 + i) % 300 + 1)
+                    vector = cached.encode_queries([text])[0]
+                    if vector[0] != len(text):
+                        errors.append((text, vector))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertLessEqual(cached.cache.stats()["entries"], 200)
+        cached.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,62 @@
+import os
+import unittest
+
+from bench_hierarchical_parser import legacy_parse_articles
+from hierarchical_parser import CHUNK_ARTICLE, CHUNK_CHAPTER, iter_hierarchical_chunks
+from optimized_chunking import parse_articles_within_chapters, parse_civil_code_by_chapters
+
+MFD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mfd.md")
+
+DOCUMENT = """## 法典
+
+### （一）总则编
+
+#### 第一章 基本规定
+
+**第一条** 第一条内容。
+
+**第二条** 第二条内容，
+分两行。
+
+### （二）物权编
+
+#### 第二章 一般规定
+
+**第三条** 第三条内容。
+"""
+
+
+class TestHierarchicalParser(unittest.TestCase):
+    def test_matches_legacy_parser_on_mfd(self):
+        """在 mfd.md 上与原先逐章节回扫的实现输出完全一致"""
+        with open(MFD_PATH, "r", encoding="utf-8") as file:
+            expected = legacy_parse_articles(file.read())
+
+        articles = [(chunk.title, chunk.text) for chunk in iter_hierarchical_chunks(MFD_PATH, emit_chapters=False)]
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(articles, expected)
+
+        # 章节分块 + 章节内按条文切分得到同样的结果
+        self.assertEqual(parse_articles_within_chapters(parse_civil_code_by_chapters(MFD_PATH)), expected)
+
+    def test_chapters_followed_by_their_articles(self):
+        chunks = list(iter_hierarchical_chunks(DOCUMENT.splitlines(keepends=True)))
+
+        self.assertEqual([chunk.kind for chunk in chunks],
+                         [CHUNK_CHAPTER, CHUNK_ARTICLE, CHUNK_ARTICLE, CHUNK_CHAPTER, CHUNK_ARTICLE])
+        self.assertEqual(chunks[0].path, ("法典", "（一）总则编", "第第一章 基本规定"))
+        # 章节之间的上级标题影响后续章节的路径，其文本仍归入当前章节（与原实现一致）
+        self.assertEqual(chunks[3].path, ("法典", "（二）物权编", "第第二章 一般规定"))
+        self.assertEqual(chunks[2].title, "法典 / （一）总则编 / 第第一章 基本规定 / **第二条**")
+        self.assertTrue(chunks[2].text.endswith("**第二条** 第二条内容，\n分两行。\n\n### （二）物权编"))
+        self.assertEqual(chunks[4].path[-1], "**第三条**")
+
+    def test_sources_are_equivalent(self):
+        """文件路径、已打开的文件和行的可迭代对象得到相同的结果"""
+        with open(MFD_PATH, "r", encoding="utf-8") as file:
+            from_file = list(iter_hierarchical_chunks(file))
+        self.assertEqual(list(iter_hierarchical_chunks(MFD_PATH)), from_file)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from embedding_cache import wrap_with_cache
+from incremental_index import (
+    assign_chunk_ids,
+    content_hash,
+    diff_chunks,
+    embedding_model_key,
+    iter_chunk_ids,
+    load_manifest,
+    manifest_matches,
+    save_manifest,
+    stable_chunk_id
+)
+
+ARTICLES = [
+    ("第一章 / **第一条**", "第一条内容"),
+    ("第一章 / **第二条**", "第二条内容"),
+    ("第一章 / **第三条**", "第三条内容"),
+]
+INDEX = {"index_type": "HNSW", "metric_type": "COSINE"}
+MODEL = {"name": "bge", "revision": ""}
+
+
+class FakeModel:
+    model_name = "fake-model"
+
+
+class TestIncrementalIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.manifest_path = os.path.join(self.tmp_dir.name, "collection.manifest.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def save(self, chunks, model=MODEL):
+        hashes = {chunk_id: content_hash(title, text) for chunk_id, title, text in chunks}
+        save_manifest(self.manifest_path, "laws", 4, hashes, index=INDEX, model=model)
+        return load_manifest(self.manifest_path)
+
+    def test_ids_do_not_depend_on_position(self):
+        """中间插入条文时其他条文的主键不变；重复的标题得到不同的主键"""
+        before = dict((title, chunk_id) for chunk_id, title, _ in assign_chunk_ids(ARTICLES))
+        inserted = ARTICLES[:1] + [("第一章 / **第一条之一**", "新增")] + ARTICLES[1:]
+        after = dict((title, chunk_id) for chunk_id, title, _ in assign_chunk_ids(inserted))
+
+        self.assertEqual({title: after[title] for title in before}, before)
+        duplicate_ids = [chunk_id for chunk_id, _, _ in assign_chunk_ids(ARTICLES[:1] * 2)]
+        self.assertEqual(len(set(duplicate_ids)), 2)
+
+    def test_duplicates_numbered_within_parent(self):
+        """重复标题按在上级路径中的位置编号，上级路径再次出现时的标题也得到不同的主键"""
+        stream = [
+            ("法典 / 第一章 / **第一条**", "a"),
+            ("法典 / 第一章 / **第一条**", "b"),
+            ("法典 / 第二章 / **第一条**", "c"),
+            ("法典 / 第一章 / **第一条**", "d"),
+            ("法典 / 第一章 / **第二条**", "e"),
+        ]
+        ids = [chunk_id for chunk_id, _, _ in iter_chunk_ids(iter(stream))]
+
+        self.assertEqual(len(set(ids)), len(stream))
+        self.assertEqual(ids[:3], [stable_chunk_id(stream[0][0]), stable_chunk_id(f"{stream[0][0]}#2"),
+                                   stable_chunk_id(stream[2][0])])
+        # 其他章节的变化不影响本章的主键
+        self.assertEqual([chunk_id for chunk_id, _, _ in iter_chunk_ids(stream[:2])], ids[:2])
+
+    def test_id_assignment_memory_does_not_grow_with_chunks(self):
+        """流式分配主键时不为每个分块保留状态"""
+
+        def stream(chapters, articles_per_chapter):
+            for chapter in range(chapters):
+                for article in range(articles_per_chapter):
+                    yield f"法典 / 第{chapter}章 / **第{article}条**", ""
+
+        def peak_bytes(chapters):
+            tracemalloc.start()
+            for _ in iter_chunk_ids(stream(chapters, 500)):
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return peak
+
+        # 分块数增加 20 倍，峰值内存基本不变（只多了每章一个整数）
+        self.assertLess(peak_bytes(200) - peak_bytes(10), 64 * 1024)
+
+    def test_diff_add_modify_delete(self):
+        manifest = self.save(assign_chunk_ids(ARTICLES))
+
+        edited = [
+            ARTICLES[0],
+            (ARTICLES[1][0], "第二条内容（修改）"),
+            ("第一章 / **第四条**", "第四条内容"),
+        ]
+        new_chunks = assign_chunk_ids(edited)
+        changed, removed, hashes = diff_chunks(manifest, new_chunks)
+
+        ids = {title: chunk_id for chunk_id, title, _ in assign_chunk_ids(ARTICLES + edited[2:])}
+        self.assertEqual([title for _, title, _ in changed], ["第一章 / **第二条**", "第一章 / **第四条**"])
+        self.assertEqual(removed, [ids["第一章 / **第三条**"]])
+        self.assertEqual(set(hashes), {chunk_id for chunk_id, _, _ in new_chunks})
+
+        # 保存后再次对比没有变化
+        changed, removed, _ = diff_chunks(self.save(new_chunks), new_chunks)
+        self.assertEqual((changed, removed), ([], []))
+
+    def test_model_change_forces_full_rebuild(self):
+        manifest = self.save(assign_chunk_ids(ARTICLES))
+
+        self.assertTrue(manifest_matches(manifest, "laws", 4, INDEX, MODEL))
+        self.assertFalse(manifest_matches(manifest, "laws", 4, INDEX, {"name": "bge", "revision": "v2"}))
+        self.assertFalse(manifest_matches(manifest, "laws", 4, INDEX, {"name": "other", "revision": ""}))
+        self.assertFalse(manifest_matches(manifest, "laws", 4, {"index_type": "FLAT"}, MODEL))
+        self.assertFalse(manifest_matches(None, "laws", 4, INDEX, MODEL))
+
+        # 没有记录模型的旧清单也会触发全量构建
+        del manifest["model"]
+        self.assertFalse(manifest_matches(manifest, "laws", 4, INDEX, MODEL))
+
+    def test_embedding_model_key(self):
+        self.assertEqual(embedding_model_key(FakeModel()), {"name": "fake-model", "revision": ""})
+        cached = wrap_with_cache(FakeModel(), model_revision="2024-06", cache_dir=self.tmp_dir.name)
+        self.assertEqual(embedding_model_key(cached), {"name": "fake-model", "revision": "2024-06"})
+        cached.close()
+
+    def test_manifest_version_mismatch(self):
+        self.save(assign_chunk_ids(ARTICLES))
+        with open(self.manifest_path, "r+", encoding="utf-8") as file:
+            content = file.read().replace('"version": 1', '"version": 0')
+            file.seek(0)
+            file.write(content)
+            file.truncate()
+        self.assertIsNone(load_manifest(self.manifest_path))
+        self.assertIsNone(load_manifest(os.path.join(self.tmp_dir.name, "missing.json")))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
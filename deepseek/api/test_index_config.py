@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from index_config import (
+    IndexConfig,
+    create_indexed_collection,
+    estimate_index_bytes,
+    expand_index_grid,
+    parse_index_config
+)
+from vector_store import NumpyVectorStore
+
+
+class TestIndexConfig(unittest.TestCase):
+    def test_parse_and_spec_round_trip(self):
+        config = parse_index_config("hnsw:M=16,efConstruction=200,ef=64,metric=ip")
+
+        self.assertEqual(config.index_type, "HNSW")
+        self.assertEqual(config.metric_type, "IP")
+        self.assertEqual(config.params, {"M": 16, "efConstruction": 200})
+        self.assertEqual(config.search_request(), {"metric_type": "IP", "params": {"ef": 64}})
+        self.assertEqual(parse_index_config(config.spec), config)
+        self.assertEqual(config.with_search_params(ef=128).build_key(), config.build_key())
+
+    def test_dict_configs_from_benchmark_json(self):
+        config = parse_index_config({"name": "ivf", "index_type": "IVF_FLAT", "metric_type": "COSINE",
+                                     "params": {"nlist": 32}, "search_params": {"nprobe": 8}})
+        self.assertEqual(config, IndexConfig("ivf", "IVF_FLAT", "COSINE", {"nlist": 32}, {"nprobe": 8}))
+
+    def test_invalid_configs(self):
+        for spec in ("hnsw:nprobe=8", "faiss", "flat:metric=JACCARD", "ivf_flat:nlist", "hnsw:M=8|16"):
+            with self.assertRaises(ValueError, msg=spec):
+                parse_index_config(spec)
+
+    def test_expand_grid_groups_build_params(self):
+        """构建参数相同的配置相邻，只有检索参数不同"""
+        configs = expand_index_grid("hnsw:M=8|16,efConstruction=200,ef=32|64|128")
+
+        self.assertEqual(len(configs), 6)
+        self.assertEqual([config.params["M"] for config in configs], [8, 8, 8, 16, 16, 16])
+        self.assertEqual([config.search_params["ef"] for config in configs[:3]], [32, 64, 128])
+        self.assertEqual(len({config.name for config in configs}), 6)
+
+    def test_estimate_index_bytes(self):
+        rows, dim = 100000, 768
+        flat = estimate_index_bytes(parse_index_config("flat"), rows, dim)
+
+        self.assertEqual(flat, rows * dim * 4)
+        self.assertLess(estimate_index_bytes(parse_index_config("ivf_sq8:nlist=1024"), rows, dim), flat)
+        self.assertLess(estimate_index_bytes(parse_index_config("ivf_pq:nlist=1024,m=16,nbits=8"), rows, dim),
+                        estimate_index_bytes(parse_index_config("ivf_sq8:nlist=1024"), rows, dim))
+        self.assertGreater(estimate_index_bytes(parse_index_config("hnsw:M=32"), rows, dim),
+                           estimate_index_bytes(parse_index_config("hnsw:M=8"), rows, dim))
+
+    def test_numpy_backend_uses_metric_only(self):
+        """NumPy 后端没有索引结构，按配置的度量方式建表，检索参数被忽略"""
+        config = parse_index_config("hnsw:M=16,ef=64,metric=IP")
+        vectors = np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = NumpyVectorStore(tmp_dir)
+            create_indexed_collection(store, "c", 8, config)
+            store.insert("c", [{"id": i, "vector": vector.tolist()} for i, vector in enumerate(vectors)])
+            hits = store.search("c", data=[vectors[0]], limit=1, search_params=config.search_request())[0]
+
+        self.assertEqual(hits[0]["id"], int(np.argmax(vectors @ vectors[0])))
+        self.assertAlmostEqual(hits[0]["distance"], float(np.max(vectors @ vectors[0])), places=4)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,102 @@
+import time
+import unittest
+
+from llm_client import create_deepseek_client, generate_answer_with_deepseek, stream_answer_with_deepseek
+from mock_openai_server import MockOpenAIServer
+
+CONTEXTS = [("第二百二十条", "权利人、利害关系人认为不动产登记簿记载的事项错误的，可以申请更正登记。", 0.9)]
+
+
+class TestLLMClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockOpenAIServer(reply="可以申请更正登记。", first_token_delay=0.05, token_delay=0.01).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.reset_stats()
+        self.client = create_deepseek_client(api_key="test", base_url=self.server.base_url)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_generate_answer(self):
+        """非流式调用返回完整答案"""
+        answer = generate_answer_with_deepseek("怎么办？", CONTEXTS, client=self.client)
+        self.assertEqual(answer, "可以申请更正登记。")
+
+    def test_stream_answer(self):
+        """流式调用逐个产出 token，首 token 早于完整答案到达"""
+        start = time.perf_counter()
+        tokens = []
+        first_token_at = None
+        for token in stream_answer_with_deepseek("怎么办？", CONTEXTS, client=self.client):
+            if first_token_at is None:
+                first_token_at = time.perf_counter() - start
+            tokens.append(token)
+        total = time.perf_counter() - start
+
+        self.assertEqual("".join(tokens), "可以申请更正登记。")
+        self.assertGreater(len(tokens), 1)
+        self.assertLess(first_token_at, total)
+
+    def test_stream_completion_flag(self):
+        """流式输出中途断开时 completed 为 False，产出的半截答案后面跟着错误提示"""
+        stream = stream_answer_with_deepseek("怎么办？", CONTEXTS, client=self.client)
+        self.assertEqual("".join(stream), "可以申请更正登记。")
+        self.assertTrue(stream.completed)
+        self.assertIsNone(stream.error)
+
+        with MockOpenAIServer(reply="可以申请更正登记。", disconnect_after=3) as server:
+            client = create_deepseek_client(api_key="test", base_url=server.base_url)
+            try:
+                stream = stream_answer_with_deepseek("怎么办？", CONTEXTS, client=client)
+                tokens = list(stream)
+            finally:
+                client.close()
+
+        self.assertFalse(stream.completed)
+        self.assertEqual("".join(tokens[:3]), "可以申")
+        self.assertTrue(tokens[-1].startswith("❌"))
+        self.assertEqual(tokens[-1], stream.error)
+
+    def test_truncated_stream_is_reported(self):
+        """finish_reason 不是 stop（被截断、没有结束块）时答案后面跟着错误提示，completed 为 False"""
+        for finish_reason in ("length", None):
+            with MockOpenAIServer(reply="可以申请更正登记。", finish_reason=finish_reason) as server:
+                client = create_deepseek_client(api_key="test", base_url=server.base_url)
+                try:
+                    stream = stream_answer_with_deepseek("怎么办？", CONTEXTS, client=client)
+                    tokens = list(stream)
+                finally:
+                    client.close()
+
+            self.assertFalse(stream.completed)
+            self.assertEqual("".join(tokens[:-1]), "可以申请更正登记。")
+            self.assertEqual(tokens[-1], stream.error)
+            self.assertIn(f"finish_reason={finish_reason}", stream.error)
+
+    def test_connection_reuse(self):
+        """同一个客户端的多次调用（包括流式）复用同一个 TCP 连接"""
+        for _ in range(3):
+            generate_answer_with_deepseek("怎么办？", CONTEXTS, client=self.client)
+            "".join(stream_answer_with_deepseek("怎么办？", CONTEXTS, client=self.client))
+
+        self.assertEqual(self.server.requests, 6)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_api_error(self):
+        """服务端出错时返回错误信息而不是抛出异常"""
+        client = create_deepseek_client(api_key="test", base_url=self.server.base_url + "/missing")
+        try:
+            answer = generate_answer_with_deepseek("怎么办？", CONTEXTS, client=client)
+        finally:
+            client.close()
+        self.assertTrue(answer.startswith("❌"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from retrieval_benchmark import (
+    CHUNKING_STRATEGIES,
+    covered_articles,
+    encode_normalized_matrix,
+    first_relevant_rank,
+    load_eval_set,
+    rank_all,
+    recall_at_k
+)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestRetrievalMetrics(unittest.TestCase):
+    def test_recall_and_rank(self):
+        ranked = [{"第一条"}, {"第二条", "第三条"}, set()]
+
+        self.assertEqual(recall_at_k(ranked, {"第二条", "第九条"}, 1), 0.0)
+        self.assertEqual(recall_at_k(ranked, {"第二条", "第九条"}, 3), 0.5)
+        self.assertEqual(first_relevant_rank(ranked, {"第三条"}), 2)
+        self.assertIsNone(first_relevant_rank(ranked, {"第九条"}))
+
+    def test_covered_articles(self):
+        text = "【民法典 / 物权编】\n\n**第二百二十条** 可以申请更正登记。\n\n**第二百二十一条** 预告登记。"
+        self.assertEqual(covered_articles(text), {"第二百二十条", "第二百二十一条"})
+
+    def test_eval_set_articles_exist_in_every_strategy(self):
+        """标注的条文在每种分块策略下都能被某个分块覆盖"""
+        corpus = os.path.join(SCRIPT_DIR, "mfd.md")
+        labelled = {
+            article
+            for item in load_eval_set(os.path.join(SCRIPT_DIR, "retrieval_eval_set.json"))
+            for article in item["articles"]
+        }
+
+        for name, split in CHUNKING_STRATEGIES.items():
+            covered = set().union(*(covered_articles(content) for _, content in split(corpus)))
+            self.assertLessEqual(labelled, covered, name)
+
+
+class TestBatchSimilarity(unittest.TestCase):
+    def test_matches_pairwise_cosine(self):
+        """批量编码 + 一次矩阵乘法的排名与逐对计算余弦相似度一致"""
+        rng = np.random.default_rng(0)
+        docs = rng.normal(size=(50, 8)).astype(np.float32)
+        queries = rng.normal(size=(3, 8)).astype(np.float32)
+        calls = []
+
+        def encode(rows):
+            calls.append(len(rows))
+            return docs[[int(row) for row in rows]] * 3.0
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            doc_matrix = encode_normalized_matrix([str(i) for i in range(50)], encode, batch_size=16,
+                                                  memmap_path=os.path.join(tmp_dir, "m.f32"), memmap_threshold=0)
+            self.assertIsInstance(doc_matrix, np.memmap)
+            self.assertEqual(calls, [16, 16, 16, 2])
+
+            query_matrix = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+            scores, order = rank_all(query_matrix, doc_matrix)
+            del doc_matrix
+
+        expected = np.array([
+            [q @ d / (np.linalg.norm(q) * np.linalg.norm(d)) for d in docs]
+            for q in queries
+        ])
+        np.testing.assert_allclose(scores, expected, rtol=1e-5, atol=1e-6)
+        np.testing.assert_array_equal(order[:, 0], expected.argmax(axis=1))
+
+    def test_default_memmap_leaves_no_files(self):
+        """未指定 memmap_path 时使用匿名临时文件，临时目录中不残留文件"""
+        vectors = np.arange(40, dtype=np.float32).reshape(10, 4) + 1
+        saved_tempdir = tempfile.tempdir
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tempfile.tempdir = tmp_dir
+            try:
+                matrix = encode_normalized_matrix([str(i) for i in range(10)],
+                                                  lambda rows: vectors[[int(row) for row in rows]],
+                                                  memmap_threshold=0)
+            finally:
+                tempfile.tempdir = saved_tempdir
+
+            self.assertIsInstance(matrix, np.memmap)
+            self.assertEqual(os.listdir(tmp_dir), [])
+            np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-6)
+            del matrix
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+
+from embedding_cache import QueryVectorLRU
+from optimized_rag_demo import search_many
+
+
+class CountingModel:
+    model_name = "counting"
+
+    def __init__(self):
+        self.calls = []
+
+    def encode_queries(self, queries):
+        self.calls.append(list(queries))
+        return [np.full(4, len(query), dtype=np.float32) for query in queries]
+
+
+class FakeMilvusClient:
+    def __init__(self):
+        self.searches = []
+
+    def search(self, collection_name, data, limit, search_params, output_fields):
+        self.searches.append(len(data))
+        return [
+            [{"id": i, "distance": 1.0 / (i + 1),
+              "entity": {"title": f"条文{int(vector[0])}-{i}", "text": "内容"}} for i in range(limit)]
+            for vector in data
+        ]
+
+
+class TestQueryVectorLRU(unittest.TestCase):
+    def test_hits_misses_and_batch_dedupe(self):
+        """重复的问题只编码一次，未命中的问题一次性批量编码"""
+        model = CountingModel()
+        cache = QueryVectorLRU()
+
+        first = cache.encode_queries(model, ["甲", "乙乙", "甲"])
+        second = cache.encode_queries(model, ["乙乙", "丙丙丙"])
+
+        self.assertEqual(model.calls, [["甲", "乙乙"], ["丙丙丙"]])
+        np.testing.assert_array_equal(first[1], second[0])
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 3, "hit_rate": 0.4, "entries": 3})
+
+    def test_lru_eviction_and_model_isolation(self):
+        model = CountingModel()
+        other = CountingModel()
+        other.model_name = "other"
+        cache = QueryVectorLRU(maxsize=2)
+
+        cache.encode_queries(model, ["a", "b"])
+        cache.encode_queries(model, ["a"])       # a 变为最近使用
+        cache.encode_queries(model, ["c"])       # 淘汰 b
+        cache.encode_queries(model, ["a", "b"])
+        cache.encode_queries(other, ["a"])       # 不同模型的同一问题不共用向量
+
+        self.assertEqual(model.calls, [["a", "b"], ["c"], ["b"]])
+        self.assertEqual(other.calls, [["a"]])
+
+
+class TestSearchMany(unittest.TestCase):
+    def test_single_batched_search_in_input_order(self):
+        model = CountingModel()
+        client = FakeMilvusClient()
+        questions = ["问题一", "问题", "问题一", "问题三三"]
+
+        results = search_many(questions, client, model, "test", top_k=2, query_cache=QueryVectorLRU())
+
+        self.assertEqual(client.searches, [3])
+        self.assertEqual(model.calls, [["问题一", "问题", "问题三三"]])
+        self.assertEqual([contexts[0][0] for contexts in results], ["条文3-0", "条文2-0", "条文3-0", "条文4-0"])
+        self.assertEqual(results[0], results[2])
+        self.assertIsNot(results[0], results[2])
+        self.assertEqual(search_many([], client, model, "test"), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
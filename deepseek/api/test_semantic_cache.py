@@ -0,0 +1,127 @@
+import atexit
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from semantic_cache import SemanticAnswerCache, generate_answer_cached
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "answers.json")
+        self.clock = FakeClock()
+        self.caches = []
+
+    def tearDown(self):
+        # 取消退出时的写入，避免在已删除的目录中重新创建缓存文件
+        for cache in self.caches:
+            atexit.unregister(cache.close)
+        self.tmp_dir.cleanup()
+
+    def make_cache(self, **kwargs):
+        kwargs.setdefault("threshold", 0.9)
+        cache = SemanticAnswerCache(self.path, clock=self.clock, **kwargs)
+        self.caches.append(cache)
+        return cache
+
+    def test_paraphrase_hit_requires_same_chunks(self):
+        """相似问题且检索条文相同才命中"""
+        cache = self.make_cache()
+        cache.store("什么是异议登记？", [1.0, 0.0, 0.1], [3, 1, 2], "答案", generation_seconds=2.0)
+
+        self.assertEqual(cache.lookup([0.98, 0.02, 0.1], [1, 2, 3]), "答案")
+        self.assertIsNone(cache.lookup([0.98, 0.02, 0.1], [1, 2, 4]))
+        self.assertIsNone(cache.lookup([0.0, 1.0, 0.0], [1, 2, 3]))
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+        self.assertGreater(stats["seconds_saved"], 1.9)
+
+    def test_ttl_and_size_eviction(self):
+        """过期答案不再返回，超出容量时淘汰最久未使用的答案"""
+        cache = self.make_cache(ttl=60, max_entries=2)
+        cache.store("q1", [1.0, 0.0], [1], "a1")
+        self.clock.now += 30
+        cache.store("q2", [1.0, 0.0], [2], "a2")
+
+        self.clock.now += 40
+        self.assertIsNone(cache.lookup([1.0, 0.0], [1]))
+        self.assertEqual(cache.lookup([1.0, 0.0], [2]), "a2")
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+        cache.store("q3", [1.0, 0.0], [3], "a3")
+        cache.store("q4", [1.0, 0.0], [4], "a4")
+        self.assertIsNone(cache.lookup([1.0, 0.0], [2]))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_persistence_and_invalidation(self):
+        """重启后仍然可用；条文重新索引后相关答案失效"""
+        cache = self.make_cache()
+        cache.store("q1", [1.0, 0.0], [1, 2], "a1")
+        cache.store("q2", [0.0, 1.0], [2, 3], "a2")
+        cache.store("q3", [0.0, 1.0], [4], "a3")
+        cache.close()
+
+        reloaded = self.make_cache()
+        self.assertEqual(len(reloaded), 3)
+        self.assertEqual(reloaded.invalidate_chunks([2]), 2)
+
+        reloaded = self.make_cache()
+        self.assertIsNone(reloaded.lookup([1.0, 0.0], [1, 2]))
+        self.assertEqual(reloaded.lookup(np.array([0.0, 1.0]), [4]), "a3")
+
+    def test_batched_flush(self):
+        """新增答案累计到 flush_every 条才写文件，close() 写入剩余的答案，不留下临时文件"""
+        cache = self.make_cache(flush_every=3)
+        cache.store("q1", [1.0, 0.0], [1], "a1")
+        cache.store("q2", [1.0, 0.0], [2], "a2")
+        self.assertFalse(os.path.exists(self.path))
+
+        cache.store("q3", [1.0, 0.0], [3], "a3")
+        self.assertEqual(len(self.make_cache()), 3)
+
+        cache.store("q4", [1.0, 0.0], [4], "a4")
+        self.assertEqual(len(self.make_cache()), 3)
+        cache.close()
+        self.assertEqual(len(self.make_cache()), 4)
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["answers.json"])
+
+    def test_unreadable_file_is_treated_as_empty(self):
+        for content in ('{"version": 1, "entries": [{"question"', '{"entries": [{"question": "q"}]}', "[]"):
+            with open(self.path, "w", encoding="utf-8") as file:
+                file.write(content)
+
+            cache = self.make_cache()
+            self.assertEqual(len(cache), 0)
+            cache.store("q1", [1.0, 0.0], [1], "a1")
+            cache.close()
+            self.assertEqual(len(self.make_cache()), 1)
+
+    def test_generate_answer_cached_skips_errors(self):
+        """未命中时调用生成函数，出错提示不写入缓存"""
+        cache = self.make_cache()
+        calls = []
+
+        def generate(question, contexts):
+            calls.append(question)
+            return "❌ 调用DeepSeek API时出错" if len(calls) == 1 else "答案"
+
+        self.assertEqual(generate_answer_cached(cache, "q", [1.0], [1], [], generate)[1], False)
+        self.assertEqual(generate_answer_cached(cache, "q", [1.0], [1], [], generate), ("答案", False))
+        self.assertEqual(generate_answer_cached(cache, "q", [1.0], [1], [], generate), ("答案", True))
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
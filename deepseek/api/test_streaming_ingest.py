@@ -0,0 +1,114 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from streaming_ingest import ingest_streaming, iter_batches, load_checkpoint, save_checkpoint
+
+CHUNKS = [(i, f"第{i}条", f"内容{i}") for i in range(100)]
+
+
+class FakeModel:
+    def __init__(self):
+        self.batches = 0
+        self.lock = threading.Lock()
+
+    def encode_documents(self, documents):
+        with self.lock:
+            self.batches += 1
+        return [[float(len(text))] for text in documents]
+
+
+class FakeMilvusClient:
+    def __init__(self, fail_after=None, on_upsert=None):
+        self.rows = {}
+        self.upserts = []
+        self.fail_after = fail_after
+        self.on_upsert = on_upsert
+
+    def upsert(self, collection_name, data):
+        if self.fail_after is not None and len(self.upserts) >= self.fail_after:
+            raise ConnectionError("Milvus 不可用")
+        if self.on_upsert:
+            self.on_upsert()
+        self.upserts.append(len(data))
+        for row in data:
+            self.rows[row["id"]] = row
+
+
+class TestStreamingIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_path = os.path.join(self.tmp_dir.name, "ingest.checkpoint.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def ingest(self, client, chunks=CHUNKS, model=None, **kwargs):
+        return ingest_streaming(iter(chunks), client, model or FakeModel(), "test",
+                                checkpoint_path=self.checkpoint_path, fingerprint="corpus-v1", **kwargs)
+
+    def test_batches_and_stats(self):
+        client = FakeMilvusClient()
+        model = FakeModel()
+        progress = []
+        stats = self.ingest(client, model=model, embed_batch_size=16, insert_batch_size=40,
+                            on_progress=progress.append)
+
+        self.assertEqual(client.upserts, [40, 40, 20])
+        self.assertEqual(progress, [40, 80, 100])
+        self.assertEqual(model.batches, 7)
+        self.assertEqual(client.rows[7], {"id": 7, "vector": [3.0], "title": "第7条", "text": "内容7"})
+        self.assertEqual({name: stage.items for name, stage in stats.items()},
+                         {"parse": 100, "embed": 100, "insert": 100})
+        # 完成后删除检查点
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_resume_after_crash(self):
+        """写入失败后检查点记录已写入的分块数，重新运行时只处理剩余的分块"""
+        with self.assertRaises(ConnectionError):
+            self.ingest(FakeMilvusClient(fail_after=2), embed_batch_size=10, insert_batch_size=30)
+        self.assertEqual(load_checkpoint(self.checkpoint_path, "corpus-v1"), 60)
+        self.assertEqual(load_checkpoint(self.checkpoint_path, "corpus-v2"), 0)
+
+        client = FakeMilvusClient()
+        stats = self.ingest(client, embed_batch_size=10, insert_batch_size=30)
+        self.assertEqual(sorted(client.rows), list(range(60, 100)))
+        self.assertEqual(stats["embed"].items, 40)
+
+    def test_backpressure(self):
+        """写入阶段阻塞时，embedding 最多领先 max_pending_batches 个批次（另有一批在 put 上等待）"""
+        model = FakeModel()
+        observed = []
+
+        def slow_upsert():
+            if not observed:
+                # 第一次写入时等 embedding 线程填满队列
+                time.sleep(0.3)
+                observed.append(model.batches)
+
+        self.ingest(FakeMilvusClient(on_upsert=slow_upsert), model=model,
+                    embed_batch_size=5, insert_batch_size=5, max_pending_batches=2)
+        # 正在写入的 1 批 + 队列中 2 批 + 正在 put 的 1 批，而不是全部 20 批
+        self.assertEqual(observed[0], 4)
+
+    def test_embedding_errors_propagate(self):
+        class FailingModel:
+            def encode_documents(self, documents):
+                raise RuntimeError("模型加载失败")
+
+        client = FakeMilvusClient()
+        with self.assertRaises(RuntimeError):
+            self.ingest(client, model=FailingModel())
+        self.assertEqual(client.rows, {})
+
+    def test_checkpoint_helpers(self):
+        self.assertEqual([len(batch) for batch in iter_batches(range(10), 4)], [4, 4, 2])
+        self.assertEqual(load_checkpoint(self.checkpoint_path, "corpus-v1"), 0)
+        save_checkpoint(self.checkpoint_path, "corpus-v1", 12)
+        self.assertEqual(load_checkpoint(self.checkpoint_path, "corpus-v1"), 12)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
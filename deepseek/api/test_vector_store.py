@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from vector_store import NumpyVectorStore, open_vector_store
+
+
+class TestNumpyVectorStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = self.tmp_dir.name
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(300, 16)).astype(np.float32)
+        self.queries = rng.normal(size=(4, 16)).astype(np.float32)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def rows(self, ids):
+        return [{"id": i, "vector": self.vectors[i].tolist(), "title": f"第{i}条"} for i in ids]
+
+    def test_exact_top_k_matches_brute_force(self):
+        """各存储精度和度量方式下的 top-k 与暴力计算一致"""
+        normalized = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        normalized_queries = self.queries / np.linalg.norm(self.queries, axis=1, keepdims=True)
+        expected_scores = {
+            "COSINE": normalized_queries @ normalized.T,
+            "IP": self.queries @ self.vectors.T,
+            "L2": -((self.queries[:, None, :] - self.vectors[None]) ** 2).sum(axis=2)
+        }
+
+        for dtype in ("float32", "float16", "int8"):
+            for metric, scores in expected_scores.items():
+                store = NumpyVectorStore(os.path.join(self.path, dtype), dtype=dtype)
+                store.create_collection(metric, dimension=16, metric_type=metric)
+                store.insert(metric, self.rows(range(300)))
+
+                results = store.search(metric, data=self.queries, limit=10, output_fields=["title"])
+                expected = np.argsort(-scores, axis=1)[:, :10]
+                for hits, truth in zip(results, expected):
+                    overlap = len({hit["id"] for hit in hits} & set(truth.tolist()))
+                    self.assertGreaterEqual(overlap, 10 if dtype == "float32" else 9, (dtype, metric))
+                    self.assertEqual(hits[0]["entity"]["title"], f"第{hits[0]['id']}条")
+
+                if dtype == "float32":
+                    distances = [hit["distance"] for hit in results[0]]
+                    self.assertAlmostEqual(abs(distances[0]), abs(scores[0, expected[0, 0]]), places=3)
+
+    def test_upsert_delete_and_reopen(self):
+        """覆盖、删除后重新打开，结果保持一致"""
+        store = NumpyVectorStore(self.path, dtype="int8")
+        store.create_collection("c", dimension=16)
+        store.insert("c", self.rows(range(100)))
+        store.upsert("c", self.rows(range(100, 150)))
+        store.upsert("c", [{"id": 5, "vector": self.vectors[5].tolist(), "title": "新标题"}])
+        store.delete("c", [7, 8])
+
+        with self.assertRaises(ValueError):
+            store.insert("c", self.rows([1]))
+
+        reopened = NumpyVectorStore(self.path)
+        self.assertEqual(reopened.get("c", [5, 7, 149], ["title"]), [
+            {"id": 5, "title": "新标题"},
+            {"id": 149, "title": "第149条"}
+        ])
+        hits = reopened.search("c", data=[self.vectors[42]], limit=1)[0]
+        self.assertEqual(hits[0]["id"], 42)
+
+    def test_uncommitted_append_is_ignored(self):
+        """追加写入中途崩溃（行数未提交）时，多出的尾部数据被忽略并在下次写入时覆盖"""
+        store = NumpyVectorStore(self.path)
+        store.create_collection("c", dimension=16)
+        store.insert("c", self.rows(range(10)))
+
+        directory = os.path.join(self.path, "c")
+        with open(os.path.join(directory, "collection.json"), "r", encoding="utf-8") as file:
+            info = json.load(file)
+        store.insert("c", self.rows(range(10, 20)))
+        with open(os.path.join(directory, "collection.json"), "w", encoding="utf-8") as file:
+            json.dump(info, file)
+
+        reopened = NumpyVectorStore(self.path)
+        self.assertEqual(reopened.get("c", [3, 15]), [{"id": 3, "title": "第3条"}])
+        reopened.insert("c", self.rows(range(15, 17)))
+
+        reopened = NumpyVectorStore(self.path)
+        self.assertEqual([row["id"] for row in reopened.get("c", range(20))], list(range(10)) + [15, 16])
+        self.assertEqual(reopened.search("c", data=[self.vectors[16]], limit=1)[0][0]["id"], 16)
+
+    def test_open_vector_store(self):
+        self.assertIsInstance(open_vector_store("numpy", self.path, dtype="float16"), NumpyVectorStore)
+        with self.assertRaises(ValueError):
+            open_vector_store("faiss", self.path)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可插拔的向量存储：Milvus Lite 或进程内的 NumPy 精确检索
+
+几百到几十万条向量的小语料用 Milvus Lite 要付出数秒的启动时间和可观的内存，
+NumpyVectorStore 实现了本项目用到的 MilvusClient 接口子集（建表、写入、删除、get、search），
+可以直接替换 milvus_client 传给 build/search/ingest 等函数。
+
+NumpyVectorStore 的存储格式（每个 collection 一个目录）：
+- vectors.bin   连续的 float32 / float16 / int8 矩阵，打开时内存映射，不需要反序列化
+- scales.f32    int8 量化时每行的缩放系数
+- metadata.jsonl 元数据旁路文件，每行一条记录（主键和标量字段），行号与矩阵行一一对应
+- collection.json 维度、度量方式、存储精度、行数（行数是提交点：insert 先追加数据文件，
+  最后原子地更新行数，中途崩溃时多出来的尾部数据会被忽略）
+
+检索为精确 top-k：按行分块做矩阵乘法，再用 argpartition 取前 k 个。
+float16 / int8 把磁盘和页缓存占用降到 1/2、1/4，代价是每次检索都要把矩阵块转换成 float32
+（float16 的转换在 NumPy 中尤其慢），批量查询可以摊薄这部分开销。
+"""
+
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Protocol, Sequence
+
+import numpy as np
+
+VECTOR_STORE_BACKENDS = ("milvus", "numpy")
+DEFAULT_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "milvus")
+
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# 每次参与矩阵乘法的行数，限制 float16/int8 反量化时的临时内存
+_SEARCH_BLOCK_ROWS = 8192
+
+
+class VectorStore(Protocol):
+    """本项目使用的 MilvusClient 接口子集"""
+
+    def has_collection(self, collection_name: str) -> bool: ...
+
+    def drop_collection(self, collection_name: str): ...
+
+    def load_collection(self, collection_name: str): ...
+
+    def create_collection(self, collection_name: str, dimension: int, metric_type: str = "COSINE", **kwargs): ...
+
+    def insert(self, collection_name: str, data: List[dict]) -> dict: ...
+
+    def upsert(self, collection_name: str, data: List[dict]) -> dict: ...
+
+    def delete(self, collection_name: str, ids: Sequence[int]): ...
+
+    def get(self, collection_name: str, ids: Sequence[int], output_fields: Optional[List[str]] = None) -> List[dict]: ...
+
+    def search(self, collection_name: str, data: Sequence, limit: int = 10,
+               search_params: Optional[dict] = None, output_fields: Optional[List[str]] = None) -> List[List[dict]]: ...
+
+
+class _Collection:
+    """单个 collection：内存映射的向量矩阵 + 元数据"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+        with open(os.path.join(directory, "collection.json"), "r", encoding="utf-8") as file:
+            info = json.load(file)
+        self.dimension = info["dimension"]
+        self.metric_type = info["metric_type"]
+        self.dtype = info["dtype"]
+
+        rows = info["rows"]
+        self.records: List[dict] = []
+        with open(os.path.join(directory, "metadata.jsonl"), "r", encoding="utf-8") as file:
+            for line, _ in zip(file, range(rows)):
+                self.records.append(json.loads(line))
+        self.row_of: Dict[int, int] = {record["id"]: row for row, record in enumerate(self.records)}
+
+        self.vectors = self._map("vectors.bin", STORAGE_DTYPES[self.dtype], rows)
+        self.scales = self._map("scales.f32", np.float32, rows) if self.dtype == "int8" else None
+
+    def _map(self, name: str, dtype, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.empty((0, self.dimension) if name == "vectors.bin" else (0,), dtype=dtype)
+        shape = (rows, self.dimension) if name == "vectors.bin" else (rows,)
+        return np.memmap(os.path.join(self.directory, name), dtype=dtype, mode="r", shape=shape)
+
+    @staticmethod
+    def _write_info(directory: str, dimension: int, metric_type: str, dtype: str, rows: int):
+        tmp_path = os.path.join(directory, "collection.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"dimension": dimension, "metric_type": metric_type, "dtype": dtype, "rows": rows}, file)
+        os.replace(tmp_path, os.path.join(directory, "collection.json"))
+
+    @staticmethod
+    def write(directory: str, dimension: int, metric_type: str, dtype: str,
+              records: List[dict], vectors: np.ndarray, scales: Optional[np.ndarray]):
+        """写入临时目录后整体替换，中途失败不会留下不一致的文件"""
+
+        tmp_dir = f"{directory}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        vectors.tofile(os.path.join(tmp_dir, "vectors.bin"))
+        if scales is not None:
+            scales.tofile(os.path.join(tmp_dir, "scales.f32"))
+        with open(os.path.join(tmp_dir, "metadata.jsonl"), "w", encoding="utf-8") as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        _Collection._write_info(tmp_dir, dimension, metric_type, dtype, len(records))
+
+        old_dir = f"{directory}.old"
+        if os.path.exists(directory):
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def append(self, records: List[dict], vectors: np.ndarray, scales: Optional[np.ndarray]):
+        """在文件末尾追加记录，最后更新 collection.json 中的行数"""
+
+        rows = len(self.records)
+        item_size = STORAGE_DTYPES[self.dtype]().itemsize
+
+        with open(os.path.join(self.directory, "vectors.bin"), "r+b") as file:
+            file.truncate(rows * self.dimension * item_size)
+            file.seek(0, os.SEEK_END)
+            file.write(vectors.tobytes())
+        if scales is not None:
+            with open(os.path.join(self.directory, "scales.f32"), "r+b") as file:
+                file.truncate(rows * 4)
+                file.seek(0, os.SEEK_END)
+                file.write(scales.tobytes())
+
+        # 丢弃上次崩溃留下的未提交元数据行
+        metadata_path = os.path.join(self.directory, "metadata.jsonl")
+        with open(metadata_path, "r+b") as file:
+            for _ in range(rows):
+                file.readline()
+            file.seek(file.tell())
+            file.truncate()
+            file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8"))
+
+        self._write_info(self.directory, self.dimension, self.metric_type, self.dtype, rows + len(records))
+
+    def encode(self, vectors: np.ndarray):
+        """按存储精度编码向量，返回 (存储矩阵, int8 缩放系数)"""
+
+        if self.metric_type == "COSINE":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms > 0, norms, 1.0)
+
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            return quantized, scales.astype(np.float32)
+
+        return vectors.astype(STORAGE_DTYPES[self.dtype]), None
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """分块计算 (查询数, 行数) 的得分矩阵，得分越大越相似"""
+
+        if self.metric_type == "COSINE":
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = queries / np.where(norms > 0, norms, 1.0)
+
+        scores = np.empty((len(queries), len(self.records)), dtype=np.float32)
+        for start in range(0, len(self.records), _SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + _SEARCH_BLOCK_ROWS], dtype=np.float32)
+            block_scores = queries @ block.T
+            if self.scales is not None:
+                block_scores *= self.scales[start:start + _SEARCH_BLOCK_ROWS]
+            if self.metric_type == "L2":
+                # 与 Milvus 一致返回平方 L2 距离，这里先取负数以便统一按从大到小排序
+                block_norms = np.einsum("ij,ij->i", block, block)
+                if self.scales is not None:
+                    block_norms *= self.scales[start:start + _SEARCH_BLOCK_ROWS] ** 2
+                block_scores = 2 * block_scores - block_norms - np.einsum("ij,ij->i", queries, queries)[:, None]
+            scores[:, start:start + len(block)] = block_scores
+        return scores
+
+
+class NumpyVectorStore:
+    """
+    进程内的精确检索向量库，接口与 MilvusClient 兼容
+
+    用法:
+        client = NumpyVectorStore("./optimized_vectors", dtype="float16")
+        client.create_collection("c", dimension=768, metric_type="COSINE")
+        client.insert("c", [{"id": 1, "vector": [...], "title": "...", "text": "..."}])
+        client.search("c", data=[query_vector], limit=5, output_fields=["title", "text"])
+    """
+
+    def __init__(self, path: str, dtype: str = "float32"):
+        """
+        Args:
+            path: 存储根目录，每个 collection 一个子目录
+            dtype: 新建 collection 的存储精度：float32 / float16 / int8
+        """
+
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"不支持的存储精度: {dtype}")
+
+        self.path = path
+        self.dtype = dtype
+        self._collections: Dict[str, _Collection] = {}
+        os.makedirs(path, exist_ok=True)
+
+    def _directory(self, collection_name: str) -> str:
+        return os.path.join(self.path, collection_name)
+
+    def _collection(self, collection_name: str) -> _Collection:
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            if not self.has_collection(collection_name):
+                raise ValueError(f"collection 不存在: {collection_name}")
+            collection = self._collections[collection_name] = _Collection(self._directory(collection_name))
+        return collection
+
+    # --- collection 管理 ---
+
+    def has_collection(self, collection_name: str) -> bool:
+        return os.path.exists(os.path.join(self._directory(collection_name), "collection.json"))
+
+    def drop_collection(self, collection_name: str):
+        self._collections.pop(collection_name, None)
+        shutil.rmtree(self._directory(collection_name), ignore_errors=True)
+
+    def load_collection(self, collection_name: str):
+        """打开时已内存映射，不需要像 Milvus 那样显式加载"""
+
+        self._collection(collection_name)
+
+    def create_collection(
+        self,
+        collection_name: str,
+        dimension: int,
+        metric_type: str = "COSINE",
+        dtype: Optional[str] = None,
+        **kwargs
+    ):
+        """创建空 collection；consistency_level 等 Milvus 专有参数被忽略"""
+
+        if metric_type not in ("COSINE", "IP", "L2"):
+            raise ValueError(f"不支持的度量方式: {metric_type}")
+
+        dtype = dtype or self.dtype
+        _Collection.write(
+            self._directory(collection_name), dimension, metric_type, dtype, [],
+            np.empty((0, dimension), dtype=STORAGE_DTYPES[dtype]),
+            np.empty(0, dtype=np.float32) if dtype == "int8" else None
+        )
+        self._collections.pop(collection_name, None)
+
+    # --- 写入 ---
+
+    @staticmethod
+    def _encode_rows(collection: _Collection, data: List[dict]):
+        vectors, scales = collection.encode(np.asarray([row["vector"] for row in data], dtype=np.float32))
+        records = [{key: value for key, value in row.items() if key != "vector"} for row in data]
+        return records, vectors, scales
+
+    def _rewrite(self, collection_name: str, keep_rows: List[int], data: List[dict]):
+        """只保留 keep_rows 行并追加 data，重写整个 collection（删除和覆盖时使用）"""
+
+        collection = self._collection(collection_name)
+        dimension, metric_type, dtype = collection.dimension, collection.metric_type, collection.dtype
+
+        records = [collection.records[row] for row in keep_rows]
+        vectors = np.asarray(collection.vectors[keep_rows], dtype=STORAGE_DTYPES[dtype]).reshape(-1, dimension)
+        scales = np.asarray(collection.scales[keep_rows], dtype=np.float32) if collection.scales is not None else None
+
+        if data:
+            new_records, new_vectors, new_scales = self._encode_rows(collection, data)
+            records += new_records
+            vectors = np.concatenate([vectors, new_vectors])
+            if scales is not None:
+                scales = np.concatenate([scales, new_scales])
+
+        # 释放内存映射后再替换文件
+        self._collections.pop(collection_name, None)
+        del collection
+        _Collection.write(self._directory(collection_name), dimension, metric_type, dtype,
+                          records, vectors, scales)
+
+    def _append(self, collection_name: str, data: List[dict]):
+        collection = self._collection(collection_name)
+        records, vectors, scales = self._encode_rows(collection, data)
+
+        self._collections.pop(collection_name, None)
+        collection.append(records, vectors, scales)
+
+    def insert(self, collection_name: str, data: List[dict]) -> dict:
+        """追加写入，只写新增的数据，不重写已有文件"""
+
+        collection = self._collection(collection_name)
+        duplicates = [row["id"] for row in data if row["id"] in collection.row_of]
+        if duplicates or len({row["id"] for row in data}) != len(data):
+            raise ValueError(f"主键重复: {duplicates[:5]}")
+
+        if data:
+            self._append(collection_name, data)
+        return {"insert_count": len(data)}
+
+    def upsert(self, collection_name: str, data: List[dict]) -> dict:
+        """主键已存在的记录被覆盖；全部是新主键时走追加写入"""
+
+        collection = self._collection(collection_name)
+        # 同一批次内主键重复时保留最后一条
+        latest = {row["id"]: row for row in data}
+
+        if not any(chunk_id in collection.row_of for chunk_id in latest):
+            if latest:
+                self._append(collection_name, list(latest.values()))
+        else:
+            keep_rows = [row for row, record in enumerate(collection.records) if record["id"] not in latest]
+            self._rewrite(collection_name, keep_rows, list(latest.values()))
+        return {"upsert_count": len(data)}
+
+    def delete(self, collection_name: str, ids: Sequence[int]) -> dict:
+        collection = self._collection(collection_name)
+        removed = set(ids)
+        keep_rows = [row for row, record in enumerate(collection.records) if record["id"] not in removed]
+
+        self._rewrite(collection_name, keep_rows, [])
+        return {"delete_count": len(collection.records) - len(keep_rows)}
+
+    # --- 查询 ---
+
+    @staticmethod
+    def _entity(record: dict, output_fields: Optional[List[str]]) -> dict:
+        if output_fields is None:
+            return {key: value for key, value in record.items() if key != "id"}
+        return {field: record[field] for field in output_fields if field in record}
+
+    def get(self, collection_name: str, ids: Sequence[int], output_fields: Optional[List[str]] = None) -> List[dict]:
+        collection = self._collection(collection_name)
+        results = []
+        for chunk_id in ids:
+            row = collection.row_of.get(chunk_id)
+            if row is not None:
+                results.append({"id": chunk_id, **self._entity(collection.records[row], output_fields)})
+        return results
+
+    def search(
+        self,
+        collection_name: str,
+        data: Sequence,
+        limit: int = 10,
+        search_params: Optional[dict] = None,
+        output_fields: Optional[List[str]] = None,
+        **kwargs
+    ) -> List[List[dict]]:
+        """
+        精确 top-k 检索，所有查询向量一次矩阵乘法
+
+        返回格式与 MilvusClient.search 相同：每个查询一个 [{"id", "distance", "entity"}, ...] 列表，
+        COSINE/IP 的 distance 为相似度（降序），L2 为平方距离（升序）。
+        """
+
+        collection = self._collection(collection_name)
+        if search_params and search_params.get("metric_type", collection.metric_type) != collection.metric_type:
+            raise ValueError(f"collection 的度量方式为 {collection.metric_type}")
+
+        queries = np.asarray(data, dtype=np.float32).reshape(-1, collection.dimension)
+        rows = len(collection.records)
+        if rows == 0:
+            return [[] for _ in queries]
+
+        scores = collection.scores(queries)
+        k = min(limit, rows)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < rows else np.tile(np.arange(rows), (len(queries), 1))
+
+        results = []
+        for query_scores, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-query_scores[candidates], kind="stable")]
+            hits = []
+            for row in ordered:
+                record = collection.records[row]
+                score = float(query_scores[row])
+                hits.append({
+                    "id": record["id"],
+                    "distance": -score if collection.metric_type == "L2" else score,
+                    "entity": self._entity(record, output_fields)
+                })
+            results.append(hits)
+        return results
+
+    def close(self):
+        self._collections.clear()
+
+
+def open_vector_store(backend: str = DEFAULT_BACKEND, uri: Optional[str] = None, **kwargs):
+    """
+    按名称创建向量存储
+
+    Args:
+        backend: "milvus"（Milvus Lite，默认 uri 为 ./optimized_milvus.db）
+            或 "numpy"（进程内精确检索，默认目录为 ./optimized_vectors）
+        uri: 数据库文件或目录
+        **kwargs: 传给 NumpyVectorStore，如 dtype="float16"
+    """
+
+    if backend == "milvus":
+        from pymilvus import MilvusClient
+
+        return MilvusClient(uri=uri or "./optimized_milvus.db")
+    if backend == "numpy":
+        return NumpyVectorStore(uri or "./optimized_vectors", **kwargs)
+
+    raise ValueError(f"未知的向量存储后端: {backend}，可选 {', '.join(VECTOR_STORE_BACKENDS)}")
@@ -0,0 +1,204 @@
+"""
+基准测试：批量邮箱验证的吞吐量（行/秒）
+
+生成一份模拟的注册名单（大部分有效，夹杂缺少 @、连续的点、空格、非法字符、超长等无效地址），对比：
+- 原来的实现：每次调用都把正则字符串传给 re.fullmatch，逐个验证
+- is_valid_email：预编译的正则 + 预检查，逐个调用
+- validate_many：对内存中的列表批量验证，结果为位图
+- validate_file：流式读取文本文件 / CSV，单进程和多进程
+
+然后对比两个格式匹配后端（regex / scanner）：
+- 典型输入：同一份名单的批量验证吞吐量
+- 对抗输入：长串的点、连字符、重复的 .ab 段等，不经过长度预检查直接调用后端，
+  看单次调用耗时随长度的增长；再给出经过预检查（最长 254 字符）后单次调用的最坏耗时
+
+最后是分阶段验证（语法 → 域名结论缓存 → MX 检查）：把地址的域名换成少数热门域名加长尾域名的分布，
+用带延迟的进程内假 DNS 模拟查询，报告吞吐量、DNS 查询次数和缓存命中率
+
+用法:
+    python bench_email_validator.py --rows 1000000 --workers 4
+"""
+
+import argparse
+import os
+import random
+import re
+import string
+import tempfile
+import time
+
+from email_staged_validator import FakeResolver, StagedEmailValidator
+from email_validator import BACKENDS, MAX_EMAIL_LENGTH, is_valid_email, validate_file, validate_many
+
+LEGACY_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
+
+def legacy_is_valid_email(email_string):
+    """原来的 is_valid_email：每次调用都传入正则字符串（依赖 re 模块内部的缓存）"""
+    if not isinstance(email_string, str):
+        raise TypeError("输入必须是字符串类型，但收到 {}".format(type(email_string).__name__))
+    return bool(re.fullmatch(LEGACY_PATTERN, email_string))
+
+
+def make_emails(rows, seed=0):
+    """约 80% 有效地址，其余为常见的各类无效地址"""
+    rng = random.Random(seed)
+    domains = ["gmail.com", "example.org", "mail.co.uk", "company-name.com", "sub.domain.io"]
+    names = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(1000)]
+
+    def valid():
+        local = rng.choice(names)
+        if rng.random() < 0.3:
+            local += rng.choice([".", "_", "+", "-"]) + rng.choice(names)
+        return f"{local}{rng.randint(0, 99) if rng.random() < 0.5 else ''}@{rng.choice(domains)}"
+
+    invalid = [
+        lambda e: e.replace("@", ""),                 # 缺少 @
+        lambda e: e.replace("@", "@@"),               # 两个 @
+        lambda e: e.replace(".", "..", 1),            # 连续的点
+        lambda e: " " + e,                            # 前导空格
+        lambda e: e.replace("@", "_at_") + "@x_y",    # 域名中有下划线
+        lambda e: e[:e.rindex(".") + 1] + "c",        # 顶级域名只有 1 个字符
+        lambda e: "a" * 250 + e,                      # 超长
+    ]
+    return [valid() if rng.random() < 0.8 else rng.choice(invalid)(valid()) for _ in range(rows)]
+
+
+def timed(label, rows, func, width=28):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<{width}} | {elapsed:>7.2f}s | {rows / elapsed:>12,.0f}")
+    return result, elapsed
+
+
+# 对抗输入：长度为 n 时的构造方式
+ADVERSARIAL = {
+    "点和单字母 a.a.a…": lambda n: "a@" + "a." * (n // 2) + "a",
+    "重复的 .ab 段，末尾非法": lambda n: "a@" + ".ab" * (n // 3) + "!",
+    "连续的点": lambda n: "a@" + "." * n,
+    "连续的连字符": lambda n: "a@" + "-" * n + ".c",
+    "顶级域名过短": lambda n: "a@b" + ".ab" * (n // 3) + ".a",
+    "没有 @": lambda n: "a" * n,
+}
+
+
+def per_call_us(func, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def bench_backends(emails):
+    """两个后端在典型输入和对抗输入上的耗时"""
+    print(f"\n🧮 后端对比：典型输入（{len(emails):,} 行，validate_many）")
+    print(f"{'后端':<10} | {'耗时':>8} | {'行/秒':>12}")
+    print("-" * 38)
+    for backend in BACKENDS:
+        timed(backend, len(emails), lambda: validate_many(emails, backend=backend), width=10)
+
+    lengths = [64, 256, 1024, 4096]
+    print("\n🧮 对抗输入：单次调用后端的耗时（μs，不经过长度预检查）")
+    print(f"{'输入':<24} | {'后端':<8} | " + " | ".join(f"{'n=' + str(n):>8}" for n in lengths))
+    print("-" * (40 + 11 * len(lengths)))
+    for label, make in ADVERSARIAL.items():
+        for backend, match in BACKENDS.items():
+            timings = [per_call_us(match, make(n), repeat=200) for n in lengths]
+            print(f"{label:<24} | {backend:<8} | " + " | ".join(f"{t:>8.2f}" for t in timings))
+
+    # 预检查把长度限制在 254 以内，单次验证的耗时有固定的上界
+    worst_inputs = [make(n) for make in ADVERSARIAL.values() for n in range(MAX_EMAIL_LENGTH - 8, MAX_EMAIL_LENGTH + 1)]
+    print(f"\n⏱️ 经过预检查的最坏耗时（{len(worst_inputs)} 个长度 ≤ {MAX_EMAIL_LENGTH} 附近的对抗输入）")
+    for backend in BACKENDS:
+        worst = max(per_call_us(lambda e: is_valid_email(e, backend), email, repeat=50) for email in worst_inputs)
+        print(f"   {backend:<8} 最坏 {worst:.2f}μs / 次")
+
+
+# 分阶段验证：热门域名占大多数，其余来自长尾（其中一部分不存在），假 DNS 每次查询的延迟
+POPULAR_DOMAINS = ["gmail.com", "qq.com", "163.com", "outlook.com", "126.com"]
+POPULAR_SHARE = 0.7
+TAIL_DOMAINS = 20_000
+MISSING_SHARE = 0.05
+DNS_LATENCY = 0.002
+
+
+def bench_staged(emails, concurrency=50, seed=0):
+    """分阶段验证的吞吐量和域名缓存命中率"""
+    rng = random.Random(seed)
+    tail = [f"company{i}.com" for i in range(TAIL_DOMAINS)]
+    records = {domain: [f"mx.{domain}"] for domain in POPULAR_DOMAINS + tail[:int(TAIL_DOMAINS * (1 - MISSING_SHARE))]}
+
+    def rehome(email):
+        if "@" not in email or "." not in email.rpartition("@")[2]:
+            return email
+        domain = rng.choice(POPULAR_DOMAINS) if rng.random() < POPULAR_SHARE else rng.choice(tail)
+        return email.rpartition("@")[0] + "@" + domain
+
+    emails = [rehome(email) for email in emails]
+    resolver = FakeResolver(records, latency=DNS_LATENCY)
+    validator = StagedEmailValidator(resolver, max_concurrency=concurrency)
+    print(f"\n🌐 分阶段验证（{len(emails):,} 行，热门域名 {POPULAR_SHARE:.0%}，长尾 {TAIL_DOMAINS:,} 个域名，"
+          f"DNS 延迟 {DNS_LATENCY * 1000:.0f}ms，并发 {concurrency}）")
+    print(f"{'方式':<28} | {'耗时':>8} | {'行/秒':>12}")
+    print("-" * 56)
+    timed("仅语法（validate_many）", len(emails), lambda: validate_many(emails))
+    result, _ = timed("语法 + 域名缓存 + MX", len(emails), lambda: validator.validate_many(emails))
+    stats = validator.stats()
+    print(f"📊 {validator.format_stats()}")
+    print(f"   不按域名缓存时需要查询 {stats['domain_rows']:,} 次，"
+          f"至少 {stats['domain_rows'] * DNS_LATENCY / concurrency:.1f}s；有效 {result.count():,} 行")
+    # 域名都已缓存：每行只剩语法检查和取域名，不再查询 DNS
+    queries = resolver.queries
+    again, _ = timed("再次验证（域名已缓存）", len(emails), lambda: validator.validate_many(emails))
+    assert again.tobytes() == result.tobytes() and resolver.queries == queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量邮箱验证的吞吐量基准测试")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="行数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="多进程模式的进程数")
+    args = parser.parse_args()
+
+    emails = make_emails(args.rows)
+    tmpdir = tempfile.TemporaryDirectory()
+    txt_path = os.path.join(tmpdir.name, "signups.txt")
+    csv_path = os.path.join(tmpdir.name, "signups.csv")
+    with open(txt_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(emails) + "\n")
+    with open(csv_path, "w", encoding="utf-8") as f:
+        f.write("id,email,source\n")
+        f.writelines(f"{i},{email},web\n" for i, email in enumerate(emails))
+
+    print(f"📦 {args.rows:,} 行，文本文件 {os.path.getsize(txt_path) / 1e6:.1f}MB，进程数 {args.workers}")
+    print(f"{'方式':<28} | {'耗时':>8} | {'行/秒':>12}")
+    print("-" * 56)
+
+    legacy, legacy_time = timed("原实现（逐个，re.fullmatch）", args.rows,
+                                lambda: [legacy_is_valid_email(email) for email in emails])
+    single, _ = timed("is_valid_email（逐个）", args.rows, lambda: [is_valid_email(email) for email in emails])
+    bitmap, many_time = timed("validate_many", args.rows, lambda: validate_many(emails))
+    results = [
+        timed("validate_file 文本", args.rows, lambda: validate_file(txt_path))[0],
+        timed(f"validate_file 文本 ×{args.workers}进程", args.rows,
+              lambda: validate_file(txt_path, workers=args.workers))[0],
+        timed("validate_file CSV", args.rows, lambda: validate_file(csv_path, column="email"))[0],
+        timed(f"validate_file CSV ×{args.workers}进程", args.rows,
+              lambda: validate_file(csv_path, column="email", workers=args.workers))[0],
+    ]
+    tmpdir.cleanup()
+
+    assert list(bitmap) == single
+    assert all(result.tobytes() == bitmap.tobytes() for result in results)
+    differences = sum(a != b for a, b in zip(legacy, single))
+    print(f"\n✅ 有效 {bitmap.count():,} 行；各批量方式结果一致；"
+          f"与原实现不同的 {differences:,} 行（连续的点、超长地址）")
+    print(f"💾 位图 {len(bitmap.tobytes()) / 1e6:.2f}MB（布尔列表约 {args.rows * 8 / 1e6:.0f}MB）")
+    print(f"⚡ validate_many 比原实现快 {legacy_time / many_time:.1f} 倍")
+
+    bench_backends(emails)
+    bench_staged(emails)
+
+
+if __name__ == "__main__":
+    main()
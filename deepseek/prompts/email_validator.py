@@ -1,18 +1,104 @@
+"""
+电子邮件地址验证：单个地址（is_valid_email）和批量流式验证（validate_many / validate_file）
+
+批量验证用于清洗千万行级别的注册名单：
+- 正则表达式只编译一次；先做几项廉价的预检查（长度、恰好一个 @、没有连续的点），大部分无效地址不进入正则
+- 结果是按行排列的位图（EmailBitmap，每行 1 位），一千万行只占约 1.2MB
+- 文件按块流式读取，不整体载入内存；workers > 1 时把各块分给多个进程并行验证，结果顺序不变
+
+预检查之后的格式匹配有两个可选的后端（backend 参数），接受的地址完全相同：
+- "regex"：预编译的正则表达式
+- "scanner"：手写的线性扫描器，用 bytes.translate 的删除表检查字符集，
+  再用 partition / rpartition 检查结构，没有回溯，耗时只与长度成正比
+
+用法:
+    python email_validator.py user@example.com
+    python email_validator.py --file signups.txt --workers 4 --bitmap-out valid.bin
+    python email_validator.py --file signups.csv --column email --backend scanner
+"""
+
+import csv
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# 健壮的电子邮件正则表达式（说明见 is_valid_email），模块加载时编译一次
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_fullmatch = EMAIL_PATTERN.fullmatch
+
+# RFC 5321 规定地址最长 254 个字符；最短的有效地址形如 a@b.cc
+MAX_EMAIL_LENGTH = 254
+MIN_EMAIL_LENGTH = 6
+
+# 批量验证时每个任务处理的行数（CSV）和字节数（按行分隔的文本文件）
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_BLOCK_BYTES = 4 << 20
+
+# 每字节一个 0/1 标志 → ASCII 的 "0"/"1"，用于打包成位图
+_FLAGS_TO_ASCII = bytes.maketrans(b"\x00\x01", b"01")
+
+
+# 域名允许的字符；用户名还允许 _ % +。扫描器用 bytes.translate 的删除表一次去掉所有允许的字符
+_DOMAIN_CHARS = b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-"
+_LOCAL_CHARS = _DOMAIN_CHARS + b"_%+"
+
+
+def _regex_match(email):
+    """正则后端"""
+    return _fullmatch(email) is not None
+
+
+def _scan_match(email):
+    """
+    扫描器后端，与正则后端（EMAIL_PATTERN）接受的字符串完全相同。
+
+    正则的结构等价于：
+    - 只有 ASCII 字符，且都属于允许的字符；恰好一个 @，@ 前面至少一个字符
+    - @ 后面（域名）不含 _ % +，并且含有点：最后一个点之前至少一个字符，
+      之后是至少 2 个字母（顶级域名只能是字母，所以分隔它的一定是最后一个点）
+    """
+    if not email.isascii():
+        return False
+    raw = email.encode("ascii")
+    # 删除所有用户名允许的字符后只剩一个 @：没有非法字符，且恰好一个 @
+    if raw.translate(None, _LOCAL_CHARS) != b"@":
+        return False
+    local, _, domain = raw.partition(b"@")
+    host, _, tld = domain.rpartition(b".")
+    # bytes.isalpha 只认 ASCII 字母；没有点时 host 为空
+    return (bool(local) and bool(host) and len(tld) >= 2 and tld.isalpha()
+            and not host.translate(None, _DOMAIN_CHARS))
+
+
+# 格式匹配后端：名称 → 判断函数
+BACKENDS = {
+    "regex": _regex_match,
+    "scanner": _scan_match,
+}
+DEFAULT_BACKEND = "regex"
+
+
+def _get_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的后端 {backend!r}，可选: {', '.join(BACKENDS)}")
+    return BACKENDS[backend]
+
 
-def is_valid_email(email_string):
+def is_valid_email(email_string, backend=DEFAULT_BACKEND):
     """
     验证给定的字符串是否为有效的电子邮件地址
-    
+
     参数:
         email_string (str): 要验证的电子邮件地址字符串
-        
+        backend (str): 格式匹配后端，"regex" 或 "scanner"，结果相同
+
     返回:
         bool: True表示有效，False表示无效
-        
+
     异常:
         TypeError: 如果输入不是字符串类型
-        
+
     正则表达式说明:
         这个正则表达式基于RFC 5322标准简化版本，覆盖大多数常见电子邮件格式：
         - 用户名部分允许: 字母、数字、. _ % + -
@@ -21,21 +107,278 @@ def is_valid_email(email_string):
         - 顶级域名至少2个字符
         - 不支持国际化域名(IDN)中的非ASCII字符
         参考: https://emailregex.com/
+
+    预检查（在正则之前执行，不满足的直接判为无效）:
+        - 长度在 6 到 254 个字符之间
+        - 恰好包含一个 @
+        - 不包含连续的点（正则本身允许 user@domain..com 这样的地址）
     """
     if not isinstance(email_string, str):
         raise TypeError("输入必须是字符串类型，但收到 {}".format(type(email_string).__name__))
-    
-    # 健壮的电子邮件正则表达式
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    
-    # 使用fullmatch确保整个字符串匹配
-    return bool(re.fullmatch(pattern, email_string))
+    match = _get_backend(backend)
+
+    return (MIN_EMAIL_LENGTH <= len(email_string) <= MAX_EMAIL_LENGTH
+            and email_string.count("@") == 1
+            and ".." not in email_string
+            and match(email_string))
+
+
+class EmailBitmap:
+    """按行排列的验证结果，每行 1 位：第 i 行对应第 i // 8 个字节中从高位数起的第 i % 8 位"""
+
+    def __init__(self):
+        self._packed = bytearray()
+        # 还没凑满 8 行的标志（每字节一个 0/1），追加时暂存在这里
+        self._tail = bytearray()
+
+    @classmethod
+    def frombytes(cls, data, length):
+        """
+        从 tobytes() 的结果恢复位图。
+
+        参数:
+            data (bytes): 打包后的位图
+            length (int): 行数
+        """
+        bitmap = cls()
+        full, extra = divmod(length, 8)
+        bitmap._packed = bytearray(data[:full])
+        if extra:
+            bitmap._tail = bytearray(data[full] >> (7 - i) & 1 for i in range(extra))
+        return bitmap
+
+    @staticmethod
+    def _pack(flags):
+        # 长度为 8 的倍数的 0/1 标志 → 打包后的字节
+        if not flags:
+            return b""
+        return int(flags.translate(_FLAGS_TO_ASCII), 2).to_bytes(len(flags) // 8, "big")
+
+    def append_flags(self, flags):
+        """
+        追加若干行的结果。
+
+        参数:
+            flags (bytes): 每行一个字节，0 表示无效，1 表示有效
+        """
+        self._tail += flags
+        full = len(self._tail) // 8 * 8
+        if full:
+            self._packed += self._pack(bytes(self._tail[:full]))
+            del self._tail[:full]
+
+    def __len__(self):
+        return len(self._packed) * 8 + len(self._tail)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("EmailBitmap 下标越界")
+        packed_bits = len(self._packed) * 8
+        if index >= packed_bits:
+            return bool(self._tail[index - packed_bits])
+        return bool(self._packed[index >> 3] >> (7 - (index & 7)) & 1)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def count(self):
+        """有效的行数"""
+        return int.from_bytes(self._packed, "big").bit_count() + sum(self._tail)
+
+    def tobytes(self):
+        """打包后的位图，最后一个字节不足 8 行时低位补 0"""
+        padding = -len(self._tail) % 8
+        return bytes(self._packed) + self._pack(bytes(self._tail) + b"\x00" * padding)
+
+    def __repr__(self):
+        return f"EmailBitmap({len(self)} 行，有效 {self.count()} 行)"
+
+
+def _validate_values(values, backend=DEFAULT_BACKEND):
+    """
+    验证一组地址，返回每行一个 0/1 字节（在子进程中执行）。
+    判断条件与 is_valid_email 相同，内联在列表推导中，省去每行一次函数调用和类型检查。
+    """
+    match = _get_backend(backend)
+    # 类型检查对整块做一次：map(type, ...) 和 set 都在 C 中执行
+    if any(not issubclass(value_type, str) for value_type in set(map(type, values))):
+        for value in values:
+            is_valid_email(value)  # 抛出与单个验证相同的 TypeError
+
+    if backend == "regex":
+        # 直接调用编译好的正则，省去一层 Python 函数调用
+        fullmatch = _fullmatch
+        return bytes([
+            MIN_EMAIL_LENGTH <= len(email) <= MAX_EMAIL_LENGTH
+            and email.count("@") == 1
+            and ".." not in email
+            and fullmatch(email) is not None
+            for email in values
+        ])
+    return bytes([
+        MIN_EMAIL_LENGTH <= len(email) <= MAX_EMAIL_LENGTH
+        and email.count("@") == 1
+        and ".." not in email
+        and match(email)
+        for email in values
+    ])
+
+
+def _validate_block(block, encoding, backend=DEFAULT_BACKEND):
+    """
+    验证一块按行分隔的文本（在子进程中执行）。
+
+    参数:
+        block (bytes): 若干完整的行，以 \\n 分隔，末尾没有换行符
+        encoding (str): 文件编码（必须兼容 ASCII，如 utf-8）；无法解码的字节替换为 U+FFFD，该行判为无效
+        backend (str): 格式匹配后端
+    """
+    text = block.decode(encoding, errors="replace").replace("\r\n", "\n")
+    # 块在换行符 \n 之前截断，\r\n 换行的最后一行还带着 \r
+    if text.endswith("\r"):
+        text = text[:-1]
+    return _validate_values(text.split("\n"), backend)
+
+
+def _ordered_map(func, tasks, workers):
+    """依次执行 func(*task)，workers > 1 时在进程池中并行；按任务顺序返回结果，进行中的任务数有上限"""
+    if workers <= 1:
+        for task in tasks:
+            yield func(*task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(func, *task))
+            # 读文件比验证快，限制排队的任务数，避免整份文件堆积在内存中
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def validate_many(emails, workers=1, chunk_rows=DEFAULT_CHUNK_ROWS, backend=DEFAULT_BACKEND):
+    """
+    批量验证，结果与逐个调用 is_valid_email 相同。
+
+    参数:
+        emails (Iterable[str]): 地址序列，可以是生成器（按块消费，不会整体载入内存）
+        workers (int): 进程数，大于 1 时各块在子进程中并行验证
+        chunk_rows (int): 每块的行数
+        backend (str): 格式匹配后端，"regex" 或 "scanner"
+
+    返回:
+        EmailBitmap: 按输入顺序排列的结果位图
+
+    异常:
+        TypeError: 如果某个元素不是字符串类型
+    """
+    _get_backend(backend)
+    bitmap = EmailBitmap()
+    tasks = ((chunk, backend) for chunk in _chunks(emails, chunk_rows))
+    for flags in _ordered_map(_validate_values, tasks, workers):
+        bitmap.append_flags(flags)
+    return bitmap
+
+
+def _iter_blocks(path, block_bytes):
+    """按块读取文本文件，每块在最后一个换行符处截断，保证只包含完整的行"""
+    with open(path, "rb") as f:
+        rest = b""
+        while data := f.read(block_bytes):
+            data = rest + data
+            cut = data.rfind(b"\n")
+            if cut < 0:
+                rest = data
+                continue
+            yield data[:cut]
+            rest = data[cut + 1:]
+        # 最后一行没有换行符
+        if rest:
+            yield rest
+
+
+def _iter_csv_column(path, column, encoding):
+    """逐行读取 CSV 的某一列（第一行是表头），缺少该列的行按空字符串处理"""
+    with open(path, newline="", encoding=encoding, errors="replace") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if isinstance(column, str):
+            if column not in header:
+                raise ValueError(f"CSV 表头中没有列 {column!r}，可用的列: {header}")
+            column = header.index(column)
+        for row in reader:
+            yield row[column] if column < len(row) else ""
+
+
+def validate_file(path, column=0, workers=1, encoding="utf-8",
+                  chunk_rows=DEFAULT_CHUNK_ROWS, block_bytes=DEFAULT_BLOCK_BYTES, backend=DEFAULT_BACKEND):
+    """
+    流式验证文件中的地址。
+
+    - .csv 文件：第一行是表头，验证 column 指定的列，结果的第 i 位对应第 i 个数据行
+    - 其他文件：每行一个地址（去掉行尾的 \\n 或 \\r\\n，不去掉空格），空行计为无效的一行
+
+    参数:
+        path (str): 文件路径
+        column (str | int): CSV 的列名或列序号
+        workers (int): 进程数，大于 1 时多个进程并行验证
+        encoding (str): 文件编码，需要兼容 ASCII
+        chunk_rows (int): CSV 每块的行数
+        block_bytes (int): 文本文件每块的字节数
+        backend (str): 格式匹配后端，"regex" 或 "scanner"
+
+    返回:
+        EmailBitmap: 按行排列的结果位图
+    """
+    if str(path).lower().endswith(".csv"):
+        return validate_many(_iter_csv_column(path, column, encoding), workers=workers,
+                             chunk_rows=chunk_rows, backend=backend)
+
+    _get_backend(backend)
+    bitmap = EmailBitmap()
+    tasks = ((block, encoding, backend) for block in _iter_blocks(path, block_bytes))
+    for flags in _ordered_map(_validate_block, tasks, workers):
+        bitmap.append_flags(flags)
+    return bitmap
+
 
 if __name__ == "__main__":
-    # 简单命令行测试
-    import sys
-    if len(sys.argv) > 1:
-        email = sys.argv[1]
-        print(f"'{email}' is {'valid' if is_valid_email(email) else 'invalid'}")
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="验证电子邮件地址")
+    parser.add_argument("email", nargs="?", help="要验证的单个地址")
+    parser.add_argument("--file", help="批量验证：每行一个地址的文本文件，或带表头的 .csv 文件")
+    parser.add_argument("--column", default="0", help="CSV 的列名或列序号")
+    parser.add_argument("--workers", type=int, default=1, help="并行的进程数")
+    parser.add_argument("--bitmap-out", help="把结果位图写入该文件")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=DEFAULT_BACKEND, help="格式匹配后端")
+    args = parser.parse_args()
+
+    if args.file:
+        start = time.perf_counter()
+        column = int(args.column) if args.column.isdigit() else args.column
+        result = validate_file(args.file, column=column, workers=args.workers, backend=args.backend)
+        elapsed = time.perf_counter() - start
+        print(f"✅ {len(result)} 行，有效 {result.count()} 行，无效 {len(result) - result.count()} 行")
+        print(f"⏱️ 耗时 {elapsed:.2f}s（{len(result) / max(elapsed, 1e-9):,.0f} 行/秒）")
+        if args.bitmap_out:
+            with open(args.bitmap_out, "wb") as f:
+                f.write(result.tobytes())
+            print(f"💾 位图已写入 {args.bitmap_out}")
+    elif args.email is not None:
+        print(f"'{args.email}' is {'valid' if is_valid_email(args.email, args.backend) else 'invalid'}")
     else:
         print("Usage: python email_validator.py <email>")
+        print("       python email_validator.py --file <path> [--column COLUMN] [--workers N]")
@@ -1,5 +1,20 @@
+import asyncio
+import importlib.util
+import os
+import random
+import tempfile
 import unittest
-from email_validator import is_valid_email
+from email_staged_validator import DnsPythonResolver, DomainVerdictCache, FakeResolver, StagedEmailValidator
+from email_validator import (BACKENDS, EmailBitmap, MAX_EMAIL_LENGTH, is_valid_email, validate_file,
+                             validate_many)
+
+# 单个验证测试中用到的地址，批量验证的结果必须与逐个验证一致
+SAMPLE_EMAILS = [
+    "simple@example.com", "firstname.lastname@example.com", "user+tag@example.org",
+    "user@sub.domain.co.uk", "user-name@domain-name.com", "plainaddress", "@missingusername.com",
+    "user@.com", "user@domain..com", "user@domain_com", "", " user@example.com", "user@example.com ",
+    "user name@example.com", "user@example .com", " user @ example.com ", "a@b@example.com",
+]
 
 class TestIsValidEmail(unittest.TestCase):
     def test_valid_emails(self):
@@ -62,6 +77,204 @@ class TestIsValidEmail(unittest.TestCase):
         for email in emails_with_spaces:
             with self.subTest(email=email):
                 self.assertFalse(is_valid_email(email), f"应该无效(含空格): {email}")
+    def test_length_limit(self):
+        """超过 254 个字符的地址无效"""
+        domain = "@example.com"
+        self.assertTrue(is_valid_email("a" * (MAX_EMAIL_LENGTH - len(domain)) + domain))
+        self.assertFalse(is_valid_email("a" * (MAX_EMAIL_LENGTH - len(domain) + 1) + domain))
+
+
+class TestEmailBitmap(unittest.TestCase):
+    def test_append_and_access(self):
+        flags = bytes([1, 0, 1, 1, 0, 0, 0, 1, 1, 0, 1])
+        bitmap = EmailBitmap()
+        bitmap.append_flags(flags[:3])
+        bitmap.append_flags(flags[3:])
+
+        self.assertEqual(len(bitmap), 11)
+        self.assertEqual(list(bitmap), [bool(flag) for flag in flags])
+        self.assertEqual((bitmap[-1], bitmap.count()), (True, 6))
+        self.assertEqual(bitmap.tobytes(), bytes([0b10110001, 0b10100000]))
+        self.assertEqual(list(EmailBitmap.frombytes(bitmap.tobytes(), 11)), list(bitmap))
+        with self.assertRaises(IndexError):
+            bitmap[11]
+
+
+class TestBulkValidation(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.expected = [is_valid_email(email) for email in SAMPLE_EMAILS]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+        return path
+
+    def test_validate_many_matches_single(self):
+        self.assertEqual(list(validate_many(SAMPLE_EMAILS)), self.expected)
+        self.assertEqual(list(validate_many(iter(SAMPLE_EMAILS), chunk_rows=3)), self.expected)
+        with self.assertRaises(TypeError):
+            validate_many(["user@example.com", None])
+
+    def test_validate_text_file(self):
+        """每行一个地址，支持 \\r\\n 换行，最后一行可以没有换行符；小块读取时结果不变"""
+        path = self.write("emails.txt", "\r\n".join(SAMPLE_EMAILS[:-1]) + "\n" + SAMPLE_EMAILS[-1])
+
+        self.assertEqual(list(validate_file(path)), self.expected)
+        self.assertEqual(list(validate_file(path, block_bytes=16)), self.expected)
+
+    def test_validate_csv_file(self):
+        rows = "".join(f'{i},"{email}"\n' for i, email in enumerate(SAMPLE_EMAILS))
+        path = self.write("emails.csv", "id,email\n" + rows)
+
+        self.assertEqual(list(validate_file(path, column="email")), self.expected)
+        self.assertEqual(list(validate_file(path, column=1)), self.expected)
+        with self.assertRaises(ValueError):
+            validate_file(path, column="mail")
+
+    def test_parallel_matches_single_process(self):
+        emails = SAMPLE_EMAILS * 50
+        path = self.write("emails.txt", "\n".join(emails) + "\n")
+
+        expected = validate_file(path).tobytes()
+        self.assertEqual(validate_file(path, workers=2, block_bytes=256).tobytes(), expected)
+        self.assertEqual(validate_many(emails, workers=2, chunk_rows=37).tobytes(), expected)
+
+
+class TestBackends(unittest.TestCase):
+    # 模糊测试的字符集：允许的各类字符、@、非法的 ASCII 字符，以及 Unicode 中的相似字符（ſ、开尔文符号 K、全角字母）
+    ALPHABET = "aZ09._%+-@@..--" + " \n\t!#_\x00" + "ſ\u212aａé"
+
+    def assert_agree(self, email):
+        results = {name: match(email) for name, match in BACKENDS.items()}
+        self.assertEqual(len(set(results.values())), 1, f"后端结果不一致: {email!r} {results}")
+        results = {name: is_valid_email(email, name) for name in BACKENDS}
+        self.assertEqual(len(set(results.values())), 1, f"is_valid_email 结果不一致: {email!r} {results}")
+
+    def test_differential_fuzz(self):
+        """随机字符串和对有效地址的随机变异：所有后端的判断完全一致"""
+        rng = random.Random(42)
+        accepted = 0
+        for _ in range(20000):
+            email = "".join(rng.choices(self.ALPHABET, k=rng.randint(0, 24)))
+            self.assert_agree(email)
+        for _ in range(20000):
+            chars = list(rng.choice(SAMPLE_EMAILS[:5]))
+            for _ in range(rng.randint(1, 3)):
+                position = rng.randint(0, len(chars))
+                operation = rng.random()
+                if operation < 0.4:
+                    chars.insert(position, rng.choice(self.ALPHABET))
+                elif chars and operation < 0.7:
+                    del chars[min(position, len(chars) - 1)]
+                elif chars:
+                    chars[min(position, len(chars) - 1)] = rng.choice(self.ALPHABET)
+            email = "".join(chars)
+            self.assert_agree(email)
+            accepted += BACKENDS["regex"](email)
+        # 变异后仍有相当一部分是有效地址，两类结果都覆盖到了
+        self.assertGreater(accepted, 1000)
+
+    def test_edge_cases(self):
+        for email in ["a@b.cc", "a@b.c", "a@.cc", "a@b..cc", "a@b.c1", "a@b.cc.", "a@-.cc", "a@b.cc\n",
+                      "a_b@c.dd", "a@b_c.dd", "a@b%.dd", "@b.cc", "a@@b.cc", "a@b@c.dd", "a.@b.cc",
+                      "a@b" + ".cc" * 100, "a@" + "." * 300 + "cc", "a@b-" + "-" * 300 + ".cc"]:
+            with self.subTest(email=email):
+                self.assert_agree(email)
+
+    def test_bulk_scanner_backend(self):
+        expected = [is_valid_email(email) for email in SAMPLE_EMAILS]
+        self.assertEqual(list(validate_many(SAMPLE_EMAILS, backend="scanner")), expected)
+        with self.assertRaises(ValueError):
+            validate_many(SAMPLE_EMAILS, backend="dfa")
+        with self.assertRaises(ValueError):
+            is_valid_email("simple@example.com", backend="dfa")
+
+
+class TestStagedValidator(unittest.TestCase):
+    RECORDS = {"example.com": ["mx1.example.com"], "example.org": ["mx.example.org"],
+               "sub.domain.co.uk": ["mx.domain.co.uk"], "nomail.com": []}
+
+    def test_domain_cache_lru(self):
+        cache = DomainVerdictCache(maxsize=2)
+        cache.put("a.com", True)
+        cache.put("b.com", False)
+        self.assertIs(cache.get("a.com"), True)   # a.com 变为最近使用
+        cache.put("c.com", True)                  # 淘汰 b.com
+        self.assertEqual((cache.get("b.com"), cache.get("c.com"), len(cache), cache.evictions),
+                         (None, True, 2, 1))
+
+    def test_mx_stage_and_hit_ratio(self):
+        """语法无效的行不查询 DNS；不存在或不接收邮件的域名无效；每个域名只查询一次"""
+        emails = ["a@example.com", "b@Example.COM", "c@nomail.com", "d@missing.com", "plainaddress",
+                  "e@example.org", "f@sub.domain.co.uk", "g@missing.com"] * 25
+        resolver = FakeResolver(self.RECORDS)
+        validator = StagedEmailValidator(resolver, max_concurrency=2)
+
+        result = validator.validate_many(emails, chunk_rows=16)
+        self.assertEqual(list(result)[:8], [True, True, False, False, False, True, True, False])
+        self.assertEqual(list(result), list(result)[:8] * 25)
+        # 4 个不同的域名（大小写不同的算同一个）+ missing.com
+        self.assertEqual(resolver.queries, 5)
+        stats = validator.stats()
+        self.assertEqual((stats["rows"], stats["domain_rows"], stats["dns_lookups"], stats["rejected_domains"]),
+                         (200, 175, 5, 2))
+        self.assertAlmostEqual(stats["hit_ratio"], 1 - 5 / 175)
+
+    def test_bounded_concurrency_and_dns_errors(self):
+        """并发查询数不超过上限；查询失败的地址保留为有效，结论不缓存，下次重新查询"""
+        domains = [f"d{i}.com" for i in range(30)]
+        resolver = FakeResolver({domain: ["mx"] for domain in domains}, latency=0.01, failing={"d0.com"})
+        validator = StagedEmailValidator(resolver, max_concurrency=4)
+
+        emails = [f"user@{domain}" for domain in domains]
+        self.assertEqual(validator.validate_many(emails).count(), 30)
+        self.assertEqual(resolver.peak_concurrency, 4)
+        self.assertEqual(validator.stats()["dns_errors"], 1)
+        validator.validate_many(["user@d0.com", "user@d1.com"])
+        self.assertEqual(resolver.queries, 31)
+
+    @unittest.skipUnless(importlib.util.find_spec("dns"), "需要 dnspython")
+    def test_dnspython_errors_are_not_fatal(self):
+        """dnspython 的超时和 NoNameservers 不是 OSError，也只算作无法确认的查询，不会中断整个文件"""
+        import dns.resolver
+
+        class StubResolver:
+            async def resolve(self, domain, rdtype):
+                if domain == "slow.com":
+                    raise dns.resolver.LifetimeTimeout(timeout=5.0, errors=[])
+                if domain == "broken.com" or rdtype == "A":
+                    raise dns.resolver.NoNameservers()
+                raise dns.resolver.NoAnswer()
+
+        resolver = DnsPythonResolver()
+        resolver._resolver = StubResolver()
+        validator = StagedEmailValidator(resolver)
+
+        # noanswer.com 没有 MX 记录，退回查询 A 记录时出错
+        emails = ["a@slow.com", "b@broken.com", "c@noanswer.com", "plainaddress"]
+        self.assertEqual(list(validator.validate_many(emails)), [True, True, True, False])
+        self.assertEqual(validator.stats()["dns_errors"], 3)
+
+    def test_syntax_only_and_async(self):
+        """不配置解析器时与 validate_many 相同；在事件循环中使用 avalidate_many"""
+        validator = StagedEmailValidator()
+        self.assertEqual(validator.validate_many(SAMPLE_EMAILS).tobytes(), validate_many(SAMPLE_EMAILS).tobytes())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "emails.txt")
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write("\r\n".join(SAMPLE_EMAILS) + "\r\n")
+            self.assertEqual(validator.validate_file(path).tobytes(), validate_file(path).tobytes())
+
+        validator = StagedEmailValidator(FakeResolver(self.RECORDS), backend="scanner")
+        result = asyncio.run(validator.avalidate_many(SAMPLE_EMAILS))
+        self.assertEqual(list(result), [is_valid_email(email) and not email.endswith("domain-name.com")
+                                        for email in SAMPLE_EMAILS])
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试：Agent 一轮中多个工具调用的并发执行和工具结果缓存
+
+模型用脚本代替（不调用 DeepSeek API），工具使用 notebook 中的模拟实现（搜索延迟 1s，产品库 0.5s）：
+- 第 1 轮：三次搜索（其中“小红书美妆趋势”对每个产品都相同）+ 一次产品库查询
+- 第 2 轮：生成表情符号
+- 第 3 轮：输出文案 JSON
+
+对比逐个执行且不缓存（notebook 原来的做法）与并发执行 + 缓存，依次为多个产品生成文案。
+
+用法:
+    python bench_rednote_agent.py
+"""
+
+import contextlib
+import io
+import json
+import time
+
+from openai.types.chat import ChatCompletion
+
+from rednote_agent import RednoteAgent, ToolResultCache, format_timings
+
+PRODUCTS = ["深海蓝藻保湿面膜", "美白精华", "玻尿酸保湿面膜"]
+
+
+def _completion(message: dict) -> ChatCompletion:
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "deepseek-chat",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", **message}}]
+    })
+
+
+def _tool_calls(calls) -> dict:
+    return {"content": None, "tool_calls": [
+        {"id": f"call_{i}", "type": "function",
+         "function": {"name": name, "arguments": json.dumps(args, ensure_ascii=False)}}
+        for i, (name, args) in enumerate(calls)
+    ]}
+
+
+class ScriptedModel:
+    """按对话进度返回固定的工具调用和最终文案，模拟一次约 50ms 的模型调用"""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.chat = self
+        self.completions = self
+
+    def create(self, messages, **kwargs):
+        time.sleep(self.latency)
+        product = messages[1]["content"].split("「")[1].split("」")[0]
+        rounds = sum(1 for m in messages if isinstance(m, dict) and m.get("role") == "assistant")
+        if rounds == 0:
+            return _completion(_tool_calls([
+                ("search_web", {"query": "小红书美妆趋势"}),
+                ("search_web", {"query": f"{product} 用户评价"}),
+                ("search_web", {"query": "保湿面膜 热门话题"}),
+                ("query_product_database", {"product_name": product}),
+            ]))
+        if rounds == 1:
+            return _completion(_tool_calls([("generate_emoji", {"context": "补水保湿 惊喜"})]))
+        note = {"title": f"{product}真的绝了✨", "body": "正文", "hashtags": ["#护肤"], "emojis": ["✨"]}
+        return _completion({"content": "```json\n" + json.dumps(note, ensure_ascii=False) + "\n```"})
+
+
+def run(label: str, agent: RednoteAgent):
+    start = time.perf_counter()
+    results = []
+    for product in PRODUCTS:
+        # 模拟工具会打印调用过程，这里不显示
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append(agent.run(product))
+    elapsed = time.perf_counter() - start
+    first_turns = ", ".join(f"{r.iterations[0].tool_seconds:.2f}s" for r in results)
+    print(f"{label:<16} | 总耗时 {elapsed:>5.2f}s | 第 1 轮工具耗时 {first_turns}")
+    return results, elapsed
+
+
+def main():
+    print(f"📦 {len(PRODUCTS)} 个产品，每个产品第 1 轮请求 3 次搜索 + 1 次产品库查询\n")
+    _, sequential = run("逐个执行，不缓存", RednoteAgent(ScriptedModel(), max_tool_workers=1,
+                                                   cache=ToolResultCache(ttl=0), verbose=False))
+    agent = RednoteAgent(ScriptedModel(), verbose=False)
+    results, parallel = run("并发执行 + 缓存", agent)
+
+    print(f"\n⚡ 快 {sequential / parallel:.1f} 倍；工具缓存 {agent.cache.format_stats()}")
+    print(f"\n⏱️ 第 2 个产品（{PRODUCTS[1]}）每一轮的耗时：")
+    print(format_timings(results[1]))
+
+
+if __name__ == "__main__":
+    main()
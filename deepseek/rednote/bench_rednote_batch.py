@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试：批量生成小红书文案的吞吐量（条/分钟）
+
+模型由本地模拟服务（mock_chat_server）代替，每次请求延迟 --latency 秒；工具使用 notebook 中的模拟实现
+（搜索 1s，产品库 0.5s）。每条文案 2 次模型请求（第 1 轮请求 2 次搜索 + 1 次产品库查询，第 2 轮输出文案）。
+
+对比：
+- 逐条调用：一个 Agent 依次生成（不同产品共用的搜索也会命中缓存），只跑前几条估算速度
+- 批量模式：run_batch 并发运行多个会话，共用连接池、工具缓存和全局的并发/限速
+
+用法:
+    python bench_rednote_batch.py --items 120 --sessions 32 --rpm 1200
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from mock_chat_server import MockChatServer
+from rednote_agent import RednoteAgent, create_client
+from rednote_batch import format_report, run_batch
+
+SEQUENTIAL_ITEMS = 5
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量生成文案的吞吐量基准测试")
+    parser.add_argument("--items", type=int, default=120, help="SKU 数")
+    parser.add_argument("--sessions", type=int, default=32, help="同时运行的会话数")
+    parser.add_argument("--max-requests", type=int, default=16, help="同时在途的模型请求数")
+    parser.add_argument("--rpm", type=float, default=1200, help="每分钟的模型请求数上限")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟模型每次请求的延迟（秒）")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    input_path = os.path.join(tmpdir.name, "products.csv")
+    output_path = os.path.join(tmpdir.name, "notes.jsonl")
+    tones = ["活泼甜美", "知性温柔", "搞怪"]
+    with open(input_path, "w", encoding="utf-8") as f:
+        f.write("id,product_name,tone_style\n")
+        f.writelines(f"sku{i},测试面膜{i}号,{tones[i % len(tones)]}\n" for i in range(args.items))
+
+    print(f"📦 {args.items} 个 SKU，模型延迟 {args.latency}s，会话数 {args.sessions}，"
+          f"在途请求上限 {args.max_requests}，每分钟请求上限 {args.rpm:.0f}\n")
+    with MockChatServer(latency=args.latency) as server:
+        client = create_client(api_key="mock", base_url=server.base_url, max_connections=args.max_requests)
+
+        agent = RednoteAgent(client, verbose=False)
+        start = time.perf_counter()
+        # 模拟工具会打印调用过程，这里不显示
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(SEQUENTIAL_ITEMS):
+                agent.run(f"测试面膜{i}号", tones[i % len(tones)])
+        sequential = SEQUENTIAL_ITEMS / (time.perf_counter() - start) * 60
+        print(f"🐢 逐条调用（前 {SEQUENTIAL_ITEMS} 条）: {sequential:.1f} 条/分钟，"
+              f"{args.items} 条约需 {args.items / sequential:.1f} 分钟")
+
+        server_requests = server.requests
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = run_batch(input_path, output_path, client=client, sessions=args.sessions,
+                               max_concurrent_requests=args.max_requests, requests_per_minute=args.rpm,
+                               verbose=False)
+        print(f"🚀 批量模式: {report.items_per_minute:.1f} 条/分钟，快 {report.items_per_minute / sequential:.1f} 倍")
+        print(f"📊 {format_report(report)}")
+        print(f"🔌 模拟服务：{server.requests - server_requests} 次请求，共 {server.connections} 个 TCP 连接，"
+              f"并发峰值 {server.max_in_flight}")
+
+        # 重新运行：所有行都已在检查点中，直接跳过
+        resumed = run_batch(input_path, output_path, client=client, verbose=False)
+        print(f"♻️ 重新运行：跳过已完成 {resumed.skipped}/{resumed.total} 行，模型请求 {resumed.llm_requests} 次")
+    tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
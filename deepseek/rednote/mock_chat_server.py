@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地的模拟 chat completions 服务（OpenAI 兼容）：用于测试和基准测试批量文案生成，不消耗 DeepSeek 额度
+
+按小红书文案 Agent 的流程应答：
+- 对话中还没有工具结果时，返回 tool_calls：搜索“小红书美妆趋势”、搜索产品评价、查询产品库
+- 已经有工具结果时，返回用 ```json 代码块包裹的文案
+
+可配置每次请求的延迟和注入 429 错误（带 Retry-After），统计连接数、请求数和并发请求峰值，
+用于验证共享连接池、并发限制和限速。
+
+用法:
+    with MockChatServer(latency=0.05) as server:
+        client = OpenAI(api_key="test", base_url=server.base_url)
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+def agent_reply(messages: List[dict]) -> dict:
+    """根据对话进度生成 assistant 消息：先请求工具，收到工具结果后输出文案"""
+    user_prompt = next((m.get("content") or "" for m in messages if m.get("role") == "user"), "")
+    match = re.search(r"「(.+?)」.*?语气(\S+?)，", user_prompt)
+    product, tone = match.groups() if match else ("产品", "活泼甜美")
+
+    if not any(m.get("role") == "tool" for m in messages):
+        calls = [
+            ("search_web", {"query": "小红书美妆趋势"}),
+            ("search_web", {"query": f"{product} 用户评价"}),
+            ("query_product_database", {"product_name": product}),
+        ]
+        return {"role": "assistant", "content": None, "tool_calls": [
+            {"id": f"call_{i}", "type": "function",
+             "function": {"name": name, "arguments": json.dumps(args, ensure_ascii=False)}}
+            for i, (name, args) in enumerate(calls)
+        ]}
+
+    note = {
+        "title": f"✨ {product}｜{tone}姐妹们冲！",
+        "body": f"最近挖到的宝藏{product}，用了一周真的爱了💖",
+        "hashtags": [f"#{product}", "#护肤好物", "#小红书爆款", "#好物分享", "#美妆趋势"],
+        "emojis": ["✨", "💖", "🔥", "💧", "🌿"],
+    }
+    return {"role": "assistant", "content": "```json\n" + json.dumps(note, ensure_ascii=False) + "\n```"}
+
+
+class _ChatCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # 每个 TCP 连接对应一个 handler 实例
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.stats_lock:
+            self.server.requests += 1
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+
+        try:
+            self._handle_chat_completions(body)
+        finally:
+            with self.server.stats_lock:
+                self.server.in_flight -= 1
+
+    def _handle_chat_completions(self, body: bytes):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        mock = self.server.mock
+        if mock.should_fail():
+            with self.server.stats_lock:
+                self.server.errors += 1
+            # OpenAI SDK 优先使用 retry-after-ms，Retry-After 只支持整数秒
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                            {"retry-after-ms": str(int(mock.retry_after * 1000)),
+                             "Retry-After": str(math.ceil(mock.retry_after))})
+            return
+
+        request = json.loads(body or b"{}")
+        time.sleep(mock.latency)
+        message = agent_reply(request["messages"])
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock-model"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    # 并发会话多时默认的 listen backlog（5）不够，连接会被丢弃后重试
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class MockChatServer:
+    """在后台线程中运行的模拟 chat completions 服务"""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        error_rate: float = 0.0,
+        retry_after: float = 0.05,
+        seed: Optional[int] = None,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        """
+        Args:
+            latency: 每次请求的响应延迟（秒），模拟模型生成的耗时
+            error_rate: 返回 429 的请求比例
+            retry_after: 429 响应中建议的重试等待时间（秒）
+            seed: 注入错误的随机种子
+            host: 监听地址
+            port: 监听端口，0 表示随机分配
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+
+        self._server = _MockHTTPServer((host, port), _ChatCompletionsHandler)
+        self._server.mock = self
+        self._server.stats_lock = threading.Lock()
+        self._server.connections = 0
+        self._server.requests = 0
+        self._server.errors = 0
+        self._server.in_flight = 0
+        self._server.max_in_flight = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def should_fail(self) -> bool:
+        with self._server.stats_lock:
+            return self._rng.random() < self.error_rate
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def connections(self) -> int:
+        return self._server.connections
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    @property
+    def errors(self) -> int:
+        """注入的 429 错误数"""
+        return self._server.errors
+
+    @property
+    def max_in_flight(self) -> int:
+        """同时处理中的请求数峰值"""
+        return self._server.max_in_flight
+
+    def start(self) -> "MockChatServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockChatServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    server = MockChatServer().start()
+    print(f"🧪 模拟 chat completions 服务已启动: {server.base_url}（Ctrl+C 退出）")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+小红书爆款文案生成 Agent：rednote.ipynb 中 Thought-Action-Observation 循环的可导入版本
+
+- 模型在一轮中请求的多个工具调用（tool_calls）并发执行（线程池），结果按原顺序写回对话，
+  一轮的工具耗时取决于最慢的那个调用，而不是所有调用之和
+- 确定性的工具（网页搜索、产品库查询）按 (工具名, 参数) 缓存结果，有效期内相同的调用直接返回，
+  不同产品的文案反复搜索“小红书美妆趋势”时只执行一次；同一轮中重复的调用也只执行一次
+- 每一轮记录模型调用耗时、工具执行耗时、工具调用数和缓存命中数
+
+用法:
+    agent = RednoteAgent(client)
+    result = agent.run("深海蓝藻保湿面膜", "活泼甜美")
+    print(result.text)
+    print(format_timings(result))
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+import httpx
+from openai import OpenAI
+
+DEEPSEEK_MODEL = "deepseek-chat"
+DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
+
+# 工具结果的缓存有效期（秒）和最多缓存的条数
+DEFAULT_TOOL_CACHE_TTL = 600.0
+DEFAULT_TOOL_CACHE_SIZE = 1024
+# 一轮中并发执行的工具调用数上限
+DEFAULT_TOOL_WORKERS = 8
+
+FAILED_MESSAGE = "未能成功生成文案。"
+
+SYSTEM_PROMPT = """
+你是一个资深的小红书爆款文案专家，擅长结合最新潮流和产品卖点，创作引人入胜、高互动、高转化的笔记文案。
+
+你的任务是根据用户提供的产品和需求，生成包含标题、正文、相关标签和表情符号的完整小红书笔记。
+
+请始终采用'Thought-Action-Observation'模式进行推理和行动。文案风格需活泼、真诚、富有感染力。当完成任务后，请以JSON格式直接输出最终文案，格式如下：
+```json
+{
+  "title": "小红书标题",
+  "body": "小红书正文",
+  "hashtags": ["#标签1", "#标签2", "#标签3", "#标签4", "#标签5"],
+  "emojis": ["✨", "🔥", "💖"]
+}
+```
+在生成文案前，请务必先思考并收集足够的信息。
+"""
+
+TOOLS_DEFINITION = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_web",
+            "description": "搜索互联网上的实时信息，用于获取最新新闻、流行趋势、用户评价、行业报告等。请确保搜索关键词精确，避免宽泛的查询。",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "要搜索的关键词或问题，例如'最新小红书美妆趋势'或'深海蓝藻保湿面膜 用户评价'"
+                    }
+                },
+                "required": ["query"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "query_product_database",
+            "description": "查询内部产品数据库，获取指定产品的详细卖点、成分、适用人群、使用方法等信息。",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "product_name": {
+                        "type": "string",
+                        "description": "要查询的产品名称，例如'深海蓝藻保湿面膜'"
+                    }
+                },
+                "required": ["product_name"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "generate_emoji",
+            "description": "根据提供的文本内容，生成一组适合小红书风格的表情符号。",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "context": {
+                        "type": "string",
+                        "description": "文案的关键内容或情感，例如'惊喜效果'、'补水保湿'"
+                    }
+                },
+                "required": ["context"]
+            }
+        }
+    }
+]
+
+
+def mock_search_web(query: str) -> str:
+    """模拟网页搜索工具，返回预设的搜索结果。"""
+    print(f"[Tool Call] 模拟搜索网页：{query}")
+    time.sleep(1)  # 模拟网络延迟
+    if "小红书美妆趋势" in query:
+        return "近期小红书美妆流行'多巴胺穿搭'、'早C晚A'护肤理念、'伪素颜'妆容，热门关键词有#氛围感、#抗老、#屏障修复。"
+    elif "保湿面膜" in query:
+        return "小红书保湿面膜热门话题：沙漠干皮救星、熬夜急救面膜、水光肌养成。用户痛点：卡粉、泛红、紧绷感。"
+    elif "深海蓝藻保湿面膜" in query:
+        return "关于深海蓝藻保湿面膜的用户评价：普遍反馈补水效果好，吸收快，对敏感肌友好。有用户提到价格略高，但效果值得。"
+    else:
+        return f"未找到关于 '{query}' 的特定信息，但市场反馈通常关注产品成分、功效和用户体验。"
+
+
+def mock_query_product_database(product_name: str) -> str:
+    """模拟查询产品数据库，返回预设的产品信息。"""
+    print(f"[Tool Call] 模拟查询产品数据库：{product_name}")
+    time.sleep(0.5)  # 模拟数据库查询延迟
+    if "深海蓝藻保湿面膜" in product_name:
+        return "深海蓝藻保湿面膜：核心成分为深海蓝藻提取物，富含多糖和氨基酸，能深层补水、修护肌肤屏障、舒缓敏感泛红。质地清爽不粘腻，适合所有肤质，尤其适合干燥、敏感肌。规格：25ml*5片。"
+    elif "美白精华" in product_name:
+        return "美白精华：核心成分是烟酰胺和VC衍生物，主要功效是提亮肤色、淡化痘印、改善暗沉。质地轻薄易吸收，适合需要均匀肤色的人群。"
+    else:
+        return f"产品数据库中未找到关于 '{product_name}' 的详细信息。"
+
+
+def mock_generate_emoji(context: str) -> list:
+    """模拟生成表情符号，根据上下文提供常用表情。"""
+    print(f"[Tool Call] 模拟生成表情符号，上下文：{context}")
+    time.sleep(0.2)  # 模拟生成延迟
+    if "补水" in context or "水润" in context or "保湿" in context:
+        return ["💦", "💧", "🌊", "✨"]
+    elif "惊喜" in context or "哇塞" in context or "爱了" in context:
+        return ["💖", "😍", "🤩", "💯"]
+    elif "熬夜" in context or "疲惫" in context:
+        return ["😭", "😮‍💨", "😴", "💡"]
+    elif "好物" in context or "推荐" in context:
+        return ["✅", "👍", "⭐", "🛍️"]
+    else:
+        return random.sample(["✨", "🔥", "💖", "💯", "🎉", "👍", "🤩", "💧", "🌿"], k=min(5, len(context.split())))
+
+
+# 将模拟工具函数映射到一个字典，方便通过名称调用
+AVAILABLE_TOOLS: Dict[str, Callable] = {
+    "search_web": mock_search_web,
+    "query_product_database": mock_query_product_database,
+    "generate_emoji": mock_generate_emoji,
+}
+
+# 相同参数总是返回相同结果的工具，结果可以缓存；generate_emoji 的兜底分支是随机的，不缓存
+DETERMINISTIC_TOOLS = frozenset({"search_web", "query_product_database"})
+
+
+class ToolResultCache:
+    """(工具名, 参数) → 工具结果的缓存，条目超过 ttl 秒后失效，超过 maxsize 条时淘汰最久未使用的"""
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TOOL_CACHE_TTL,
+        maxsize: int = DEFAULT_TOOL_CACHE_SIZE,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            ttl: 有效期（秒）
+            maxsize: 最多缓存的条数
+            clock: 时钟，测试时可以替换
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        # key -> (过期时间, 结果)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        # 正在执行的调用：key -> Future，并发的相同调用等待同一个结果
+        self._in_flight: Dict[Tuple[str, str], Future] = {}
+        # 多个 Agent（线程）可以共用一个缓存
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(name: str, args: dict) -> Tuple[str, str]:
+        """参数按键排序后序列化，键的顺序不同的相同调用命中同一条缓存"""
+        return name, json.dumps(args, ensure_ascii=False, sort_keys=True)
+
+    def _lookup(self, key: Tuple[str, str]) -> Optional[str]:
+        # 调用方持有锁
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self.clock():
+            if entry is not None:
+                del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key: Tuple[str, str], result: str):
+        # 调用方持有锁
+        self._entries[key] = (self.clock() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        """返回未过期的结果，未命中时返回 None"""
+        with self._lock:
+            result = self._lookup(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def put(self, key: Tuple[str, str], result: str):
+        with self._lock:
+            self._store(key, result)
+
+    def run_once(self, key: Tuple[str, str], func: Callable[[], Tuple[str, bool]]) -> Tuple[str, bool]:
+        """
+        执行 func() 并缓存成功的结果；其他线程正在执行相同的调用时，等待并共用它的结果（不再重复执行）
+
+        Args:
+            key: 缓存 key
+            func: 返回 (结果, 是否成功)，只有成功的结果会被缓存
+
+        Returns:
+            (结果, 是否成功)
+        """
+        with self._lock:
+            result = self._lookup(key)
+            if result is not None:
+                # 在 get 未命中之后、执行之前，另一个会话刚好写入了结果
+                self.coalesced += 1
+                return result, True
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+
+        try:
+            outcome = func()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            if outcome[1]:
+                self._store(key, outcome[0])
+            del self._in_flight[key]
+        future.set_result(outcome)
+        return outcome
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "coalesced": self.coalesced
+        }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"{s['entries']} 条，命中 {s['hits']}/{s['hits'] + s['misses']} ({s['hit_rate']:.0%})，"
+                f"合并并发的相同调用 {s['coalesced']} 次")
+
+
+class IterationTiming(NamedTuple):
+    """Agent 一轮（一次模型调用 + 本轮的工具调用）的耗时"""
+
+    iteration: int
+    llm_seconds: float
+    tool_seconds: float
+    tool_calls: int
+    cache_hits: int
+
+
+class AgentResult(NamedTuple):
+    """一次文案生成的结果"""
+
+    text: str                         # 格式化的 JSON 文案；失败时为 FAILED_MESSAGE
+    note: Optional[dict]              # 解析后的文案，失败时为 None
+    iterations: List[IterationTiming]
+    seconds: float
+    error: Optional[str] = None       # 调用 API 出错时的错误信息
+
+
+def parse_rednote_json(content: str) -> Optional[dict]:
+    """从模型回复中解析文案 JSON：优先取 ```json 代码块，否则尝试解析整段内容；失败时返回 None"""
+    match = re.search(r"```json\s*(\{.*\})\s*```", content, re.DOTALL)
+    try:
+        return json.loads(match.group(1) if match else content)
+    except json.JSONDecodeError:
+        return None
+
+
+def build_user_prompt(product_name: str, tone_style: str) -> str:
+    return (f"请为产品「{product_name}」生成一篇小红书爆款文案。要求：语气{tone_style}，包含标题、正文、"
+            f"至少5个相关标签和5个表情符号。请以完整的JSON格式输出，并确保JSON内容用markdown代码块包裹"
+            f"（例如：```json{{...}}```）。")
+
+
+def create_client(
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    max_connections: int = 20,
+    timeout: float = 60.0,
+    max_retries: int = 2
+) -> OpenAI:
+    """
+    创建带 keep-alive 连接池的 DeepSeek 客户端，未指定的参数从环境变量 DEEPSEEK_API_KEY / DEEPSEEK_BASE_URL 读取
+
+    客户端是线程安全的，并发的多个 Agent 会话应共用一个，复用连接池中的 HTTP 连接和 TLS 会话；
+    遇到 429 / 5xx 时 SDK 按 Retry-After 自动重试 max_retries 次。
+    """
+    api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
+    if not api_key:
+        raise ValueError("请设置 DEEPSEEK_API_KEY 环境变量")
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return OpenAI(
+        api_key=api_key,
+        base_url=base_url or os.getenv("DEEPSEEK_BASE_URL", DEEPSEEK_BASE_URL),
+        http_client=httpx.Client(limits=limits, timeout=timeout),
+        max_retries=max_retries
+    )
+
+
+class RednoteAgent:
+    """
+    Thought-Action-Observation 循环：调用模型 → 并发执行本轮的工具调用 → 把结果写回对话，直到模型输出文案 JSON
+    """
+
+    def __init__(
+        self,
+        client: Optional[OpenAI] = None,
+        model: str = DEEPSEEK_MODEL,
+        system_prompt: str = SYSTEM_PROMPT,
+        tools_definition: Optional[List[dict]] = None,
+        tools: Optional[Dict[str, Callable]] = None,
+        cache: Optional[ToolResultCache] = None,
+        cacheable_tools: FrozenSet[str] = DETERMINISTIC_TOOLS,
+        max_tool_workers: int = DEFAULT_TOOL_WORKERS,
+        verbose: bool = True
+    ):
+        """
+        Args:
+            client: OpenAI 兼容客户端，默认用 create_client() 创建
+            model: 模型名称
+            system_prompt: 系统提示词
+            tools_definition: 传给模型的工具定义，默认 TOOLS_DEFINITION
+            tools: 工具名 → 函数，默认 AVAILABLE_TOOLS
+            cache: 工具结果缓存，多个 Agent 可以共用一个；默认新建一个
+            cacheable_tools: 结果可以缓存的工具
+            max_tool_workers: 一轮中并发执行的工具调用数上限，1 表示逐个执行
+            verbose: 是否打印每一步的过程
+        """
+        self.client = client or create_client()
+        self.model = model
+        self.system_prompt = system_prompt
+        self.tools_definition = TOOLS_DEFINITION if tools_definition is None else tools_definition
+        self.tools = AVAILABLE_TOOLS if tools is None else tools
+        self.cache = ToolResultCache() if cache is None else cache
+        self.cacheable_tools = cacheable_tools
+        self.max_tool_workers = max_tool_workers
+        self.verbose = verbose
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    def _run_tool(self, name: str, args: dict) -> Tuple[str, bool]:
+        """执行一个工具，返回 (结果, 是否成功)；工具抛出的异常作为错误信息返回给模型"""
+        try:
+            return str(self.tools[name](**args)), True
+        except Exception as e:
+            return f"错误：工具 '{name}' 执行失败: {e}", False
+
+    def execute_tool_calls(self, tool_calls) -> Tuple[List[dict], int]:
+        """
+        执行模型在一轮中请求的全部工具调用
+
+        缓存命中的直接返回；其余的去重后在线程池中并发执行，可缓存的结果写入缓存。
+        其他会话正在执行相同的可缓存调用时，等待它的结果而不是再执行一次。
+
+        Returns:
+            (按 tool_calls 顺序排列的 tool 消息, 缓存命中数)
+        """
+        contents: List[Optional[str]] = [None] * len(tool_calls)
+        # 需要执行的调用：key → 使用该结果的 tool_calls 下标；不可缓存的调用以下标为 key，不合并
+        pending: Dict[tuple, List[int]] = {}
+        calls: Dict[tuple, Tuple[str, dict]] = {}
+        cache_hits = 0
+
+        for i, tool_call in enumerate(tool_calls):
+            name = tool_call.function.name
+            try:
+                # 即使工具不要求参数，也需要传递空字典
+                args = json.loads(tool_call.function.arguments) if tool_call.function.arguments else {}
+            except json.JSONDecodeError as e:
+                contents[i] = f"错误：工具 '{name}' 的参数不是合法的 JSON: {e}"
+                continue
+            self._log(f"Agent Action: 调用工具 '{name}'，参数：{args}")
+            if name not in self.tools:
+                contents[i] = f"错误：未知的工具 '{name}'"
+                continue
+
+            if name not in self.cacheable_tools:
+                key = (name, i)
+            else:
+                key = ToolResultCache.key(name, args)
+                cached = None if key in pending else self.cache.get(key)
+                if cached is not None:
+                    contents[i] = cached
+                    cache_hits += 1
+                    continue
+            pending.setdefault(key, []).append(i)
+            calls[key] = (name, args)
+
+        if pending:
+            workers = max(1, min(self.max_tool_workers, len(pending)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    key: executor.submit(self.cache.run_once, key, partial(self._run_tool, *calls[key]))
+                    if calls[key][0] in self.cacheable_tools else executor.submit(self._run_tool, *calls[key])
+                    for key in pending
+                }
+            for key, future in futures.items():
+                result, _ = future.result()
+                for i in pending[key]:
+                    contents[i] = result
+
+        messages = []
+        for tool_call, content in zip(tool_calls, contents):
+            self._log(f"Observation: 工具返回结果：{content}")
+            messages.append({"tool_call_id": tool_call.id, "role": "tool", "content": content})
+        return messages, cache_hits
+
+    def run(self, product_name: str, tone_style: str = "活泼甜美", max_iterations: int = 5) -> AgentResult:
+        """
+        使用 DeepSeek Agent 生成小红书爆款文案。
+
+        Args:
+            product_name: 要生成文案的产品名称。
+            tone_style: 文案的语气和风格，如"活泼甜美"、"知性"、"搞怪"等。
+            max_iterations: Agent 最大迭代次数，防止无限循环。
+
+        Returns:
+            AgentResult: 文案和每一轮的耗时
+        """
+        self._log(f"\n🚀 启动小红书文案生成助手，产品：{product_name}，风格：{tone_style}\n")
+        start = time.perf_counter()
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": build_user_prompt(product_name, tone_style)}
+        ]
+        timings: List[IterationTiming] = []
+
+        for iteration in range(1, max_iterations + 1):
+            self._log(f"-- Iteration {iteration} --")
+            llm_start = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    tools=self.tools_definition,  # 告知模型可用的工具
+                    tool_choice="auto"  # 允许模型自动决定是否使用工具
+                )
+            except Exception as e:
+                self._log(f"调用 DeepSeek API 时发生错误: {e}")
+                timings.append(IterationTiming(iteration, time.perf_counter() - llm_start, 0.0, 0, 0))
+                return AgentResult(FAILED_MESSAGE, None, timings, time.perf_counter() - start, f"API 调用失败: {e}")
+            llm_seconds = time.perf_counter() - llm_start
+            response_message = response.choices[0].message
+
+            # ReAct 模式：处理工具调用
+            if response_message.tool_calls:
+                self._log("Agent: 决定调用工具...")
+                messages.append(response_message.model_dump(exclude_none=True))
+                tool_start = time.perf_counter()
+                tool_messages, cache_hits = self.execute_tool_calls(response_message.tool_calls)
+                messages.extend(tool_messages)  # 工具执行结果作为 Observation 添加到对话历史
+                timings.append(IterationTiming(iteration, llm_seconds, time.perf_counter() - tool_start,
+                                               len(tool_messages), cache_hits))
+                continue
+
+            timings.append(IterationTiming(iteration, llm_seconds, 0.0, 0, 0))
+            # ReAct 模式：处理最终内容
+            if not response_message.content:
+                self._log("Agent: 未知响应，可能需要更多交互。")
+                break
+            self._log(f"[模型生成结果] {response_message.content}")
+            note = parse_rednote_json(response_message.content)
+            if note is not None:
+                self._log("Agent: 任务完成，成功解析最终JSON文案。")
+                return AgentResult(json.dumps(note, ensure_ascii=False, indent=2), note, timings,
+                                   time.perf_counter() - start)
+            self._log("Agent: 生成了非JSON格式内容或非Markdown JSON块，可能还在思考或出错。")
+            messages.append({"role": "assistant", "content": response_message.content})  # 继续对话
+
+        self._log("\n⚠️ Agent 达到最大迭代次数或未能生成最终文案。请检查Prompt或增加迭代次数。")
+        return AgentResult(FAILED_MESSAGE, None, timings, time.perf_counter() - start)
+
+    def generate(self, product_name: str, tone_style: str = "活泼甜美", max_iterations: int = 5) -> str:
+        """与 notebook 中的 generate_rednote 相同：返回 JSON 格式的文案字符串，失败时返回 FAILED_MESSAGE"""
+        return self.run(product_name, tone_style, max_iterations).text
+
+
+def format_timings(result: AgentResult) -> str:
+    """每一轮的耗时表"""
+    lines = [f"{'轮次':>4} | {'模型(s)':>8} | {'工具(s)':>8} | {'调用数':>6} | {'缓存命中':>8}"]
+    for t in result.iterations:
+        lines.append(f"{t.iteration:>6} | {t.llm_seconds:>9.2f} | {t.tool_seconds:>9.2f} | "
+                     f"{t.tool_calls:>9} | {t.cache_hits:>12}")
+    lines.append(f"总耗时 {result.seconds:.2f}s")
+    return "\n".join(lines)
+
+
+_default_agent: Optional[RednoteAgent] = None
+
+
+def generate_rednote(product_name: str, tone_style: str = "活泼甜美", max_iterations: int = 5) -> str:
+    """使用模块级共享的 Agent（工具缓存在多次调用之间共用）生成文案，返回 JSON 格式的字符串"""
+    global _default_agent
+    if _default_agent is None:
+        _default_agent = RednoteAgent()
+    return _default_agent.generate(product_name, tone_style, max_iterations)
+
+
+if __name__ == "__main__":
+    import sys
+
+    agent = RednoteAgent()
+    for product in sys.argv[1:] or ["深海蓝藻保湿面膜"]:
+        result = agent.run(product)
+        print(f"\n--- 生成的文案：{product} ---")
+        print(result.text)
+        print(format_timings(result))
+    print(f"\n🗃️ 工具缓存：{agent.cache.format_stats()}")
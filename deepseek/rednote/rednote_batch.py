@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量生成小红书文案：从 CSV 读取产品和语气，并发运行多个 Agent 会话，结果写入 JSONL
+
+- 所有会话共用一个带连接池的客户端、一个 Agent 和一份工具结果缓存（“小红书美妆趋势”只搜索一次）
+- 全局限制：同时运行的会话数、同时在途的模型请求数，以及每分钟的模型请求数（令牌桶）
+- 每完成一行就追加写入输出文件（JSONL，一行一条）；重新运行时跳过已经成功的行，从中断处继续
+- 结束时报告成功/失败数、耗时和每分钟完成的条数
+
+输入 CSV 需要表头，product_name 列必填；tone_style 列可选（为空时使用默认语气）；
+有 id 列时用它识别已完成的行，否则用 (产品名, 语气)。
+
+用法:
+    python rednote_batch.py products.csv --output notes.jsonl --sessions 16 --rpm 300
+    python rednote_batch.py products.csv --output notes.jsonl --mock-server   # 本地模拟服务，不消耗额度
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
+from typing import Callable, Dict, List, NamedTuple, Optional, Set
+
+from rednote_agent import RednoteAgent, ToolResultCache, create_client
+
+DEFAULT_TONE_STYLE = "活泼甜美"
+# 同时运行的 Agent 会话数
+DEFAULT_SESSIONS = 8
+# 同时在途的模型请求数，也是共享客户端连接池的大小
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+# 每分钟的模型请求数上限
+DEFAULT_REQUESTS_PER_MINUTE = 300
+
+
+class BatchItem(NamedTuple):
+    """CSV 中的一行"""
+
+    key: str
+    row: int
+    product_name: str
+    tone_style: str
+
+
+class BatchReport(NamedTuple):
+    """一次批量运行的统计"""
+
+    total: int
+    skipped: int        # 之前已经成功、本次跳过的行
+    succeeded: int
+    failed: int
+    seconds: float
+    llm_requests: int
+    throttle_wait: float
+    peak_requests: int
+
+    @property
+    def items_per_minute(self) -> float:
+        done = self.succeeded + self.failed
+        return done / self.seconds * 60 if self.seconds else 0.0
+
+
+class TokenBucket:
+    """线程安全的令牌桶：每秒补充 rate 个令牌，最多积累 burst 个"""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """预订一个令牌，返回需要等待的秒数（令牌可以透支，排队的调用按预订顺序等待）"""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+class LimitedClient:
+    """
+    包装共享的 OpenAI 客户端：每次 chat.completions.create 先从令牌桶取令牌，再占用一个并发名额
+
+    对 Agent 来说与普通客户端相同（client.chat.completions.create(...)），所有会话共用同一组限制。
+    """
+
+    def __init__(self, client, requests_per_minute: float, max_concurrent_requests: int):
+        self.client = client
+        self.bucket = TokenBucket(requests_per_minute / 60, burst=max_concurrent_requests)
+        self._semaphore = threading.BoundedSemaphore(max_concurrent_requests)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttle_wait = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        wait = self.bucket.acquire()
+        with self._semaphore:
+            with self._lock:
+                self.requests += 1
+                self.throttle_wait += wait
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                return self.client.chat.completions.create(**kwargs)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+
+def read_items(path: str, default_tone: str = DEFAULT_TONE_STYLE) -> List[BatchItem]:
+    """读取产品 CSV（需要 product_name 列），跳过产品名为空的行；key 重复的行只保留第一行"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        if "product_name" not in (reader.fieldnames or []):
+            raise ValueError(f"CSV 表头中没有列 'product_name'，可用的列: {reader.fieldnames}")
+        items: Dict[str, BatchItem] = {}
+        for row, record in enumerate(reader):
+            product = (record.get("product_name") or "").strip()
+            if not product:
+                continue
+            tone = (record.get("tone_style") or "").strip() or default_tone
+            key = (record.get("id") or "").strip() or f"{product}|{tone}"
+            items.setdefault(key, BatchItem(key, row, product, tone))
+    return list(items.values())
+
+
+def load_completed(output_path: str) -> Set[str]:
+    """读取输出文件中已经成功的行的 key；中断时没写完的最后一行会被忽略"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("ok"):
+                completed.add(record["key"])
+    return completed
+
+
+def _open_checkpoint(output_path: str):
+    """以追加方式打开输出文件；上次中断时最后一行没写完的，先补一个换行，避免与新记录连在一起"""
+    needs_newline = False
+    if os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    f = open(output_path, "a", encoding="utf-8")
+    if needs_newline:
+        f.write("\n")
+    return f
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    client=None,
+    tools: Optional[Dict[str, Callable]] = None,
+    sessions: int = DEFAULT_SESSIONS,
+    max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+    max_iterations: int = 5,
+    cache: Optional[ToolResultCache] = None,
+    verbose: bool = True
+) -> BatchReport:
+    """
+    批量生成文案
+
+    Args:
+        input_path: 产品 CSV
+        output_path: 输出的 JSONL 文件，同时作为检查点：已经成功的行不会重新生成
+        client: 共享的 OpenAI 兼容客户端，默认用 create_client() 创建，连接池大小为 max_concurrent_requests
+        tools: 工具名 → 函数，默认使用 rednote_agent 中的模拟工具
+        sessions: 同时运行的 Agent 会话数
+        max_concurrent_requests: 同时在途的模型请求数
+        requests_per_minute: 每分钟的模型请求数上限
+        max_iterations: 每个会话的最大迭代次数
+        cache: 工具结果缓存，默认新建一个，所有会话共用
+        verbose: 是否打印每一行的进度
+
+    Returns:
+        BatchReport: 运行统计
+    """
+    items = read_items(input_path)
+    completed = load_completed(output_path)
+    todo = [item for item in items if item.key not in completed]
+
+    client = client or create_client(max_connections=max_concurrent_requests)
+    limited = LimitedClient(client, requests_per_minute, max_concurrent_requests)
+    agent = RednoteAgent(limited, tools=tools, cache=cache, verbose=False)
+
+    succeeded = failed = 0
+    start = time.perf_counter()
+    with _open_checkpoint(output_path) as out, ThreadPoolExecutor(max_workers=max(1, sessions)) as executor:
+        futures = {executor.submit(agent.run, item.product_name, item.tone_style, max_iterations): item
+                   for item in todo}
+        # 结果在主线程中按完成顺序写入，不需要给文件加锁
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                result = future.result()
+                note, error = result.note, result.error
+                seconds, iterations = result.seconds, len(result.iterations)
+            except Exception as e:
+                note, error, seconds, iterations = None, str(e), 0.0, 0
+            ok = note is not None
+            record = {
+                "key": item.key, "row": item.row, "product_name": item.product_name,
+                "tone_style": item.tone_style, "ok": ok, "note": note,
+                "error": None if ok else (error or "未能生成文案"),
+                "seconds": round(seconds, 3), "iterations": iterations
+            }
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            succeeded += ok
+            failed += not ok
+            if verbose:
+                done = succeeded + failed
+                print(f"{'✅' if ok else '❌'} [{done}/{len(todo)}] {item.product_name}（{item.tone_style}）"
+                      f"{seconds:.1f}s" + ("" if ok else f" {record['error']}"))
+
+    return BatchReport(
+        total=len(items),
+        skipped=len(items) - len(todo),
+        succeeded=succeeded,
+        failed=failed,
+        seconds=time.perf_counter() - start,
+        llm_requests=limited.requests,
+        throttle_wait=limited.throttle_wait,
+        peak_requests=limited.peak_in_flight
+    )
+
+
+def format_report(report: BatchReport) -> str:
+    return (f"共 {report.total} 行，跳过已完成 {report.skipped}，成功 {report.succeeded}，失败 {report.failed}；"
+            f"耗时 {report.seconds:.1f}s，{report.items_per_minute:.1f} 条/分钟\n"
+            f"模型请求 {report.llm_requests} 次，并发峰值 {report.peak_requests}，限速等待共 {report.throttle_wait:.1f}s")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="批量生成小红书文案")
+    parser.add_argument("input", help="产品 CSV（表头含 product_name，可选 tone_style、id）")
+    parser.add_argument("--output", default="rednote_batch.jsonl", help="输出的 JSONL 文件（兼作检查点）")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS, help="同时运行的会话数")
+    parser.add_argument("--max-requests", type=int, default=DEFAULT_MAX_CONCURRENT_REQUESTS,
+                        help="同时在途的模型请求数")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_REQUESTS_PER_MINUTE, help="每分钟的模型请求数上限")
+    parser.add_argument("--max-iterations", type=int, default=5, help="每个会话的最大迭代次数")
+    parser.add_argument("--mock-server", action="store_true", help="使用本地的模拟 chat completions 服务")
+    args = parser.parse_args()
+
+    server = None
+    client = None
+    if args.mock_server:
+        from mock_chat_server import MockChatServer
+
+        server = MockChatServer().start()
+        client = create_client(api_key="mock", base_url=server.base_url, max_connections=args.max_requests)
+    try:
+        report = run_batch(args.input, args.output, client=client, sessions=args.sessions,
+                           max_concurrent_requests=args.max_requests, requests_per_minute=args.rpm,
+                           max_iterations=args.max_iterations)
+    finally:
+        if server is not None:
+            server.stop()
+    print(f"\n📊 {format_report(report)}")
+    print(f"💾 结果已写入 {args.output}")
@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from openai.types.chat import ChatCompletion
+
+from rednote_agent import FAILED_MESSAGE, RednoteAgent, ToolResultCache, parse_rednote_json
+
+NOTE = {"title": "标题", "body": "正文", "hashtags": ["#a"], "emojis": ["✨"]}
+
+
+def completion(content=None, tool_calls=()):
+    """构造一个 chat.completions 的响应，tool_calls 为 (工具名, 参数) 列表"""
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "deepseek-chat",
+        "choices": [{"index": 0, "finish_reason": "tool_calls" if tool_calls else "stop", "message": {
+            "role": "assistant", "content": content,
+            "tool_calls": [
+                {"id": f"call_{i}", "type": "function",
+                 "function": {"name": name, "arguments": json.dumps(args, ensure_ascii=False)}}
+                for i, (name, args) in enumerate(tool_calls)
+            ] or None
+        }}]
+    })
+
+
+class ScriptedClient:
+    """按顺序返回预设响应的客户端，记录每次请求的消息"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.requests.append(kwargs["messages"])
+        return self.responses.pop(0)
+
+
+def final_reply():
+    return completion("好的，文案如下：\n```json\n" + json.dumps(NOTE, ensure_ascii=False) + "\n```")
+
+
+class TestRednoteAgent(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def slow_search(self, query):
+        with self.lock:
+            self.calls.append(query)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.2)
+        with self.lock:
+            self.active -= 1
+        return f"结果：{query}"
+
+    def make_agent(self, responses, **kwargs):
+        tools = {"search_web": self.slow_search, "generate_emoji": lambda context: ["✨"]}
+        return RednoteAgent(ScriptedClient(responses), tools=tools, verbose=False, **kwargs)
+
+    def test_parallel_tool_calls(self):
+        """一轮中的三次搜索并发执行，结果按 tool_calls 的顺序写回对话"""
+        searches = [("search_web", {"query": q}) for q in ["小红书美妆趋势", "保湿面膜", "用户评价"]]
+        agent = self.make_agent([completion(tool_calls=searches), final_reply()])
+
+        result = agent.run("深海蓝藻保湿面膜")
+        self.assertEqual(result.note, NOTE)
+        self.assertEqual(self.peak, 3)
+        first, second = result.iterations
+        self.assertLess(first.tool_seconds, 0.4)
+        self.assertEqual((first.tool_calls, first.cache_hits, second.tool_calls), (3, 0, 0))
+
+        tool_messages = agent.client.requests[1][3:]
+        self.assertEqual([m["tool_call_id"] for m in tool_messages], ["call_0", "call_1", "call_2"])
+        self.assertEqual([m["content"] for m in tool_messages],
+                         ["结果：小红书美妆趋势", "结果：保湿面膜", "结果：用户评价"])
+
+    def test_sequential_when_single_worker(self):
+        searches = [("search_web", {"query": q}) for q in ["a", "b"]]
+        agent = self.make_agent([completion(tool_calls=searches), final_reply()], max_tool_workers=1)
+        agent.run("面膜")
+        self.assertEqual(self.peak, 1)
+
+    def test_tool_cache_across_runs(self):
+        """相同的搜索只执行一次：同一轮中重复的调用合并，之后的生成命中缓存；不可缓存的工具每次都执行"""
+        turn = [("search_web", {"query": "小红书美妆趋势"}), ("search_web", {"query": "小红书美妆趋势"}),
+                ("generate_emoji", {"context": "补水"})]
+        cache = ToolResultCache()
+        agent = self.make_agent([completion(tool_calls=turn), final_reply()] * 2, cache=cache)
+
+        first = agent.run("深海蓝藻保湿面膜")
+        second = agent.run("美白精华")
+        self.assertEqual(self.calls, ["小红书美妆趋势"])
+        self.assertEqual(first.iterations[0].cache_hits, 0)
+        self.assertEqual(second.iterations[0].cache_hits, 2)
+        self.assertEqual(second.iterations[0].tool_calls, 3)
+        self.assertEqual(len(cache), 1)
+
+    def test_cache_ttl_and_lru(self):
+        now = [0.0]
+        cache = ToolResultCache(ttl=10, maxsize=2, clock=lambda: now[0])
+        a, b, c = (ToolResultCache.key("search_web", {"query": q}) for q in "abc")
+        cache.put(a, "A")
+        cache.put(b, "B")
+        self.assertEqual(cache.get(a), "A")
+        cache.put(c, "C")  # 淘汰最久未使用的 b
+        self.assertIsNone(cache.get(b))
+        now[0] = 10.0
+        self.assertIsNone(cache.get(a))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(ToolResultCache.key("t", {"x": 1, "y": 2}), ToolResultCache.key("t", {"y": 2, "x": 1}))
+
+    def test_run_once_coalesces_concurrent_calls(self):
+        """并发的相同调用只执行一次；失败的结果不缓存"""
+        cache = ToolResultCache()
+        key = ToolResultCache.key("search_web", {"query": "小红书美妆趋势"})
+        runs = []
+
+        def slow():
+            runs.append(1)
+            time.sleep(0.1)
+            return "趋势", True
+
+        threads = [threading.Thread(target=cache.run_once, args=(key, slow)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(runs), cache.coalesced, cache.get(key)), (1, 2, "趋势"))
+
+        failed = ToolResultCache.key("search_web", {"query": "x"})
+        self.assertEqual(cache.run_once(failed, lambda: ("错误", False)), ("错误", False))
+        self.assertIsNone(cache.get(failed))
+
+    def test_tool_errors_are_observations(self):
+        """未知工具、非法参数和工具异常都作为 Observation 返回给模型，错误结果不缓存"""
+        def failing_search(query):
+            raise RuntimeError("超时")
+
+        client = ScriptedClient([
+            completion(tool_calls=[("unknown_tool", {}), ("search_web", {"query": "x"})]),
+            final_reply()
+        ])
+        client.responses[0].choices[0].message.tool_calls[0].function.arguments = "{bad json"
+        agent = RednoteAgent(client, tools={"search_web": failing_search}, verbose=False)
+
+        result = agent.run("面膜")
+        contents = [m["content"] for m in client.requests[1][3:]]
+        self.assertIn("不是合法的 JSON", contents[0])
+        self.assertIn("执行失败: 超时", contents[1])
+        self.assertEqual(len(agent.cache), 0)
+        self.assertEqual(result.note, NOTE)
+
+    def test_gives_up_after_max_iterations(self):
+        agent = self.make_agent([completion("还在思考")] * 2)
+        result = agent.run("面膜", max_iterations=2)
+        self.assertEqual((result.text, result.note, len(result.iterations)), (FAILED_MESSAGE, None, 2))
+
+    def test_parse_rednote_json(self):
+        self.assertEqual(parse_rednote_json('```json\n{"title": "t"}\n```'), {"title": "t"})
+        self.assertEqual(parse_rednote_json('{"title": "t"}'), {"title": "t"})
+        self.assertIsNone(parse_rednote_json("不是 JSON"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,125 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from mock_chat_server import MockChatServer
+from rednote_agent import create_client
+from rednote_batch import TokenBucket, load_completed, read_items, run_batch
+
+
+class TestRednoteBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmpdir.name, "products.csv")
+        self.output_path = os.path.join(self.tmpdir.name, "notes.jsonl")
+        self.searches = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_products(self, count):
+        with open(self.input_path, "w", encoding="utf-8", newline="") as f:
+            f.write("id,product_name,tone_style\n")
+            f.writelines(f"sku{i},产品{i},{'知性' if i % 2 else ''}\n" for i in range(count))
+
+    def tools(self):
+        def search_web(query):
+            with self.lock:
+                self.searches.append(query)
+            time.sleep(0.01)
+            return f"结果：{query}"
+
+        return {"search_web": search_web, "query_product_database": lambda product_name: f"{product_name}的卖点"}
+
+    def read_output(self):
+        with open(self.output_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def test_batch_with_shared_client_and_limits(self):
+        """所有会话共用一个连接池；在途请求数不超过上限；相同的搜索只执行一次"""
+        self.write_products(12)
+        with MockChatServer(latency=0.05) as server:
+            client = create_client(api_key="test", base_url=server.base_url, max_connections=3)
+            report = run_batch(self.input_path, self.output_path, client=client, tools=self.tools(),
+                               sessions=6, max_concurrent_requests=3, requests_per_minute=6000, verbose=False)
+
+        self.assertEqual((report.total, report.succeeded, report.failed, report.llm_requests), (12, 12, 0, 24))
+        self.assertLessEqual(server.max_in_flight, 3)
+        self.assertLessEqual(server.connections, 3)
+        self.assertEqual(report.peak_requests, 3)
+        self.assertGreater(report.items_per_minute, 0)
+        self.assertEqual(self.searches.count("小红书美妆趋势"), 1)
+
+        records = {record["key"]: record for record in self.read_output()}
+        self.assertEqual(len(records), 12)
+        self.assertEqual(records["sku1"]["tone_style"], "知性")
+        self.assertEqual(records["sku2"]["tone_style"], "活泼甜美")
+        self.assertTrue(records["sku3"]["note"]["title"].startswith("✨ 产品3｜知性"))
+
+    def test_resume_from_checkpoint(self):
+        """重新运行时跳过已经成功的行，重试失败的行；中断时没写完的行不影响后续记录"""
+        self.write_products(6)
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"key": "sku0", "ok": True}) + "\n")
+            f.write(json.dumps({"key": "sku1", "ok": False}) + "\n")
+            f.write('{"key": "sku2", "ok": tr')  # 中断时写了一半
+
+        with MockChatServer(latency=0.01) as server:
+            client = create_client(api_key="test", base_url=server.base_url)
+            report = run_batch(self.input_path, self.output_path, client=client, tools=self.tools(), verbose=False)
+
+        self.assertEqual((report.skipped, report.succeeded), (1, 5))
+        self.assertEqual(load_completed(self.output_path), {f"sku{i}" for i in range(6)})
+        # 原有的 3 行（含写了一半的行）+ 本次的 5 行
+        with open(self.output_path, encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 8)
+
+    def test_rate_limit_and_retries(self):
+        """429 由 SDK 按 retry-after-ms 重试；每分钟请求数上限生效"""
+        self.write_products(4)
+        with MockChatServer(latency=0.0, error_rate=0.3, seed=1) as server:
+            client = create_client(api_key="test", base_url=server.base_url, max_retries=10)
+            report = run_batch(self.input_path, self.output_path, client=client, tools=self.tools(),
+                               sessions=4, max_concurrent_requests=2, requests_per_minute=120, verbose=False)
+
+        self.assertEqual(report.succeeded, 4)
+        self.assertGreater(server.errors, 0)
+        # 8 次请求，突发 2 次，之后每秒 2 次
+        self.assertGreaterEqual(report.seconds, 2.5)
+        self.assertGreater(report.throttle_wait, 0)
+
+    def test_failed_rows_are_recorded(self):
+        self.write_products(2)
+        with MockChatServer() as server:
+            base_url = server.base_url
+        client = create_client(api_key="test", base_url=base_url, max_retries=0, timeout=2)
+        report = run_batch(self.input_path, self.output_path, client=client, tools=self.tools(), verbose=False)
+
+        self.assertEqual((report.succeeded, report.failed), (0, 2))
+        self.assertTrue(all("API 调用失败" in record["error"] for record in self.read_output()))
+        self.assertEqual(load_completed(self.output_path), set())
+
+    def test_read_items(self):
+        with open(self.input_path, "w", encoding="utf-8", newline="") as f:
+            f.write("product_name\n面膜\n\n面膜\n精华\n")
+        self.assertEqual([(item.key, item.product_name) for item in read_items(self.input_path)],
+                         [("面膜|活泼甜美", "面膜"), ("精华|活泼甜美", "精华")])
+        with open(self.input_path, "w", encoding="utf-8") as f:
+            f.write("name\n面膜\n")
+        with self.assertRaises(ValueError):
+            read_items(self.input_path)
+
+    def test_token_bucket(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0], sleep=lambda s: None)
+        self.assertEqual([bucket.reserve() for _ in range(4)], [0.0, 0.0, 0.5, 1.0])
+        now[0] = 2.0
+        self.assertEqual(bucket.reserve(), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,326 @@
+"""
+基准测试：weather 工具在本地模拟 NWS 服务上的延迟和连接数
+
+对比三种方式执行同一组工具调用（若干地点的预报 + 若干州的预警，地点和州会重复出现）：
+- 每次请求新建客户端（原来的实现）
+- 共享连接池，不缓存（模拟服务返回 no-cache）
+- 共享连接池 + 响应缓存
+
+另外单独测量预报查询在网格缓存下的稳态延迟：预报本身不缓存（内容随时间变化），
+对比没有网格缓存（每次 points → forecast 两次请求）和网格缓存已由上次运行预热（只请求 forecast）。
+
+最后模拟大量智能体同时调用工具的突发负载（分若干波发出）（模拟服务随机返回 429 / 503，响应均不缓存）：
+对比不合并、不限流、不重试的客户端和默认的请求合并 + 令牌桶 + 并发上限 + 抖动重试。
+
+批量工具通过内存中的 MCP 会话调用：逐个调用 get_alerts / get_forecast 与一次 get_alerts_batch /
+get_forecast_batch 对比耗时、工具调用次数和传输的字节数（实际使用中每次工具调用还要多一轮模型推理）。
+
+输出大小：同一组查询分别用 text 和 json（紧凑）格式输出，对比字节数和估算的 token 数。
+token 按 DeepSeek 文档给出的比例估算（1 个中文字符约 0.6 个 token，1 个英文字符约 0.3 个 token）。
+
+模拟服务每个请求有固定延迟，每个新连接有额外的建连延迟（模拟 TLS 握手）。
+
+用法:
+    python bench_weather.py --calls 40 --latency 0.02 --connect-latency 0.03 --agents 100 --waves 5 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+
+import httpx
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import weather
+from mock_nws_server import MockNWSServer
+from nws_client import POINTS_MIN_TTL, NWSClient
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """按 DeepSeek 的字符换算比例估算 token 数（不计空格）"""
+    cjk_chars = len(_CJK_PATTERN.findall(text))
+    other_chars = len(text) - cjk_chars - text.count(" ")
+    return math.ceil(cjk_chars * 0.6 + other_chars * 0.3)
+
+
+async def legacy_request(url: str):
+    """原来的 make_nws_request：每次请求新建一个 AsyncClient"""
+    headers = {"User-Agent": weather.USER_AGENT, "Accept": "application/geo+json"}
+    async with httpx.AsyncClient() as client:
+        try:
+            response = await client.get(url, headers=headers, timeout=30.0)
+            response.raise_for_status()
+            return response.json()
+        except Exception:
+            return None
+
+
+def make_workload(calls: int, seed: int = 0) -> list[tuple]:
+    """预报和预警各占一半，地点和州从小集合中随机抽取（多个智能体常常查询相同的地点）"""
+    rng = random.Random(seed)
+    places = [(39.7456, -97.0892), (40.7128, -74.006), (34.0522, -118.2437), (41.8781, -87.6298)]
+    states = ["CA", "TX", "NY", "FL"]
+    return [
+        ("forecast", *rng.choice(places)) if i % 2 == 0 else ("alerts", rng.choice(states))
+        for i in range(calls)
+    ]
+
+
+async def run_workload(workload: list[tuple]) -> list[float]:
+    timings = []
+    for call in workload:
+        start = time.perf_counter()
+        if call[0] == "forecast":
+            await weather.get_forecast(call[1], call[2])
+        else:
+            await weather.get_alerts(call[1])
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def run_mode(mode: str, workload: list[tuple]) -> list[float]:
+    original_request = weather.make_nws_request
+    if mode == "legacy":
+        weather.make_nws_request = legacy_request
+    else:
+        # 不缓存模式下 /points 也不使用最短缓存时间
+        points_min_ttl = 0 if mode == "pooled" else POINTS_MIN_TTL
+        weather._nws_client = NWSClient(user_agent=weather.USER_AGENT, points_min_ttl=points_min_ttl)
+    try:
+        return await run_workload(workload)
+    finally:
+        weather.make_nws_request = original_request
+        await weather.close_nws_client()
+
+
+async def run_forecasts(places: list[tuple[float, float]]) -> list[float]:
+    """新的进程：新建客户端（响应缓存为空），依次查询每个地点的预报"""
+    weather._nws_client = NWSClient(user_agent=weather.USER_AGENT, points_min_ttl=0)
+    try:
+        return await run_workload([("forecast", *place) for place in places])
+    finally:
+        await weather.close_nws_client()
+
+
+def bench_grid_cache(args):
+    """预报不缓存时，网格缓存对 get_forecast 稳态延迟的影响"""
+    rng = random.Random(1)
+    places = [(rng.uniform(30, 45), rng.uniform(-120, -75)) for _ in range(args.calls)]
+
+    print(f"\n🗄️ 网格缓存：{len(places)} 个地点的预报，points / forecast 均不缓存")
+    print(f"{'方式':<12} | {'平均':>8} | {'p95':>8} | {'points请求':>10} | {'forecast请求':>12}")
+    print("-" * 64)
+
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            MockNWSServer(latency=args.latency, max_age={"points": 0, "forecast": 0}) as server:
+        weather.NWS_API_BASE = server.base_url
+        results = []
+        for label, path in [("无网格缓存", ""), ("上次运行预热", os.path.join(tmpdir, "grid.sqlite3"))]:
+            weather.GRID_CACHE_PATH = path
+            if path:
+                # 上一次运行：解析全部地点并写入 SQLite
+                asyncio.run(run_forecasts(places))
+                weather.close_grid_cache()
+                print(f"💾 预热: {weather.get_grid_cache().format_stats()}")
+
+            server.reset_stats()
+            timings = asyncio.run(run_forecasts(places))
+            weather.close_grid_cache()
+            results.append(statistics.mean(timings))
+
+            routes = server.requests_by_route
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            print(f"{label:<12} | {results[-1] * 1000:>6.1f}ms | {p95 * 1000:>6.1f}ms | "
+                  f"{routes['points']:>10} | {routes['forecast']:>12}")
+
+    print(f"⚡ 预报平均延迟降低 {1 - results[1] / results[0]:.0%}")
+
+
+async def run_burst(waves: list[list[tuple]], **client_kwargs) -> tuple[list[str], dict]:
+    """每一波的工具调用同时发出，一波结束后再发下一波；返回 (全部结果, 客户端统计)"""
+    weather._nws_client = NWSClient(user_agent=weather.USER_AGENT, **client_kwargs)
+    try:
+        results = []
+        for workload in waves:
+            results += await asyncio.gather(*[
+                weather.get_forecast(call[1], call[2]) if call[0] == "forecast" else weather.get_alerts(call[1])
+                for call in workload
+            ])
+        return results, weather.get_nws_client().stats()
+    finally:
+        await weather.close_nws_client()
+
+
+def bench_burst(args):
+    """突发负载下请求合并、限流和重试的效果"""
+    waves = [make_workload(args.agents, seed=wave) for wave in range(args.waves)]
+    modes = [
+        ("不合并不限流", dict(coalesce=False, rate_limit=None, max_retries=0,
+                              max_connections=100, max_concurrency=100)),
+        ("合并+限流+重试", dict(rate_limit=args.rate_limit, burst=args.burst,
+                                max_concurrency=args.max_concurrency, backoff_base=0.05)),
+    ]
+
+    print(f"\n🌊 突发负载：{args.waves} 波 × {args.agents} 个并发工具调用，错误注入 {args.error_rate:.0%}，"
+          f"限流 {args.rate_limit:g}/s（突发 {args.burst}），并发上限 {args.max_concurrency}")
+    print(f"{'方式':<12} | {'总耗时':>7} | {'上游请求':>8} | {'并发峰值':>8} | {'合并':>5} | "
+          f"{'限流等待':>8} | {'重试':>5} | {'失败调用':>8}")
+    print("-" * 90)
+
+    weather.GRID_CACHE_PATH = ""
+    upstream = []
+    for label, client_kwargs in modes:
+        with MockNWSServer(latency=args.latency, error_rate=args.error_rate,
+                           max_age={"points": 0, "forecast": 0, "alerts": 0}) as server:
+            weather.NWS_API_BASE = server.base_url
+            start = time.perf_counter()
+            results, stats = asyncio.run(run_burst(waves, **client_kwargs))
+            total = time.perf_counter() - start
+
+            failed = sum(result.startswith("无法") for result in results)
+            upstream.append(server.requests)
+            print(f"{label:<12} | {total:>6.2f}s | {server.requests:>8} | {server.max_in_flight:>8} | "
+                  f"{stats['coalesced']:>5} | {stats['throttled']:>4} 次 | {stats['retries']:>5} | {failed:>8}")
+
+    print(f"⚡ 节省上游请求 {upstream[0] - upstream[1]} 次（{1 - upstream[1] / upstream[0]:.0%}）")
+
+
+async def call_tools(calls: list[tuple[str, dict]]) -> tuple[float, int]:
+    """通过 MCP 会话依次调用工具，返回 (耗时, 请求参数和结果的总字节数)"""
+    weather._nws_client = NWSClient(user_agent=weather.USER_AGENT)
+    try:
+        async with create_connected_server_and_client_session(weather.mcp._mcp_server) as session:
+            start = time.perf_counter()
+            size = 0
+            for name, arguments in calls:
+                result = await session.call_tool(name, arguments)
+                size += len(json.dumps({"name": name, "arguments": arguments}).encode())
+                size += sum(len(content.text.encode()) for content in result.content)
+            return time.perf_counter() - start, size
+    finally:
+        await weather.close_nws_client()
+
+
+def bench_batch(args):
+    """逐个调用工具与批量工具的对比"""
+    rng = random.Random(3)
+    states = rng.sample(["AL", "AZ", "CA", "CO", "FL", "GA", "IL", "KS", "MI", "MN", "NC", "NJ",
+                         "NY", "OH", "OK", "OR", "PA", "TN", "TX", "WA"], k=min(args.batch_size, 20))
+    locations = [[round(rng.uniform(30, 45), 4), round(rng.uniform(-120, -75), 4)] for _ in range(args.batch_size)]
+    modes = [
+        ("逐个调用", [("get_alerts", {"state": state}) for state in states]
+         + [("get_forecast", {"latitude": lat, "longitude": lon}) for lat, lon in locations]),
+        ("批量调用", [("get_alerts_batch", {"states": states}), ("get_forecast_batch", {"locations": locations})]),
+    ]
+
+    print(f"\n📦 批量工具：{len(states)} 个州的预警 + {len(locations)} 个地点的预报（MCP 内存会话）")
+    print(f"{'方式':<10} | {'耗时':>7} | {'工具调用':>8} | {'传输字节':>9}")
+    print("-" * 48)
+
+    weather.GRID_CACHE_PATH = ""
+    for label, calls in modes:
+        with MockNWSServer(latency=args.latency) as server:
+            weather.NWS_API_BASE = server.base_url
+            elapsed, size = asyncio.run(call_tools(calls))
+        print(f"{label:<10} | {elapsed:>6.2f}s | {len(calls):>8} | {size:>9,}")
+
+
+async def collect_outputs(queries: list[tuple]) -> list[tuple[str, str]]:
+    """每个查询分别以 text 和 json 格式调用，返回 [(text 结果, json 结果)]"""
+    weather._nws_client = NWSClient(user_agent=weather.USER_AGENT)
+    try:
+        outputs = []
+        for _, tool, call_args, kwargs in queries:
+            text = await tool(*call_args, output_format="text", **kwargs)
+            outputs.append((text, await tool(*call_args, output_format="json", **kwargs)))
+        return outputs
+    finally:
+        await weather.close_nws_client()
+
+
+def bench_output(args):
+    """text 与紧凑 json 输出的大小对比"""
+    queries = [
+        ("get_alerts", weather.get_alerts, ("CA",), {}),
+        ("get_alerts (limit=10)", weather.get_alerts, ("CA",), {"limit": 10}),
+        ("get_forecast", weather.get_forecast, (39.7456, -97.0892), {}),
+        ("get_alerts_batch", weather.get_alerts_batch, (["CA", "TX", "NY", "FL"],), {}),
+    ]
+
+    print(f"\n📏 输出大小：每个州 {args.alerts} 条预警")
+    print(f"{'查询':<22} | {'text 字节':>10} | {'json 字节':>10} | {'text tokens':>11} | {'json tokens':>11} | {'减少':>5}")
+    print("-" * 86)
+
+    weather.GRID_CACHE_PATH = ""
+    with MockNWSServer(alerts_per_state=args.alerts) as server:
+        weather.NWS_API_BASE = server.base_url
+        outputs = asyncio.run(collect_outputs(queries))
+
+    for (label, *_), (text, compact) in zip(queries, outputs):
+        text_tokens, json_tokens = estimate_tokens(text), estimate_tokens(compact)
+        print(f"{label:<22} | {len(text.encode()):>10,} | {len(compact.encode()):>10,} | "
+              f"{text_tokens:>11,} | {json_tokens:>11,} | {1 - json_tokens / text_tokens:>5.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="weather 工具的连接复用和缓存基准测试")
+    parser.add_argument("--calls", type=int, default=40, help="工具调用次数")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟服务每个请求的延迟（秒）")
+    parser.add_argument("--connect-latency", type=float, default=0.03, help="每个新连接的建连延迟（秒）")
+    parser.add_argument("--agents", type=int, default=100, help="突发负载中每一波同时发出的工具调用数")
+    parser.add_argument("--waves", type=int, default=5, help="突发负载的波数")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="突发负载中模拟服务返回 429 / 503 的比例")
+    parser.add_argument("--rate-limit", type=float, default=20.0, help="突发负载中每秒最多的上游请求数")
+    parser.add_argument("--burst", type=int, default=5, help="令牌桶容量")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="同时进行的上游请求上限")
+    parser.add_argument("--batch-size", type=int, default=20, help="批量工具对比中的州 / 地点数")
+    parser.add_argument("--alerts", type=int, default=40, help="输出大小对比中每个州的预警数")
+    args = parser.parse_args()
+
+    # mcp 会把 httpx 的日志级别设为 INFO，每个请求打印一行；MCP 服务器每处理一个请求也打印一行
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("mcp").setLevel(logging.WARNING)
+
+    workload = make_workload(args.calls)
+    modes = [
+        ("legacy", "每次新建客户端", {"points": 0, "forecast": 0, "alerts": 0}),
+        ("pooled", "共享连接池", {"points": 0, "forecast": 0, "alerts": 0}),
+        ("cached", "连接池 + 缓存", {}),
+    ]
+
+    print(f"📦 {args.calls} 次工具调用，请求延迟 {args.latency * 1000:.0f}ms，"
+          f"建连延迟 {args.connect_latency * 1000:.0f}ms")
+    print(f"{'方式':<12} | {'总耗时':>7} | {'平均':>8} | {'p95':>8} | {'TCP连接':>7} | {'上游请求':>8}")
+    print("-" * 70)
+
+    # 这一组对比连接复用和响应缓存，不使用网格缓存
+    weather.GRID_CACHE_PATH = ""
+    for mode, label, max_age in modes:
+        with MockNWSServer(latency=args.latency, connect_latency=args.connect_latency, max_age=max_age) as server:
+            weather.NWS_API_BASE = server.base_url
+            start = time.perf_counter()
+            timings = asyncio.run(run_mode(mode, workload))
+            total = time.perf_counter() - start
+
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            print(f"{label:<12} | {total:>6.2f}s | {statistics.mean(timings) * 1000:>6.1f}ms | "
+                  f"{p95 * 1000:>6.1f}ms | {server.connections:>7} | {server.requests:>8}")
+
+    bench_grid_cache(args)
+    bench_burst(args)
+    bench_batch(args)
+    bench_output(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+经纬度 → NWS 预报网格的持久化缓存（SQLite）
+
+NWS 的预报网格是固定的（约 2.5km 一格），/points/{lat},{lon} 对同一位置总是返回同一个 forecast URL。
+缓存按量化后的经纬度保存 forecast URL，命中时 get_forecast 直接请求预报，省掉 /points 这一次往返。
+
+- 经纬度四舍五入到 precision 位小数（默认 3 位，约 110 米），相邻的坐标共用一条记录；
+  /points 请求本身也使用量化后的坐标，缓存的结果与请求完全对应
+- 启动时把未过期的记录全部读入内存（预热），查询不访问磁盘；写入时同步落盘，下次启动仍然有效
+- 记录超过 max_age 后视为过期；预报请求失败时调用方应使 invalidate() 失效并重新解析
+
+用法:
+    cache = GridCache("./.nws_grid_cache.sqlite3")
+    forecast_url = cache.lookup(39.7456, -97.0892)
+    if forecast_url is None:
+        latitude, longitude = cache.quantize(39.7456, -97.0892)
+        ...  # 请求 /points/{latitude},{longitude}
+        cache.store(39.7456, -97.0892, points_data["properties"])
+"""
+
+import sqlite3
+import time
+from collections.abc import Callable
+
+# 经纬度保留的小数位数：3 位约 110 米，远小于 2.5km 的网格
+DEFAULT_PRECISION = 3
+# 网格划分偶尔会调整，记录保存 30 天
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+
+
+class GridCache:
+    """量化坐标 → forecast URL 的 SQLite 缓存，启动时整体读入内存"""
+
+    def __init__(
+        self,
+        path: str,
+        precision: int = DEFAULT_PRECISION,
+        max_age: float = DEFAULT_MAX_AGE,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            path: SQLite 文件路径，":memory:" 表示不持久化
+            precision: 经纬度保留的小数位数
+            max_age: 记录的有效期（秒）
+            clock: 墙上时钟（记录跨进程保存，不能用单调时钟），测试时可以替换
+        """
+        self.path = path
+        self.precision = precision
+        self.max_age = max_age
+        self.clock = clock
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS grid (
+                lat_key INTEGER NOT NULL,
+                lon_key INTEGER NOT NULL,
+                forecast_url TEXT NOT NULL,
+                grid_id TEXT,
+                grid_x INTEGER,
+                grid_y INTEGER,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (lat_key, lon_key)
+            )
+            """
+        )
+        self._conn.commit()
+
+        # (lat_key, lon_key) -> (forecast_url, updated_at)
+        self._entries: dict[tuple[int, int], tuple[str, float]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.warmed = self.warm()
+
+    def _key(self, latitude: float, longitude: float) -> tuple[int, int]:
+        # 用整数作为主键，避免浮点数相等比较的问题
+        scale = 10 ** self.precision
+        return round(latitude * scale), round(longitude * scale)
+
+    def quantize(self, latitude: float, longitude: float) -> tuple[float, float]:
+        """
+        返回量化后的经纬度，用于构造 /points 请求
+
+        由 _key 的整数换算回来，而不是 round(x, precision)：两者对恰好在中间的坐标
+        （如 37.7745）可能舍入到不同方向，导致按原坐标查询和按量化坐标保存的键不一致
+        """
+        scale = 10 ** self.precision
+        lat_key, lon_key = self._key(latitude, longitude)
+        return lat_key / scale, lon_key / scale
+
+    def warm(self) -> int:
+        """从 SQLite 读入全部未过期的记录并清理过期记录，返回读入的条数"""
+        cutoff = self.clock() - self.max_age
+        self._conn.execute("DELETE FROM grid WHERE updated_at < ?", (cutoff,))
+        self._conn.commit()
+        rows = self._conn.execute("SELECT lat_key, lon_key, forecast_url, updated_at FROM grid").fetchall()
+        self._entries = {(lat_key, lon_key): (url, updated_at) for lat_key, lon_key, url, updated_at in rows}
+        return len(self._entries)
+
+    def lookup(self, latitude: float, longitude: float) -> str | None:
+        """返回缓存的 forecast URL，未命中或已过期时返回 None"""
+        entry = self._entries.get(self._key(latitude, longitude))
+        if entry is None or self.clock() - entry[1] > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def store(self, latitude: float, longitude: float, properties: dict):
+        """保存 /points 响应中的网格信息（properties 中需要有 forecast）"""
+        key = self._key(latitude, longitude)
+        now = self.clock()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO grid VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (*key, properties["forecast"], properties.get("gridId"),
+             properties.get("gridX"), properties.get("gridY"), now)
+        )
+        self._conn.commit()
+        self._entries[key] = (properties["forecast"], now)
+
+    def invalidate(self, latitude: float, longitude: float):
+        """删除一条记录（例如缓存的 forecast URL 已经失效）"""
+        key = self._key(latitude, longitude)
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+        self._conn.execute("DELETE FROM grid WHERE lat_key = ? AND lon_key = ?", key)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "warmed": self.warmed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"启动预热 {s['warmed']} 条，命中 {s['hits']}/{s['hits'] + s['misses']} ({s['hit_rate']:.0%})，"
+                f"失效 {s['invalidations']}，共 {s['entries']} 条")
@@ -0,0 +1,299 @@
+"""
+本地模拟的 NWS (api.weather.gov) 服务：用于测试和基准测试，不访问真实的气象局 API
+
+- 支持 /points/{lat},{lon}、/gridpoints/{office}/{x},{y}/forecast、/alerts/active/area/{state} 三个接口，
+  返回与真实 API 结构相同的 GeoJSON（只包含 weather.py 用到的字段）
+- 响应带 Cache-Control（或 Expires）头，用于验证客户端缓存
+- 可配置每个请求的延迟和每个新 TCP 连接的建连延迟（模拟 TLS 握手）
+- 可注入错误：按比例随机返回 429 / 503，或用 fail_next 指定接下来若干个请求的状态码
+- 统计 TCP 连接数、各接口的请求数（注入的错误计为 "errors"）和并发请求峰值
+
+用法:
+    with MockNWSServer(latency=0.05) as server:
+        weather.NWS_API_BASE = server.base_url
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+POINTS_PATTERN = re.compile(r"^/points/(-?[\d.]+),(-?[\d.]+)$")
+FORECAST_PATTERN = re.compile(r"^/gridpoints/(\w+)/(\d+),(\d+)/forecast$")
+ALERTS_PATTERN = re.compile(r"^/alerts/active/area/(\w+)$")
+
+# 模拟网格的边长（度），真实 NWS 网格约 2.5km
+GRID_SIZE = 0.025
+
+
+class _NWSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写出，keep-alive 连接上 Nagle 算法会与延迟确认叠加出约 40ms 的停顿
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # 每个 TCP 连接对应一个 handler 实例；建连延迟模拟 TLS 握手的往返
+        with self.server.stats_lock:
+            self.server.connections += 1
+        time.sleep(self.server.mock.connect_latency)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        mock = self.server.mock
+        with self.server.stats_lock:
+            self.server.requests += 1
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+
+        try:
+            time.sleep(mock.latency)
+            self._route()
+        finally:
+            with self.server.stats_lock:
+                self.server.in_flight -= 1
+
+    def _route(self):
+        mock = self.server.mock
+        path = self.path.split("?")[0]
+
+        if status := mock.next_error():
+            with self.server.stats_lock:
+                self.server.requests_by_route["errors"] += 1
+            headers = {"Retry-After": str(mock.retry_after)} if status == 429 and mock.retry_after is not None else {}
+            self._send_json(status, {"title": "Injected Error", "status": status}, headers)
+            return
+
+        if match := POINTS_PATTERN.match(path):
+            route, payload = "points", mock.points(float(match[1]), float(match[2]))
+        elif match := FORECAST_PATTERN.match(path):
+            route, payload = "forecast", mock.forecast(match[1], int(match[2]), int(match[3]))
+        elif match := ALERTS_PATTERN.match(path):
+            route, payload = "alerts", mock.alerts(match[1])
+        else:
+            self._send_json(404, {"title": "Not Found", "detail": f"unknown path {path}"}, {})
+            return
+
+        with self.server.stats_lock:
+            self.server.requests_by_route[route] += 1
+        self._send_json(200, payload, mock.cache_headers(route))
+
+    def _send_json(self, status: int, payload: dict, headers: dict[str, str]):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/geo+json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    # 默认的监听队列只有 5，突发负载下大量并发建连会被丢弃，客户端要等 1 秒以上的 SYN 重传
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class MockNWSServer:
+    """在后台线程中运行的模拟 NWS 服务"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        connect_latency: float = 0.0,
+        max_age: dict[str, int] | None = None,
+        use_expires: bool = False,
+        alerts_per_state: int = 3,
+        periods: int = 14,
+        error_rate: float = 0.0,
+        retry_after: int | None = None,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        """
+        Args:
+            latency: 每个请求的处理延迟（秒）
+            connect_latency: 每个新 TCP 连接的建连延迟（秒）
+            max_age: 各接口（points / forecast / alerts）响应的缓存时间（秒），0 表示 no-cache
+            use_expires: 用 Expires 头代替 Cache-Control 表示缓存时间
+            alerts_per_state: 每个州返回的预警数
+            periods: 预报返回的时段数
+            error_rate: 随机返回 429 或 503 的请求比例
+            retry_after: 429 响应的 Retry-After 秒数，None 表示不带该头
+            seed: 错误注入的随机种子
+            host: 监听地址
+            port: 监听端口，0 表示随机分配
+        """
+
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.max_age = {"points": 86400, "forecast": 600, "alerts": 30, **(max_age or {})}
+        self.use_expires = use_expires
+        self.alerts_per_state = alerts_per_state
+        self.periods = periods
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        # 接下来的请求依次返回这些状态码（优先于 error_rate）
+        self.fail_next: deque[int] = deque()
+        self._rng = random.Random(seed)
+
+        self._server = _MockHTTPServer((host, port), _NWSHandler)
+        self._server.mock = self
+        self._server.stats_lock = threading.Lock()
+        self._server.in_flight = 0
+        self._thread: threading.Thread | None = None
+        self.reset_stats()
+
+    # --- 响应内容 ---
+
+    def points(self, latitude: float, longitude: float) -> dict:
+        grid_x = math.floor((longitude + 180) / GRID_SIZE)
+        grid_y = math.floor((latitude + 90) / GRID_SIZE)
+        return {
+            "properties": {
+                "gridId": "TST",
+                "gridX": grid_x,
+                "gridY": grid_y,
+                "forecast": f"{self.base_url}/gridpoints/TST/{grid_x},{grid_y}/forecast"
+            }
+        }
+
+    def forecast(self, office: str, grid_x: int, grid_y: int) -> dict:
+        names = ["今天", "今晚", "周一", "周一夜间", "周二", "周二夜间", "周三", "周三夜间"]
+        return {
+            "properties": {
+                "periods": [
+                    {
+                        "number": i + 1,
+                        "name": names[i % len(names)],
+                        "temperature": 60 + (grid_x + grid_y + i) % 20,
+                        "temperatureUnit": "F",
+                        "windSpeed": f"{5 + i % 10} mph",
+                        "windDirection": "NW",
+                        "shortForecast": "Partly Cloudy",
+                        "detailedForecast": f"{office} 网格 {grid_x},{grid_y}：多云，最高温度接近 {70 + i % 5} 度，"
+                                            f"西北风每小时 {5 + i % 10} 英里。"
+                    }
+                    for i in range(self.periods)
+                ]
+            }
+        }
+
+    def alerts(self, state: str) -> dict:
+        counties = [f"{state} County {i}" for i in range(1, 9)]
+        return {
+            "features": [
+                {
+                    "properties": {
+                        "event": ["Flood Warning", "Heat Advisory", "Wind Advisory"][i % 3],
+                        # 真实数据中同一批县会在多条预警中重复出现
+                        "areaDesc": "; ".join(counties[i % 2 * 4:i % 2 * 4 + 4]),
+                        "severity": ["Severe", "Moderate", "Minor"][i % 3],
+                        "headline": f"{state} 第 {i + 1} 条预警",
+                        # 真实的描述按 WHAT / WHERE / WHEN / IMPACTS 分段，通常有一两千字符
+                        "description": (
+                            "* WHAT...River flooding is forecast. Minor flooding is occurring and moderate\n"
+                            "flooding is forecast.\n\n"
+                            f"* WHERE...{counties[0]} and surrounding low-lying areas along the river.\n\n"
+                            "* WHEN...From this evening until further notice.\n\n"
+                            "* IMPACTS...At 20.0 feet, water affects several roads near the river and\n"
+                            "low-lying farmland. Some homes in the flood plain may be cut off.\n\n"
+                            "* ADDITIONAL DETAILS...\n"
+                            "- At 7:00 PM CDT the stage was 18.2 feet.\n"
+                            "- Flood stage is 19.0 feet.\n"
+                            "- Forecast...The river is expected to rise above flood stage late this\n"
+                            "evening to a crest of 21.5 feet tomorrow afternoon.\n"
+                            "- Fact: The flood stage for this location is 19.0 feet. Minor flooding begins at this level."
+                        ),
+                        "instruction": (
+                            "Turn around, don't drown when encountering flooded roads. Most flood deaths\n"
+                            "occur in vehicles. Additional information is available at www.weather.gov.\n\n"
+                            "The next statement will be issued tomorrow morning at 1030 AM CDT."
+                        )
+                    }
+                }
+                for i in range(self.alerts_per_state)
+            ]
+        }
+
+    def next_error(self) -> int | None:
+        """返回本次请求要注入的错误状态码，不注入时返回 None"""
+        with self._server.stats_lock:
+            if self.fail_next:
+                return self.fail_next.popleft()
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return self._rng.choice([429, 503])
+        return None
+
+    def cache_headers(self, route: str) -> dict[str, str]:
+        max_age = self.max_age.get(route, 0)
+        if max_age <= 0:
+            return {"Cache-Control": "no-cache"}
+        if self.use_expires:
+            # send_response 已经写入了 Date 头
+            return {"Expires": formatdate(time.time() + max_age, usegmt=True)}
+        return {"Cache-Control": f"public, max-age={max_age}"}
+
+    # --- 统计 ---
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def connections(self) -> int:
+        return self._server.connections
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    @property
+    def requests_by_route(self) -> Counter:
+        return Counter(self._server.requests_by_route)
+
+    @property
+    def max_in_flight(self) -> int:
+        """同时处理中的请求数峰值"""
+        return self._server.max_in_flight
+
+    def reset_stats(self):
+        with self._server.stats_lock:
+            self._server.connections = 0
+            self._server.requests = 0
+            self._server.requests_by_route = Counter()
+            self._server.max_in_flight = 0
+
+    def start(self) -> "MockNWSServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockNWSServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    server = MockNWSServer(latency=0.05).start()
+    print(f"🧪 模拟 NWS 服务已启动: {server.base_url}（Ctrl+C 退出）")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,344 @@
+"""
+NWS API 客户端：整个服务器生命周期共享一个带连接池的 httpx.AsyncClient，并按响应头缓存 JSON
+
+- HTTP keep-alive：连续的请求复用已建立的 TCP/TLS 连接，
+  get_forecast 的 points → forecast 两次请求不再各自握手
+- 响应缓存：有效期按 Cache-Control 的 max-age（扣除 Age）或 Expires 与 Date 的差计算，
+  no-store / no-cache 或没有缓存头的响应不缓存
+- /points/{lat},{lon} 对固定的网格不会变化，缓存时间至少为 POINTS_MIN_TTL
+- 请求合并（single-flight）：同一 URL 已有请求在进行中时，后来的调用等待同一个结果，不再访问上游
+- 限流：令牌桶限制每秒请求数，信号量限制同时进行的上游请求数
+- 重试：429 / 5xx 和网络错误按指数退避重试，退避时间带随机抖动（有 Retry-After 头时按它等待）
+- 统计新建连接数、上游请求数、缓存命中、合并、限流等待和重试次数
+
+用法:
+    client = NWSClient(user_agent="weather-app/1.0", rate_limit=10, max_concurrency=4)
+    data = await client.get_json("https://api.weather.gov/alerts/active/area/CA")
+    print(client.format_stats())
+    await client.aclose()
+"""
+
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import httpx
+
+# /points 接口的最短缓存时间（秒）：经纬度到预报网格的映射是固定的
+POINTS_MIN_TTL = 7 * 24 * 3600
+# 需要重试的状态码：限流和服务端错误
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def response_ttl(headers: Mapping[str, str], now: float | None = None) -> float:
+    """
+    根据响应头计算可以缓存的秒数，0 表示不缓存。
+
+    Args:
+        headers: 响应头（大小写不敏感的映射，如 httpx.Headers）
+        now: 当前时间戳，响应没有 Date 头时用于计算 Expires 的剩余时间
+
+    Returns:
+        float: 缓存有效期（秒）
+    """
+    directives = {}
+    for part in headers.get("Cache-Control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+
+    if "no-store" in directives or "no-cache" in directives:
+        return 0.0
+
+    # max-age 优先于 Expires；Age 是响应在上游缓存（CDN）中已经停留的时间
+    if "max-age" in directives:
+        try:
+            return max(0.0, float(directives["max-age"]) - float(headers.get("Age", 0)))
+        except ValueError:
+            return 0.0
+
+    if "Expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["Expires"]).timestamp()
+            # 用服务器自己的 Date 作为基准，避免本地时钟偏差
+            base = parsedate_to_datetime(headers["Date"]).timestamp() if "Date" in headers else None
+        except (TypeError, ValueError):
+            return 0.0
+        return max(0.0, expires - (base if base is not None else (now or time.time())))
+
+    return 0.0
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> float | None:
+    """解析 Retry-After 头（秒数或 HTTP 日期），没有或无法解析时返回 None"""
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """令牌桶限流：平均每秒 rate 个请求，最多允许 burst 个请求的突发"""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Any] = asyncio.sleep
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def reserve(self) -> float:
+        """预订一个令牌，返回需要等待的秒数（令牌可以透支，等待者按预订顺序依次放行）"""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self) -> float:
+        """等待一个令牌，返回实际等待的秒数"""
+        wait = self.reserve()
+        if wait > 0:
+            await self.sleep(wait)
+        return wait
+
+
+class NWSClient:
+    """共享连接池 + TTL 响应缓存 + 请求合并和限流的 NWS 客户端"""
+
+    def __init__(
+        self,
+        user_agent: str,
+        timeout: float = 30.0,
+        max_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        max_cache_entries: int = 1024,
+        points_min_ttl: float = POINTS_MIN_TTL,
+        clock: Callable[[], float] = time.monotonic,
+        coalesce: bool = True,
+        rate_limit: float | None = 50.0,
+        burst: int = 50,
+        max_concurrency: int | None = None,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+        rng: random.Random | None = None
+    ):
+        """
+        Args:
+            user_agent: NWS 要求的 User-Agent
+            timeout: 单次请求超时（秒）
+            max_connections: 连接池大小
+            keepalive_expiry: 空闲连接保持的时间（秒）
+            max_cache_entries: 缓存条目上限，超出时淘汰最久未使用的
+            points_min_ttl: /points 响应的最短缓存时间（秒）
+            clock: 单调时钟，测试时可以替换
+            coalesce: 是否合并同一 URL 的并发请求
+            rate_limit: 每秒最多发出的上游请求数，None 表示不限
+            burst: 令牌桶容量（允许的突发请求数）
+            max_concurrency: 同时进行的上游请求上限，默认等于连接池大小
+            max_retries: 429 / 5xx / 网络错误的最大重试次数
+            backoff_base: 第一次重试的退避上限（秒），之后每次翻倍
+            backoff_max: 单次退避的最长时间（秒）
+            rng: 退避抖动使用的随机数生成器，测试时可以固定种子
+        """
+        self._client = httpx.AsyncClient(
+            headers={
+                "User-Agent": user_agent,
+                "Accept": "application/geo+json"  # NWS API 推荐的 Accept 头
+            },
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry
+            )
+        )
+        self.max_cache_entries = max_cache_entries
+        self.points_min_ttl = points_min_ttl
+        self.clock = clock
+        self.coalesce = coalesce
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rng = rng or random.Random()
+        self._bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self._semaphore = asyncio.Semaphore(max_concurrency or max_connections)
+
+        # url -> (过期时间, JSON)
+        self._cache: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        # url -> 进行中的上游请求
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+        self.connections_opened = 0
+        self.upstream_requests = 0
+        self.errors = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.throttle_wait = 0.0
+        self.retries = 0
+        self.active = 0
+        self.peak_concurrency = 0
+
+    async def _trace(self, event: str, info: dict):
+        # httpcore 的 trace 扩展：每建立一个新的 TCP 连接触发一次
+        if event == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+
+    def _lookup(self, url: str) -> Any | None:
+        entry = self._cache.get(url)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if self.clock() >= expires_at:
+            del self._cache[url]
+            self.expirations += 1
+            return None
+        self._cache.move_to_end(url)
+        return data
+
+    def _store(self, url: str, data: Any, ttl: float):
+        if "/points/" in url:
+            ttl = max(ttl, self.points_min_ttl)
+        if ttl <= 0:
+            return
+        self._cache[url] = (self.clock() + ttl, data)
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+
+    def _backoff(self, attempt: int, response: httpx.Response | None) -> float:
+        if response is not None:
+            retry_after = retry_after_seconds(response.headers)
+            if retry_after is not None:
+                return min(retry_after, self.backoff_max)
+        # full jitter：在 [0, base * 2^attempt] 中随机取值，避免大量客户端同时重试
+        return self.rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _send(self, url: str) -> httpx.Response | None:
+        """在并发上限和令牌桶的约束下发出一次请求，网络错误时返回 None"""
+        async with self._semaphore:
+            if self._bucket:
+                wait = await self._bucket.acquire()
+                if wait > 0:
+                    self.throttled += 1
+                    self.throttle_wait += wait
+            self.active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.active)
+            self.upstream_requests += 1
+            try:
+                return await self._client.get(url, extensions={"trace": self._trace})
+            except httpx.HTTPError:
+                return None
+            finally:
+                self.active -= 1
+
+    async def _fetch(self, url: str) -> dict[str, Any] | None:
+        """访问上游（含重试），成功时写入缓存"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self._send(url)
+            except httpx.InvalidURL:
+                # URL 本身不合法（如参数中含控制字符），重试也不会成功
+                response = None
+                break
+            retryable = response is None or response.status_code in RETRY_STATUSES
+            if not retryable or attempt == self.max_retries:
+                break
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt, response))
+
+        if response is None:
+            self.errors += 1
+            return None
+        try:
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            # 与原来的行为一致：网络问题、超时、HTTP 错误都返回 None，由调用方给出提示
+            self.errors += 1
+            return None
+
+        self._store(url, data, response_ttl(response.headers))
+        return data
+
+    async def get_json(self, url: str) -> dict[str, Any] | None:
+        """
+        GET 请求并解析 JSON，命中缓存或合并到进行中的相同请求时不访问上游。
+
+        Returns:
+            dict[str, Any] | None: 成功时返回 JSON 字典；重试后仍然失败（网络错误、超时或 4xx/5xx）时返回 None
+        """
+        data = self._lookup(url)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+
+        if not self.coalesce:
+            return await self._fetch(url)
+
+        task = self._in_flight.get(url)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._fetch(url))
+            self._in_flight[url] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(url, None))
+        # shield：某个调用方被取消时，其他等待同一结果的调用方不受影响
+        return await asyncio.shield(task)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "connections_opened": self.connections_opened,
+            "upstream_requests": self.upstream_requests,
+            "errors": self.errors,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expirations": self.expirations,
+            "entries": len(self._cache),
+            "coalesced": self.coalesced,
+            # 缓存命中和请求合并省下的上游请求
+            "upstream_saved": self.hits + self.coalesced,
+            "throttled": self.throttled,
+            "throttle_wait": self.throttle_wait,
+            "retries": self.retries,
+            "peak_concurrency": self.peak_concurrency
+        }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"新建连接 {s['connections_opened']}，上游请求 {s['upstream_requests']}（失败 {s['errors']}），"
+                f"缓存命中 {s['hits']}/{s['hits'] + s['misses']} ({s['hit_rate']:.0%})，"
+                f"过期 {s['expirations']}，条目 {s['entries']}，合并 {s['coalesced']}，"
+                f"限流等待 {s['throttled']} 次 ({s['throttle_wait']:.2f}s)，重试 {s['retries']}，"
+                f"并发峰值 {s['peak_concurrency']}")
@@ -0,0 +1,459 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from email.utils import formatdate
+
+import httpx
+
+import weather
+from grid_cache import GridCache
+from mock_nws_server import MockNWSServer
+from nws_client import NWSClient, TokenBucket, response_ttl, retry_after_seconds
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestResponseTTL(unittest.TestCase):
+    def test_cache_headers(self):
+        now = time.time()
+        self.assertEqual(response_ttl(httpx.Headers({"Cache-Control": "public, max-age=600"})), 600)
+        self.assertEqual(response_ttl(httpx.Headers({"Cache-Control": "max-age=600", "Age": "100"})), 500)
+        self.assertEqual(response_ttl(httpx.Headers({"Cache-Control": "no-store, max-age=600"})), 0)
+        self.assertEqual(response_ttl(httpx.Headers({"Cache-Control": "no-cache"})), 0)
+        self.assertEqual(response_ttl(httpx.Headers({})), 0)
+        self.assertEqual(response_ttl(httpx.Headers({
+            "Date": formatdate(now, usegmt=True),
+            "Expires": formatdate(now + 300, usegmt=True)
+        })), 300)
+        self.assertEqual(response_ttl(httpx.Headers({"Expires": "0"})), 0)
+
+    def test_retry_after(self):
+        self.assertEqual(retry_after_seconds(httpx.Headers({"Retry-After": "5"})), 5)
+        self.assertAlmostEqual(retry_after_seconds(httpx.Headers({
+            "Retry-After": formatdate(time.time() + 30, usegmt=True)
+        })), 30, delta=2)
+        self.assertIsNone(retry_after_seconds(httpx.Headers({})))
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_reserve_waits_in_order(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=1, clock=clock)
+        waits = [bucket.reserve() for _ in range(3)]
+        self.assertEqual([round(w, 6) for w in waits], [0, 0.1, 0.2])
+
+        # 令牌补充不超过桶的容量
+        clock.now += 10
+        self.assertEqual([bucket.reserve(), round(bucket.reserve(), 6)], [0, 0.1])
+
+
+class MockServerTestCase(unittest.TestCase):
+    """每个测试启动一个模拟 NWS 服务，并让 weather 指向它"""
+
+    def setUp(self):
+        self.server = MockNWSServer().start()
+        self.base = weather.NWS_API_BASE
+        self.grid_cache_path = weather.GRID_CACHE_PATH
+        weather.NWS_API_BASE = self.server.base_url
+        # 这些测试针对响应缓存，不使用网格缓存
+        weather.GRID_CACHE_PATH = ""
+
+    def tearDown(self):
+        weather.close_grid_cache()
+        weather.NWS_API_BASE = self.base
+        weather.GRID_CACHE_PATH = self.grid_cache_path
+        self.server.stop()
+
+    def run_with_client(self, coro_factory, **client_kwargs):
+        """在共享客户端上运行，结束后关闭客户端；返回 (结果, 客户端统计)"""
+
+        async def main():
+            weather._nws_client = NWSClient(user_agent=weather.USER_AGENT, **client_kwargs)
+            try:
+                return await coro_factory(), weather.get_nws_client().stats()
+            finally:
+                await weather.close_nws_client()
+
+        return asyncio.run(main())
+
+
+class TestWeatherTools(MockServerTestCase):
+    def test_pooled_client_reuses_one_connection(self):
+        """连续调用工具只建立一个 TCP 连接"""
+
+        async def calls():
+            for i in range(5):
+                await weather.get_forecast(40.0 + i, -100.0)
+                await weather.get_alerts("CA")
+
+        self.server.max_age.update({"points": 0, "forecast": 0, "alerts": 0})
+        _, stats = self.run_with_client(calls)
+
+        self.assertEqual(self.server.requests, 15)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(stats["connections_opened"], 1)
+
+    def test_repeated_lookups_are_served_from_cache(self):
+        """points 和 forecast 按 max-age 缓存，no-cache 的预警每次都访问上游"""
+
+        async def calls():
+            results = [await weather.get_forecast(39.7456, -97.0892) for _ in range(3)]
+            for _ in range(3):
+                await weather.get_alerts("TX")
+            return results
+
+        self.server.max_age.update({"alerts": 0})
+        results, stats = self.run_with_client(calls)
+
+        self.assertEqual(len(set(results)), 1)
+        self.assertIn("温度", results[0])
+        self.assertEqual(self.server.requests_by_route, {"points": 1, "forecast": 1, "alerts": 3})
+        self.assertEqual(stats["hits"], 4)
+
+    def test_ttl_expiry_and_points_floor(self):
+        """forecast 过期后重新请求；points 即使 max-age 很短也至少缓存 POINTS_MIN_TTL"""
+        clock = FakeClock()
+
+        async def calls():
+            await weather.get_forecast(39.7, -97.1)
+            clock.now += 120
+            await weather.get_forecast(39.7, -97.1)
+            clock.now += 3600
+            await weather.get_forecast(39.7, -97.1)
+
+        self.server.max_age.update({"points": 60, "forecast": 600})
+        _, stats = self.run_with_client(calls, clock=clock)
+
+        self.assertEqual(self.server.requests_by_route, {"points": 1, "forecast": 2})
+        self.assertEqual(stats["expirations"], 1)
+
+    def test_expires_header(self):
+        self.server.use_expires = True
+        self.server.max_age.update({"alerts": 60})
+
+        async def calls():
+            await weather.get_alerts("NY")
+            await weather.get_alerts("NY")
+
+        self.run_with_client(calls)
+        self.assertEqual(self.server.requests_by_route["alerts"], 1)
+
+    def test_upstream_error_returns_message(self):
+        weather.NWS_API_BASE = self.server.base_url + "/missing"
+
+        result, stats = self.run_with_client(lambda: weather.get_alerts("CA"))
+
+        self.assertEqual(result, "无法获取预警信息或未找到相关数据。")
+        self.assertEqual(stats["errors"], 1)
+
+    def test_invalid_url_returns_message(self):
+        """参数中含控制字符导致 URL 不合法时返回错误提示，不重试"""
+        result, stats = self.run_with_client(lambda: weather.get_alerts("C\x00A"))
+
+        self.assertEqual(result, weather.ALERTS_ERROR)
+        self.assertEqual((stats["errors"], stats["retries"]), (1, 0))
+
+    def test_latency_with_connection_setup_cost(self):
+        """建连开销较大时，复用连接和缓存让重复的预报查询明显变快"""
+        self.server.latency = 0.01
+        self.server.connect_latency = 0.05
+
+        async def calls():
+            timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                await weather.get_forecast(35.0, -80.0)
+                timings.append(time.perf_counter() - start)
+            return timings
+
+        timings, stats = self.run_with_client(calls)
+
+        # 首次：一次建连 + 两次请求；之后全部命中缓存
+        self.assertGreater(timings[0], 0.07)
+        self.assertLess(max(timings[1:]), 0.01)
+        self.assertEqual((self.server.connections, stats["hits"]), (1, 4))
+
+
+class TestRequestControl(MockServerTestCase):
+    def test_concurrent_identical_requests_are_coalesced(self):
+        """同一 URL 的并发请求只访问一次上游"""
+        self.server.latency = 0.05
+        self.server.max_age.update({"alerts": 0})
+
+        async def calls():
+            return await asyncio.gather(
+                *[weather.get_alerts("CA") for _ in range(20)],
+                *[weather.get_forecast(39.7456, -97.0892) for _ in range(10)]
+            )
+
+        results, stats = self.run_with_client(calls)
+
+        self.assertEqual(len(set(results[:20])), 1)
+        self.assertEqual(len(set(results[20:])), 1)
+        self.assertEqual(self.server.requests_by_route, {"alerts": 1, "points": 1, "forecast": 1})
+        self.assertEqual(stats["coalesced"], 19 + 9 + 9)
+        self.assertEqual(stats["upstream_saved"], 37)
+
+    def test_retries_on_429_and_5xx(self):
+        self.server.retry_after = 0
+        self.server.fail_next.extend([503, 429])
+
+        result, stats = self.run_with_client(lambda: weather.get_alerts("CA"), backoff_base=0.01)
+
+        self.assertIn("事件", result)
+        self.assertEqual((stats["upstream_requests"], stats["retries"], stats["errors"]), (3, 2, 0))
+
+    def test_retries_exhausted(self):
+        self.server.fail_next.extend([503] * 5)
+
+        result, stats = self.run_with_client(
+            lambda: weather.get_alerts("CA"), max_retries=2, backoff_base=0.01
+        )
+
+        self.assertEqual(result, "无法获取预警信息或未找到相关数据。")
+        self.assertEqual((stats["upstream_requests"], stats["errors"]), (3, 1))
+        self.assertEqual(len(self.server.fail_next), 2)
+
+    def test_rate_limit_and_concurrency_cap(self):
+        """令牌桶限制请求速率，信号量限制同时进行的上游请求数"""
+        self.server.latency = 0.02
+        self.server.max_age.update({"alerts": 0})
+
+        async def calls():
+            start = time.perf_counter()
+            await asyncio.gather(*[weather.get_alerts(f"S{i}") for i in range(10)])
+            return time.perf_counter() - start
+
+        elapsed, stats = self.run_with_client(calls, rate_limit=50, burst=1, max_concurrency=2)
+
+        # 10 个请求、每秒 50 个、没有突发：至少 9 / 50 = 0.18 秒
+        self.assertGreater(elapsed, 0.17)
+        self.assertGreater(stats["throttled"], 0)
+        self.assertLessEqual(stats["peak_concurrency"], 2)
+        self.assertLessEqual(self.server.max_in_flight, 2)
+
+
+class TestBatchTools(MockServerTestCase):
+    def test_alerts_batch_reports_failures_per_state(self):
+        result, _ = self.run_with_client(lambda: weather.get_alerts_batch(["CA", "tx", "ca", "X-Y"]))
+
+        self.assertTrue(result.startswith("共 3 个州，成功 2 个，失败 1 个。"))
+        self.assertIn("=== CA ===\n事件: Flood Warning", result)
+        self.assertIn("=== TX ===", result)
+        self.assertIn(f"=== X-Y（失败）===\n{weather.ALERTS_ERROR}", result)
+        self.assertEqual(self.server.requests_by_route["alerts"], 2)
+
+    def test_forecast_batch(self):
+        locations = [(39.7456, -97.0892), (40.7128, -74.006), (39.7456, -97.0892), (float("nan"), 0.0)]
+
+        result, _ = self.run_with_client(lambda: weather.get_forecast_batch(locations))
+
+        self.assertTrue(result.startswith("共 3 个地点，成功 2 个，失败 1 个。"))
+        self.assertIn("=== 40.7128,-74.006 ===", result)
+        self.assertIn(f"=== nan,0.0（失败）===\n{weather.POINTS_ERROR}", result)
+        self.assertEqual(self.server.requests_by_route, {"points": 2, "forecast": 2})
+
+    def test_batch_concurrency_cap(self):
+        """批量查询并发进行，但同时进行的查询不超过 BATCH_CONCURRENCY"""
+        self.server.latency = 0.05
+        states = [f"S{i}" for i in range(12)]
+        original = weather.BATCH_CONCURRENCY
+        weather.BATCH_CONCURRENCY = 4
+
+        async def calls():
+            start = time.perf_counter()
+            await weather.get_alerts_batch(states)
+            return time.perf_counter() - start
+
+        try:
+            elapsed, _ = self.run_with_client(calls)
+        finally:
+            weather.BATCH_CONCURRENCY = original
+
+        self.assertLessEqual(self.server.max_in_flight, 4)
+        # 12 个请求、每次 4 个：约 3 个请求延迟，远少于逐个查询的 12 个
+        self.assertLess(elapsed, 12 * 0.05 / 2)
+
+    def test_batch_size_limit(self):
+        result = asyncio.run(weather.get_alerts_batch([f"S{i}" for i in range(weather.MAX_BATCH_SIZE + 1)]))
+        self.assertEqual(result, f"一次最多查询 {weather.MAX_BATCH_SIZE} 个州，收到 {weather.MAX_BATCH_SIZE + 1} 个。")
+        self.assertEqual(self.server.requests, 0)
+
+
+class TestCompactOutput(MockServerTestCase):
+    def test_alerts_json_is_compact_and_deduplicates_areas(self):
+        self.server.alerts_per_state = 5
+
+        async def calls():
+            return await weather.get_alerts("CA"), await weather.get_alerts("CA", output_format="json")
+
+        (text, compact), _ = self.run_with_client(calls)
+        data = json.loads(compact)
+
+        self.assertEqual((data["state"], data["total"], data["offset"]), ("CA", 5, 0))
+        self.assertNotIn("next_offset", data)
+        # 模拟数据中两组县交替出现
+        self.assertEqual(len(data["areas"]), 2)
+        self.assertEqual([alert["area"] for alert in data["alerts"]], [0, 1, 0, 1, 0])
+        description = data["alerts"][0]["description"]
+        self.assertEqual(len(description), weather.COMPACT_DESCRIPTION_CHARS)
+        self.assertTrue(description.endswith("…"))
+        self.assertNotIn("\n", description)
+        self.assertLess(len(compact.encode()), len(text.encode()) / 2)
+
+    def test_alerts_pagination(self):
+        self.server.alerts_per_state = 5
+
+        async def calls():
+            return [
+                json.loads(await weather.get_alerts("CA", "json", offset=0, limit=2)),
+                json.loads(await weather.get_alerts("CA", "json", offset=4, limit=2)),
+                await weather.get_alerts("CA", offset=2, limit=2),
+                await weather.get_alerts("CA", offset=9)
+            ]
+
+        (first, last, text, beyond), _ = self.run_with_client(calls)
+
+        self.assertEqual((len(first["alerts"]), first["next_offset"]), (2, 2))
+        self.assertEqual((len(last["alerts"]), last["offset"]), (1, 4))
+        self.assertNotIn("next_offset", last)
+        self.assertEqual(text.count("事件:"), 2)
+        self.assertIn("本次返回第 3-4 条，使用 offset=4 获取下一页", text)
+        self.assertEqual(beyond, "该州共有 5 条预警，offset=9 之后没有更多预警。")
+        # 所有分页共用一次上游请求
+        self.assertEqual(self.server.requests_by_route["alerts"], 1)
+
+    def test_forecast_json(self):
+        result, _ = self.run_with_client(lambda: weather.get_forecast(39.7456, -97.0892, output_format="json"))
+        periods = json.loads(result)["periods"]
+
+        self.assertEqual(len(periods), 5)
+        self.assertEqual(set(periods[0]), {"name", "temperature", "wind", "forecast"})
+        self.assertEqual(periods[0]["forecast"], "Partly Cloudy")
+
+    def test_json_errors_and_batch(self):
+        async def calls():
+            return (
+                await weather.get_alerts("X-Y", output_format="json"),
+                await weather.get_alerts_batch(["CA", "X-Y"], output_format="json"),
+                await weather.get_forecast(35.0, -80.0, output_format="xml")
+            )
+
+        (error, batch, unsupported), _ = self.run_with_client(calls)
+
+        self.assertEqual(json.loads(error), {"error": weather.ALERTS_ERROR})
+        batch = json.loads(batch)
+        self.assertEqual((batch["total"], batch["failed"]), (2, 1))
+        self.assertEqual(batch["results"]["CA"]["total"], 3)
+        self.assertEqual(batch["results"]["X-Y"], {"error": weather.ALERTS_ERROR})
+        self.assertEqual(unsupported, "不支持的输出格式: xml（可选: text, json）")
+
+
+class TestGridCache(MockServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        weather.GRID_CACHE_PATH = os.path.join(self.tmpdir.name, "grid.sqlite3")
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmpdir.cleanup()
+
+    def restart(self):
+        """模拟服务器重启：重新打开网格缓存，响应缓存随新的客户端清空"""
+        weather.close_grid_cache()
+        return weather.get_grid_cache()
+
+    def test_warm_start_skips_points(self):
+        """重启后从 SQLite 预热，预报查询直接请求 forecast，不再访问 /points"""
+        first, _ = self.run_with_client(lambda: weather.get_forecast(39.7456, -97.0892))
+
+        cache = self.restart()
+        self.assertEqual(cache.stats()["warmed"], 1)
+        self.server.reset_stats()
+        second, _ = self.run_with_client(lambda: weather.get_forecast(39.7456, -97.0892))
+
+        self.assertEqual(second, first)
+        self.assertEqual(self.server.requests_by_route, {"forecast": 1})
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_nearby_coordinates_share_grid_entry(self):
+        """量化后相同的坐标共用一条记录，/points 请求使用量化后的坐标"""
+
+        async def calls():
+            await weather.get_forecast(39.74561, -97.08921)
+            await weather.get_forecast(39.74559, -97.08919)
+            await weather.get_forecast(40.5, -97.0)
+
+        self.server.max_age.update({"points": 0, "forecast": 0})
+        self.run_with_client(calls, points_min_ttl=0)
+
+        self.assertEqual(self.server.requests_by_route, {"points": 2, "forecast": 3})
+        self.assertEqual(weather.get_grid_cache().stats()["entries"], 2)
+
+    def test_half_way_coordinates_hit_the_stored_entry(self):
+        """量化坐标与查询键由同一次整数舍入得到，恰好在中间的坐标也能命中"""
+        cache = weather.get_grid_cache()
+        for latitude, longitude in ((37.7745, -122.4195), (39.0005, -97.0015)):
+            self.assertEqual(cache._key(*cache.quantize(latitude, longitude)), cache._key(latitude, longitude))
+
+        self.server.max_age.update({"points": 0, "forecast": 0})
+        self.run_with_client(lambda: weather.get_forecast(37.7745, -122.4195), points_min_ttl=0)
+        self.run_with_client(lambda: weather.get_forecast(37.7745, -122.4195), points_min_ttl=0)
+
+        self.assertEqual(self.server.requests_by_route, {"points": 1, "forecast": 2})
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_stale_forecast_url_is_re_resolved(self):
+        """缓存的 forecast URL 失效时删除记录，重新解析网格"""
+        cache = weather.get_grid_cache()
+        cache.store(35.0, -80.0, {"forecast": f"{self.server.base_url}/gridpoints/OLD/1,1/missing"})
+
+        result, _ = self.run_with_client(lambda: weather.get_forecast(35.0, -80.0))
+
+        self.assertIn("温度", result)
+        self.assertEqual(self.server.requests_by_route, {"points": 1, "forecast": 1})
+        self.assertEqual(cache.stats()["invalidations"], 1)
+        self.assertNotIn("/OLD/", self.restart().lookup(35.0, -80.0))
+
+    def test_unusable_cache_file_is_skipped(self):
+        """缓存文件无法打开时记录日志并继续工作，只是不使用网格缓存"""
+        weather.close_grid_cache()
+        with open(weather.GRID_CACHE_PATH, "wb") as f:
+            f.write(b"not a sqlite database" * 10)
+
+        with self.assertLogs("weather", level="WARNING"):
+            self.assertIsNone(weather.get_grid_cache())
+        result, _ = self.run_with_client(lambda: weather.get_forecast(39.7456, -97.0892))
+
+        self.assertIn("温度", result)
+        self.assertEqual(self.server.requests_by_route, {"points": 1, "forecast": 1})
+
+    @unittest.skipIf(os.getenv("NWS_GRID_CACHE_PATH"), "已通过环境变量指定缓存路径")
+    def test_default_path_is_next_to_module(self):
+        self.assertEqual(os.path.dirname(self.grid_cache_path), os.path.dirname(os.path.abspath(weather.__file__)))
+
+    def test_expired_entries_are_dropped_on_warm(self):
+        clock = FakeClock()
+        path = weather.GRID_CACHE_PATH
+        cache = GridCache(path, max_age=60, clock=clock)
+        cache.store(35.0, -80.0, {"forecast": "http://example/forecast"})
+        cache.close()
+
+        clock.now += 61
+        cache = GridCache(path, max_age=60, clock=clock)
+        self.assertEqual((cache.warmed, cache.lookup(35.0, -80.0)), (0, None))
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
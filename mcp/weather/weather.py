@@ -1,16 +1,108 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from collections.abc import AsyncIterator, Awaitable
+from contextlib import asynccontextmanager
 from typing import Any
-import httpx
 from mcp.server.fastmcp import FastMCP
 
-# 1. 初始化 FastMCP 服务器
-# 创建一个名为 "weather" 的服务器实例。这个名字有助于识别这套工具。
-mcp = FastMCP("weather")
+from grid_cache import GridCache
+from nws_client import NWSClient
 
 # --- 常量定义 ---
 # 美国国家气象局 (NWS) API 的基础 URL
 NWS_API_BASE = "https://api.weather.gov"
 # 设置请求头中的 User-Agent，很多公共 API 要求提供此信息以识别客户端
 USER_AGENT = "weather-app/1.0"
+# 经纬度 → 预报网格的持久化缓存文件，设为空字符串时不使用网格缓存；
+# 默认放在本模块所在目录，不随 MCP 客户端启动服务器时的工作目录变化
+GRID_CACHE_PATH = os.getenv(
+    "NWS_GRID_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".nws_grid_cache.sqlite3")
+)
+# 批量工具中同时进行的单项查询数（上游请求另外受 NWSClient 的并发上限和限流约束）
+BATCH_CONCURRENCY = 8
+# 单次批量调用最多包含的州 / 地点数
+MAX_BATCH_SIZE = 50
+
+# 工具的错误提示；批量工具据此判断单项是否失败
+ALERTS_ERROR = "无法获取预警信息或未找到相关数据。"
+POINTS_ERROR = "无法获取该地点的预报数据。"
+FORECAST_ERROR = "无法获取详细的预报信息。"
+
+# 输出格式：text 为原来的可读文本；json 为只保留关键字段、限制长度的紧凑 JSON，模型读取时 token 更少
+OUTPUT_FORMATS = ("text", "json")
+# 紧凑输出中预警描述和指令的最大字符数
+COMPACT_DESCRIPTION_CHARS = 200
+COMPACT_INSTRUCTION_CHARS = 120
+
+# 整个服务器生命周期共享的 NWS 客户端（连接池 + 响应缓存），首次请求时创建
+_nws_client: NWSClient | None = None
+# 网格缓存，服务器启动时打开（并从上次运行保存的记录预热）
+_grid_cache: GridCache | None = None
+# 网格缓存打开失败后不再重试，直到 close_grid_cache()
+_grid_cache_failed = False
+
+logger = logging.getLogger(__name__)
+
+
+def get_nws_client() -> NWSClient:
+    """返回共享的 NWS 客户端，不存在时创建。"""
+    global _nws_client
+    if _nws_client is None:
+        _nws_client = NWSClient(user_agent=USER_AGENT)
+    return _nws_client
+
+
+async def close_nws_client():
+    """关闭共享的 NWS 客户端，释放连接池中的连接。"""
+    global _nws_client
+    if _nws_client is not None:
+        await _nws_client.aclose()
+        _nws_client = None
+
+
+def get_grid_cache() -> GridCache | None:
+    """
+    返回网格缓存，不存在时打开；GRID_CACHE_PATH 为空时返回 None。
+
+    缓存文件无法打开（目录只读、文件损坏等）时记录日志并返回 None，工具照常工作，只是不使用网格缓存。
+    """
+    global _grid_cache, _grid_cache_failed
+    if _grid_cache is None and GRID_CACHE_PATH and not _grid_cache_failed:
+        try:
+            _grid_cache = GridCache(GRID_CACHE_PATH)
+        except sqlite3.Error as e:
+            _grid_cache_failed = True
+            logger.warning("无法打开网格缓存 %s，将不使用网格缓存: %s", GRID_CACHE_PATH, e)
+    return _grid_cache
+
+
+def close_grid_cache():
+    """关闭网格缓存（记录已在写入时落盘）。"""
+    global _grid_cache, _grid_cache_failed
+    _grid_cache_failed = False
+    if _grid_cache is not None:
+        _grid_cache.close()
+        _grid_cache = None
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """服务器启动时预热网格缓存，退出时关闭共享的 NWS 客户端和网格缓存。"""
+    get_grid_cache()
+    try:
+        yield
+    finally:
+        await close_nws_client()
+        close_grid_cache()
+
+
+# 1. 初始化 FastMCP 服务器
+# 创建一个名为 "weather" 的服务器实例。这个名字有助于识别这套工具。
+mcp = FastMCP("weather", lifespan=lifespan)
 
 
 # --- 辅助函数 ---
@@ -18,6 +110,8 @@ USER_AGENT = "weather-app/1.0"
 async def make_nws_request(url: str) -> dict[str, Any] | None:
     """
     一个通用的异步函数，用于向 NWS API 发起请求并处理常见的错误。
+    所有请求共用一个带连接池的客户端（HTTP keep-alive），
+    并按响应的 Cache-Control / Expires 头缓存结果，重复的请求不再访问 NWS。
 
     Args:
         url (str): 要请求的完整 URL。
@@ -25,22 +119,9 @@ async def make_nws_request(url: str) -> dict[str, Any] | None:
     Returns:
         dict[str, Any] | None: 成功时返回解析后的 JSON 字典，失败时返回 None。
     """
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Accept": "application/geo+json"  # NWS API 推荐的 Accept 头
-    }
-    # 使用 httpx.AsyncClient 来执行异步 HTTP GET 请求
-    async with httpx.AsyncClient() as client:
-        try:
-            # 发起请求，设置了30秒的超时
-            response = await client.get(url, headers=headers, timeout=30.0)
-            # 如果响应状态码是 4xx 或 5xx（表示客户端或服务器错误），则会引发一个异常
-            response.raise_for_status()
-            # 如果请求成功，返回 JSON 格式的响应体
-            return response.json()
-        except Exception:
-            # 捕获所有可能的异常（如网络问题、超时、HTTP错误等），并返回 None
-            return None
+    # 请求头（User-Agent、Accept）和30秒超时在共享客户端中统一设置；
+    # 网络问题、超时、4xx/5xx 等错误都会返回 None
+    return await get_nws_client().get_json(url)
 
 def format_alert(feature: dict) -> str:
     """将单个天气预警的 JSON 数据格式化为人类可读的字符串。"""
@@ -54,36 +135,145 @@ def format_alert(feature: dict) -> str:
 指令: {props.get('instruction', '无具体指令')}
 """
 
+def truncate(text: str | None, max_chars: int) -> str | None:
+    """合并连续的空白（换行、缩进），超过 max_chars 个字符时截断并以省略号结尾。"""
+    if not text:
+        return None
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+def to_json(data: Any) -> str:
+    """紧凑的 JSON：不转义中文，不加多余的空格。"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def check_output_format(output_format: str) -> str | None:
+    """不支持的输出格式返回提示信息，否则返回 None。"""
+    if output_format not in OUTPUT_FORMATS:
+        return f"不支持的输出格式: {output_format}（可选: {', '.join(OUTPUT_FORMATS)}）"
+    return None
+
+def error_result(message: str, output_format: str) -> str:
+    """按输出格式返回错误提示。"""
+    return to_json({"error": message}) if output_format == "json" else message
+
+def compact_alerts(features: list[dict]) -> dict:
+    """
+    精简预警列表：只保留关键字段，描述和指令合并空白并截断。
+    同一批县常常出现在多条预警中，区域描述只在 areas 中出现一次，预警用序号引用。
+    """
+    areas: dict[str, int] = {}
+    alerts = []
+    for feature in features:
+        props = feature["properties"]
+        alert = {
+            "event": props.get("event", "未知"),
+            "severity": props.get("severity", "未知"),
+            "headline": props.get("headline"),
+            "area": areas.setdefault(props.get("areaDesc") or "未知", len(areas)),
+            "description": truncate(props.get("description"), COMPACT_DESCRIPTION_CHARS),
+            "instruction": truncate(props.get("instruction"), COMPACT_INSTRUCTION_CHARS)
+        }
+        # 缺失的字段不输出
+        alerts.append({key: value for key, value in alert.items() if value is not None})
+    return {"areas": list(areas), "alerts": alerts}
+
+def compact_period(period: dict) -> dict:
+    """精简单个预报时段：用简短预报代替详细描述。"""
+    return {
+        "name": period["name"],
+        "temperature": f"{period['temperature']}°{period['temperatureUnit']}",
+        "wind": f"{period['windSpeed']} {period['windDirection']}",
+        "forecast": period.get("shortForecast") or truncate(period["detailedForecast"], COMPACT_DESCRIPTION_CHARS)
+    }
+
+async def gather_limited(coros: list[Awaitable[str]], limit: int) -> list[str | BaseException]:
+    """并发执行，同时最多 limit 个；单项抛出的异常作为结果返回，不影响其他项。"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro: Awaitable[str]) -> str:
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*[run(coro) for coro in coros], return_exceptions=True)
+
+def format_batch(kind: str, labels: list[str], results: list[str | BaseException], output_format: str = "text") -> str:
+    """把批量查询的结果合并成一个字符串：开头是汇总，之后每项一段，失败的项单独标出。"""
+    if output_format == "json":
+        items = {}
+        for label, result in zip(labels, results):
+            items[label] = {"error": f"查询出错: {type(result).__name__}"} \
+                if isinstance(result, BaseException) else json.loads(result)
+        failed = sum("error" in item for item in items.values())
+        return to_json({"total": len(labels), "failed": failed, "results": items})
+
+    sections = []
+    failed = 0
+    for label, result in zip(labels, results):
+        if isinstance(result, BaseException):
+            result = f"查询出错: {type(result).__name__}"
+        if result.startswith("查询出错") or result in (ALERTS_ERROR, POINTS_ERROR, FORECAST_ERROR):
+            failed += 1
+            sections.append(f"=== {label}（失败）===\n{result}")
+        else:
+            sections.append(f"=== {label} ===\n{result.strip()}")
+    summary = f"共 {len(labels)} 个{kind}，成功 {len(labels) - failed} 个，失败 {failed} 个。"
+    return "\n\n".join([summary, *sections])
+
 # --- MCP 工具定义 ---
 
 @mcp.tool()
-async def get_alerts(state: str) -> str:
+async def get_alerts(state: str, output_format: str = "text", offset: int = 0, limit: int | None = None) -> str:
     """
     获取美国某个州当前生效的天气预警信息。
     这个函数被 @mcp.tool() 装饰器标记，意味着它可以被大模型作为工具来调用。
 
     参数:
         state: 两个字母的美国州代码 (例如: CA, NY)。
+        output_format: "text" 返回完整的可读文本；"json" 返回精简字段、截断长文本的紧凑 JSON，
+            重复的区域描述只出现一次（预警的 area 是 areas 中的序号）。
+        offset: 分页时跳过的预警数，从 0 开始。
+        limit: 每页最多返回的预警数，不指定时返回全部；还有更多预警时结果中会给出下一页的 offset。
     """
+    if message := check_output_format(output_format):
+        return message
+
     # 构造请求特定州天气预警的 URL
     url = f"{NWS_API_BASE}/alerts/active/area/{state}"
     data = await make_nws_request(url)
 
     # 健壮性检查：如果请求失败或返回的数据格式不正确
     if not data or "features" not in data:
-        return "无法获取预警信息或未找到相关数据。"
+        return error_result(ALERTS_ERROR, output_format)
+
+    # 分页：预警很多的州可以分几次读取
+    features = data["features"]
+    total = len(features)
+    offset = max(0, offset)
+    page = features[offset:offset + limit] if limit else features[offset:]
+    next_offset = offset + len(page) if offset + len(page) < total else None
+
+    if output_format == "json":
+        result = {"state": state, "total": total, "offset": offset, **compact_alerts(page)}
+        if next_offset is not None:
+            result["next_offset"] = next_offset
+        return to_json(result)
 
     # 如果 features 列表为空，说明该州当前没有生效的预警
-    if not data["features"]:
+    if not features:
         return "该州当前没有生效的天气预警。"
+    if not page:
+        return f"该州共有 {total} 条预警，offset={offset} 之后没有更多预警。"
 
     # 使用列表推导和 format_alert 函数来格式化所有预警信息
-    alerts = [format_alert(feature) for feature in data["features"]]
+    alerts = [format_alert(feature) for feature in page]
     # 将所有预警信息用分隔线连接成一个字符串并返回
-    return "\n---\n".join(alerts)
+    text = "\n---\n".join(alerts)
+    if next_offset is not None:
+        text += f"\n（共 {total} 条预警，本次返回第 {offset + 1}-{next_offset} 条，使用 offset={next_offset} 获取下一页）"
+    return text
 
 @mcp.tool()
-async def get_forecast(latitude: float, longitude: float) -> str:
+async def get_forecast(latitude: float, longitude: float, output_format: str = "text") -> str:
     """
     根据给定的经纬度获取天气预报。
     同样，这个函数也是一个可被调用的 MCP 工具。
@@ -91,25 +281,47 @@ async def get_forecast(latitude: float, longitude: float) -> str:
     参数:【经查官网，API并不支持days参数，默认会获取7天的预报】
         latitude: 地点的纬度
         longitude: 地点的经度
+        output_format: "text" 返回详细的可读文本；"json" 返回每个时段的温度、风力和简短预报（紧凑 JSON）
     """
-    # NWS API 获取预报需要两步
-    # 第一步：根据经纬度获取一个包含具体预报接口 URL 的网格点信息
-    points_url = f"{NWS_API_BASE}/points/{latitude},{longitude}"
-    points_data = await make_nws_request(points_url)
+    if message := check_output_format(output_format):
+        return message
+
+    # NWS API 获取预报需要两步；网格缓存命中时直接请求预报，跳过第一步
+    grid_cache = get_grid_cache()
+    forecast_url = grid_cache.lookup(latitude, longitude) if grid_cache else None
+    forecast_data = None
+    if forecast_url:
+        forecast_data = await make_nws_request(forecast_url)
+        if not forecast_data:
+            # 缓存的预报 URL 可能已经失效（网格调整），删除后重新解析
+            grid_cache.invalidate(latitude, longitude)
 
-    if not points_data:
-        return "无法获取该地点的预报数据。"
+    if not forecast_data:
+        # 第一步：根据经纬度获取一个包含具体预报接口 URL 的网格点信息
+        # 使用网格缓存时按量化后的坐标请求，与缓存的键保持一致
+        if grid_cache:
+            latitude, longitude = grid_cache.quantize(latitude, longitude)
+        points_url = f"{NWS_API_BASE}/points/{latitude},{longitude}"
+        points_data = await make_nws_request(points_url)
+
+        if not points_data:
+            return error_result(POINTS_ERROR, output_format)
 
-    # 第二步：从上一步的响应中提取实际的天气预报接口 URL
-    forecast_url = points_data["properties"]["forecast"]
-    # 第三步：请求详细的天气预报数据
-    forecast_data = await make_nws_request(forecast_url)
+        if grid_cache:
+            grid_cache.store(latitude, longitude, points_data["properties"])
+        # 第二步：从上一步的响应中提取实际的天气预报接口 URL
+        forecast_url = points_data["properties"]["forecast"]
+        # 第三步：请求详细的天气预报数据
+        forecast_data = await make_nws_request(forecast_url)
 
     if not forecast_data:
-        return "无法获取详细的预报信息。"
+        return error_result(FORECAST_ERROR, output_format)
 
     # 提取预报周期数据
     periods = forecast_data["properties"]["periods"]
+    if output_format == "json":
+        return to_json({"periods": [compact_period(period) for period in periods[:5]]})
+
     forecasts = []
     # 遍历接下来的5个预报周期（例如：今天下午、今晚、明天...）
     for period in periods[:5]:
@@ -124,6 +336,50 @@ async def get_forecast(latitude: float, longitude: float) -> str:
     # 将格式化后的预报信息连接成一个字符串并返回
     return "\n---\n".join(forecasts)
 
+@mcp.tool()
+async def get_alerts_batch(states: list[str], output_format: str = "text") -> str:
+    """
+    一次获取多个州当前生效的天气预警，各州并发查询，结果合并返回。
+    需要查询多个州时使用，比逐个调用 get_alerts 少很多次工具调用；某个州失败不影响其他州。
+
+    参数:
+        states: 两个字母的美国州代码列表 (例如: ["CA", "NY"])，最多 50 个，重复的州只查询一次。
+        output_format: "text" 或 "json"，与 get_alerts 相同；json 时返回以州代码为键的一个 JSON 对象。
+    """
+    if message := check_output_format(output_format):
+        return message
+
+    # 统一大小写并去重，保持原来的顺序
+    states = list(dict.fromkeys(state.strip().upper() for state in states))
+    if len(states) > MAX_BATCH_SIZE:
+        return error_result(f"一次最多查询 {MAX_BATCH_SIZE} 个州，收到 {len(states)} 个。", output_format)
+
+    results = await gather_limited([get_alerts(state, output_format) for state in states], BATCH_CONCURRENCY)
+    return format_batch("州", states, results, output_format)
+
+@mcp.tool()
+async def get_forecast_batch(locations: list[tuple[float, float]], output_format: str = "text") -> str:
+    """
+    一次获取多个地点的天气预报，各地点并发查询，结果合并返回。
+    需要查询多个地点时使用，比逐个调用 get_forecast 少很多次工具调用；某个地点失败不影响其他地点。
+
+    参数:
+        locations: [纬度, 经度] 的列表 (例如: [[40.71, -74.01], [34.05, -118.24]])，最多 50 个，重复的地点只查询一次。
+        output_format: "text" 或 "json"，与 get_forecast 相同；json 时返回以 "纬度,经度" 为键的一个 JSON 对象。
+    """
+    if message := check_output_format(output_format):
+        return message
+
+    locations = list(dict.fromkeys((latitude, longitude) for latitude, longitude in locations))
+    if len(locations) > MAX_BATCH_SIZE:
+        return error_result(f"一次最多查询 {MAX_BATCH_SIZE} 个地点，收到 {len(locations)} 个。", output_format)
+
+    results = await gather_limited(
+        [get_forecast(latitude, longitude, output_format) for latitude, longitude in locations], BATCH_CONCURRENCY
+    )
+    labels = [f"{latitude},{longitude}" for latitude, longitude in locations]
+    return format_batch("地点", labels, results, output_format)
+
 
 # --- 服务器启动 ---
 